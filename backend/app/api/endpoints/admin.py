@@ -1,23 +1,74 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from typing import Dict, Any, List
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, List, Optional, Set
 import os
+import asyncio
 import csv
 import io
-from app.services.snowflake_service import SnowflakeService
-from app.services.ai_company_collector import AICompanyCollector
-from app.services.nikihou_scraper import NikihouScraper
+import json
+from app.services.company_tables import COMPANY_TABLES
+from app.services.registry import create_snowflake_service, get_snowflake_service
+from app.services.response_cache import invalidate_company_responses
+from app.services.company_catalogue import get_company_catalogue
+from app.services.company_search_index import get_company_search_index
+from app.services.company_suggest import get_company_suggester
+from app.services.pagination import (
+    MARKET_CAP_ORDER,
+    MARKET_CAP_SORT_COLUMN,
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    filters_fingerprint,
+    market_cap_seek,
+)
+from app.services.llm_cache import get_llm_cache
+from app.services.company_csv_import import CompanyCSVImporter, DEFAULT_BATCH_ROWS
 from app.services.sec_edgar_service import SECEdgarService
-from app.services.google_drive_service import GoogleDriveService
-from app.services.pdf_converter_service import PDFConverterService
-from app.services.shikiho_scraper import ShikihoScraper
+# pandas・pyarrow・Google APIクライアント・BeautifulSoupを使うサービスは読み込みに時間が
+# かかるため、起動を遅くしないよう各エンドポイントの中でインポートする
 
 router = APIRouter()
 
+MAX_BATCH_CONCURRENCY = 20
+# 実行中のバックグラウンドタスク（参照を持たないと途中でガベージコレクションされるため）
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _parse_max_concurrency(request_data: Dict[str, Any], default: int) -> int:
+    """リクエストの max_concurrency を検証して返す（1〜MAX_BATCH_CONCURRENCY の整数以外は400）"""
+    value = request_data.get('max_concurrency', default)
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= MAX_BATCH_CONCURRENCY:
+        raise HTTPException(
+            status_code=400,
+            detail=f"max_concurrency は1〜{MAX_BATCH_CONCURRENCY}の整数で指定してください",
+        )
+    return value
+
+
+def _on_company_written(table_name: str, ticker: str, values: Optional[Dict[str, Any]] = None, replace: bool = True):
+    """
+    企業を1件書き込んだ後に、カタログ・検索インデックス・検索候補・レスポンスキャッシュを更新
+
+    Args:
+        values: 書き込んだ値（Noneの場合は削除として扱う）
+        replace: Trueなら全項目を書き込んだもの（追加）、Falseならvaluesの項目だけを更新したものとして扱う
+    """
+    if values is None:
+        get_company_catalogue().remove(table_name, ticker)
+        get_company_search_index().remove(table_name, ticker)
+    else:
+        get_company_catalogue().apply(table_name, ticker, values, replace=replace)
+        get_company_search_index().apply(table_name, ticker, values, replace=replace)
+    get_company_suggester().mark_stale()
+    invalidate_company_responses([ticker])
+
 @router.post("/companies/add")
 async def add_company(company_data: Dict[str, Any]):
     """企業情報をSnowflakeに追加"""
     try:
-        snowflake_service = SnowflakeService()
+        snowflake_service = get_snowflake_service()
         required_fields = ['ticker', 'company_name']
         for field in required_fields:
             if not company_data.get(field):
@@ -76,6 +127,7 @@ async def add_company(company_data: Dict[str, Any]):
         cursor.execute(insert_query, tuple(values))
         snowflake_service.conn.commit()
         cursor.close()
+        _on_company_written(table_name, ticker, {**company_data, 'country': country})
         return {
             "message": "企業情報が正常に追加されました",
             "ticker": company_data['ticker'],
@@ -86,10 +138,21 @@ async def add_company(company_data: Dict[str, Any]):
         raise HTTPException(status_code=500, detail=f"企業情報の追加に失敗しました: {str(e)}")
 
 @router.get("/companies/search")
-async def search_companies(query: str = "", country: str = ""):
-    """企業名で検索してデータベースから情報を取得"""
+async def search_companies(
+    query: str = "",
+    country: str = "",
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="前のレスポンスのnext_cursor"),
+):
+    """企業名で検索してデータベースから情報を取得（時価総額の降順、続きはnext_cursorで取得）"""
     try:
-        snowflake_service = SnowflakeService()
+        filters = filters_fingerprint(query=query, country=country)
+        try:
+            seek_condition, seek_params = market_cap_seek(decode_cursor(cursor, filters) if cursor else None)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=f"カーソルが不正です: {str(e)}")
+        
+        snowflake_service = get_snowflake_service()
         db_name = os.getenv("SNOWFLAKE_DATABASE")
         schema_name = os.getenv("SNOWFLAKE_SCHEMA")
         
@@ -97,23 +160,39 @@ async def search_companies(query: str = "", country: str = ""):
         conditions = []
         params = []
         
+        # 企業名またはティッカーは検索インデックスでtickerに変換して絞り込む
+        # （一致する企業が多すぎる場合やインデックスを読み込めない場合はLIKEで検索する）
+        indexed_tickers = None
         if query:
-            # 企業名またはティッカーで検索
-            conditions.append("(LOWER(COMPANY_NAME) LIKE LOWER(%s) OR LOWER(TICKER) LIKE LOWER(%s))")
-            params.append(f"%{query}%")
-            params.append(f"%{query}%")
+            try:
+                indexed_tickers = get_company_search_index().tickers_by_table(query, country if country != "all" else None)
+            except Exception as e:
+                print(f"Company search index unavailable, falling back to LIKE: {str(e)}")
+            if indexed_tickers is None:
+                conditions.append("(LOWER(COMPANY_NAME) LIKE LOWER(%s) OR LOWER(TICKER) LIKE LOWER(%s))")
+                params.append(f"%{query}%")
+                params.append(f"%{query}%")
         
         if country and country != "all":
             conditions.append("COUNTRY = %s")
             params.append(country)
         
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
-        
-        # 各テーブルから検索
+        # 各テーブルを同じ条件で検索し、1つのクエリにまとめる
         tables = ['COMPANIES_JP', 'COMPANIES_US', 'COMPANIES_CN']
-        all_results = []
+        selects = []
+        union_params = []
         
         for table in tables:
+            table_conditions = list(conditions)
+            table_params = list(params)
+            if indexed_tickers is not None:
+                table_tickers = indexed_tickers.get(table)
+                if not table_tickers:
+                    continue
+                table_conditions.append(f"TICKER IN ({', '.join(['%s'] * len(table_tickers))})")
+                table_params.extend(table_tickers)
+            where_clause = " AND ".join(table_conditions) if table_conditions else "1=1"
+            
             # テーブルに応じてカラム名を調整
             if table == 'COMPANIES_CN':
                 search_query = f"""
@@ -124,11 +203,10 @@ async def search_companies(query: str = "", country: str = ""):
                     PER, PBR, EPS, BPS, ROE, ROA, REVENUE,
                     OPERATING_INCOME as OPERATING_PROFIT, NET_INCOME as NET_PROFIT, 
                     TOTAL_ASSETS, SHAREHOLDERS_EQUITY as EQUITY,
-                    OPERATING_MARGIN, NET_MARGIN, DIVIDEND_YIELD, COMPANY_TYPE, CEO
+                    OPERATING_MARGIN, NET_MARGIN, DIVIDEND_YIELD, COMPANY_TYPE, CEO,
+                    {MARKET_CAP_SORT_COLUMN}
                 FROM {db_name}.{schema_name}.{table}
                 WHERE {where_clause}
-                ORDER BY COMPANY_NAME
-                LIMIT 50
                 """
             else:
                 search_query = f"""
@@ -138,42 +216,86 @@ async def search_companies(query: str = "", country: str = ""):
                     EMPLOYEES, CURRENT_PRICE, SHARES_OUTSTANDING, VOLUME,
                     PER, PBR, EPS, BPS, ROE, ROA, REVENUE,
                     OPERATING_PROFIT, NET_PROFIT, TOTAL_ASSETS, EQUITY,
-                    OPERATING_MARGIN, NET_MARGIN, DIVIDEND_YIELD, COMPANY_TYPE, CEO
+                    OPERATING_MARGIN, NET_MARGIN, DIVIDEND_YIELD, COMPANY_TYPE, CEO,
+                    {MARKET_CAP_SORT_COLUMN}
                 FROM {db_name}.{schema_name}.{table}
                 WHERE {where_clause}
-                ORDER BY COMPANY_NAME
-                LIMIT 50
                 """
-            
-            results = snowflake_service.query(search_query, tuple(params))
-            # キー名を小文字に変換してフロントエンドと互換性を保つ
-            converted_results = []
-            for result in results:
-                converted_result = {}
-                for key, value in result.items():
-                    # 大文字のキーを小文字に変換
-                    converted_key = key.lower() if key.isupper() else key
-                    converted_result[converted_key] = value
-                converted_results.append(converted_result)
-            all_results.extend(converted_results)
-        
-        # 結果を企業名でソート
-        all_results.sort(key=lambda x: x.get('company_name', '') or '')
+            selects.append(search_query)
+            union_params.extend(table_params)
+        
+        if not selects:
+            return {"companies": [], "total": 0, "next_cursor": None}
+        
+        # 並べ替えとページの切り出しはSnowflakeで行う（次のページの有無を判定するため1件多く取得）
+        page_query = f"""
+        SELECT * FROM ({" UNION ALL ".join(selects)})
+        WHERE {seek_condition}
+        ORDER BY {MARKET_CAP_ORDER}
+        LIMIT {limit + 1}
+        """
+        results = snowflake_service.query(page_query, tuple(union_params + seek_params))
+        # キー名を小文字に変換してフロントエンドと互換性を保つ
+        all_results = []
+        for result in results:
+            converted_result = {}
+            for key, value in result.items():
+                # 大文字のキーを小文字に変換
+                converted_key = key.lower() if key.isupper() else key
+                converted_result[converted_key] = value
+            all_results.append(converted_result)
+        
+        has_more = len(all_results) > limit
+        all_results = all_results[:limit]
+        next_cursor = None
+        if has_more:
+            last_result = all_results[-1]
+            next_cursor = encode_cursor((last_result['sort_market_cap'], last_result['ticker']), filters)
+        for result in all_results:
+            result.pop('sort_market_cap', None)
         
         return {
             "companies": all_results,
-            "total": len(all_results)
+            "total": len(all_results),
+            "next_cursor": next_cursor
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error searching companies: {str(e)}")
         raise HTTPException(status_code=500, detail=f"企業検索に失敗しました: {str(e)}")
 
+# /companies/{ticker} より前に登録する（後にするとtickerとして扱われる）
+@router.get("/companies/export.parquet")
+async def export_companies_parquet(country: str = Query("JP", description="JP / US / CN")):
+    """企業テーブルをParquet形式でエクスポート（Snowflakeから取得したArrowのバッチを順に送信）"""
+    from app.services.company_parquet import stream_parquet
+    table_name = COMPANY_TABLES.get(country.upper())
+    if not table_name:
+        raise HTTPException(status_code=400, detail="countryにはJP、US、CNのいずれかを指定してください")
+
+    snowflake_service = create_snowflake_service()
+    if not snowflake_service.conn:
+        raise HTTPException(status_code=500, detail="Snowflakeに接続できませんでした")
+
+    def parquet_chunks():
+        try:
+            yield from stream_parquet(snowflake_service.iter_table_arrow_batches(table_name))
+        finally:
+            snowflake_service.close_connection()
+
+    return StreamingResponse(
+        parquet_chunks(),
+        media_type="application/vnd.apache.parquet",
+        headers={"Content-Disposition": f'attachment; filename="{table_name.lower()}.parquet"'}
+    )
+
 @router.get("/companies/{ticker}")
 async def get_company_by_ticker(ticker: str):
     """TICKERで企業情報を取得"""
     try:
-        snowflake_service = SnowflakeService()
+        snowflake_service = get_snowflake_service()
         db_name = os.getenv("SNOWFLAKE_DATABASE")
         schema_name = os.getenv("SNOWFLAKE_SCHEMA")
         
@@ -207,7 +329,7 @@ async def get_company_by_ticker(ticker: str):
 async def update_company(ticker: str, company_data: Dict[str, Any]):
     """企業情報を更新"""
     try:
-        snowflake_service = SnowflakeService()
+        snowflake_service = get_snowflake_service()
         db_name = os.getenv("SNOWFLAKE_DATABASE")
         schema_name = os.getenv("SNOWFLAKE_SCHEMA")
         
@@ -263,6 +385,11 @@ async def update_company(ticker: str, company_data: Dict[str, Any]):
         cursor.execute(update_query, tuple(update_params))
         snowflake_service.conn.commit()
         cursor.close()
+        _on_company_written(
+            target_table, ticker,
+            {field: value for field, value in company_data.items() if field in updatable_fields and value is not None},
+            replace=False,
+        )
         
         return {
             "message": "企業情報が正常に更新されました",
@@ -278,7 +405,7 @@ async def update_company(ticker: str, company_data: Dict[str, Any]):
 async def delete_company(ticker: str):
     """企業情報を削除"""
     try:
-        snowflake_service = SnowflakeService()
+        snowflake_service = get_snowflake_service()
         db_name = os.getenv("SNOWFLAKE_DATABASE")
         schema_name = os.getenv("SNOWFLAKE_SCHEMA")
         
@@ -310,6 +437,7 @@ async def delete_company(ticker: str):
         cursor.execute(delete_query, (ticker,))
         snowflake_service.conn.commit()
         cursor.close()
+        _on_company_written(target_table, ticker)
         
         return {
             "message": "企業情報が正常に削除されました",
@@ -324,6 +452,7 @@ async def delete_company(ticker: str):
 @router.post("/ai/collect-company")
 async def collect_company_with_ai(request_data: Dict[str, Any]):
     """AIを使って企業情報を自動収集"""
+    from app.services.ai_company_collector import AICompanyCollector
     try:
         print(f"AI company collection request: {request_data}")
         
@@ -350,7 +479,10 @@ async def collect_company_with_ai(request_data: Dict[str, Any]):
             )
         
         print("Starting AI company collection...")
-        result = collector.collect_and_save_with_ticker(company_name, website_url, ticker, country)
+        try:
+            result = await collector.collect_and_save_with_ticker_async(company_name, website_url, ticker, country)
+        finally:
+            await collector.close()
         print(f"Collection result: {result}")
         
         if result['success']:
@@ -373,6 +505,169 @@ async def collect_company_with_ai(request_data: Dict[str, Any]):
         print(f"Traceback: {error_details}")
         raise HTTPException(status_code=500, detail=f"AI企業情報収集に失敗しました: {str(e)}")
 
+@router.post("/ai/batch-collect")
+async def batch_collect_companies_with_ai(request_data: Dict[str, Any]):
+    """AIを使って複数企業の情報を並行して一括収集"""
+    from app.services.ai_company_collector import AICompanyCollector
+    try:
+        companies = request_data.get('companies', [])
+        max_concurrency = _parse_max_concurrency(request_data, 5)
+        
+        if not companies or not isinstance(companies, list) or not all(isinstance(c, dict) for c in companies):
+            raise HTTPException(status_code=400, detail="企業情報のリストが必要です")
+        
+        invalid = [c for c in companies if not c.get('company_name') or not c.get('website_url')]
+        if invalid:
+            raise HTTPException(status_code=400, detail="全ての企業に企業名とウェブサイトURLが必要です")
+        
+        print(f"Starting batch AI collection for {len(companies)} companies (concurrency: {max_concurrency})")
+        
+        collector = AICompanyCollector()
+        try:
+            results = await collector.collect_and_save_batch(companies, max_concurrency=max_concurrency)
+        finally:
+            await collector.close()
+        
+        successful_companies = [r['company_name'] for r in results if r['success']]
+        failed_companies = [
+            {"company_name": r['company_name'], "ticker": r['ticker'], "message": r['message']}
+            for r in results if not r['success']
+        ]
+        
+        return {
+            "success": True,
+            "message": f"一括収集完了: 成功 {len(successful_companies)}件, 失敗 {len(failed_companies)}件",
+            "successful_companies": successful_companies,
+            "failed_companies": failed_companies,
+            "results": results
+        }
+        
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        import traceback
+        error_details = traceback.format_exc()
+        print(f"Error in batch AI company collection: {str(e)}")
+        print(f"Traceback: {error_details}")
+        raise HTTPException(status_code=500, detail=f"AI企業情報一括収集に失敗しました: {str(e)}")
+
+@router.post("/ai/batch-enrich")
+async def create_ai_batch_enrichment(request_data: Dict[str, Any]):
+    """OpenAI Batch APIで複数企業の情報を一括補完するジョブを作成・提出"""
+    from app.services.ai_batch_enrichment import AIBatchEnricher
+    try:
+        companies = request_data.get('companies', [])
+        max_concurrency = _parse_max_concurrency(request_data, 10)
+        if not companies or not isinstance(companies, list) or not all(isinstance(c, dict) for c in companies):
+            raise HTTPException(status_code=400, detail="企業情報のリストが必要です")
+        if any(not c.get('company_name') or not c.get('website_url') or not c.get('ticker') for c in companies):
+            raise HTTPException(status_code=400, detail="全ての企業に企業名・ウェブサイトURL・TICKERが必要です")
+        
+        enricher = AIBatchEnricher()
+        job = await enricher.prepare(companies, max_concurrency=max_concurrency)
+        if request_data.get('submit', True):
+            job = await asyncio.to_thread(enricher.submit, job['job_id'])
+        
+        return {"success": True, "job": job}
+        
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        import traceback
+        error_details = traceback.format_exc()
+        print(f"Error creating AI batch enrichment: {str(e)}")
+        print(f"Traceback: {error_details}")
+        raise HTTPException(status_code=500, detail=f"バッチ補完ジョブの作成に失敗しました: {str(e)}")
+
+@router.post("/ai/batch-enrich/{job_id}/submit")
+async def submit_ai_batch_enrichment(job_id: str):
+    """準備済みのバッチ補完ジョブを提出"""
+    from app.services.ai_batch_enrichment import AIBatchEnricher
+    try:
+        job = await asyncio.to_thread(AIBatchEnricher().submit, job_id)
+        return {"success": True, "job": job}
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"ジョブ '{job_id}' が見つかりません")
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        print(f"Error submitting AI batch enrichment: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"バッチ補完ジョブの提出に失敗しました: {str(e)}")
+
+@router.get("/ai/batch-enrich/{job_id}")
+async def get_ai_batch_enrichment(job_id: str):
+    """バッチ補完ジョブの状態を取得"""
+    from app.services.ai_batch_enrichment import AIBatchEnricher
+    try:
+        job = await asyncio.to_thread(AIBatchEnricher().refresh, job_id)
+        return {"success": True, "job": job}
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"ジョブ '{job_id}' が見つかりません")
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        print(f"Error fetching AI batch enrichment: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"バッチ補完ジョブの取得に失敗しました: {str(e)}")
+
+@router.post("/ai/batch-enrich/{job_id}/merge")
+async def merge_ai_batch_enrichment(job_id: str):
+    """完了したバッチ補完ジョブの結果を企業テーブルに一括反映"""
+    from app.services.ai_batch_enrichment import AIBatchEnricher, BatchNotReady
+    try:
+        job = await asyncio.to_thread(AIBatchEnricher().merge, job_id)
+        return {"success": True, "job": job}
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"ジョブ '{job_id}' が見つかりません")
+    except BatchNotReady as e:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": f"ジョブ '{job_id}' のバッチはまだ完了していません", "status": e.status},
+        )
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        print(f"Error merging AI batch enrichment: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"バッチ補完結果の反映に失敗しました: {str(e)}")
+
+@router.get("/ai/llm-cache/stats")
+async def get_llm_cache_stats():
+    """OpenAIレスポンスキャッシュの統計情報（ヒット率・トークン数・レイテンシ）"""
+    return get_llm_cache().stats()
+
+@router.delete("/ai/llm-cache")
+async def clear_llm_cache():
+    """OpenAIレスポンスキャッシュを全削除"""
+    get_llm_cache().clear()
+    return {"message": "LLMキャッシュを削除しました"}
+
+@router.get("/scheduler/jobs")
+async def get_scheduler_jobs():
+    """定期更新ジョブの予定と実行状況（実行回数・実行時間・直近の結果）"""
+    from app.services.scheduler import get_scheduler
+    return get_scheduler().get_status()
+
+@router.post("/scheduler/jobs/{job_id}/run")
+async def run_scheduler_job(job_id: str):
+    """定期更新ジョブをすぐに実行（バックグラウンドで実行し、結果は /scheduler/jobs で確認）"""
+    from app.services.scheduler import JOB_DEFINITIONS, get_scheduler
+    if job_id not in JOB_DEFINITIONS:
+        raise HTTPException(status_code=404, detail=f"ジョブ '{job_id}' が見つかりません")
+
+    scheduler = get_scheduler()
+    if scheduler.metrics.is_running(job_id):
+        raise HTTPException(status_code=409, detail=f"ジョブ '{job_id}' は実行中です")
+
+    async def run():
+        try:
+            await scheduler.run_job(job_id)
+        except Exception as e:
+            print(f"Error running scheduler job {job_id}: {str(e)}")
+
+    task = asyncio.create_task(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return {"message": f"ジョブ '{job_id}' を開始しました"}
+
 @router.post("/data/collect")
 async def collect_data():
     """データ収集のエンドポイント（既存の実装）"""
@@ -441,7 +736,7 @@ async def update_business_description(ticker: str, request_data: Dict[str, Any])
             table_name = 'COMPANIES_US'
         
         # Snowflakeで更新
-        snowflake_service = SnowflakeService()
+        snowflake_service = get_snowflake_service()
         
         update_fields = []
         params = []
@@ -465,6 +760,7 @@ async def update_business_description(ticker: str, request_data: Dict[str, Any])
         cursor = snowflake_service.conn.cursor()
         cursor.execute(query, params)
         cursor.close()
+        invalidate_company_responses([ticker])
         
         return {
             "success": True,
@@ -482,6 +778,7 @@ async def update_business_description(ticker: str, request_data: Dict[str, Any])
 @router.post("/nikihou/scrape-company")
 async def scrape_company_from_nikihou(request_data: Dict[str, Any]):
     """日経報から企業情報をスクレイピング"""
+    from app.services.nikihou_scraper import NikihouScraper
     try:
         ticker = request_data.get('ticker')
         market = request_data.get('market', 'HKM')
@@ -498,7 +795,7 @@ async def scrape_company_from_nikihou(request_data: Dict[str, Any]):
             raise HTTPException(status_code=404, detail=f"企業情報が見つかりませんでした: {ticker}")
         
         # データベースに保存
-        snowflake_service = SnowflakeService()
+        snowflake_service = get_snowflake_service()
         success = snowflake_service.upsert_companies([company_info])
         
         if success:
@@ -526,6 +823,7 @@ async def scrape_company_from_nikihou(request_data: Dict[str, Any]):
 @router.post("/nikihou/batch-scrape")
 async def batch_scrape_from_nikihou(request_data: Dict[str, Any]):
     """日経報から複数企業を一括スクレイピング"""
+    from app.services.nikihou_scraper import NikihouScraper
     try:
         tickers = request_data.get('tickers', [])
         market = request_data.get('market', 'HKM')
@@ -545,7 +843,7 @@ async def batch_scrape_from_nikihou(request_data: Dict[str, Any]):
         for ticker, company_info in results.items():
             if company_info:
                 try:
-                    snowflake_service = SnowflakeService()
+                    snowflake_service = get_snowflake_service()
                     success = snowflake_service.upsert_companies([company_info])
                     if success:
                         successful_companies.append(ticker)
@@ -577,6 +875,7 @@ async def batch_scrape_from_nikihou(request_data: Dict[str, Any]):
 @router.get("/nikihou/test-scrape/{ticker}")
 async def test_nikihou_scrape(ticker: str, market: str = "HKM"):
     """日経報スクレイピングのテスト用エンドポイント"""
+    from app.services.nikihou_scraper import NikihouScraper
     try:
         scraper = NikihouScraper()
         company_info = scraper.scrape_company_info(ticker, market)
@@ -596,75 +895,121 @@ async def test_nikihou_scrape(ticker: str, market: str = "HKM"):
         raise HTTPException(status_code=500, detail=f"テストスクレイピングに失敗しました: {str(e)}")
 
 @router.post("/companies/upload-csv")
-async def upload_companies_csv(file: UploadFile = File(...), country: str = "JP"):
-    """CSVファイルから企業情報を一括アップロード"""
-    try:
-        if not file.filename.endswith('.csv'):
-            raise HTTPException(status_code=400, detail="CSVファイルをアップロードしてください")
-        
-        # ファイル内容を読み取り
-        content = await file.read()
-        csv_content = content.decode('utf-8-sig')  # BOMを除去
-        csv_reader = csv.DictReader(io.StringIO(csv_content))
-        
-        companies = []
-        for row in csv_reader:
-            # 空の行をスキップ
-            if not any(row.values()):
-                continue
-                
-            # 国を設定
-            row['country'] = country
-            
-            # 数値フィールドを変換
-            numeric_fields = [
-                'market_cap', 'employees', 'current_price', 'shares_outstanding', 'volume',
-                'per', 'pbr', 'eps', 'bps', 'roe', 'roa', 'revenue',
-                'operating_profit', 'net_profit', 'total_assets', 'equity',
-                'operating_margin', 'net_margin', 'dividend_yield', 'founded_year'
-            ]
-            
-            for field in numeric_fields:
-                if field in row and row[field]:
+async def upload_companies_csv(
+    file: UploadFile = File(...),
+    country: str = Form("JP"),
+    batch_rows: int = Query(DEFAULT_BATCH_ROWS, ge=100, le=100000),
+    stream: bool = Query(False, description="trueの場合、バッチごとの進捗をServer-Sent Eventsで返す"),
+):
+    """
+    CSVファイルから企業情報を一括アップロード
+
+    アップロードされたファイルをbatch_rows行ずつ読み込んで型変換し、バッチごとに
+    企業テーブルへ一括で反映する。
+    """
+    import pandas as pd
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="CSVファイルをアップロードしてください")
+
+    def _summary(result: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "success": result["uploaded_count"] > 0,
+            "message": f"{result['uploaded_count']}件の企業情報をアップロードしました",
+            **result,
+        }
+
+    if stream:
+        async def event_generator():
+            loop = asyncio.get_running_loop()
+            queue: asyncio.Queue = asyncio.Queue()
+
+            def on_progress(progress: Dict[str, Any]):
+                loop.call_soon_threadsafe(queue.put_nowait, progress)
+
+            snowflake_service = create_snowflake_service()
+            importer = CompanyCSVImporter(snowflake_service, batch_rows=batch_rows)
+            task = asyncio.create_task(asyncio.to_thread(importer.run, file.file, country, on_progress))
+            try:
+                while not task.done() or not queue.empty():
                     try:
-                        # カンマを除去して数値に変換
-                        value = str(row[field]).replace(',', '').replace('¥', '').replace('$', '')
-                        if value and value != '':
-                            row[field] = float(value) if '.' in value else int(value)
-                        else:
-                            row[field] = None
-                    except (ValueError, TypeError):
-                        row[field] = None
+                        progress = await asyncio.wait_for(queue.get(), timeout=1)
+                        yield f"data: {json.dumps(progress, ensure_ascii=False)}\n\n"
+                    except asyncio.TimeoutError:
+                        continue
+                try:
+                    result = task.result()
+                    yield f"data: {json.dumps({'done': True, **_summary(result)}, ensure_ascii=False)}\n\n"
+                except Exception as e:
+                    print(f"Error in CSV upload: {str(e)}")
+                    yield f"data: {json.dumps({'done': True, 'error': str(e)}, ensure_ascii=False)}\n\n"
+            finally:
+                # 専用の接続は取り込みが終わってから閉じる（途中でクライアントが切断した場合も）
+                if task.done():
+                    await asyncio.to_thread(snowflake_service.close_connection)
                 else:
-                    row[field] = None
-            
-            companies.append(row)
-        
-        if not companies:
-            raise HTTPException(status_code=400, detail="有効な企業データが見つかりませんでした")
-        
-        # データベースに保存
-        snowflake_service = SnowflakeService()
-        success = snowflake_service.upsert_companies(companies)
-        
-        if success:
-            return {
-                "success": True,
-                "message": f"{len(companies)}件の企業情報をアップロードしました",
-                "uploaded_count": len(companies),
-                "country": country
-            }
-        else:
-            raise HTTPException(status_code=500, detail="データベースへの保存に失敗しました")
-            
-    except HTTPException as he:
-        raise he
+                    task.add_done_callback(lambda _: loop.run_in_executor(None, snowflake_service.close_connection))
+
+        return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+    snowflake_service = create_snowflake_service()
+    try:
+        importer = CompanyCSVImporter(snowflake_service, batch_rows=batch_rows)
+        result = await asyncio.to_thread(importer.run, file.file, country)
+    except (UnicodeDecodeError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        raise HTTPException(status_code=400, detail=f"CSVの読み込みに失敗しました: {str(e)}")
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
         print(f"Error in CSV upload: {str(e)}")
         print(f"Traceback: {error_details}")
         raise HTTPException(status_code=500, detail=f"CSVアップロードに失敗しました: {str(e)}")
+    finally:
+        snowflake_service.close_connection()
+
+    if result["uploaded_count"] == 0:
+        raise HTTPException(status_code=400, detail="有効な企業データが見つかりませんでした")
+
+    return _summary(result)
+
+@router.post("/companies/import-parquet")
+async def import_companies_parquet(file: UploadFile = File(...), country: str = Form("JP")):
+    """Parquetファイルを一時ステージにPUTし、COPYとMERGEで企業テーブルに取り込む"""
+    from app.services.company_parquet import save_parquet_upload, inspect_parquet
+    table_name = COMPANY_TABLES.get(country.upper())
+    if not table_name:
+        raise HTTPException(status_code=400, detail="countryにはJP、US、CNのいずれかを指定してください")
+
+    path = await asyncio.to_thread(save_parquet_upload, file.file)
+    try:
+        try:
+            info = inspect_parquet(path)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Parquetファイルの読み込みに失敗しました: {str(e)}")
+        if 'TICKER' not in {column.upper() for column in info["columns"]}:
+            raise HTTPException(status_code=400, detail="ParquetファイルにTICKERカラムがありません")
+
+        snowflake_service = create_snowflake_service()
+        try:
+            imported = await asyncio.to_thread(
+                snowflake_service.copy_parquet_into, table_name, path, ['TICKER'], info["columns"]
+            )
+        finally:
+            snowflake_service.close_connection()
+
+        return {
+            "success": True,
+            "message": f"{imported}件の企業情報を{table_name}に取り込みました",
+            "imported_count": imported,
+            "file_rows": info["num_rows"],
+            "table": table_name,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in Parquet import: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Parquetの取り込みに失敗しました: {str(e)}")
+    finally:
+        os.remove(path)
 
 @router.get("/companies/csv-template")
 async def get_csv_template():
@@ -869,6 +1214,7 @@ async def search_sec_company(company_name: str):
 @router.post("/sec-edgar/collect-and-upload")
 async def collect_sec_reports_and_upload(request_data: Dict[str, Any]):
     """SEC EDGAR APIを使用してアメリカ企業の決算資料を収集し、Google Driveにアップロード"""
+    from app.services.google_drive_service import GoogleDriveService
     try:
         company_name = request_data.get('company_name')
         if not company_name:
@@ -1161,6 +1507,7 @@ async def get_google_drive_file_content(file_id: str):
 @router.post("/shikiho/scrape-company")
 async def scrape_shikiho_company(request: Dict[str, str]):
     """四季報オンラインから単一企業の情報を取得"""
+    from app.services.shikiho_scraper import ShikihoScraper
     try:
         ticker = request.get("ticker")
         if not ticker:
@@ -1190,6 +1537,7 @@ async def scrape_shikiho_company(request: Dict[str, str]):
 @router.post("/shikiho/batch-scrape")
 async def batch_scrape_shikiho_companies(request: Dict[str, Any]):
     """四季報オンラインから複数企業の情報を一括取得"""
+    from app.services.shikiho_scraper import ShikihoScraper
     try:
         tickers = request.get("tickers", [])
         if not tickers:
@@ -1220,6 +1568,7 @@ async def batch_scrape_shikiho_companies(request: Dict[str, Any]):
 @router.post("/shikiho/create-spreadsheet")
 async def create_shikiho_spreadsheet(request: Dict[str, Any]):
     """四季報オンラインのデータをスプレッドシートに保存"""
+    from app.services.google_drive_service import GoogleDriveService
     try:
         companies_data = request.get("companies_data", [])
         if not companies_data:
@@ -1345,6 +1694,7 @@ def create_spreadsheet_from_shikiho_data(companies_data: List[Dict]) -> Dict:
 @router.post("/sec-edgar/download-pdf")
 async def download_sec_report_pdf(request_data: Dict[str, Any]):
     """SEC EDGARで収集した決算資料をPDFでダウンロード"""
+    from app.services.pdf_converter_service import PDFConverterService
     try:
         company_name = request_data.get('company_name')
         if not company_name:
@@ -1413,6 +1763,7 @@ async def download_sec_report_pdf(request_data: Dict[str, Any]):
 @router.get("/sec-edgar/download-pdf/{filename}")
 async def download_sec_pdf_file(filename: str, company_name: str = None):
     """SEC EDGAR決算資料PDFファイルをダウンロード"""
+    from app.services.pdf_converter_service import PDFConverterService
     try:
         if not company_name:
             # ファイル名から企業名を推測
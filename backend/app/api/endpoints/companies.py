@@ -1,14 +1,92 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 import os
-import yfinance as yf
+import time
+import asyncio
+import logging
+import functools
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
-from ...services.company_service import CompanyService
-from ...services.snowflake_service import SnowflakeService
-from ...services.google_drive_service import GoogleDriveService
+from ...services.registry import get_snowflake_service
+from ...services.instrumentation import traced
+from ...services.response_cache import COMPANIES_TAG, cached_response, company_tag
+from ...services.company_catalogue import get_company_catalogue
+from ...services.company_search_index import get_company_search_index
+from ...services.company_suggest import get_company_suggester
+from ...services.company_tables import DRIVE_COMPANY_FOLDERS
+from ...services.pagination import (
+    MARKET_CAP_ORDER,
+    MARKET_CAP_SORT_COLUMN,
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    filters_fingerprint,
+    market_cap_seek,
+    seek_sorted,
+)
+
+# yfinance・Google APIクライアント・pyarrow（arrow_results）は読み込みに時間がかかるため、
+# 起動を遅くしないよう使う関数の中でインポートする
 
 router = APIRouter()
-company_service = CompanyService()
-snowflake_service = SnowflakeService()
+logger = logging.getLogger(__name__)
+
+COMPANY_DETAIL_TTL_SECONDS = int(os.getenv("COMPANY_DETAIL_CACHE_TTL_SECONDS", 60))
+# 企業詳細の依存先ごとのタイムアウト（秒）
+COMPANY_DETAIL_QUERY_TIMEOUT_SECONDS = float(os.getenv("COMPANY_DETAIL_QUERY_TIMEOUT_SECONDS", 10))
+COMPANY_DETAIL_QUOTE_TIMEOUT_SECONDS = float(os.getenv("COMPANY_DETAIL_QUOTE_TIMEOUT_SECONDS", 3))
+# 企業詳細の行のカラム（Snowflakeから取得できない場合に検索インデックスの値で埋める）
+COMPANY_DETAIL_COLUMNS = [
+    'ticker', 'company_name', 'market', 'sector', 'industry', 'country', 'website',
+    'business_description', 'description', 'market_cap', 'employees', 'current_price',
+    'shares_outstanding', 'volume', 'per', 'pbr', 'eps', 'bps', 'roe', 'roa', 'revenue',
+    'operating_profit', 'net_profit', 'total_assets', 'equity', 'operating_margin',
+    'net_margin', 'tradingview_summary', 'dividend_yield',
+]
+# Google Driveの検索結果を並べ替えたものを再利用する時間（秒）と件数
+DRIVE_SEARCH_CACHE_SECONDS = int(os.getenv("DRIVE_SEARCH_CACHE_SECONDS", 300))
+DRIVE_SEARCH_CACHE_MAX_ENTRIES = 256
+# (フォルダID, 検索語) -> (期限, (名前, ID)順の項目, 並べ替えキー)
+_drive_search_cache: "OrderedDict[Tuple[str, str], Tuple[float, List[Dict[str, Any]], List[Tuple[str, str]]]]" = OrderedDict()
+_drive_search_lock = threading.Lock()
+# Snowflakeの取得がタイムアウト・失敗したことを表す値（見つからなかった場合のNoneと区別する）
+_UNAVAILABLE = object()
+# yfinanceの呼び出しは応答が止まることがあるため専用のスレッドで実行する
+_quote_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("QUOTE_EXECUTOR_WORKERS", 8)), thread_name_prefix="quote"
+)
+
+def _search_drive_sorted(drive_service, query: Optional[str], folder_id: str) -> Tuple[List[Dict[str, Any]], List[Tuple[str, str]]]:
+    """
+    Driveの検索結果を (名前, ID) の順に並べたものと並べ替えキーを返す
+
+    一致する項目をすべて取得して並べ替えるため、同じ検索語の結果は DRIVE_SEARCH_CACHE_SECONDS の間
+    再利用し、続きのページを取得するたびにDriveの一覧を取り直さない。
+    """
+    cache_key = (folder_id, query or "")
+    now = time.monotonic()
+    with _drive_search_lock:
+        cached = _drive_search_cache.get(cache_key)
+        if cached and cached[0] > now:
+            _drive_search_cache.move_to_end(cache_key)
+            return cached[1], cached[2]
+
+    folders = sorted(drive_service.search_company_folders(query, folder_id), key=lambda item: (item['name'], item['id']))
+    keys = [(item['name'], item['id']) for item in folders]
+    # 検索に失敗した場合も空になるため、空の結果は保存しない
+    if folders:
+        with _drive_search_lock:
+            _drive_search_cache[cache_key] = (now + DRIVE_SEARCH_CACHE_SECONDS, folders, keys)
+            _drive_search_cache.move_to_end(cache_key)
+            while len(_drive_search_cache) > DRIVE_SEARCH_CACHE_MAX_ENTRIES:
+                _drive_search_cache.popitem(last=False)
+    return folders, keys
+
 
 @router.get("/search")
 async def search_companies(
@@ -17,50 +95,57 @@ async def search_companies(
     page_size: int = Query(10, ge=1, le=100),
     market: str = None,
     sector: str = None,
-    country: str = None
+    country: str = None,
+    cursor: str = Query(None, description="前のレスポンスのnext_cursor（指定した場合pageは使わない）"),
+    snowflake_service=Depends(get_snowflake_service),
 ):
+    """
+    企業を検索（時価総額の降順・tickerの昇順）
+
+    続きのページはレスポンスの next_cursor を cursor に渡して取得する（キーセットページネーション）。
+    cursor を使う場合は件数を数えないため、total・total_pages は null になる。
+    """
     try:
-        # デバッグ: パラメータをログ出力
-        print(f"Search parameters - query: '{query}', market: '{market}', sector: '{sector}', country: '{country}'")
+        logger.debug("Company search", extra={"query": query, "market": market, "sector": sector, "country": country})
+        filters = filters_fingerprint(query=query, market=(market or "").upper(), sector=sector, country=country)
+        try:
+            position = decode_cursor(cursor, filters) if cursor else None
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=f"カーソルが不正です: {str(e)}")
         
         # 中国市場、米国市場、または日本市場が選択されている場合はGoogle Driveから検索
-        if market and (market.upper() == "CN" or market.upper() == "US" or market.upper() == "JP"):
+        if market and market.upper() in DRIVE_COMPANY_FOLDERS:
             market = market.upper()  # 大文字に統一
             try:
-                print(f"Searching Google Drive for {market} companies with query: '{query}'")
-                
+                from ...services.google_drive_service import GoogleDriveService
                 drive_service = GoogleDriveService()
                 
                 # Google Driveサービスが初期化されているか確認
                 if not drive_service.service:
-                    print("Google Drive service not initialized")
+                    logger.error("Google Drive service not initialized")
                     raise HTTPException(
                         status_code=500,
                         detail="Google Driveサービスが初期化されていません。設定を確認してください。"
                     )
                 
                 # 市場に応じてフォルダIDを設定
-                if market == "CN":
-                    folder_id = "1uragZmOuCVZYJ_9Wcyxe6R9-dnyI8-fi"  # 中国企業用フォルダ
-                    market_label = "中国企業"
-                    currency = "CNY"
-                elif market == "US":
-                    folder_id = "1JDah1KWIgrGwktuxnF0yGz3WyBR6yDb2"  # 米国企業用フォルダ
-                    market_label = "米国企業"
-                    currency = "USD"
-                else:  # JP
-                    folder_id = "1UCVDgNvrei0HPuWmM_BJaaHYAUNg3gO9"  # 日本企業用フォルダ
-                    market_label = "日本企業"
-                    currency = "JPY"
+                drive_folder = DRIVE_COMPANY_FOLDERS[market]
+                folder_id = drive_folder['folder_id']
+                market_label = drive_folder['label']
+                currency = drive_folder['currency']
                 
-                folders = drive_service.search_company_folders(query, folder_id)
+                # (名前, ID) の順に並べ、カーソルの位置（最後に返した項目の名前とID）の次から返す
+                folders, keys = _search_drive_sorted(drive_service, query, folder_id)
                 
-                print(f"Google Drive search returned {len(folders)} items")
-                print(f"Folders/items: {folders}")
+                logger.debug("Google Drive search finished", extra={"market": market, "count": len(folders)})
                 
-                # Google Driveの結果をCompany形式に変換
+                start_idx = seek_sorted(keys, position) if position else (page - 1) * page_size
+                page_items = folders[start_idx:start_idx + page_size]
+                has_more = start_idx + page_size < len(folders)
+                
+                # Google Driveの結果をCompany形式に変換（ファイル数は返すページの項目だけ取得する）
                 companies = []
-                for item in folders:
+                for item in page_items:
                     try:
                         if item['type'] == 'folder':
                             # フォルダの場合
@@ -91,50 +176,54 @@ async def search_companies(
                         }
                         companies.append(company)
                     except Exception as e:
-                        print(f"Error processing item {item}: {str(e)}")
+                        logger.warning("Error processing Google Drive item", extra={"item": item, "error": str(e)})
                         continue
                 
-                # ページネーション処理
-                start_idx = (page - 1) * page_size
-                end_idx = start_idx + page_size
-                paginated_companies = companies[start_idx:end_idx]
-                
-                print(f"Final result: {len(companies)} total companies, returning {len(paginated_companies)} for page {page}")
-                print(f"Companies: {[c['company_name'] for c in paginated_companies]}")
+                logger.debug("Google Drive search result", extra={"total": len(folders), "start": start_idx, "returned": len(companies)})
                 
+                last_item = page_items[-1] if page_items else None
                 return {
-                    "companies": paginated_companies,
-                    "total": len(companies),
-                    "page": page,
+                    "companies": companies,
+                    "total": len(folders),
+                    "page": None if position else page,
                     "page_size": page_size,
-                    "total_pages": (len(companies) + page_size - 1) // page_size if companies else 0
+                    "total_pages": (len(folders) + page_size - 1) // page_size if folders else 0,
+                    "next_cursor": encode_cursor((last_item['name'], last_item['id']), filters) if has_more else None,
                 }
             except HTTPException:
                 raise
+            except InvalidCursor as e:
+                raise HTTPException(status_code=400, detail=f"カーソルが不正です: {str(e)}")
             except Exception as e:
-                print(f"Error searching Google Drive: {str(e)}")
-                import traceback
-                print(f"Traceback: {traceback.format_exc()}")
+                logger.exception("Error searching Google Drive")
                 raise HTTPException(
                     status_code=500,
                     detail=f"Google Drive検索中にエラーが発生しました: {str(e)}"
                 )
         
         # その他の市場は従来通りSnowflakeから検索
-        print(f"Searching Snowflake for market: '{market}' (not CN/US/JP)")
+        from ...services.arrow_results import arrow_json_response
         db_name = os.getenv("SNOWFLAKE_DATABASE")
         schema_name = os.getenv("SNOWFLAKE_SCHEMA")
 
         conditions = ["1=1"]
         query_params = []
 
+        # 検索語はプロセス内の検索インデックスでtickerに変換し、TICKERで絞り込む
+        # （一致する企業が多すぎる場合やインデックスを読み込めない場合はLIKEで検索する）
+        indexed_tickers = None
         if query:
-            conditions.append("""
-                (LOWER(COMPANY_NAME) LIKE LOWER(%s)
-                OR LOWER(TICKER) LIKE LOWER(%s))
-            """)
-            query_params.append(f"%{query}%")
-            query_params.append(f"%{query}%")
+            try:
+                indexed_tickers = await asyncio.to_thread(get_company_search_index().tickers_by_table, query, country)
+            except Exception:
+                logger.exception("Company search index unavailable, falling back to LIKE")
+            if indexed_tickers is None:
+                conditions.append("""
+                    (LOWER(COMPANY_NAME) LIKE LOWER(%s)
+                    OR LOWER(TICKER) LIKE LOWER(%s))
+                """)
+                query_params.append(f"%{query}%")
+                query_params.append(f"%{query}%")
 
         if sector:
             conditions.append("LOWER(SECTOR) = LOWER(%s)")
@@ -144,471 +233,363 @@ async def search_companies(
             conditions.append("LOWER(COUNTRY) = LOWER(%s)")
             query_params.append(country)
 
-        offset = (page - 1) * page_size
-
-        # まずCOMPANIES_JPから検索
-        jp_query = f"""
-        SELECT
-            TICKER,
-            COMPANY_NAME,
-            MARKET,
-            SECTOR,
-            INDUSTRY,
-            COUNTRY,
-            WEBSITE,
-            BUSINESS_DESCRIPTION,
-            MARKET_CAP,
-            CURRENT_PRICE,
-            PER,
-            PBR,
-            ROE,
-            ROA,
-            DIVIDEND_YIELD,
-            COMPANY_TYPE,
-            CEO
-        FROM {db_name}.{schema_name}.COMPANIES_JP
-        WHERE {" AND ".join(conditions)}
-        """
-        
-        # 次にCOMPANIES_USから検索
-        us_query = f"""
-        SELECT
-            TICKER,
-            COMPANY_NAME,
-            MARKET,
-            SECTOR,
-            INDUSTRY,
-            COUNTRY,
-            WEBSITE,
-            BUSINESS_DESCRIPTION,
-            MARKET_CAP,
-            CURRENT_PRICE,
-            PER,
-            PBR,
-            ROE,
-            ROA,
-            DIVIDEND_YIELD,
-            COMPANY_TYPE,
-            CEO
-        FROM {db_name}.{schema_name}.COMPANIES_US
-        WHERE {" AND ".join(conditions)}
-        """
-        
-        # COMPANIES_CNから検索
-        cn_query = f"""
-        SELECT
-            TICKER,
-            COMPANY_NAME,
-            MARKET,
-            SECTOR,
-            INDUSTRY,
-            COUNTRY,
-            WEBSITE,
-            BUSINESS_DESCRIPTION,
-            MARKET_CAP,
-            CURRENT_PRICE,
-            PER,
-            PBR,
-            ROE,
-            ROA,
-            DIVIDEND_YIELD,
-            COMPANY_TYPE,
-            CEO
-        FROM {db_name}.{schema_name}.COMPANIES_CN
-        WHERE {" AND ".join(conditions)}
-        """
-        
-        # 3つのクエリを実行
-        jp_results = snowflake_service.query(jp_query, tuple(query_params))
-        us_results = snowflake_service.query(us_query, tuple(query_params))
-        cn_results = snowflake_service.query(cn_query, tuple(query_params))
-        
-        # 結果を結合
-        all_results = jp_results + us_results + cn_results
-        
-        # market_capでソート（降順）
-        all_results.sort(key=lambda x: (x['market_cap'] or 0), reverse=True)
-        
-        # ページネーション
-        start_idx = offset
-        end_idx = start_idx + page_size
-        results = all_results[start_idx:end_idx]
+        # JP/US/CNの企業テーブルを同じ条件で検索し、1つのクエリにまとめる
+        selects = []
+        union_params = []
+        for table_name in ("COMPANIES_JP", "COMPANIES_US", "COMPANIES_CN"):
+            table_conditions = list(conditions)
+            table_params = list(query_params)
+            if indexed_tickers is not None:
+                # インデックスで一致しなかったテーブルは検索しない
+                table_tickers = indexed_tickers.get(table_name)
+                if not table_tickers:
+                    continue
+                table_conditions.append(f"TICKER IN ({', '.join(['%s'] * len(table_tickers))})")
+                table_params.extend(table_tickers)
+            selects.append(f"""
+            SELECT
+                TICKER,
+                COMPANY_NAME,
+                MARKET,
+                SECTOR,
+                INDUSTRY,
+                COUNTRY,
+                WEBSITE,
+                BUSINESS_DESCRIPTION,
+                MARKET_CAP,
+                CURRENT_PRICE,
+                PER,
+                PBR,
+                ROE,
+                ROA,
+                DIVIDEND_YIELD,
+                COMPANY_TYPE,
+                CEO,
+                {MARKET_CAP_SORT_COLUMN}
+            FROM {db_name}.{schema_name}.{table_name}
+            WHERE {" AND ".join(table_conditions)}
+            """)
+            union_params.extend(table_params)
 
-        # LIMITとOFFSETのパラメータは不要になったので削除
-        # query_params.append(page_size)
-        # query_params.append(offset)
+        if not selects:
+            return {"companies": [], "total": 0, "page": page, "page_size": page_size, "total_pages": 0, "next_cursor": None}
 
-        # results = snowflake_service.query(bq_query, tuple(query_params))  # この行は削除
+        union_query = " UNION ALL ".join(selects)
 
-        # カウントクエリも個別に実行
-        jp_count_query = f"""
-        SELECT COUNT(*) as total
-        FROM {db_name}.{schema_name}.COMPANIES_JP
-        WHERE {" AND ".join(conditions)}
-        """
-        
-        us_count_query = f"""
-        SELECT COUNT(*) as total
-        FROM {db_name}.{schema_name}.COMPANIES_US
-        WHERE {" AND ".join(conditions)}
+        # 並べ替えとページの切り出しはSnowflakeで行う（cursorがあればシーク条件、なければOFFSET）。
+        # 次のページの有無を判定するため1件多く取得する
+        try:
+            seek_condition, seek_params = market_cap_seek(position)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=f"カーソルが不正です: {str(e)}")
+        page_query = f"""
+        SELECT * FROM ({union_query})
+        WHERE {seek_condition}
+        ORDER BY {MARKET_CAP_ORDER}
+        LIMIT {page_size + 1}{"" if position else f" OFFSET {(page - 1) * page_size}"}
         """
-        
-        cn_count_query = f"""
-        SELECT COUNT(*) as total
-        FROM {db_name}.{schema_name}.COMPANIES_CN
-        WHERE {" AND ".join(conditions)}
-        """
-        
-        jp_count_results = snowflake_service.query(jp_count_query, tuple(query_params))
-        us_count_results = snowflake_service.query(us_count_query, tuple(query_params))
-        cn_count_results = snowflake_service.query(cn_count_query, tuple(query_params))
-        
-        # カウント結果が空でないことを確認
-        jp_total = jp_count_results[0]['total'] if jp_count_results and len(jp_count_results) > 0 else 0
-        us_total = us_count_results[0]['total'] if us_count_results and len(us_count_results) > 0 else 0
-        cn_total = cn_count_results[0]['total'] if cn_count_results and len(cn_count_results) > 0 else 0
-        
-        total = jp_total + us_total + cn_total
-
-        companies = []
-        for row in results:
-            company = {
-                "ticker": row['ticker'],
-                "company_name": row['company_name'],
-                "market": row['market'],
-                "sector": row['sector'],
-                "industry": row['industry'],
-                "country": row['country'],
-                "website": row['website'],
-                "business_description": row['business_description'],
-                "market_cap": row['market_cap'],
-                "current_price": row['current_price'],
-                "per": row['per'],
-                "pbr": row['pbr'],
-                "roe": row['roe'],
-                "roa": row['roa'],
-                "dividend_yield": row['dividend_yield'],
-                "company_type": row['company_type'],
-                "ceo": row['ceo']
-            }
-            companies.append(company)
+        rows = await asyncio.to_thread(snowflake_service.query_arrow, page_query, tuple(union_params + seek_params))
+        has_more = rows.num_rows > page_size
+        results = rows.slice(0, page_size)
+        next_cursor = None
+        if has_more:
+            last_row = results.slice(results.num_rows - 1, 1).to_pylist()[0]
+            next_cursor = encode_cursor((last_row["sort_market_cap"], last_row["ticker"]), filters)
+        results = results.drop_columns(["sort_market_cap"])
 
-        return {
-            "companies": companies,
-            "total": total,
-            "page": page,
-            "page_size": page_size,
-            "total_pages": (total + page_size - 1) // page_size
-        }
+        # 件数はページ番号で取得する場合だけ数える（cursorで続きを取得する場合は数えない）
+        total = None
+        if position is None:
+            count_rows = await asyncio.to_thread(
+                snowflake_service.query_arrow, f"SELECT COUNT(*) AS TOTAL FROM ({union_query})", tuple(union_params)
+            )
+            total = int(count_rows.column("total")[0].as_py())
+
+        return arrow_json_response(
+            "companies",
+            results,
+            total=total,
+            page=None if position else page,
+            page_size=page_size,
+            total_pages=(total + page_size - 1) // page_size if total is not None else None,
+            next_cursor=next_cursor,
+        )
 
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error in search_companies: {str(e)}")
+        logger.exception("Error in search_companies")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/{ticker}")
-async def get_company_detail(ticker: str):
+# 業種・国・市場の一覧は企業テーブルを走査せず、書き込み時に更新されるカタログから返す
+@router.get("/sectors")
+@cached_response(lambda **_: [COMPANIES_TAG])
+async def get_sectors(request: Request, with_counts: bool = False):
+    """利用可能な業種（SECTOR）の一覧を取得（with_counts=trueで件数付き）"""
     try:
-        db_name = os.getenv("SNOWFLAKE_DATABASE")
-        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+        catalogue = get_company_catalogue()
+        if with_counts:
+            return {"sectors": await asyncio.to_thread(catalogue.counts, "sector")}
+        return {"sectors": await asyncio.to_thread(catalogue.values, "sector")}
+    except Exception as e:
+        logger.exception("Error in get_sectors")
+        raise HTTPException(status_code=500, detail=f"Error in get_sectors: {str(e)}")
 
-        # まずCOMPANIES_JPから検索
-        jp_query = f"""
-        SELECT
-            TICKER,
-            COMPANY_NAME,
-            MARKET,
-            SECTOR,
-            INDUSTRY,
-            COUNTRY,
-            WEBSITE,
-            BUSINESS_DESCRIPTION,
-            DESCRIPTION,
-            MARKET_CAP,
-            EMPLOYEES,
-            CURRENT_PRICE,
-            SHARES_OUTSTANDING,
-            VOLUME,
-            PER,
-            PBR,
-            EPS,
-            BPS,
-            ROE,
-            ROA,
-            REVENUE,
-            OPERATING_PROFIT,
-            NET_PROFIT,
-            TOTAL_ASSETS,
-            EQUITY,
-            OPERATING_MARGIN,
-            NET_MARGIN,
-            TRADINGVIEW_SUMMARY,
-            DIVIDEND_YIELD
-        FROM {db_name}.{schema_name}.COMPANIES_JP
-        WHERE TICKER = %s
-        """
-        
-        # 次にCOMPANIES_USから検索
-        us_query = f"""
-        SELECT
-            TICKER,
-            COMPANY_NAME,
-            MARKET,
-            SECTOR,
-            INDUSTRY,
-            COUNTRY,
-            WEBSITE,
-            BUSINESS_DESCRIPTION,
-            DESCRIPTION,
-            MARKET_CAP,
-            EMPLOYEES,
-            CURRENT_PRICE,
-            SHARES_OUTSTANDING,
-            VOLUME,
-            PER,
-            PBR,
-            EPS,
-            BPS,
-            ROE,
-            ROA,
-            REVENUE,
-            OPERATING_PROFIT,
-            NET_PROFIT,
-            TOTAL_ASSETS,
-            EQUITY,
-            OPERATING_MARGIN,
-            NET_MARGIN,
-            TRADINGVIEW_SUMMARY,
-            DIVIDEND_YIELD
-        FROM {db_name}.{schema_name}.COMPANIES_US
-        WHERE TICKER = %s
-        """
-        
-        # COMPANIES_CNから検索
-        cn_query = f"""
-        SELECT
-            TICKER,
-            COMPANY_NAME,
-            MARKET,
-            SECTOR,
-            INDUSTRY,
-            COUNTRY,
-            WEBSITE,
-            BUSINESS_DESCRIPTION,
-            DESCRIPTION,
-            MARKET_CAP,
-            EMPLOYEES,
-            CURRENT_PRICE,
-            SHARES_OUTSTANDING,
-            VOLUME,
-            PER,
-            PBR,
-            EPS,
-            BPS,
-            ROE,
-            ROA,
-            REVENUE,
-            OPERATING_INCOME as OPERATING_PROFIT,
-            NET_INCOME as NET_PROFIT,
-            TOTAL_ASSETS,
-            SHAREHOLDERS_EQUITY as EQUITY,
-            OPERATING_MARGIN,
-            NET_MARGIN,
-            NULL as TRADINGVIEW_SUMMARY,
-            DIVIDEND_YIELD
-        FROM {db_name}.{schema_name}.COMPANIES_CN
-        WHERE TICKER = %s
-        """
-        
-        # 3つのクエリを実行
-        jp_results = snowflake_service.query(jp_query, (ticker,))
-        us_results = snowflake_service.query(us_query, (ticker,))
-        cn_results = snowflake_service.query(cn_query, (ticker,))
-        
-        # 結果を結合（通常は1つしか結果がないはず）
-        results = jp_results + us_results + cn_results
-        
-        if not results:
-            raise HTTPException(status_code=404, detail="Company not found")
-            
-        row = results[0]
-        # リアルタイム株価データを取得
-        realtime_data = _get_realtime_stock_data(ticker)
-        
-        # Snowflakeのクエリ結果の列名は小文字になっているため、小文字でアクセス
-        return {
-            "ticker": row['ticker'],
-            "company_name": row['company_name'],
-            "market": row['market'],
-            "sector": row['sector'],
-            "industry": row['industry'],
-            "country": row['country'],
-            "website": row['website'],
-            "business_description": row['description'] or row['business_description'],
-            "description": row['description'],
-            # リアルタイム株価データを使用
-            "current_price": realtime_data.get('current_price', row['current_price']),
-            "market_cap": realtime_data.get('market_cap', row['market_cap']),
-            "volume": realtime_data.get('volume', row['volume']),
-            "per": realtime_data.get('pe_ratio', row['per']),
-            "pbr": realtime_data.get('pb_ratio', row['pbr']),
-            "dividend_yield": realtime_data.get('dividend_yield', row['dividend_yield']),
-            # データベースの財務データ
-            "employees": row['employees'],
-            "shares_outstanding": row['shares_outstanding'],
-            "eps": row['eps'],
-            "bps": row['bps'],
-            "roe": row['roe'],
-            "roa": row['roa'],
-            "revenue": row['revenue'],
-            "operating_income": row['operating_profit'],  # マッピング
-            "net_income": row['net_profit'],  # マッピング
-            "total_assets": row['total_assets'],
-            "shareholders_equity": row['equity'],  # マッピング
-            "operating_margin": row['operating_margin'],
-            "net_margin": row['net_margin'],
-            "tradingview_summary": row['tradingview_summary'],
-            # フロントエンドで期待されるフィールドのデフォルト値
-            "data_source": "Snowflake + yfinance",
-            "last_updated": realtime_data.get('last_updated'),
-            "current_assets": None,
-            "current_liabilities": None,
-            "total_liabilities": None,
-            "capital": None,
-            "minority_interests": None,
-            "debt_ratio": None,
-            "current_ratio": None,
-            "equity_ratio": None,
-            "operating_cash_flow": None,
-            "investing_cash_flow": None,
-            "financing_cash_flow": None,
-            "cash_and_equivalents": None,
-            "dividend_per_share": None,
-            "payout_ratio": None,
-            "beta": realtime_data.get('beta'),
-            "market_type": row['market'],
-            "currency": "JPY" if row['country'] == 'JP' else "USD",
-            "collected_at": None
-        }
-        
+@router.get("/countries")
+@cached_response(lambda **_: [COMPANIES_TAG])
+async def get_countries(request: Request, with_counts: bool = False):
+    """利用可能な国（COUNTRY）の一覧を取得（with_counts=trueで件数付き）"""
+    try:
+        catalogue = get_company_catalogue()
+        if with_counts:
+            return {"countries": await asyncio.to_thread(catalogue.counts, "country")}
+        return {"countries": await asyncio.to_thread(catalogue.values, "country")}
     except Exception as e:
-        print(f"Error in get_company_detail: {str(e)}")
+        logger.exception("Error in get_countries")
         raise HTTPException(status_code=500, detail=str(e))
 
-def _get_realtime_stock_data(ticker: str) -> dict:
-    """yfinanceを使用してリアルタイム株価データを取得"""
+@router.get("/catalogue")
+@cached_response(lambda **_: [COMPANIES_TAG])
+async def get_catalogue(request: Request):
+    """業種・産業・国・市場ごとの値と企業数の一覧を取得"""
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
-        
-        # 最新の株価データを取得
-        hist = stock.history(period="1d", interval="1m")
-        latest_price = None
-        if not hist.empty:
-            latest_price = float(hist['Close'].iloc[-1])
-        
-        return {
-            'current_price': latest_price or info.get('currentPrice'),
-            'market_cap': info.get('marketCap'),
-            'volume': info.get('volume'),
-            'pe_ratio': info.get('trailingPE'),
-            'pb_ratio': info.get('priceToBook'),
-            'dividend_yield': info.get('dividendYield'),
-            'beta': info.get('beta'),
-            'last_updated': info.get('regularMarketTime')
-        }
+        return await asyncio.to_thread(get_company_catalogue().snapshot)
     except Exception as e:
-        print(f"リアルタイム株価取得エラー {ticker}: {str(e)}")
-        return {}
+        logger.exception("Error in get_catalogue")
+        raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/sectors")
-async def get_sectors():
-    """利用可能な業種（SECTOR）の一覧を取得"""
+# 入力途中の検索語に対する候補（メモリ上の配列から返すため、レスポンスキャッシュは使わない）
+@router.get("/suggest")
+async def suggest_companies(
+    query: str = "",
+    limit: int = Query(10, ge=1, le=50),
+    country: str = None,
+):
+    """ticker・企業名が検索語で始まる企業の候補を時価総額の大きい順に取得"""
     try:
-        db_name = os.getenv("SNOWFLAKE_DATABASE")
-        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
-
-        # シンプルなクエリでテスト
-        simple_query = f"""
-        SELECT DISTINCT SECTOR
-        FROM {db_name}.{schema_name}.COMPANIES_JP
-        WHERE SECTOR IS NOT NULL AND SECTOR != ''
-        LIMIT 10
-        """
-        
-        print(f"Executing simple sectors query...")
-        results = snowflake_service.query(simple_query)
-        print(f"Results: {len(results)}")
-        
-        # 結果を処理
-        sectors = []
-        for row in results:
-            sectors.append(row['sector'])
-        
-        sectors = sorted(sectors)
-        
-        return {"sectors": sectors}
-        
+        suggester = get_company_suggester()
+        if not suggester.is_loaded:
+            # 初回だけ企業テーブルとGoogle Driveから作成する（以降の作り直しは別スレッド）
+            await asyncio.to_thread(suggester.ensure_loaded)
+        return {"suggestions": suggester.suggest(query, limit, country)}
     except Exception as e:
-        print(f"Error in get_sectors: {str(e)}")
-        print(f"Error type: {type(e)}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
-        raise HTTPException(status_code=500, detail=f"Error in get_sectors: {str(e)}")
+        logger.exception("Error in suggest_companies")
+        raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/countries")
-async def get_countries():
-    """利用可能な国（COUNTRY）の一覧を取得"""
+# 企業詳細はyfinanceのリアルタイム株価を含むため短い期間だけキャッシュする
+@router.get("/{ticker}")
+@cached_response(lambda ticker, **_: [company_tag(ticker)], ttl_seconds=COMPANY_DETAIL_TTL_SECONDS)
+async def get_company_detail(request: Request, ticker: str, snowflake_service=Depends(get_snowflake_service)):
+    """
+    企業詳細を取得
+
+    Snowflakeの企業情報とyfinanceの株価情報（info・1分足）を同時に取得し、それぞれに
+    タイムアウトを設ける。株価情報が取得できない場合はSnowflakeに保存されている値を使い、
+    Snowflakeから取得できない場合は検索インデックスに保存されている値で応答する
+    （このときは203を返し、レスポンスキャッシュには保存しない）。
+    """
     try:
-        db_name = os.getenv("SNOWFLAKE_DATABASE")
-        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+        row, info, latest_price = await asyncio.gather(
+            _call_with_timeout("snowflake", _fetch_company_row, snowflake_service, ticker,
+                               timeout=COMPANY_DETAIL_QUERY_TIMEOUT_SECONDS, default=_UNAVAILABLE),
+            _call_with_timeout("yfinance_info", _fetch_quote_info, ticker,
+                               timeout=COMPANY_DETAIL_QUOTE_TIMEOUT_SECONDS, default={}, executor=_quote_executor),
+            _call_with_timeout("yfinance_history", _fetch_latest_price, ticker,
+                               timeout=COMPANY_DETAIL_QUOTE_TIMEOUT_SECONDS, default=None, executor=_quote_executor),
+        )
+        realtime_data = _realtime_fields(info, latest_price)
 
-        # まずCOMPANIES_JPから国一覧を取得
-        jp_query = f"""
-        SELECT DISTINCT COUNTRY
-        FROM {db_name}.{schema_name}.COMPANIES_JP
-        WHERE COUNTRY IS NOT NULL AND COUNTRY != ''
-        """
-        
-        # 次にCOMPANIES_USから国一覧を取得
-        us_query = f"""
-        SELECT DISTINCT COUNTRY
-        FROM {db_name}.{schema_name}.COMPANIES_US
-        WHERE COUNTRY IS NOT NULL AND COUNTRY != ''
-        """
-        
-        # COMPANIES_CNから国一覧を取得
-        cn_query = f"""
-        SELECT DISTINCT COUNTRY
-        FROM {db_name}.{schema_name}.COMPANIES_CN
-        WHERE COUNTRY IS NOT NULL AND COUNTRY != ''
-        """
-        
-        jp_results = snowflake_service.query(jp_query)
-        us_results = snowflake_service.query(us_query)
-        cn_results = snowflake_service.query(cn_query)
-        
-        # 結果を結合して重複を除去
-        all_countries = set()
-        for row in jp_results:
-            all_countries.add(row['country'])
-        for row in us_results:
-            all_countries.add(row['country'])
-        for row in cn_results:
-            all_countries.add(row['country'])
-        
-        countries = sorted(list(all_countries))
-        
-        # results = snowflake_service.query(query)  # この行を削除
-        # countries = [row['country'] for row in results]  # この行を削除
-        
-        return {"countries": countries}
-        
+        if row is _UNAVAILABLE:
+            indexed = get_company_search_index().get(ticker)
+            if indexed is None:
+                raise HTTPException(status_code=503, detail="企業情報を取得できませんでした。しばらくしてから再度お試しください。")
+            stored = dict.fromkeys(COMPANY_DETAIL_COLUMNS)
+            stored.update(indexed)
+            return JSONResponse(
+                jsonable_encoder(_company_detail(stored, realtime_data, "Search index + yfinance")),
+                status_code=203,
+            )
+
+        if row is None:
+            raise HTTPException(status_code=404, detail="Company not found")
+        return _company_detail(row, realtime_data, "Snowflake + yfinance")
+
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error in get_countries: {str(e)}")
+        logger.exception("Error in get_company_detail")
         raise HTTPException(status_code=500, detail=str(e))
 
+
+async def _call_with_timeout(dependency: str, func, *args, timeout: float, default=None, executor=None):
+    """
+    funcを別スレッドで実行し、timeout秒を過ぎた場合や失敗した場合はdefaultを返す
+
+    タイムアウトしたスレッドは止められないため、応答が止まることのある呼び出しには
+    専用のexecutorを渡し、他の処理が使うスレッドを塞がないようにする。
+    """
+    loop = asyncio.get_running_loop()
+    # 計測中のspanなどのcontextvarsを引き継ぐ（run_in_executorはコンテキストをコピーしない）
+    call = functools.partial(contextvars.copy_context().run, func, *args)
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(executor, call), timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Company detail dependency timed out", extra={"dependency": dependency, "timeout": timeout})
+    except Exception as e:
+        logger.warning("Company detail dependency failed", extra={"dependency": dependency, "error": str(e)})
+    return default
+
+
+def _fetch_company_row(snowflake_service, ticker: str) -> Optional[dict]:
+    """JP/US/CNの企業テーブルから1回のクエリで企業を取得（見つからなければNone）"""
+    db_name = os.getenv("SNOWFLAKE_DATABASE")
+    schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+    columns = """
+        TICKER,
+        COMPANY_NAME,
+        MARKET,
+        SECTOR,
+        INDUSTRY,
+        COUNTRY,
+        WEBSITE,
+        BUSINESS_DESCRIPTION,
+        DESCRIPTION,
+        MARKET_CAP,
+        EMPLOYEES,
+        CURRENT_PRICE,
+        SHARES_OUTSTANDING,
+        VOLUME,
+        PER,
+        PBR,
+        EPS,
+        BPS,
+        ROE,
+        ROA,
+        REVENUE,
+        {financials},
+        OPERATING_MARGIN,
+        NET_MARGIN,
+        {tradingview_summary},
+        DIVIDEND_YIELD
+    """
+    jp_us_columns = columns.format(
+        financials="OPERATING_PROFIT,\n        NET_PROFIT,\n        TOTAL_ASSETS,\n        EQUITY",
+        tradingview_summary="TRADINGVIEW_SUMMARY",
+    )
+    # COMPANIES_CNは財務指標のカラム名が異なり、TradingViewの要約を持たない
+    cn_columns = columns.format(
+        financials="OPERATING_INCOME as OPERATING_PROFIT,\n        NET_INCOME as NET_PROFIT,\n        TOTAL_ASSETS,\n        SHAREHOLDERS_EQUITY as EQUITY",
+        tradingview_summary="NULL as TRADINGVIEW_SUMMARY",
+    )
+    detail_query = " UNION ALL ".join(
+        f"SELECT {table_columns} FROM {db_name}.{schema_name}.{table_name} WHERE TICKER = %s"
+        for table_name, table_columns in (
+            ("COMPANIES_JP", jp_us_columns),
+            ("COMPANIES_US", jp_us_columns),
+            ("COMPANIES_CN", cn_columns),
+        )
+    )
+    # 通常は1つしか結果がないはず（複数ある場合はJP、US、CNの順で先のものを使う）
+    results = snowflake_service.query(detail_query, (ticker, ticker, ticker))
+    return results[0] if results else None
+
+
+def _company_detail(row: dict, realtime_data: dict, data_source: str) -> dict:
+    """企業テーブルの行とリアルタイム株価データから企業詳細のレスポンスを作成"""
+    # Snowflakeのクエリ結果の列名は小文字になっているため、小文字でアクセス
+    return {
+        "ticker": row['ticker'],
+        "company_name": row['company_name'],
+        "market": row['market'],
+        "sector": row['sector'],
+        "industry": row['industry'],
+        "country": row['country'],
+        "website": row['website'],
+        "business_description": row['description'] or row['business_description'],
+        "description": row['description'],
+        # リアルタイム株価データを使用
+        "current_price": realtime_data.get('current_price', row['current_price']),
+        "market_cap": realtime_data.get('market_cap', row['market_cap']),
+        "volume": realtime_data.get('volume', row['volume']),
+        "per": realtime_data.get('pe_ratio', row['per']),
+        "pbr": realtime_data.get('pb_ratio', row['pbr']),
+        "dividend_yield": realtime_data.get('dividend_yield', row['dividend_yield']),
+        # データベースの財務データ
+        "employees": row['employees'],
+        "shares_outstanding": row['shares_outstanding'],
+        "eps": row['eps'],
+        "bps": row['bps'],
+        "roe": row['roe'],
+        "roa": row['roa'],
+        "revenue": row['revenue'],
+        "operating_income": row['operating_profit'],  # マッピング
+        "net_income": row['net_profit'],  # マッピング
+        "total_assets": row['total_assets'],
+        "shareholders_equity": row['equity'],  # マッピング
+        "operating_margin": row['operating_margin'],
+        "net_margin": row['net_margin'],
+        "tradingview_summary": row['tradingview_summary'],
+        # フロントエンドで期待されるフィールドのデフォルト値
+        "data_source": data_source,
+        "last_updated": realtime_data.get('last_updated'),
+        "current_assets": None,
+        "current_liabilities": None,
+        "total_liabilities": None,
+        "capital": None,
+        "minority_interests": None,
+        "debt_ratio": None,
+        "current_ratio": None,
+        "equity_ratio": None,
+        "operating_cash_flow": None,
+        "investing_cash_flow": None,
+        "financing_cash_flow": None,
+        "cash_and_equivalents": None,
+        "dividend_per_share": None,
+        "payout_ratio": None,
+        "beta": realtime_data.get('beta'),
+        "market_type": row['market'],
+        "currency": "JPY" if row['country'] == 'JP' else "USD",
+        "collected_at": None
+    }
+
+@traced("yfinance", "quote_info")
+def _fetch_quote_info(ticker: str) -> dict:
+    """yfinanceで銘柄情報（時価総額・PER・PBRなど）を取得"""
+    import yfinance as yf
+
+    return yf.Ticker(ticker).info or {}
+
+@traced("yfinance", "quote_history")
+def _fetch_latest_price(ticker: str) -> Optional[float]:
+    """yfinanceで当日の1分足から最新の株価を取得"""
+    import yfinance as yf
+
+    hist = yf.Ticker(ticker).history(period="1d", interval="1m")
+    if hist.empty:
+        return None
+    return float(hist['Close'].iloc[-1])
+
+def _realtime_fields(info: dict, latest_price: Optional[float]) -> dict:
+    """
+    yfinanceの結果をリアルタイム株価データに変換
+
+    取得できなかった項目はキーを含めない（呼び出し側でSnowflakeに保存されている値を使う）。
+    """
+    realtime_data = {
+        'current_price': latest_price or info.get('currentPrice'),
+        'market_cap': info.get('marketCap'),
+        'volume': info.get('volume'),
+        'pe_ratio': info.get('trailingPE'),
+        'pb_ratio': info.get('priceToBook'),
+        'dividend_yield': info.get('dividendYield'),
+        'beta': info.get('beta'),
+        'last_updated': info.get('regularMarketTime'),
+    }
+    return {key: value for key, value in realtime_data.items() if value is not None}
+
 @router.get("/{ticker}/financial-history")
-async def get_financial_history(ticker: str):
+@cached_response(lambda ticker, **_: [company_tag(ticker)])
+async def get_financial_history(request: Request, ticker: str, snowflake_service=Depends(get_snowflake_service)):
     try:
         db_name = os.getenv("SNOWFLAKE_DATABASE")
         schema_name = os.getenv("SNOWFLAKE_SCHEMA")
@@ -678,6 +659,7 @@ async def get_financial_history(ticker: str):
 async def get_spreadsheet_data(spreadsheet_id: str):
     """Google Sheetsからデータを取得"""
     try:
+        from ...services.google_drive_service import GoogleDriveService
         drive_service = GoogleDriveService()
         data = drive_service.get_all_sheets_data(spreadsheet_id)
         
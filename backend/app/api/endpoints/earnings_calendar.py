@@ -1,115 +1,121 @@
-from fastapi import APIRouter, HTTPException
-import os
-from dotenv import load_dotenv
-from ...services.snowflake_service import SnowflakeService
+from fastapi import APIRouter, Depends, HTTPException, Query
+import logging
+from datetime import date, timedelta
+from ...services.registry import get_snowflake_service
+from ...services.earnings_cache import monthly_earnings_cache, daily_earnings_cache
 
 router = APIRouter()
-snowflake_service = SnowflakeService()
+logger = logging.getLogger(__name__)
 
 @router.get("/monthly/{year}/{month}")
-async def get_monthly_earnings(year: int, month: int):
+async def get_monthly_earnings(year: int, month: int, snowflake_service=Depends(get_snowflake_service)):
+    if not 1 <= month <= 12:
+        raise HTTPException(status_code=400, detail="月は1〜12で指定してください")
+
+    cached = monthly_earnings_cache.get(year, month)
+    if cached is not None:
+        return cached
+
     try:
-        db_name = os.getenv("SNOWFLAKE_DATABASE")
-        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
-
-        query = f"""
-        SELECT 
-            TO_DATE(announcement_date) as date,
-            COUNT(*) as company_count
-        FROM {db_name}.{schema_name}.earnings_calendar
-        WHERE EXTRACT(YEAR FROM announcement_date) = {year}
-        AND EXTRACT(MONTH FROM announcement_date) = {month}
-        GROUP BY date
-        ORDER BY date
-        """
-        
-        print(f"Executing monthly query for {year}-{month}")
-        results = snowflake_service.query(query)
-        
+        # 集計テーブルを日付範囲で検索（announcement_dateに関数を適用しないためプルーニングが効く）
+        start_date = date(year, month, 1)
+        end_date = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+
+        logger.debug("Monthly earnings query", extra={"year": year, "month": month})
+        results = snowflake_service.get_earnings_daily_counts(start_date, end_date)
+
         calendar_data = {}
         for row in results:
-            calendar_data[row['DATE'].strftime('%Y-%m-%d')] = {
-                "date": row['DATE'].strftime('%Y-%m-%d'),
-                "count": row['COMPANY_COUNT']
+            date_str = row['date'].strftime('%Y-%m-%d')
+            calendar_data[date_str] = {
+                "date": date_str,
+                "count": row['company_count']
             }
-        
+
+        monthly_earnings_cache.set(year, month, calendar_data)
         return calendar_data
     except Exception as e:
-        print(f"Error in get_monthly_earnings: {str(e)}")
+        logger.exception("Error in get_monthly_earnings")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/daily/{date}")
-async def get_daily_earnings(date: str):
+def _parse_date(value: str) -> date:
     try:
-        print(f"Getting daily earnings for date: {date}")
-        db_name = os.getenv("SNOWFLAKE_DATABASE")
-        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
-
-        # テーブルの存在確認はSnowflakeServiceのinitialize_databaseで行うため、ここでは不要
-
-        # 企業の詳細情報を含むクエリ
-        query = f"""
-        WITH latest_earnings AS (
-            SELECT 
-                ticker,
-                company_name,
-                announcement_date,
-                fiscal_year,
-                fiscal_quarter,
-                ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY created_at DESC) as rn
-            FROM {db_name}.{schema_name}.earnings_calendar
-            WHERE TO_DATE(announcement_date) = '{date}'
-        )
-        SELECT 
-            e.ticker as company_code,
-            COALESCE(c.company_name, e.company_name) as company_name,
-            c.market as market,
-            e.fiscal_year,
-            e.fiscal_quarter as quarter,
-            c.description,
-            c.sector,
-            c.industry,
-            c.market_cap,
-            c.per,
-            c.pbr,
-            c.dividend_yield
-        FROM latest_earnings e
-        LEFT JOIN {db_name}.{schema_name}.companies c
-        ON e.ticker = c.ticker
-        WHERE e.rn = 1
-        ORDER BY e.ticker
-        """
-        
-        print(f"Executing query for date {date}: {query}")
-        results = snowflake_service.query(query)
-        
-        companies = []
-        print("Processing results...")
-        row_count = 0
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="日付はYYYY-MM-DD形式で指定してください")
+
+
+def _format_company(row: dict) -> dict:
+    return {
+        "code": row['company_code'],
+        "name": row['company_name'],
+        "market": row['market'],
+        "fiscal_year": row['fiscal_year'],
+        "quarter": f"Q{row['quarter']}",
+        "description": row['description'],
+        "sector": row['sector'],
+        "industry": row['industry'],
+        "market_cap": row['market_cap'],
+        "per": row['per'],
+        "pbr": row['pbr'],
+        "dividend_yield": row['dividend_yield']
+    }
+
+
+def _get_daily_listings(snowflake_service, start_date: date, days: int) -> dict:
+    """
+    start_dateからdays日分の決算発表企業を日付ごとに取得
+
+    キャッシュにない日付だけをまとめて1回のクエリで取得し、結果をキャッシュする。
+    """
+    target_dates = [start_date + timedelta(days=i) for i in range(days)]
+    listings = {}
+    missing = []
+    for day in target_dates:
+        cached = daily_earnings_cache.get(day)
+        if cached is None:
+            missing.append(day)
+        else:
+            listings[day.isoformat()] = cached
+
+    if missing:
+        results = snowflake_service.get_earnings_day_view(missing[0], missing[-1] + timedelta(days=1))
+        fetched = {day.isoformat(): [] for day in missing}
         for row in results:
-            row_count += 1
-            print(f"Processing row {row_count}: {row['COMPANY_CODE']}")
-            company_data = {
-                "code": row['COMPANY_CODE'],
-                "name": row['COMPANY_NAME'],
-                "market": row['MARKET'],
-                "fiscal_year": row['FISCAL_YEAR'],
-                "quarter": f"Q{row['QUARTER']}",
-                "description": row['DESCRIPTION'],
-                "sector": row['SECTOR'],
-                "industry": row['INDUSTRY'],
-                "market_cap": row['MARKET_CAP'],
-                "per": row['PER'],
-                "pbr": row['PBR'],
-                "dividend_yield": row['DIVIDEND_YIELD']
-            }
-            companies.append(company_data)
-        
-        print(f"Found {len(companies)} companies")
+            day_str = row['date'].strftime('%Y-%m-%d')
+            if day_str in fetched:
+                fetched[day_str].append(_format_company(row))
+        for day in missing:
+            daily_earnings_cache.set(day, fetched[day.isoformat()])
+        listings.update(fetched)
+
+    return {day.isoformat(): listings[day.isoformat()] for day in target_dates}
+
+
+@router.get("/daily/{date}")
+async def get_daily_earnings(date: str, snowflake_service=Depends(get_snowflake_service)):
+    target_date = _parse_date(date)
+    try:
+        companies = _get_daily_listings(snowflake_service, target_date, 1)[target_date.isoformat()]
+        logger.debug("Daily earnings", extra={"date": target_date.isoformat(), "count": len(companies)})
         return companies
     except Exception as e:
         error_message = f"Error in get_daily_earnings: {str(e)}"
-        print(error_message)
-        print(f"Project ID: {os.getenv('GOOGLE_CLOUD_PROJECT')}")
-        print(f"Dataset: {os.getenv('BIGQUERY_DATASET')}")
+        logger.exception("Error in get_daily_earnings")
+        raise HTTPException(status_code=500, detail=error_message)
+
+
+@router.get("/weekly/{start_date}")
+async def get_weekly_earnings(
+    start_date: str,
+    days: int = Query(7, ge=1, le=31),
+    snowflake_service=Depends(get_snowflake_service),
+):
+    """start_dateから指定日数分（デフォルト1週間）の決算発表企業を日付ごとにまとめて取得"""
+    target_date = _parse_date(start_date)
+    try:
+        return _get_daily_listings(snowflake_service, target_date, days)
+    except Exception as e:
+        error_message = f"Error in get_weekly_earnings: {str(e)}"
+        logger.exception("Error in get_weekly_earnings")
         raise HTTPException(status_code=500, detail=error_message)
@@ -1,7 +1,12 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
+import asyncio
+import logging
+import importlib
+from contextlib import suppress
 from pathlib import Path
 
 # .envファイルを読み込み
@@ -11,8 +16,13 @@ from dotenv import load_dotenv
 env_path = Path(__file__).parent.parent.parent / '.env'
 load_dotenv(env_path)
 
+# ログはキュー経由で別スレッドから出力（JSON形式）
+from app.services.structured_logging import dropped_count, setup_logging, shutdown_logging
+setup_logging()
+
 from app.routers import admin, chat
 from app.api.endpoints import admin as admin_endpoints, companies as companies_endpoints, earnings_calendar, financial_reports, auth
+from app.services.instrumentation import TimingMiddleware, render_metrics
 
 app = FastAPI(title="BizLens API", version="1.0.0")
 
@@ -23,8 +33,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# リクエストの処理時間の計測（Server-Timingヘッダーと/api/metrics）
+app.add_middleware(TimingMiddleware)
+
 # APIルーター
 app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
@@ -37,11 +51,66 @@ app.include_router(financial_reports.router, prefix="/api/financial-reports", ta
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 
 
+# データの定期更新（SCHEDULER_ENABLED=trueを指定したプロセスだけで実行）
+# 同じジョブの重複実行はプロセス内でしか防げないため、uvicornのワーカーやマシンを複数
+# 起動する場合は、スケジュールを受け持つ1つのプロセスにだけ指定する
+# スケジューラのモジュール（APScheduler・SQLAlchemy）は起動処理の完了後に別スレッドで読み込み、
+# 起動処理（/api/healthの応答開始）を待たせない
+logger = logging.getLogger(__name__)
+_scheduler_task = None
+
+def _scheduler_enabled() -> bool:
+    return os.getenv("SCHEDULER_ENABLED", "false").lower() == "true"
+
+async def _start_scheduler_in_background():
+    try:
+        scheduler_module = await asyncio.to_thread(importlib.import_module, "app.services.scheduler")
+        scheduler_module.get_scheduler().start()
+    except Exception:
+        logger.exception("Failed to start data update scheduler")
+
+@app.on_event("startup")
+async def start_scheduler():
+    global _scheduler_task
+    if _scheduler_enabled():
+        _scheduler_task = asyncio.create_task(_start_scheduler_in_background())
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    if _scheduler_task is None:
+        return
+    if not _scheduler_task.done():
+        _scheduler_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await _scheduler_task
+    from app.services.scheduler import get_scheduler
+    get_scheduler().shutdown()
+
+@app.on_event("shutdown")
+async def close_services():
+    from app.services.registry import reset_services
+    reset_services()
+
+@app.on_event("shutdown")
+async def flush_logs():
+    shutdown_logging()
+
+
 # ヘルスチェック
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy"}
 
+# Prometheus形式のメトリクス
+@app.get("/api/metrics", include_in_schema=False)
+async def metrics():
+    body = render_metrics() + (
+        "# HELP bizlens_log_records_dropped_total キューがいっぱいで捨てたログの件数\n"
+        "# TYPE bizlens_log_records_dropped_total counter\n"
+        f"bizlens_log_records_dropped_total {dropped_count()}\n"
+    )
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
 # Vercel用のハンドラー
 if __name__ == "__main__":
     import uvicorn
@@ -3,7 +3,6 @@ from pydantic import BaseModel
 from typing import List
 import os
 from ..services.chat.mock_chat_service import MockChatService
-from ..services.company_service import CompanyService
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -1,105 +1,74 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
-from ..services.company_service import CompanyService
+from ..services.collection_jobs import DEFAULT_WORKERS
+from ..services.registry import get_company_service
 from fastapi.responses import StreamingResponse
-import asyncio
 import json
 
 router = APIRouter(tags=["companies"])
-company_service = CompanyService()
 
 @router.get("/search")
 async def search_companies(
     query: str = Query(..., description="Company name or stock code to search for"),
     page: int = Query(1, ge=1),
-    page_size: int = Query(10, ge=1, le=100)
+    page_size: int = Query(10, ge=1, le=100),
+    company_service=Depends(get_company_service),
 ):
     companies = await company_service.search_companies(query, page, page_size)
     return companies
 
 @router.get("/{company_id}")
-async def get_company(company_id: str):
+async def get_company(company_id: str, company_service=Depends(get_company_service)):
     company = await company_service.get_company(company_id)
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
     return company
 
 @router.get("/{ticker}/details")
-async def get_company_details(ticker: str):
+async def get_company_details(ticker: str, company_service=Depends(get_company_service)):
     details = await company_service.get_company_details(ticker)
     if not details:
         raise HTTPException(status_code=404, detail="Company details not found")
     return details
 
 @router.get("/{company_id}/metrics")
-async def get_company_metrics(company_id: str):
+async def get_company_metrics(company_id: str, company_service=Depends(get_company_service)):
     metrics = await company_service.get_financial_metrics(company_id)
     return metrics
 
 @router.get("/{company_id}/comparison")
-async def get_company_comparison(company_id: str):
+async def get_company_comparison(company_id: str, company_service=Depends(get_company_service)):
     comparison = await company_service.get_peer_companies(company_id)
     if not comparison:
         raise HTTPException(status_code=404, detail="Company not found")
     return comparison
 
 @router.post("/collect-data", status_code=200)
-async def collect_company_data():
+async def collect_company_data(
+    workers: int = Query(DEFAULT_WORKERS, ge=1, le=32, description="同時に収集する企業数"),
+    company_service=Depends(get_company_service),
+):
     async def event_generator():
         try:
             print("Starting data collection process...")  # デバッグログ
             
-            # データ収集の開始
-            collected_data = []
-            failed_companies = []
-            
             companies = await company_service.get_company_list()
-            total = len(companies)
-            print(f"Found {total} companies to process")  # デバッグログ
-            
-            # 進捗状況の初期値を送信
-            initial_data = {'progress': 0, 'current': 0, 'total': total}
-            print(f"Sending initial progress: {initial_data}")  # デバッグログ
-            yield f"data: {json.dumps(initial_data)}\n\n"
+            tickers = [company['ticker'] for company in companies]
+            print(f"Found {len(tickers)} companies to process")  # デバッグログ
             
-            # バッチ処理（10社ごと）
-            batch_size = 10
-            for i in range(0, total, batch_size):
-                batch = companies[i:i + batch_size]
-                print(f"Processing batch {i//batch_size + 1}/{(total+batch_size-1)//batch_size}")  # デバッグログ
-                
-                for company in batch:
-                    try:
-                        print(f"Collecting data for {company['ticker']}")  # デバッグログ
-                        data = await company_service.collect_all_data(company['ticker'])
-                        collected_data.append(data)
-                    except Exception as e:
-                        print(f"Error collecting data for {company['ticker']}: {str(e)}")  # デバッグログ
-                        failed_companies.append({
-                            'ticker': company['ticker'],
-                            'error': str(e)
-                        })
-                    
-                    # 進捗状況を送信
-                    current = len(collected_data) + len(failed_companies)
-                    progress = round((current / total) * 100, 1)
-                    progress_data = {'progress': progress, 'current': current, 'total': total}
-                    print(f"Sending progress update: {progress_data}")  # デバッグログ
-                    yield f"data: {json.dumps(progress_data)}\n\n"
-                
-                if i + batch_size < total:
-                    print(f"Waiting 30 seconds before next batch...")  # バッグログ
-                    await asyncio.sleep(30)
+            # 1社終わるごとに進捗状況を送信（最後に完了状態を送信）
+            job = company_service.create_collection_job(workers=workers)
+            failed = set()
+            async for event in job.run(tickers):
+                failed.update(item['ticker'] for item in event.get('failed', []))
+                yield f"data: {json.dumps(event)}\n\n"
             
-            # 完了状態を送信
-            final_data = {
-                'progress': 100,
-                'total': len(collected_data),
-                'updated': len(collected_data),
-                'failed': failed_companies
-            }
-            print(f"Data collection completed. Final status: {final_data}")  # デバッグログ
-            yield f"data: {json.dumps(final_data)}\n\n"
+            # TradingViewのサマリーを複数銘柄ずつまとめて取得
+            tradingview = await company_service.update_tradingview_summaries(
+                [ticker for ticker in tickers if ticker not in failed]
+            )
+            yield f"data: {json.dumps({'stage': 'tradingview', **tradingview})}\n\n"
+            print("Data collection completed.")  # デバッグログ
             
         except Exception as e:
             print(f"Error in event_generator: {str(e)}")  # デバッグログ
@@ -0,0 +1,155 @@
+"""
+アプリケーションのインポート時間（コールドスタート）の計測
+
+別プロセスで `python -X importtime -c "import app.main"` を実行し、標準エラーに出力される
+モジュールごとの累積インポート時間を集計する。--save で結果をJSONに保存しておき、
+--baseline でその結果と比較すると、重いモジュールがインポート時に読み込まれるように
+なっていないかを確認できる。
+
+--startup を指定すると、インポートに続けてアプリケーションの起動処理（on_event("startup")）
+まで実行し、起動処理が終わる（uvicornがリクエストの受け付けを始める）までの時間と、
+それまでに読み込まれたモジュールを集計する。起動処理の後にバックグラウンドで
+読み込まれるモジュールは含めない。
+
+使い方:
+    python app/scripts/benchmark_import_time.py --top 20
+    python app/scripts/benchmark_import_time.py --startup
+    python app/scripts/benchmark_import_time.py --save app/cache/import_time.json
+    python app/scripts/benchmark_import_time.py --baseline app/cache/import_time.json --max-regression 0.2
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+project_root = Path(__file__).resolve().parents[2]
+
+# import time:   self [us] | cumulative | imported package
+IMPORTTIME_PATTERN = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S.*)$')
+
+
+def parse_importtime(output: str) -> Dict[str, Tuple[int, int]]:
+    """-X importtime の出力をモジュール名 -> (自身の時間, 累積時間)（マイクロ秒）に変換"""
+    modules = {}
+    for line in output.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if match:
+            modules[match.group(4).strip()] = (int(match.group(1)), int(match.group(2)))
+    return modules
+
+
+# 起動処理を実行し、完了までの時間（インポートを含む）と読み込まれたモジュール名を出力する
+STARTUP_RESULT_PREFIX = 'startup result: '
+STARTUP_CODE = """
+import sys, json, time, asyncio
+STARTUP_RESULT_PREFIX = {prefix!r}
+started = time.perf_counter()
+import {module}
+module = sys.modules[{module!r}]
+
+async def startup():
+    await module.app.router.startup()
+    elapsed_us = int((time.perf_counter() - started) * 1e6)
+    print(STARTUP_RESULT_PREFIX + json.dumps({{"elapsed_us": elapsed_us, "modules": sorted(sys.modules)}}), flush=True)
+
+asyncio.run(startup())
+"""
+
+
+def measure(module: str, startup: bool = False) -> Dict[str, Tuple[int, int]]:
+    """
+    新しいプロセスでmoduleをインポートし、モジュールごとのインポート時間を返す
+
+    startupがTrueの場合は module.app の起動処理まで実行し、起動処理の完了までに
+    読み込まれたモジュールだけを返す（module の累積時間は起動処理を含む時間にする）。
+    """
+    code = STARTUP_CODE.format(module=module, prefix=STARTUP_RESULT_PREFIX) if startup else f'import {module}'
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=project_root,
+        env={**os.environ, 'PYTHONPATH': str(project_root)},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+        raise RuntimeError(f"Failed to import {module}:\n" + "\n".join(errors[-20:]))
+    modules = parse_importtime(result.stderr)
+    if not startup:
+        return modules
+
+    line = next(line for line in result.stdout.splitlines() if line.startswith(STARTUP_RESULT_PREFIX))
+    started = json.loads(line[len(STARTUP_RESULT_PREFIX):])
+    loaded = set(started["modules"])
+    modules = {name: times for name, times in modules.items() if name in loaded}
+    modules[module] = (modules[module][0], started["elapsed_us"])
+    return modules
+
+
+def summarize(runs: List[Dict[str, Tuple[int, int]]], module: str, top: int) -> Dict[str, object]:
+    """複数回の計測結果から合計時間と累積時間の大きいモジュールの中央値をまとめる"""
+    total_ms = statistics.median(run[module][1] for run in runs) / 1000
+    cumulative = {}
+    for run in runs:
+        for name, (_, cumulative_us) in run.items():
+            cumulative.setdefault(name, []).append(cumulative_us)
+    slowest = sorted(
+        ((name, statistics.median(values) / 1000) for name, values in cumulative.items() if name != module),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:top]
+    return {
+        "module": module,
+        "total_ms": round(total_ms, 1),
+        "module_count": len(runs[0]),
+        "slowest": [{"module": name, "cumulative_ms": round(ms, 1)} for name, ms in slowest],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="アプリケーションのインポート時間を計測")
+    parser.add_argument('--module', default='app.main', help="計測するモジュール")
+    parser.add_argument('--startup', action='store_true', help="module.app の起動処理の完了までを計測")
+    parser.add_argument('--repeat', type=int, default=3, help="計測回数（中央値を使う）")
+    parser.add_argument('--top', type=int, default=15, help="表示する累積時間の大きいモジュール数")
+    parser.add_argument('--save', help="結果を保存するJSONファイル")
+    parser.add_argument('--baseline', help="比較する以前の結果のJSONファイル")
+    parser.add_argument('--max-regression', type=float, default=None,
+                        help="ベースラインからの増加率がこの値を超えたら終了コード1（例: 0.2 = 20%%）")
+    args = parser.parse_args()
+
+    runs = [measure(args.module, startup=args.startup) for _ in range(args.repeat)]
+    summary = summarize(runs, args.module, args.top)
+
+    label = "startup" if args.startup else "import"
+    print(f"{label} {summary['module']}: {summary['total_ms']:.1f} ms ({summary['module_count']} modules)")
+    for item in summary['slowest']:
+        print(f"  {item['cumulative_ms']:>9.1f} ms  {item['module']}")
+
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"Saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        change = (summary['total_ms'] - baseline['total_ms']) / baseline['total_ms']
+        print(f"Baseline: {baseline['total_ms']:.1f} ms -> {summary['total_ms']:.1f} ms ({change:+.1%})")
+        baseline_modules = {item['module'] for item in baseline['slowest']}
+        added = [item['module'] for item in summary['slowest'] if item['module'] not in baseline_modules]
+        if added:
+            print(f"Newly slow modules: {', '.join(added)}")
+        if args.max_regression is not None and change > args.max_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
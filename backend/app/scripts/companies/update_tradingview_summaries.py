@@ -0,0 +1,56 @@
+"""
+企業テーブルの全銘柄のTradingViewサマリーを一括更新
+
+COMPANIES_JP・COMPANIES_USのtickerを読み込み、get_multiple_analysisで数百銘柄ずつ
+まとめて取得してTRADINGVIEW_SUMMARYに書き込む。
+
+使い方:
+    python app/scripts/companies/update_tradingview_summaries.py --country JP --country US
+"""
+
+import sys
+import asyncio
+import argparse
+from pathlib import Path
+
+# Add project root to sys.path
+project_root = Path(__file__).resolve().parents[3]
+sys.path.append(str(project_root))
+
+from app.services.snowflake_service import SnowflakeService
+from app.services.tradingview_summaries import (
+    DEFAULT_BATCH_SIZE,
+    SCREENER_EXCHANGES,
+    TradingViewSummaryCollector,
+    update_tradingview_summaries,
+)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="TradingViewの分析サマリーを一括更新")
+    parser.add_argument('--country', action='append', choices=sorted(SCREENER_EXCHANGES),
+                        help="対象の国コード（複数指定可、デフォルトはすべて）")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="1回のリクエストで問い合わせる銘柄数")
+    args = parser.parse_args()
+
+    snowflake_service = SnowflakeService()
+    if not snowflake_service.get_connection():
+        print("Could not connect to Snowflake. Aborting.")
+        return
+
+    try:
+        countries = args.country or sorted(SCREENER_EXCHANGES)
+        tickers_by_country = {country: snowflake_service.get_company_tickers(country) for country in countries}
+        stats = await update_tradingview_summaries(
+            snowflake_service,
+            tickers_by_country,
+            TradingViewSummaryCollector(batch_size=args.batch_size),
+        )
+        for country, counts in stats.items():
+            print(f"{country}: {counts['found']}/{counts['requested']} found, {counts['updated']} rows updated")
+    finally:
+        snowflake_service.close_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
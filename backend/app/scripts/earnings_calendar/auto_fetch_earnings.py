@@ -1,51 +1,178 @@
 import asyncio
-import os
+import argparse
+import sys
 from datetime import datetime, timedelta
-from backend.app.scripts.earnings_calendar.fetch_earnings_data import fetch_earnings_data, save_to_bigquery
+from pathlib import Path
 import aiohttp
 import logging
 
-# ロギングの設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('earnings_fetch.log'),
-        logging.StreamHandler()
-    ]
+# Add project root to sys.path
+project_root = Path(__file__).resolve().parents[3]
+sys.path.append(str(project_root))
+
+from app.scripts.earnings_calendar.earnings_sources import (
+    fetch_earnings_data,
+    fetch_jpx_workbook,
+    fetch_nikkei_table,
+    merge_earnings_data,
+    parse_jpx_workbook,
+    parse_nikkei_table,
+    save_to_snowflake,
 )
+from app.scripts.earnings_calendar.earnings_sync import SyncState, diff_earnings, fingerprint, to_calendar_rows
+from app.services.rate_limiter import HostRateLimiter
+from app.services.snowflake_service import SnowflakeService
+
 logger = logging.getLogger(__name__)
 
-async def auto_fetch():
+def get_target_month():
+    """翌々月の(年, 月)を取得"""
+    today = datetime.now()
+    target_month = today.replace(day=1) + timedelta(days=32)  # 翌月
+    target_month = target_month.replace(day=1) + timedelta(days=32)  # 翌々月
+    target_month = target_month.replace(day=1)  # 月初に設定
+    return target_month.year, target_month.month
+
+async def _load_source(state: SyncState, source_key: str, fetch, parse):
+    """
+    取得元を取得し、前回から変わっていなければ保存済みの解析結果を使う
+
+    Returns:
+        (行のリスト, フィンガープリント, 変更の有無, 取得できたか)
+    """
+    previous = state.get(source_key)
+    try:
+        content = await fetch()
+    except Exception as e:
+        logger.warning(f"Failed to fetch {source_key}: {str(e)}")
+        content = None
+
+    if content is None:
+        return (previous or {}).get("rows", []), None, False, False
+
+    source_fingerprint = fingerprint(content)
+    if state.is_unchanged(source_key, source_fingerprint):
+        logger.info(f"{source_key} unchanged, skipping parse")
+        return previous["rows"], source_fingerprint, False, True
+
+    return parse(content), source_fingerprint, True, True
+
+async def incremental_sync(year: int, month: int, state: SyncState = None, snowflake_service: SnowflakeService = None):
+    """
+    指定月の決算予定を差分同期
+
+    取得元が前回から変わっていなければ何もしない。変わっていれば保存済みの決算予定と
+    比較し、追加・変更・取消された発表だけを書き込む。
+    """
+    state = state or SyncState()
+    limiter = HostRateLimiter(rate_per_second=0.5, max_concurrency=2)
+    period = f"{year}-{month:02d}"
+
+    async with aiohttp.ClientSession() as session:
+        nikkei, jpx = await asyncio.gather(
+            _load_source(
+                state, f"nikkei:{period}",
+                lambda: fetch_nikkei_table(session, year, month, limiter),
+                lambda table_html: parse_nikkei_table(table_html, year, month),
+            ),
+            _load_source(
+                state, f"jpx:{period}",
+                lambda: fetch_jpx_workbook(session, limiter),
+                lambda content: parse_jpx_workbook(content, year, month),
+            ),
+        )
+
+    sources = {f"nikkei:{period}": nikkei, f"jpx:{period}": jpx}
+    if not any(changed for _, _, changed, _ in sources.values()):
+        logger.info(f"No source changes for {year}/{month}, nothing to sync")
+        return {"inserted": 0, "changed": 0, "cancelled": 0, "skipped": True}
+
+    all_fetched = all(fetched for _, _, _, fetched in sources.values())
+    new_rows = to_calendar_rows(merge_earnings_data(nikkei[0], jpx[0]))
+
+    # 取得元の期間と取得した発表日を含む範囲で保存済みの状態を取得
+    month_start = f"{period}-01"
+    month_end = f"{year + 1}-01-01" if month == 12 else f"{year}-{month + 1:02d}-01"
+    dates = [row["announcement_date"] for row in new_rows.values()]
+    range_end = (datetime.strptime(max(dates + [month_start]), '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+
+    owns_service = snowflake_service is None
+    snowflake_service = snowflake_service or SnowflakeService()
+    try:
+        stored_rows = snowflake_service.get_earnings_calendar_rows(min(dates + [month_start]), max(range_end, month_end))
+        diff = diff_earnings(new_rows, stored_rows, cancel_window=(month_start, month_end))
+
+        # 取得できなかった取得元がある場合や結果が空の場合は、誤って取り消さないよう削除しない
+        if not all_fetched or not new_rows:
+            if diff["cancelled"]:
+                logger.warning(f"Skipping {len(diff['cancelled'])} cancellations because sources were incomplete")
+            diff["cancelled"] = []
+
+        upserts = diff["inserted"] + diff["changed"]
+        if upserts:
+            snowflake_service.upsert_earnings_calendar(upserts)
+        if diff["cancelled"]:
+            snowflake_service.delete_earnings_calendar(diff["cancelled"])
+    finally:
+        if owns_service:
+            snowflake_service.close_connection()
+
+    # 書き込みが成功した取得元だけ状態を更新する
+    for source_key, (rows, source_fingerprint, changed, fetched) in sources.items():
+        if fetched and changed:
+            state.update(source_key, source_fingerprint, rows)
+    state.save()
+
+    logger.info(
+        f"Synced {year}/{month}: {len(diff['inserted'])} inserted, {len(diff['changed'])} changed, "
+        f"{len(diff['cancelled'])} cancelled, {diff['unchanged']} unchanged"
+    )
+    return {
+        "inserted": len(diff["inserted"]),
+        "changed": len(diff["changed"]),
+        "cancelled": len(diff["cancelled"]),
+        "skipped": False,
+    }
+
+async def auto_fetch(full: bool = False):
     """翌々月の決算予定データを自動取得"""
     try:
-        # 現在の日付から翌々月を計算
-        today = datetime.now()
-        target_month = today.replace(day=1) + timedelta(days=32)  # 翌月
-        target_month = target_month.replace(day=1) + timedelta(days=32)  # 翌々月
-        target_month = target_month.replace(day=1)  # 月初に設定
-        
-        year = target_month.year
-        month = target_month.month
-        
-        logger.info(f"Starting auto fetch for {year}/{month}")
-        
+        year, month = get_target_month()
+
+        logger.info(f"Starting {'full' if full else 'incremental'} fetch for {year}/{month}")
+
+        if not full:
+            await incremental_sync(year, month)
+            return
+
         async with aiohttp.ClientSession() as session:
             earnings_data = await fetch_earnings_data(session, year, month)
-            if earnings_data:
-                await save_to_bigquery(earnings_data)
-                logger.info(f"Successfully fetched and saved {len(earnings_data)} records for {year}/{month}")
-            else:
-                logger.warning(f"No data found for {year}/{month}")
-    
+        if earnings_data:
+            save_to_snowflake(earnings_data)
+            logger.info(f"Successfully fetched and saved {len(earnings_data)} records for {year}/{month}")
+        else:
+            logger.warning(f"No data found for {year}/{month}")
+
     except Exception as e:
         logger.error(f"Error in auto fetch: {str(e)}", exc_info=True)
         raise
 
 def main():
     """メイン実行関数"""
+    # ロギングの設定（スケジューラから import した場合はアプリケーションの設定を使う）
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('earnings_fetch.log'),
+            logging.StreamHandler()
+        ]
+    )
+    parser = argparse.ArgumentParser(description="翌々月の決算予定を取得")
+    parser.add_argument('--full', action='store_true', help="差分同期ではなく全件を取得して書き込む")
+    args = parser.parse_args()
     try:
-        asyncio.run(auto_fetch())
+        asyncio.run(auto_fetch(full=args.full))
     except Exception as e:
         logger.error(f"Failed to execute auto fetch: {str(e)}", exc_info=True)
         exit(1)
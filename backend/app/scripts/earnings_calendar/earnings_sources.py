@@ -0,0 +1,292 @@
+"""
+決算予定の取得元（日経の決算発表スケジュール、JPXの決算発表予定のExcelファイル）
+
+取得・解析したデータを (企業コード, 発表日) 単位でマージし、Snowflakeの
+earnings_calendar に書き込む。fetch_earnings_data（期間を指定した一括取得）と
+auto_fetch_earnings（翌々月の差分同期）から使う。
+"""
+
+import asyncio
+import re
+from contextlib import nullcontext
+from datetime import date, datetime
+
+from bs4 import BeautifulSoup
+
+from app.scripts.earnings_calendar.jpx_workbook import download_jpx_workbook, parse_jpx_workbook
+from app.services.rate_limiter import HostRateLimiter
+from app.services.snowflake_service import SnowflakeService
+
+# ブラウザのヘッダーを模倣
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'ja,en-US;q=0.7,en;q=0.3',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Cache-Control': 'max-age=0',
+}
+
+def parse_nikkei_date(date_str: str) -> str:
+    """日経の日付文字列をISO形式に変換"""
+    # "YYYY/MM/DD" -> "YYYY-MM-DD"
+    try:
+        date_obj = datetime.strptime(date_str, '%Y/%m/%d')
+        return date_obj.strftime('%Y-%m-%d')
+    except Exception as e:
+        print(f"Error parsing date '{date_str}': {e}")
+        return None
+
+def parse_fiscal_period(period_str: str, quarter_str: str, announcement_date: str) -> tuple:
+    """
+    決算期と四半期を解析
+
+    年度（決算期末の年）は発表日から求める。発表日より前に終わった直近の対象四半期末を
+    求め、そこから決算期末までの月数を足す（例: 2月に発表される3月期の第3四半期は
+    前年12月末の四半期なので、その年の3月期）。
+    """
+    # 例: period_str="2月期", quarter_str=" 第３ "
+    try:
+        month_match = re.match(r'(\d+)月期', period_str)
+        quarter_match = re.search(r'第\s*(\d)\s*', quarter_str)
+        
+        if month_match and quarter_match:
+            month = int(month_match.group(1))
+            quarter = int(quarter_match.group(1))
+            announced = datetime.strptime(announcement_date, '%Y-%m-%d')
+
+            # 対象四半期末の月と、そこから決算期末までの月数
+            months_to_period_end = 3 * (4 - quarter)
+            quarter_end_month = (month - months_to_period_end - 1) % 12 + 1
+            quarter_end_year = announced.year if quarter_end_month < announced.month else announced.year - 1
+            year = quarter_end_year + (quarter_end_month - 1 + months_to_period_end) // 12
+            
+            return year, quarter
+    except Exception as e:
+        print(f"Error parsing fiscal period '{period_str}', '{quarter_str}': {e}")
+    return None, None
+
+def parse_company_code(code_str: str) -> str:
+    """企業コードを抽出"""
+    try:
+        # 数字4桁のみを抽出
+        code = re.sub(r'\D', '', code_str)[:4]
+        if len(code) == 4:
+            return code
+    except Exception as e:
+        print(f"Error parsing company code '{code_str}': {e}")
+    return None
+
+def _limit(limiter, url: str):
+    """レート制限の実行枠（limiterがなければ何もしない）"""
+    return limiter.limit(url) if limiter else nullcontext()
+
+async def fetch_nikkei_table(session, year: int, month: int, limiter=None):
+    """日経の決算発表スケジュールのページを取得し、スケジュール表のHTMLを返す"""
+    url = f"https://www.nikkei.com/markets/kigyo/money-schedule/kessan/?ResultFlag=4&KessanMonth={month:02d}"
+    print(f"Fetching Nikkei data from: {url}")
+    
+    async with _limit(limiter, url), session.get(url, headers=HEADERS) as response:
+        if response.status != 200:
+            print(f"Failed to fetch Nikkei data: {response.status}")
+            return None
+        html = await response.text()
+
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # 決算発表スケジュールのテーブルを探す
+    article = soup.find('div', class_='m-artcle')
+    if not article:
+        print("Article div not found")
+        return None
+    
+    table = article.find('table', class_='cmn-table_style2')
+    
+    if not table:
+        print("Table not found in Nikkei")
+        return None
+    
+    return str(table)
+
+def parse_nikkei_table(table_html: str, year: int, month: int):
+    """日経のスケジュール表のHTMLから決算予定データを抽出"""
+    table = BeautifulSoup(table_html, 'html.parser')
+    earnings_data = []
+    skipped = 0
+    
+    for row in table.find_all('tr', class_='tr2'):  # データ行を取得
+        cols = row.find_all(['td', 'th'])  # thタグも含める
+        if len(cols) >= 8:  # 必要なカラム数があることを確認
+            # 列の順序:
+            # 0: 決算発表日
+            # 1: 証券コード
+            # 2: 会社名
+            # 3: 関連情報
+            # 4: 決算期
+            # 5: 決算種別
+            # 6: 業種
+            # 7: 上場市場
+            date_str = cols[0].text.strip()
+            # 証券コードはaタグ内にある
+            code_link = cols[1].find('a')
+            code_str = code_link.text.strip() if code_link else cols[1].text.strip()
+            # 会社名もaタグ内にある
+            name_link = cols[2].find('a')
+            company_name = name_link.text.strip() if name_link else cols[2].text.strip()
+            period_str = cols[4].text.strip()  # 決算期
+            quarter_str = cols[5].text.strip()  # 決算種別
+            
+            announcement_date = parse_nikkei_date(date_str)
+            code = parse_company_code(code_str)
+            fiscal_year, quarter = (
+                parse_fiscal_period(period_str, quarter_str, announcement_date) if announcement_date else (None, None)
+            )
+            
+            if all([announcement_date, code, fiscal_year, quarter]):
+                earnings_data.append({
+                    "code": code,
+                    "company_name": company_name,
+                    "date": announcement_date,
+                    "fiscal_year": fiscal_year,
+                    "quarter": quarter,
+                })
+            else:
+                skipped += 1
+    
+    if skipped:
+        print(f"Skipped {skipped} Nikkei rows due to missing data")
+    print(f"Found {len(earnings_data)} companies from Nikkei for {year}/{month}")
+    return earnings_data
+
+async def fetch_nikkei_data(session, year: int, month: int, limiter=None):
+    """日経から決算予定データを取得"""
+    try:
+        table_html = await fetch_nikkei_table(session, year, month, limiter)
+        if table_html is None:
+            return []
+        return parse_nikkei_table(table_html, year, month)
+    except Exception as e:
+        print(f"Error fetching Nikkei data: {str(e)}")
+        return []
+
+async def fetch_jpx_workbook(session, limiter=None):
+    """JPXの決算発表予定のExcelファイルを取得"""
+    # 最新のExcelファイルのURLを取得
+    index_url = "https://www.jpx.co.jp/listing/event-schedules/financial-announcement/index.html"
+    
+    async with _limit(limiter, index_url), session.get(index_url, headers=HEADERS) as response:
+        if response.status != 200:
+            print(f"Failed to fetch JPX index page: {response.status}")
+            return None
+        html = await response.text()
+
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Excelファイルへのリンクを探す
+    excel_link = None
+    for link in soup.find_all('a'):
+        href = link.get('href', '')
+        if 'kessan.xlsx' in href:
+            excel_link = href
+            break
+    
+    if not excel_link:
+        print("Excel file link not found")
+        return None
+    
+    # 相対URLを絶対URLに変換
+    if not excel_link.startswith('http'):
+        excel_link = f"https://www.jpx.co.jp{excel_link}"
+    
+    print(f"Downloading Excel file from: {excel_link}")
+    
+    # Excelファイルをダウンロード（前回から変更がなければ保存済みのファイルを使用）
+    async with _limit(limiter, excel_link):
+        return await download_jpx_workbook(session, excel_link, HEADERS)
+
+async def fetch_jpx_data(session, year: int, month: int, limiter=None):
+    """JPXから決算予定データを取得"""
+    try:
+        content = await fetch_jpx_workbook(session, limiter)
+        if content is None:
+            return []
+        
+        earnings_data = parse_jpx_workbook(content, year, month)
+        print(f"Found {len(earnings_data)} companies from JPX for {year}/{month}")
+        return earnings_data
+    except Exception as e:
+        print(f"Error fetching JPX data: {str(e)}")
+        return []
+
+def merge_earnings_data(*sources):
+    """複数ソースの決算予定を(企業コード, 発表日)単位でマージ（後のソースを優先）"""
+    merged_data = {}
+    for source in sources:
+        for data in source:
+            merged_data[f"{data['code']}_{data['date']}"] = data
+    return list(merged_data.values())
+
+async def fetch_earnings_data(session, year: int, month: int, limiter=None):
+    """両方のソースから決算予定データを取得"""
+    nikkei_data, jpx_data = await asyncio.gather(
+        fetch_nikkei_data(session, year, month, limiter),
+        fetch_jpx_data(session, year, month, limiter),
+    )
+    return merge_earnings_data(nikkei_data, jpx_data)
+
+def iter_months(start: date, end: date):
+    """startの月からendの月までの(年, 月)を順に返す"""
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+async def fetch_earnings_range(session, months, limiter=None):
+    """
+    複数月の決算予定をまとめて取得
+
+    日経の月別ページはホストごとのレート制限の範囲で並行取得し、JPXのExcelファイルは
+    1回だけ取得して各月を抽出する。結果はメモリ上でマージして返す。
+
+    どちらの取得元も公開中の予定しか提供せず、日経のページは月（KessanMonth）だけで
+    指定するため、同じ月を別の年で含む範囲（12ヶ月を超える範囲）は ValueError にする。
+    """
+    limiter = limiter or HostRateLimiter(rate_per_second=0.5, max_concurrency=2)
+    months = list(months)
+    if len({month for _, month in months}) != len(months):
+        raise ValueError("日経の決算発表スケジュールは年を指定できないため、12ヶ月を超える範囲は取得できません")
+
+    nikkei_results, jpx_content = await asyncio.gather(
+        asyncio.gather(*[fetch_nikkei_data(session, year, month, limiter) for year, month in months]),
+        fetch_jpx_workbook(session, limiter),
+    )
+
+    jpx_results = []
+    if jpx_content is not None:
+        for year, month in months:
+            jpx_data = parse_jpx_workbook(jpx_content, year, month)
+            print(f"Found {len(jpx_data)} companies from JPX for {year}/{month}")
+            jpx_results.append(jpx_data)
+
+    nikkei_data = [data for result in nikkei_results for data in result]
+    jpx_data = [data for result in jpx_results for data in result]
+    return merge_earnings_data(nikkei_data, jpx_data)
+
+def save_to_snowflake(earnings_data):
+    """決算予定データをSnowflakeのearnings_calendarに一括で反映"""
+    rows = [
+        {
+            "ticker": data["code"],
+            "company_name": data["company_name"],
+            "announcement_date": data["date"],
+            "fiscal_year": data["fiscal_year"],
+            "fiscal_quarter": data["quarter"],
+        }
+        for data in earnings_data
+    ]
+    snowflake_service = SnowflakeService()
+    try:
+        snowflake_service.upsert_earnings_calendar(rows)
+        print(f"Successfully upserted {len(rows)} rows")
+    finally:
+        snowflake_service.close_connection()
@@ -0,0 +1,109 @@
+"""
+決算予定の差分同期
+
+取得元（日経の月別ページ、JPXのExcelファイル）ごとに内容のフィンガープリントと
+解析結果を保存しておき、内容が変わっていない取得元は解析を省略して前回の結果を
+使う。取得元の結果を合わせた決算予定を保存済みの状態と比較し、追加・変更・取消
+された発表だけを書き込む。
+"""
+
+import json
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_STATE_PATH = Path(__file__).resolve().parents[2] / 'cache' / 'earnings_sync' / 'state.json'
+
+EarningsKey = Tuple[str, int, int]
+
+
+def fingerprint(content) -> str:
+    """取得元の内容（bytesまたはstr）のフィンガープリント"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
+
+
+class SyncState:
+    """取得元ごとのフィンガープリントと解析結果をJSONファイルに保存する"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or DEFAULT_STATE_PATH)
+        self._sources: Dict[str, Dict] = {}
+        if self.path.exists():
+            with open(self.path, encoding='utf-8') as f:
+                self._sources = json.load(f).get('sources', {})
+
+    def get(self, source_key: str) -> Optional[Dict]:
+        """前回の {"fingerprint": ..., "rows": [...]} を取得"""
+        return self._sources.get(source_key)
+
+    def is_unchanged(self, source_key: str, source_fingerprint: str) -> bool:
+        entry = self._sources.get(source_key)
+        return entry is not None and entry.get('fingerprint') == source_fingerprint
+
+    def update(self, source_key: str, source_fingerprint: str, rows: List[Dict]):
+        self._sources[source_key] = {"fingerprint": source_fingerprint, "rows": rows}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"sources": self._sources}, f, ensure_ascii=False)
+        tmp_path.replace(self.path)
+
+
+def to_calendar_rows(earnings_data: List[Dict]) -> Dict[EarningsKey, Dict]:
+    """取得した決算予定を (ticker, fiscal_year, fiscal_quarter) ごとの earnings_calendar の行に変換"""
+    rows = {}
+    for data in earnings_data:
+        key = (str(data["code"]), int(data["fiscal_year"]), int(data["quarter"]))
+        rows[key] = {
+            "ticker": key[0],
+            "company_name": data["company_name"],
+            "announcement_date": str(data["date"])[:10],
+            "fiscal_year": key[1],
+            "fiscal_quarter": key[2],
+        }
+    return rows
+
+
+def diff_earnings(
+    new_rows: Dict[EarningsKey, Dict],
+    stored_rows: List[Dict],
+    cancel_window: Optional[Tuple[str, str]] = None,
+) -> Dict[str, List]:
+    """
+    取得した決算予定と保存済みの決算予定を比較
+
+    Args:
+        new_rows: to_calendar_rows の結果
+        stored_rows: earnings_calendar の行（ticker, fiscal_year, fiscal_quarter, announcement_date）
+        cancel_window: 取消とみなす発表日の範囲 [開始日, 終了日)。取得元が対象とする期間外の
+            保存済みの発表は、取得結果になくても取消にしない
+
+    Returns:
+        inserted: 新しく追加された発表, changed: 発表日が変わった発表,
+        cancelled: 取得元から消えた発表のキー, unchanged: 変更のない件数
+    """
+    stored = {
+        (str(row["ticker"]), int(row["fiscal_year"]), int(row["fiscal_quarter"])): str(row["announcement_date"])[:10]
+        for row in stored_rows
+    }
+
+    inserted, changed = [], []
+    unchanged = 0
+    for key, row in new_rows.items():
+        if key not in stored:
+            inserted.append(row)
+        elif stored[key] != row["announcement_date"]:
+            changed.append(row)
+        else:
+            unchanged += 1
+
+    cancelled = [
+        key for key, announcement_date in stored.items()
+        if key not in new_rows
+        and (cancel_window is None or cancel_window[0] <= announcement_date < cancel_window[1])
+    ]
+    return {"inserted": inserted, "changed": changed, "cancelled": cancelled, "unchanged": unchanged}
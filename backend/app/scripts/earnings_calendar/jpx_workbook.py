@@ -0,0 +1,137 @@
+"""
+JPXの決算発表予定（kessan.xlsx）の取得と解析
+
+ワークブックはETag/Last-Modifiedを使って条件付きで取得し、変更がなければ
+ローカルに保存したファイルを再利用する。解析はpandasの列演算で行い、
+同じ内容のワークブックは一度だけ正規化して月ごとの抽出に使い回す。
+"""
+
+import io
+import json
+import hashlib
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[2] / 'cache' / 'jpx'
+REQUIRED_COLUMNS = ['日付', 'コード', '会社名', '決算期', '四半期']
+
+# ワークブックの内容(SHA-1) -> 正規化済みDataFrame
+_normalized_workbooks: Dict[str, pd.DataFrame] = {}
+
+
+def normalize_jpx_workbook(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    ワークブックの全行を code, company_name, date, fiscal_year, quarter の形に正規化
+
+    日付が日付型でない行、決算期から年を読み取れない行、四半期が数値でない行は除外する。
+    """
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        print(f"JPX workbook is missing columns: {missing}")
+        return pd.DataFrame(columns=['code', 'company_name', 'date', 'fiscal_year', 'quarter', 'year', 'month'])
+
+    # 日付: 日付型の値のみ（文字列や空欄は除外）
+    raw_dates = df['日付']
+    if not pd.api.types.is_datetime64_any_dtype(raw_dates):
+        is_date = raw_dates.map(lambda value: isinstance(value, (datetime, date)))
+        raw_dates = raw_dates.where(is_date)
+    dates = pd.to_datetime(raw_dates, errors='coerce')
+
+    # 決算期: "2025年3月" のような文字列の年の部分（2桁の場合は2000年代）
+    fiscal_text = df['決算期'].where(df['決算期'].map(type) == str)
+    fiscal_text = fiscal_text.str.split('年', n=1).str[0].str.normalize('NFKC').str.strip()
+    fiscal_year = pd.to_numeric(fiscal_text.where(fiscal_text.str.fullmatch(r'[+-]?\d+', na=False)), errors='coerce')
+    fiscal_year = fiscal_year.where(fiscal_year >= 100, fiscal_year + 2000)
+
+    # 四半期: 数値（小数は切り捨て）
+    quarter = pd.to_numeric(df['四半期'], errors='coerce')
+    quarter = quarter.where(quarter.abs() != float('inf'))
+
+    valid = dates.notna() & fiscal_year.notna() & quarter.notna()
+    dates = dates[valid]
+    return pd.DataFrame({
+        'code': df.loc[valid, 'コード'].astype(str).str.zfill(4),
+        'company_name': df.loc[valid, '会社名'],
+        'date': dates.dt.strftime('%Y-%m-%d'),
+        'fiscal_year': fiscal_year[valid].astype('int64'),
+        'quarter': quarter[valid].astype('int64'),
+        'year': dates.dt.year,
+        'month': dates.dt.month,
+    })
+
+
+def select_month(normalized: pd.DataFrame, year: int, month: int) -> List[Dict]:
+    """正規化済みのワークブックから指定した年月の決算予定を取り出す"""
+    rows = normalized[(normalized['year'] == year) & (normalized['month'] == month)]
+    return [
+        {
+            "code": code,
+            "company_name": company_name,
+            "date": date_str,
+            "fiscal_year": int(fiscal_year),
+            "quarter": int(quarter),
+        }
+        for code, company_name, date_str, fiscal_year, quarter in zip(
+            rows['code'], rows['company_name'], rows['date'], rows['fiscal_year'], rows['quarter']
+        )
+    ]
+
+
+def load_jpx_workbook(content: bytes) -> pd.DataFrame:
+    """ワークブックを読み込んで正規化（同じ内容なら前回の結果を返す）"""
+    digest = hashlib.sha1(content).hexdigest()
+    if digest not in _normalized_workbooks:
+        df = pd.read_excel(io.BytesIO(content))
+        print(f"Excel columns: {df.columns.tolist()} ({len(df)} rows)")
+        _normalized_workbooks.clear()
+        _normalized_workbooks[digest] = normalize_jpx_workbook(df)
+    return _normalized_workbooks[digest]
+
+
+def parse_jpx_workbook(content: bytes, year: int, month: int) -> List[Dict]:
+    """ワークブックから指定した年月の決算予定を抽出"""
+    return select_month(load_jpx_workbook(content), year, month)
+
+
+async def download_jpx_workbook(session, url: str, headers: Dict[str, str], cache_dir: Optional[Path] = None) -> Optional[bytes]:
+    """
+    ワークブックを条件付きGETで取得
+
+    前回取得時のETag/Last-Modifiedを送り、304が返った場合は保存済みのファイルを返す。
+    """
+    cache_dir = Path(cache_dir or DEFAULT_CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    workbook_path = cache_dir / 'kessan.xlsx'
+    meta_path = cache_dir / 'kessan.json'
+
+    meta = {}
+    if workbook_path.exists() and meta_path.exists():
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('url') != url:
+            meta = {}
+
+    request_headers = dict(headers)
+    if meta.get('etag'):
+        request_headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        request_headers['If-Modified-Since'] = meta['last_modified']
+
+    async with session.get(url, headers=request_headers) as response:
+        if response.status == 304 and meta:
+            print(f"JPX workbook not modified (ETag: {meta.get('etag')}), using cached file")
+            return workbook_path.read_bytes()
+        if response.status != 200:
+            print(f"Failed to download Excel file: {response.status}")
+            return None
+        content = await response.read()
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+
+    workbook_path.write_bytes(content)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'url': url, 'etag': etag, 'last_modified': last_modified}, f)
+    return content
@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+# Add project root to sys.path
+project_root = Path(__file__).resolve().parents[3]
+sys.path.append(str(project_root))
+
+from app.services.snowflake_service import SnowflakeService
+
+
+def main():
+    """決算発表日ごとの集計テーブルと企業一覧テーブルを作成し、earnings_calendar全体から作り直す"""
+    snowflake_service = SnowflakeService()
+    if not snowflake_service.get_connection():
+        print("Could not connect to Snowflake. Aborting rebuild.")
+        return
+
+    try:
+        snowflake_service.create_earnings_daily_counts_table()
+        snowflake_service.rebuild_earnings_daily_counts()
+        snowflake_service.create_earnings_day_view_table()
+        snowflake_service.rebuild_earnings_day_view()
+    finally:
+        snowflake_service.close_connection()
+
+
+if __name__ == "__main__":
+    main()
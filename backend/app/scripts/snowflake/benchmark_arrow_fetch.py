@@ -0,0 +1,133 @@
+"""
+辞書で受け取る経路（SnowflakeService.query）とArrowで受け取る経路（query_arrow）の比較
+
+同じクエリを両方の経路で実行し、取得からJSON文字列の作成までの時間を計測する。
+--synthetic を指定した場合はSnowflakeに接続せず、指定した行数の企業データを
+生成して変換部分だけを比較する。
+
+使い方:
+    python app/scripts/snowflake/benchmark_arrow_fetch.py --repeat 5
+    python app/scripts/snowflake/benchmark_arrow_fetch.py --synthetic 100000
+"""
+
+import sys
+import time
+import json
+import argparse
+import statistics
+from decimal import Decimal
+from pathlib import Path
+
+import pyarrow as pa
+from fastapi.encoders import jsonable_encoder
+
+# Add project root to sys.path
+project_root = Path(__file__).resolve().parents[3]
+sys.path.append(str(project_root))
+
+from app.services.arrow_results import arrow_to_json, concat_tables, lowercase_columns, sort_desc
+
+SEARCH_COLUMNS = """
+    TICKER, COMPANY_NAME, MARKET, SECTOR, INDUSTRY, COUNTRY, WEBSITE, BUSINESS_DESCRIPTION,
+    MARKET_CAP, CURRENT_PRICE, PER, PBR, ROE, ROA, DIVIDEND_YIELD, COMPANY_TYPE, CEO
+"""
+
+
+def _measure(func, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), min(timings)
+
+
+def _report(label: str, dict_timing, arrow_timing):
+    dict_median, dict_min = dict_timing
+    arrow_median, arrow_min = arrow_timing
+    print(f"{label}")
+    print(f"  dict : median {dict_median * 1000:8.1f} ms / min {dict_min * 1000:8.1f} ms")
+    print(f"  arrow: median {arrow_median * 1000:8.1f} ms / min {arrow_min * 1000:8.1f} ms")
+    if arrow_median > 0:
+        print(f"  speedup: x{dict_median / arrow_median:.2f}")
+
+
+def run_live(repeat: int):
+    """Snowflakeに対して検索・一覧のクエリを両方の経路で実行"""
+    import os
+    from app.services.snowflake_service import SnowflakeService
+
+    service = SnowflakeService()
+    if not service.conn:
+        print("Could not connect to Snowflake. Aborting benchmark.")
+        return
+
+    db_name = os.getenv("SNOWFLAKE_DATABASE")
+    schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+    tables = ("COMPANIES_JP", "COMPANIES_US", "COMPANIES_CN")
+    search_queries = [f"SELECT {SEARCH_COLUMNS} FROM {db_name}.{schema_name}.{table}" for table in tables]
+
+    def search_dict():
+        rows = []
+        for query in search_queries:
+            rows.extend(service.query(query))
+        rows.sort(key=lambda row: row["market_cap"] or 0, reverse=True)
+        return json.dumps(jsonable_encoder(rows[:100]), ensure_ascii=False)
+
+    def search_arrow():
+        table = sort_desc(concat_tables([service.query_arrow(query) for query in search_queries]), "market_cap")
+        return arrow_to_json(table.slice(0, 100))
+
+    def full_dict():
+        rows = []
+        for query in search_queries:
+            rows.extend(service.query(query))
+        return json.dumps(jsonable_encoder(rows), ensure_ascii=False)
+
+    def full_arrow():
+        return arrow_to_json(concat_tables([service.query_arrow(query) for query in search_queries]))
+
+    try:
+        _report("search fan-out (top 100)", _measure(search_dict, repeat), _measure(search_arrow, repeat))
+        _report("all companies -> JSON", _measure(full_dict, repeat), _measure(full_arrow, repeat))
+    finally:
+        service.close_connection()
+
+
+def run_synthetic(rows: int, repeat: int):
+    """生成した企業データで、行ごとの辞書変換とArrowの変換を比較"""
+    columns = [name.strip() for name in SEARCH_COLUMNS.split(",")]
+    tuples = [
+        (
+            f"{1000 + i}", f"Company {i}", "Prime", "Technology", "Software", "JP", "https://example.com",
+            "description " * 5, i * 1_000_000, Decimal("1234.50"), 15.2, 1.3, 8.5, 4.1, Decimal("2.10"), "Corp", None,
+        )
+        for i in range(rows)
+    ]
+    arrow_table = pa.Table.from_pylist([dict(zip(columns, row)) for row in tuples])
+
+    def dict_path():
+        # SnowflakeService.queryと同じ行ごとの変換
+        results = [{col.lower(): val for col, val in zip(columns, row)} for row in tuples]
+        return json.dumps(jsonable_encoder(results), ensure_ascii=False)
+
+    def arrow_path():
+        return arrow_to_json(lowercase_columns(arrow_table))
+
+    _report(f"synthetic {rows} rows -> JSON", _measure(dict_path, repeat), _measure(arrow_path, repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="辞書とArrowによるクエリ結果の取得・変換の比較")
+    parser.add_argument('--repeat', type=int, default=5, help="計測の繰り返し回数")
+    parser.add_argument('--synthetic', type=int, default=0, help="Snowflakeに接続せず、指定行数の生成データで比較する")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        run_synthetic(args.synthetic, args.repeat)
+    else:
+        run_live(args.repeat)
+
+
+if __name__ == "__main__":
+    main()
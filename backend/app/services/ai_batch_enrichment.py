@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+OpenAI Batch APIを使った企業情報の一括補完
+
+大量の企業を登録する際に、企業ごとの同期的なチャット補完の代わりに
+1. 外部DB・ウェブサイト情報を並行して収集し、リクエストをJSONLに書き出す
+2. ファイルをアップロードしてバッチを作成する
+3. バッチの完了をポーリングする
+4. 結果をダウンロードして企業情報に統合し、COMPANIES_JP/US/CNへ一括で反映する
+という流れで処理する。ジョブの状態はジョブディレクトリに保存されるため、
+提出と統合は別プロセス・別リクエストで実行できる。
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import requests
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from app.services.ai_company_collector import AICompanyCollector, AI_SYSTEM_PROMPT
+from app.services.llm_cache import make_cache_key
+from app.services.instrumentation import traced
+
+DEFAULT_JOB_DIR = Path(__file__).parent.parent / 'cache' / 'ai_batches'
+TERMINAL_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+
+
+class BatchNotReady(ValueError):
+    """完了していない（実行中・失敗・期限切れなどの）バッチを統合しようとした"""
+
+    def __init__(self, job_id: str, status: str):
+        super().__init__(f"Batch job {job_id} is not completed (status: {status})")
+        self.job_id = job_id
+        self.status = status
+
+
+class AIBatchEnricher:
+    def __init__(self, collector: Optional[AICompanyCollector] = None, job_dir: Optional[str] = None):
+        self.collector = collector or AICompanyCollector()
+        self.job_dir = Path(job_dir or os.getenv("AI_BATCH_JOB_DIR") or DEFAULT_JOB_DIR)
+        self.job_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def _auth_headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.collector.openai_api_key}"}
+
+    def _job_path(self, job_id: str) -> Path:
+        if not re.fullmatch(r'batch_\w+', job_id):
+            raise ValueError(f"Invalid job id: {job_id}")
+        return self.job_dir / job_id
+
+    def _load_job(self, job_id: str) -> Dict[str, Any]:
+        with open(self._job_path(job_id) / 'job.json', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_job(self, job: Dict[str, Any]):
+        with open(self._job_path(job['job_id']) / 'job.json', 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False, indent=2)
+
+    async def prepare(self, companies: List[Dict[str, Any]], max_concurrency: int = 10) -> Dict[str, Any]:
+        """
+        企業ごとの基本情報を並行して収集し、Batch API用のJSONLを書き出す
+
+        Args:
+            companies: company_name, website_url, ticker, countryを持つ辞書のリスト
+            max_concurrency: 同時にスクレイピングする企業数の上限
+
+        Returns:
+            ジョブ情報（job_id, リクエスト数, スキップした企業）
+        """
+        job_id = f"batch_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        job_path = self._job_path(job_id)
+        job_path.mkdir(parents=True)
+
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def _prepare(index: int, company: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            company_name = company.get('company_name')
+            website_url = company.get('website_url')
+            ticker = company.get('ticker', '')
+            country = company.get('country', 'JP')
+
+            async with semaphore:
+                if await asyncio.to_thread(self.collector.check_duplicate_company, company_name, ticker, country):
+                    return None
+                external_info, basic_info = await asyncio.gather(
+                    self.collector._fetch_external_company_info_async(company_name, country),
+                    self.collector._scrape_website_info_async(website_url),
+                )
+
+            combined_basic = {**basic_info, **external_info}
+            prompt = self.collector._build_enhancement_prompt(company_name, website_url, combined_basic)
+            return {
+                "custom_id": f"{index}:{ticker}",
+                "company_name": company_name,
+                "website_url": website_url,
+                "ticker": ticker,
+                "country": country,
+                "basic_info": {k: v for k, v in basic_info.items() if k != "website_content"},
+                "external_info": external_info,
+                "prompt": prompt,
+            }
+
+        try:
+            prepared = await asyncio.gather(*[_prepare(i, c) for i, c in enumerate(companies)])
+        finally:
+            await self.collector.close()
+
+        entries = [entry for entry in prepared if entry]
+        skipped = [
+            {"company_name": c.get('company_name'), "ticker": c.get('ticker', '')}
+            for c, entry in zip(companies, prepared) if entry is None
+        ]
+
+        with open(job_path / 'requests.jsonl', 'w', encoding='utf-8') as f:
+            for entry in entries:
+                request = {
+                    "custom_id": entry["custom_id"],
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": self.collector._build_chat_request(AI_SYSTEM_PROMPT, entry["prompt"]),
+                }
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+
+        with open(job_path / 'context.json', 'w', encoding='utf-8') as f:
+            json.dump({entry["custom_id"]: entry for entry in entries}, f, ensure_ascii=False)
+
+        job = {
+            "job_id": job_id,
+            "model": self.collector.openai_model,
+            "status": "prepared",
+            "request_count": len(entries),
+            "skipped": skipped,
+            "batch_id": None,
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self._save_job(job)
+        print(f"Prepared batch job {job_id}: {len(entries)} requests, {len(skipped)} skipped")
+        return job
+
+    @traced("openai", "batch_submit")
+    def submit(self, job_id: str) -> Dict[str, Any]:
+        """JSONLをアップロードしてバッチを作成"""
+        job = self._load_job(job_id)
+        if not job["request_count"]:
+            job["status"] = "completed"
+            self._save_job(job)
+            return job
+
+        base_url = self.collector.openai_base_url
+        with open(self._job_path(job_id) / 'requests.jsonl', 'rb') as f:
+            upload = requests.post(
+                f"{base_url}/files",
+                headers=self._auth_headers,
+                files={"file": ("requests.jsonl", f, "application/jsonl")},
+                data={"purpose": "batch"},
+                timeout=300
+            )
+        upload.raise_for_status()
+        input_file_id = upload.json()["id"]
+
+        response = requests.post(
+            f"{base_url}/batches",
+            headers=self._auth_headers,
+            json={
+                "input_file_id": input_file_id,
+                "endpoint": "/v1/chat/completions",
+                "completion_window": "24h",
+                "metadata": {"job_id": job_id},
+            },
+            timeout=60
+        )
+        response.raise_for_status()
+        batch = response.json()
+
+        job.update({"batch_id": batch["id"], "input_file_id": input_file_id, "status": batch.get("status", "validating")})
+        self._save_job(job)
+        print(f"Submitted batch {batch['id']} for job {job_id}")
+        return job
+
+    @traced("openai", "batch_status")
+    def refresh(self, job_id: str) -> Dict[str, Any]:
+        """バッチの状態を取得してジョブ情報を更新"""
+        job = self._load_job(job_id)
+        if not job.get("batch_id") or job["status"] in TERMINAL_STATUSES | {"merged"}:
+            return job
+
+        response = requests.get(
+            f"{self.collector.openai_base_url}/batches/{job['batch_id']}",
+            headers=self._auth_headers,
+            timeout=60
+        )
+        response.raise_for_status()
+        batch = response.json()
+
+        job.update({
+            "status": batch.get("status"),
+            "output_file_id": batch.get("output_file_id"),
+            "error_file_id": batch.get("error_file_id"),
+            "request_counts": batch.get("request_counts"),
+        })
+        self._save_job(job)
+        return job
+
+    def wait(self, job_id: str, poll_interval: float = 30, timeout: float = 24 * 60 * 60) -> Dict[str, Any]:
+        """バッチが終了状態になるまでポーリング"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.refresh(job_id)
+            if job["status"] in TERMINAL_STATUSES | {"merged"}:
+                return job
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Batch {job.get('batch_id')} did not finish within {timeout} seconds")
+            print(f"Batch {job.get('batch_id')} status: {job['status']}")
+            time.sleep(poll_interval)
+
+    @traced("openai", "batch_download")
+    def _download_results(self, output_file_id: str) -> Dict[str, Dict[str, Any]]:
+        """バッチの出力ファイルを取得し、custom_idごとの結果に変換"""
+        response = requests.get(
+            f"{self.collector.openai_base_url}/files/{output_file_id}/content",
+            headers=self._auth_headers,
+            timeout=300
+        )
+        response.raise_for_status()
+
+        results = {}
+        for line in response.text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                result = json.loads(line)
+                results[result["custom_id"]] = result
+            except (ValueError, KeyError, TypeError) as e:
+                # 読めない行は結果なしとして扱い、統合時にfailedへ記録する
+                print(f"Skipping malformed batch output line: {e}")
+        return results
+
+    def merge(self, job_id: str) -> Dict[str, Any]:
+        """完了したバッチの結果を企業情報に統合し、企業テーブルへ一括で反映"""
+        job = self.refresh(job_id)
+        if job["status"] == "merged":
+            return job
+        if job["status"] != "completed":
+            raise BatchNotReady(job_id, job['status'])
+
+        with open(self._job_path(job_id) / 'context.json', encoding='utf-8') as f:
+            context = json.load(f)
+
+        results = self._download_results(job["output_file_id"]) if job.get("output_file_id") else {}
+
+        companies = []
+        failed = []
+        for custom_id, entry in context.items():
+            result = results.get(custom_id) or {}
+            response = result.get("response") or {}
+            if response.get("status_code") != 200:
+                failed.append({"ticker": entry["ticker"], "company_name": entry["company_name"], "error": result.get("error")})
+                continue
+            if not entry["ticker"]:
+                # TICKERがない企業はbulk_upsert_companiesで書き込まれないため、失敗として報告する
+                failed.append({"ticker": entry["ticker"], "company_name": entry["company_name"], "error": "TICKERがありません"})
+                continue
+
+            # 1件の応答が壊れていても他の企業の統合は続ける
+            try:
+                body = response["body"]
+                content = body["choices"][0]["message"]["content"]
+                # 同じ企業を同期APIで再収集した場合にキャッシュから返せるよう保存
+                self.collector.llm_cache.set(
+                    make_cache_key(job["model"], AI_SYSTEM_PROMPT, entry["prompt"]),
+                    {"content": content, "usage": body.get("usage") or {}}
+                )
+
+                ai_enhanced_info = self.collector._parse_ai_response(content)
+                company_info = self.collector._merge_company_info(
+                    entry["company_name"], entry["website_url"], entry["country"],
+                    entry["basic_info"], entry["external_info"], ai_enhanced_info,
+                    self.collector._get_financial_info(entry["company_name"], entry["country"])
+                )
+            except Exception as e:
+                print(f"Failed to merge batch result for {entry['company_name']}: {e}")
+                failed.append({"ticker": entry["ticker"], "company_name": entry["company_name"], "error": str(e)})
+                continue
+            company_info["ticker"] = entry["ticker"]
+            companies.append(company_info)
+
+        merged = self.collector.snowflake_service.bulk_upsert_companies(companies)
+
+        job.update({
+            "status": "merged",
+            "merged_counts": merged,
+            "failed": failed,
+            "merged_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+        self._save_job(job)
+        print(f"Merged batch job {job_id}: {len(companies)} companies, {len(failed)} failed")
+        return job
+
+    def get_job(self, job_id: str) -> Dict[str, Any]:
+        """ジョブ情報を取得"""
+        return self._load_job(job_id)
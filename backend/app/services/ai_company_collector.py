@@ -5,25 +5,46 @@ AIを使った企業情報自動収集サービス
 
 import os
 import json
+import asyncio
+import aiohttp
 import requests
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple
 from bs4 import BeautifulSoup
 import re
 from pathlib import Path
 from dotenv import load_dotenv
 from app.services.snowflake_service import SnowflakeService
+from app.services.llm_cache import get_llm_cache, make_cache_key
+from app.services.instrumentation import traced
+from app.services.website_content_extractor import find_relevant_links, build_website_content, truncate_to_tokens
 
 # .envファイルを読み込み
 env_path = Path(__file__).parent.parent.parent.parent / '.env'
 load_dotenv(env_path)
 
+STARTUP_DB_BASE_URL = "https://startup-db.com"
+
+AI_SYSTEM_PROMPT = "あなたは企業情報分析の専門家です。与えられた情報から企業の詳細情報を分析し、不足している情報を推定してください。必ず指定されたJSON形式で回答してください。"
+
 class AICompanyCollector:
     def __init__(self):
         self.snowflake_service = SnowflakeService()
+        # 非同期収集用のHTTPセッション（initialize()で作成し、全リクエストで共有）
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        }
         # OpenAI APIキー（環境変数から取得）
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.openai_model = os.getenv("OPENAI_MODEL", "gpt-4")  # デフォルトはgpt-4
-        self.openai_base_url = "https://api.openai.com/v1"
+        self.openai_base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+        # 同一プロンプトの結果を再利用するレスポンスキャッシュ（プロセス内で共有）
+        self.llm_cache = get_llm_cache()
+        # プロンプトに含めるウェブサイト本文のトークン予算と取得する関連ページ数
+        self.website_token_budget = int(os.getenv("AI_WEBSITE_TOKEN_BUDGET", 1500))
+        self.field_token_limit = 300
+        self.max_subpages = 3
         
         if not self.openai_api_key:
             print("Warning: OPENAI_API_KEY not found in environment variables")
@@ -56,28 +77,111 @@ class AICompanyCollector:
             # 4. 財務情報を取得（可能な場合）
             financial_info = self._get_financial_info(company_name, country)
             
-            # 5. 情報を統合（AIで収集した企業名を優先、なければ入力された企業名を使用）
-            # AIで収集した企業名がある場合はそれを使用
-            final_company_name = ai_enhanced_info.get('company_name', company_name)
-            if not final_company_name or final_company_name.strip() == '':
-                final_company_name = company_name
-            
-            combined_info = {
-                **basic_info,
-                **external_info,
-                **ai_enhanced_info,
-                **financial_info,
-                "company_name": final_company_name,  # AIで収集した企業名を優先
-                "country": country,
-                "market": country,  # デフォルトで国と同じ
-                "website": website_url
-            }
+            # 5. 情報を統合
+            return self._merge_company_info(
+                company_name, website_url, country,
+                basic_info, external_info, ai_enhanced_info, financial_info
+            )
+            
+        except Exception as e:
+            print(f"Error collecting company info: {str(e)}")
+            raise
+
+    def _merge_company_info(
+        self,
+        company_name: str,
+        website_url: str,
+        country: str,
+        basic_info: Dict[str, Any],
+        external_info: Dict[str, Any],
+        ai_enhanced_info: Dict[str, Any],
+        financial_info: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """収集した情報を統合（AIで収集した企業名を優先、なければ入力された企業名を使用）"""
+        # プロンプト用の本文抜粋は保存対象に含めない
+        basic_info = {k: v for k, v in basic_info.items() if k != "website_content"}
+        
+        final_company_name = ai_enhanced_info.get('company_name', company_name)
+        if not final_company_name or final_company_name.strip() == '':
+            final_company_name = company_name
+        
+        return {
+            **basic_info,
+            **external_info,
+            **ai_enhanced_info,
+            **financial_info,
+            "company_name": final_company_name,  # AIで収集した企業名を優先
+            "country": country,
+            "market": country,  # デフォルトで国と同じ
+            "website": website_url
+        }
+
+    async def initialize(self):
+        """非同期収集用HTTPセッションの初期化"""
+        if not self.session:
+            self.session = aiohttp.ClientSession(headers=self.headers)
+
+    async def close(self):
+        """セッションのクローズ"""
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def _fetch_async(self, url: str, timeout: int, params: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        """共有セッションでURLを取得し、(ステータスコード, 本文)を返す"""
+        await self.initialize()
+        async with self.session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            return response.status, await response.read()
+
+    async def collect_company_info_async(self, company_name: str, website_url: str, country: str = "JP") -> Dict[str, Any]:
+        """
+        collect_company_infoの非同期版
+        
+        外部データベースの検索とウェブサイトのスクレイピングは互いに独立しているため
+        共有セッション上で並行して実行し、両方の結果が揃ってからAI分析を行う。
+        """
+        try:
+            # 1, 2. 外部データベースとウェブサイトを並行して取得
+            external_info, basic_info = await asyncio.gather(
+                self._fetch_external_company_info_async(company_name, country),
+                self._scrape_website_info_async(website_url),
+            )
+            
+            # 3. AIを使って企業情報を分析・補完（同期HTTPクライアントのためスレッドで実行）
+            combined_basic = {**basic_info, **external_info}
+            ai_enhanced_info = await asyncio.to_thread(
+                self._enhance_with_ai, company_name, website_url, combined_basic
+            )
+            
+            # 4. 財務情報を取得（可能な場合）
+            financial_info = self._get_financial_info(company_name, country)
             
-            return combined_info
+            # 5. 情報を統合
+            return self._merge_company_info(
+                company_name, website_url, country,
+                basic_info, external_info, ai_enhanced_info, financial_info
+            )
             
         except Exception as e:
             print(f"Error collecting company info: {str(e)}")
             raise
+
+    async def _fetch_external_company_info_async(self, company_name: str, country: str = "JP") -> Dict[str, Any]:
+        """_fetch_external_company_infoの非同期版"""
+        external_info = {}
+        
+        try:
+            if self._is_likely_startup(company_name, country):
+                startup_db_info = await self._fetch_from_startup_db_async(company_name)
+                if startup_db_info:
+                    external_info.update(startup_db_info)
+                    print(f"STARTUP DBから情報を取得: {company_name}")
+            else:
+                print(f"Skipping STARTUP DB search for: {company_name} (likely not a startup)")
+        except Exception as e:
+            print(f"Error fetching external info: {str(e)}")
+        
+        return external_info
     
     def _fetch_external_company_info(self, company_name: str, country: str = "JP") -> Dict[str, Any]:
         """外部データベースから企業情報を取得"""
@@ -146,14 +250,10 @@ class AICompanyCollector:
             print(f"Searching STARTUP DB for: {company_name}")
             
             # STARTUP DBの検索URL
-            search_url = f"https://startup-db.com/search?q={company_name}"
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
+            search_url = f"{STARTUP_DB_BASE_URL}/search?q={company_name}"
             
             # 検索ページを取得
-            response = requests.get(search_url, headers=headers, timeout=15)
+            response = requests.get(search_url, headers=self.headers, timeout=15)
             
             # 404エラーの場合は企業が見つからない（スタートアップでない）
             if response.status_code == 404:
@@ -162,130 +262,213 @@ class AICompanyCollector:
             
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
             # 検索結果から企業ページのリンクを探す
-            company_links = soup.find_all('a', href=True)
-            company_url = None
-            
-            for link in company_links:
-                href = link.get('href', '')
-                if '/companies/' in href and company_name.lower() in link.get_text().lower():
-                    company_url = f"https://startup-db.com{href}"
-                    print(f"Found company URL: {company_url}")
-                    break
-            
+            company_url = self._find_startup_db_company_url(response.content, company_name)
             if not company_url:
                 print(f"No company URL found for: {company_name}")
                 return {}
             
             # 企業詳細ページを取得
-            company_response = requests.get(company_url, headers=headers, timeout=15)
+            company_response = requests.get(company_url, headers=self.headers, timeout=15)
             company_response.raise_for_status()
             
-            company_soup = BeautifulSoup(company_response.content, 'html.parser')
-            
-            # 企業情報を抽出
-            info = {}
-            
-            # 従業員数
-            employees_text = company_soup.find(text=lambda text: text and '従業員数' in text)
-            if employees_text:
-                import re
-                employees_match = re.search(r'(\d+)', employees_text)
-                if employees_match:
-                    info['employees'] = int(employees_match.group(1))
-                    print(f"Found employees: {info['employees']}")
-            
-            # 設立日
-            founded_text = company_soup.find(text=lambda text: text and '設立日' in text)
-            if founded_text:
-                import re
-                founded_match = re.search(r'(\d{4})', founded_text)
-                if founded_match:
-                    info['founded_year'] = int(founded_match.group(1))
-                    print(f"Found founded year: {info['founded_year']}")
-            
-            # 代表者情報
-            ceo_elements = company_soup.find_all(text=lambda text: text and ('代表' in text or 'CEO' in text or '社長' in text))
-            if ceo_elements:
-                for element in ceo_elements:
-                    import re
-                    ceo_match = re.search(r'([^\s]+)', element)
-                    if ceo_match:
-                        info['ceo'] = ceo_match.group(1)
-                        print(f"Found CEO: {info['ceo']}")
-                        break
-            
-            # 事業内容
-            business_desc_elements = company_soup.find_all('p')
-            for element in business_desc_elements:
-                text = element.get_text().strip()
-                if len(text) > 50 and ('サービス' in text or '事業' in text or 'ビジネス' in text):
-                    info['business_description'] = text[:500]
-                    print(f"Found business description: {info['business_description'][:100]}...")
-                    break
+            return self._parse_startup_db_company(company_response.content)
+            
+        except Exception as e:
+            print(f"Error fetching from STARTUP DB: {str(e)}")
+            return {}
+
+    async def _fetch_from_startup_db_async(self, company_name: str) -> Dict[str, Any]:
+        """_fetch_from_startup_dbの非同期版"""
+        try:
+            print(f"Searching STARTUP DB for: {company_name}")
             
-            # 企業タイプ（スタートアップDBなのでSTARTUP）
-            info['company_type'] = 'STARTUP'
+            status, content = await self._fetch_async(
+                f"{STARTUP_DB_BASE_URL}/search", timeout=15, params={"q": company_name}
+            )
             
-            print(f"Total info extracted from STARTUP DB: {len(info)} fields")
-            return info
+            # 404エラーの場合は企業が見つからない（スタートアップでない）
+            if status == 404:
+                print(f"Company not found in STARTUP DB: {company_name} (likely not a startup)")
+                return {}
+            if status >= 400:
+                raise Exception(f"STARTUP DB search returned HTTP {status}")
+            
+            company_url = self._find_startup_db_company_url(content, company_name)
+            if not company_url:
+                print(f"No company URL found for: {company_name}")
+                return {}
+            
+            status, content = await self._fetch_async(company_url, timeout=15)
+            if status >= 400:
+                raise Exception(f"STARTUP DB company page returned HTTP {status}")
+            
+            return self._parse_startup_db_company(content)
             
         except Exception as e:
             print(f"Error fetching from STARTUP DB: {str(e)}")
             return {}
 
+    def _find_startup_db_company_url(self, content: bytes, company_name: str) -> Optional[str]:
+        """STARTUP DBの検索結果ページから企業ページのURLを探す"""
+        soup = BeautifulSoup(content, 'html.parser')
+        
+        for link in soup.find_all('a', href=True):
+            href = link.get('href', '')
+            if '/companies/' in href and company_name.lower() in link.get_text().lower():
+                company_url = f"{STARTUP_DB_BASE_URL}{href}"
+                print(f"Found company URL: {company_url}")
+                return company_url
+        
+        return None
+
+    def _parse_startup_db_company(self, content: bytes) -> Dict[str, Any]:
+        """STARTUP DBの企業詳細ページから企業情報を抽出"""
+        company_soup = BeautifulSoup(content, 'html.parser')
+        info = {}
+        
+        # 従業員数
+        employees_text = company_soup.find(text=lambda text: text and '従業員数' in text)
+        if employees_text:
+            employees_match = re.search(r'(\d+)', employees_text)
+            if employees_match:
+                info['employees'] = int(employees_match.group(1))
+                print(f"Found employees: {info['employees']}")
+        
+        # 設立日
+        founded_text = company_soup.find(text=lambda text: text and '設立日' in text)
+        if founded_text:
+            founded_match = re.search(r'(\d{4})', founded_text)
+            if founded_match:
+                info['founded_year'] = int(founded_match.group(1))
+                print(f"Found founded year: {info['founded_year']}")
+        
+        # 代表者情報
+        ceo_elements = company_soup.find_all(text=lambda text: text and ('代表' in text or 'CEO' in text or '社長' in text))
+        if ceo_elements:
+            for element in ceo_elements:
+                ceo_match = re.search(r'([^\s]+)', element)
+                if ceo_match:
+                    info['ceo'] = ceo_match.group(1)
+                    print(f"Found CEO: {info['ceo']}")
+                    break
+        
+        # 事業内容
+        business_desc_elements = company_soup.find_all('p')
+        for element in business_desc_elements:
+            text = element.get_text().strip()
+            if len(text) > 50 and ('サービス' in text or '事業' in text or 'ビジネス' in text):
+                info['business_description'] = text[:500]
+                print(f"Found business description: {info['business_description'][:100]}...")
+                break
+        
+        # 企業タイプ（スタートアップDBなのでSTARTUP）
+        info['company_type'] = 'STARTUP'
+        
+        print(f"Total info extracted from STARTUP DB: {len(info)} fields")
+        return info
+
     def _scrape_website_info(self, url: str) -> Dict[str, Any]:
-        """ウェブサイトから基本情報をスクレイピング"""
+        """ウェブサイトから基本情報と関連ページの本文をスクレイピング"""
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=10)
+            response = requests.get(url, headers=self.headers, timeout=10)
             response.raise_for_status()
             
             soup = BeautifulSoup(response.content, 'html.parser')
+            info = self._parse_website_info(soup, url)
             
-            # 基本情報を抽出
-            info = {
-                "company_name": "",
-                "business_description": "",
-                "description": "",
-                "employees": None,
-                "website": url
-            }
+            # 会社概要・IRなどの関連ページを並行して取得
+            links = find_relevant_links(soup, url, max_links=self.max_subpages)
+            subpages = []
+            if links:
+                def _fetch(link: str) -> Tuple[str, Optional[bytes]]:
+                    try:
+                        sub_response = requests.get(link, headers=self.headers, timeout=10)
+                        sub_response.raise_for_status()
+                        return link, sub_response.content
+                    except Exception as e:
+                        print(f"Error fetching subpage {link}: {str(e)}")
+                        return link, None
+                
+                with ThreadPoolExecutor(max_workers=len(links)) as executor:
+                    subpages = list(executor.map(_fetch, links))
             
-            # タイトルから企業名を抽出
-            title = soup.find('title')
-            if title:
-                info["company_name"] = title.get_text().strip()
+            info["website_content"] = build_website_content(
+                [(url, response.content)] + subpages, self.website_token_budget
+            )
+            return info
             
-            # メタディスクリプションから事業内容を抽出
-            meta_desc = soup.find('meta', attrs={'name': 'description'})
-            if meta_desc:
-                info["business_description"] = meta_desc.get('content', '').strip()
+        except Exception as e:
+            print(f"Error scraping website: {str(e)}")
+            return self._empty_website_info(url)
+
+    async def _scrape_website_info_async(self, url: str) -> Dict[str, Any]:
+        """_scrape_website_infoの非同期版"""
+        try:
+            status, content = await self._fetch_async(url, timeout=10)
+            if status >= 400:
+                raise Exception(f"HTTP {status} for {url}")
+            
+            soup = BeautifulSoup(content, 'html.parser')
+            info = self._parse_website_info(soup, url)
+            
+            # 会社概要・IRなどの関連ページを並行して取得
+            links = find_relevant_links(soup, url, max_links=self.max_subpages)
+            
+            async def _fetch(link: str) -> Tuple[str, Optional[bytes]]:
+                try:
+                    sub_status, sub_content = await self._fetch_async(link, timeout=10)
+                    return link, sub_content if sub_status < 400 else None
+                except Exception as e:
+                    print(f"Error fetching subpage {link}: {str(e)}")
+                    return link, None
             
-            # 本文から企業説明を抽出
-            main_content = soup.find('main') or soup.find('body')
-            if main_content:
-                # 最初の段落を企業説明として使用
-                paragraphs = main_content.find_all('p')
-                if paragraphs:
-                    info["description"] = paragraphs[0].get_text().strip()[:500]  # 500文字まで
+            subpages = await asyncio.gather(*[_fetch(link) for link in links])
             
+            info["website_content"] = build_website_content(
+                [(url, content)] + list(subpages), self.website_token_budget
+            )
             return info
             
         except Exception as e:
             print(f"Error scraping website: {str(e)}")
-            return {
-                "company_name": "",
-                "business_description": "",
-                "description": "",
-                "employees": None,
-                "website": url
-            }
+            return self._empty_website_info(url)
+
+    def _empty_website_info(self, url: str) -> Dict[str, Any]:
+        """スクレイピング失敗時の基本情報"""
+        return {
+            "company_name": "",
+            "business_description": "",
+            "description": "",
+            "employees": None,
+            "website": url,
+            "website_content": ""
+        }
+
+    def _parse_website_info(self, soup: BeautifulSoup, url: str) -> Dict[str, Any]:
+        """ウェブサイトのHTMLから基本情報を抽出"""
+        # 基本情報を抽出
+        info = self._empty_website_info(url)
+        
+        # タイトルから企業名を抽出
+        title = soup.find('title')
+        if title:
+            info["company_name"] = title.get_text().strip()
+        
+        # メタディスクリプションから事業内容を抽出
+        meta_desc = soup.find('meta', attrs={'name': 'description'})
+        if meta_desc:
+            info["business_description"] = meta_desc.get('content', '').strip()
+        
+        # 本文から企業説明を抽出
+        main_content = soup.find('main') or soup.find('body')
+        if main_content:
+            # 最初の段落を企業説明として使用
+            paragraphs = main_content.find_all('p')
+            if paragraphs:
+                info["description"] = paragraphs[0].get_text().strip()[:500]  # 500文字まで
+        
+        return info
     
     def _enhance_with_ai(self, company_name: str, website_url: str, basic_info: Dict[str, Any]) -> Dict[str, Any]:
         """AIを使って企業情報を分析・補完"""
@@ -298,172 +481,221 @@ class AICompanyCollector:
         
         try:
             # AIに送信するプロンプトを作成
-            prompt = f"""
-            以下の企業情報を分析し、不足している情報を補完してください。
-            
-            企業名: {company_name}
-            ウェブサイト: {website_url}
-            基本情報: {json.dumps(basic_info, ensure_ascii=False)}
-            
-            外部データベース（STARTUP DBなど）から取得した情報も含まれている可能性があります。
-            これらの情報を活用して、より正確な分析を行ってください。
-            
-            【重要】事業内容の分析について：
-            - ウェブサイトの情報を正確に読み取り、実際の事業内容を特定してください
-            - 企業のミッションやビジョンではなく、具体的な事業・サービス内容を記載してください
-            - 推測や一般的な説明ではなく、その企業固有の事業内容を記載してください
-            - 複数の事業がある場合は、主要な事業を具体的に列挙してください
-            
-            以下の形式でJSONを返してください：
-            {{
-                "company_name": "正確な企業名（正式名称）",
-                "sector": "業種（例：テクノロジー、金融、製造業、ヘルスケア、教育、小売など）",
-                "industry": "業界（例：ソフトウェア、銀行、自動車、医療機器、EdTech、ECなど）",
-                "business_description": "具体的な事業内容（実際のサービス・製品を具体的に記載、100-200文字程度）",
-                "description": "企業の詳細説明（事業内容を中心に、200-300文字程度）",
-                "estimated_employees": "推定従業員数（数値のみ、既に取得済みの場合はその値を使用）",
-                "estimated_market_cap": "推定時価総額（数値のみ、単位は円）",
-                "estimated_revenue": "推定売上高（数値のみ、単位は円）",
-                "estimated_operating_profit": "推定営業利益（数値のみ、単位は円）",
-                "estimated_net_profit": "推定純利益（数値のみ、単位は円）",
-                "estimated_total_assets": "推定総資産（数値のみ、単位は円）",
-                "estimated_equity": "推定純資産（数値のみ、単位は円）",
-                "company_type": "企業タイプ（LISTED: 上場企業、STARTUP: スタートアップ、PRIVATE: 非上場企業）",
-                "ceo": "代表者名（CEO/代表取締役、既に取得済みの場合はその値を使用）",
-                "founded_year": "設立年（数値のみ）",
-                "funding_series": "資金調達シリーズ（シード、シリーズA、B、C、D、E、IPOなど）",
-                "total_funding": "総資金調達額（数値のみ、単位は円）",
-                "latest_funding": "最新資金調達額（数値のみ、単位は円）",
-                "investors": "主要投資家（配列形式）",
-                "business_model": "ビジネスモデル（B2B、B2C、B2B2C、SaaS、マーケットプレイスなど）",
-                "target_market": "ターゲット市場（企業規模、業界、地域など）",
-                "competitive_advantage": "競合優位性（技術、ブランド、ネットワーク効果など）",
-                "growth_stage": "成長段階（アイデア、プロトタイプ、製品市場適合、スケール、成熟など）"
-            }}
-            
-            企業タイプの判別基準：
-            - LISTED: 証券取引所に上場している企業、大企業、時価総額が大きい企業、従業員数1000名以上、設立から10年以上
-            - STARTUP: ベンチャー企業、新興企業、革新的なビジネスモデル、急成長中、従業員数1000名未満、設立から10年未満
-            - PRIVATE: 非上場の大企業、家族企業、中堅企業、従業員数1000名以上、設立から10年以上
-            
-            資金調達シリーズの判別基準：
-            - シード: 初期段階、資金調達額数百万円〜数千万円、従業員数10名未満
-            - シリーズA: 製品開発・市場検証段階、資金調達額数千万円〜数億円、従業員数10-50名
-            - シリーズB: 事業拡大段階、資金調達額数億円〜数十億円、従業員数50-200名
-            - シリーズC: スケール段階、資金調達額数十億円〜数百億円、従業員数200-1000名
-            - シリーズD以降: 成熟段階、資金調達額数百億円以上、従業員数1000名以上
-            
-            既に取得済みの情報（従業員数、代表者名など）がある場合は、その値を優先してください。
-            推定値が不明な場合はnullを設定してください。
-            """
-            
-            # OpenAI APIを呼び出し
-            headers = {
-                "Authorization": f"Bearer {self.openai_api_key}",
-                "Content-Type": "application/json"
-            }
+            prompt = self._build_enhancement_prompt(company_name, website_url, basic_info)
             
-            data = {
-                "model": self.openai_model,
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "あなたは企業情報分析の専門家です。与えられた情報から企業の詳細情報を分析し、不足している情報を推定してください。必ず指定されたJSON形式で回答してください。"
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            }
+            # OpenAI APIを呼び出し（同一プロンプトはキャッシュから返す）
+            completion = self._chat_completion(AI_SYSTEM_PROMPT, prompt)
+            if completion is None:
+                return {}
+            
+            ai_response = completion['content']
+            print(f"AI Response received: {ai_response[:200]}...")  # 最初の200文字を表示
             
-            # モデルに応じてパラメータを調整
-            if "gpt-5-mini" in self.openai_model:
-                # GPT-5-mini用の設定（最小限のパラメータ）
-                data["max_completion_tokens"] = 2000
-            elif "gpt-5" in self.openai_model:
-                # その他のGPT-5モデル用
-                data["max_completion_tokens"] = 2000
-                data["temperature"] = 0.1
+            return self._parse_ai_response(ai_response)
+                
+        except Exception as e:
+            print(f"Error in AI enhancement: {str(e)}")
+            return {}
+
+    def _build_enhancement_prompt(self, company_name: str, website_url: str, basic_info: Dict[str, Any]) -> str:
+        """企業情報の分析・補完を依頼するプロンプトを作成"""
+        prompt = f"""
+        以下の企業情報を分析し、不足している情報を補完してください。
+        
+        企業名: {company_name}
+        ウェブサイト: {website_url}
+        基本情報: {json.dumps(self._compact_basic_info(basic_info), ensure_ascii=False)}
+        
+        ウェブサイト抜粋:
+        {basic_info.get("website_content") or "（取得できませんでした）"}
+        
+        外部データベース（STARTUP DBなど）から取得した情報も含まれている可能性があります。
+        これらの情報を活用して、より正確な分析を行ってください。
+        
+        【重要】事業内容の分析について：
+        - ウェブサイトの情報を正確に読み取り、実際の事業内容を特定してください
+        - 企業のミッションやビジョンではなく、具体的な事業・サービス内容を記載してください
+        - 推測や一般的な説明ではなく、その企業固有の事業内容を記載してください
+        - 複数の事業がある場合は、主要な事業を具体的に列挙してください
+        
+        以下の形式でJSONを返してください：
+        {{
+            "company_name": "正確な企業名（正式名称）",
+            "sector": "業種（例：テクノロジー、金融、製造業、ヘルスケア、教育、小売など）",
+            "industry": "業界（例：ソフトウェア、銀行、自動車、医療機器、EdTech、ECなど）",
+            "business_description": "具体的な事業内容（実際のサービス・製品を具体的に記載、100-200文字程度）",
+            "description": "企業の詳細説明（事業内容を中心に、200-300文字程度）",
+            "estimated_employees": "推定従業員数（数値のみ、既に取得済みの場合はその値を使用）",
+            "estimated_market_cap": "推定時価総額（数値のみ、単位は円）",
+            "estimated_revenue": "推定売上高（数値のみ、単位は円）",
+            "estimated_operating_profit": "推定営業利益（数値のみ、単位は円）",
+            "estimated_net_profit": "推定純利益（数値のみ、単位は円）",
+            "estimated_total_assets": "推定総資産（数値のみ、単位は円）",
+            "estimated_equity": "推定純資産（数値のみ、単位は円）",
+            "company_type": "企業タイプ（LISTED: 上場企業、STARTUP: スタートアップ、PRIVATE: 非上場企業）",
+            "ceo": "代表者名（CEO/代表取締役、既に取得済みの場合はその値を使用）",
+            "founded_year": "設立年（数値のみ）",
+            "funding_series": "資金調達シリーズ（シード、シリーズA、B、C、D、E、IPOなど）",
+            "total_funding": "総資金調達額（数値のみ、単位は円）",
+            "latest_funding": "最新資金調達額（数値のみ、単位は円）",
+            "investors": "主要投資家（配列形式）",
+            "business_model": "ビジネスモデル（B2B、B2C、B2B2C、SaaS、マーケットプレイスなど）",
+            "target_market": "ターゲット市場（企業規模、業界、地域など）",
+            "competitive_advantage": "競合優位性（技術、ブランド、ネットワーク効果など）",
+            "growth_stage": "成長段階（アイデア、プロトタイプ、製品市場適合、スケール、成熟など）"
+        }}
+        
+        企業タイプの判別基準：
+        - LISTED: 証券取引所に上場している企業、大企業、時価総額が大きい企業、従業員数1000名以上、設立から10年以上
+        - STARTUP: ベンチャー企業、新興企業、革新的なビジネスモデル、急成長中、従業員数1000名未満、設立から10年未満
+        - PRIVATE: 非上場の大企業、家族企業、中堅企業、従業員数1000名以上、設立から10年以上
+        
+        資金調達シリーズの判別基準：
+        - シード: 初期段階、資金調達額数百万円〜数千万円、従業員数10名未満
+        - シリーズA: 製品開発・市場検証段階、資金調達額数千万円〜数億円、従業員数10-50名
+        - シリーズB: 事業拡大段階、資金調達額数億円〜数十億円、従業員数50-200名
+        - シリーズC: スケール段階、資金調達額数十億円〜数百億円、従業員数200-1000名
+        - シリーズD以降: 成熟段階、資金調達額数百億円以上、従業員数1000名以上
+        
+        既に取得済みの情報（従業員数、代表者名など）がある場合は、その値を優先してください。
+        推定値が不明な場合はnullを設定してください。
+        """
+        return prompt
+
+    def _parse_ai_response(self, ai_response: str) -> Dict[str, Any]:
+        """AIの応答からJSONを抽出し、数値フィールドを変換"""
+        try:
+            # JSONブロックを抽出（```json ... ```の形式の場合）
+            if '```json' in ai_response:
+                json_start = ai_response.find('```json') + 7
+                json_end = ai_response.find('```', json_start)
+                if json_end != -1:
+                    ai_response = ai_response[json_start:json_end].strip()
+            
+            # 通常のJSON解析
+            ai_data = json.loads(ai_response)
+            print(f"Successfully parsed AI response with {len(ai_data)} fields")
+            
+            # 企業名の処理
+            if 'company_name' in ai_data and ai_data['company_name']:
+                print(f"AI collected company name: {ai_data['company_name']}")
             else:
-                # その他のモデル用（GPT-4、GPT-3.5など）
-                data["max_tokens"] = 2000
-                data["temperature"] = 0.1
-            
-            print(f"Sending request to OpenAI API with model: {self.openai_model}")
-            response = requests.post(
-                f"{self.openai_base_url}/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=120  # タイムアウトをさらに延長
-            )
+                print("No company name collected by AI")
             
-            print(f"OpenAI API response status: {response.status_code}")
-            print(f"OpenAI API response headers: {dict(response.headers)}")
+            # 数値フィールドの型変換
+            numeric_fields = [
+                'estimated_employees', 'estimated_market_cap', 'estimated_revenue',
+                'estimated_operating_profit', 'estimated_net_profit', 'estimated_total_assets', 'estimated_equity',
+                'founded_year', 'total_funding', 'latest_funding'
+            ]
             
-            if response.status_code == 200:
-                try:
-                    result = response.json()
-                    ai_response = result['choices'][0]['message']['content']
-                    print(f"AI Response received: {ai_response[:200]}...")  # 最初の200文字を表示
-                    
-                    # JSONレスポンスを解析
+            for field in numeric_fields:
+                if field in ai_data and ai_data[field] is not None:
                     try:
-                        # JSONブロックを抽出（```json ... ```の形式の場合）
-                        if '```json' in ai_response:
-                            json_start = ai_response.find('```json') + 7
-                            json_end = ai_response.find('```', json_start)
-                            if json_end != -1:
-                                ai_response = ai_response[json_start:json_end].strip()
-                        
-                        # 通常のJSON解析
-                        ai_data = json.loads(ai_response)
-                        print(f"Successfully parsed AI response with {len(ai_data)} fields")
-                        
-                        # 企業名の処理
-                        if 'company_name' in ai_data and ai_data['company_name']:
-                            print(f"AI collected company name: {ai_data['company_name']}")
-                        else:
-                            print("No company name collected by AI")
-                        
-                        # 数値フィールドの型変換
-                        numeric_fields = [
-                            'estimated_employees', 'estimated_market_cap', 'estimated_revenue',
-                            'estimated_operating_profit', 'estimated_net_profit', 'estimated_total_assets', 'estimated_equity',
-                            'founded_year', 'total_funding', 'latest_funding'
-                        ]
-                        
-                        for field in numeric_fields:
-                            if field in ai_data and ai_data[field] is not None:
-                                try:
-                                    if isinstance(ai_data[field], str):
-                                        # 文字列から数値に変換
-                                        ai_data[field] = int(ai_data[field])
-                                except (ValueError, TypeError):
-                                    ai_data[field] = None
-                        
-                        return ai_data
-                        
-                    except json.JSONDecodeError as e:
-                        print(f"Failed to parse AI response: {ai_response}")
-                        print(f"JSON decode error: {str(e)}")
-                        return {}
-                    except Exception as e:
-                        print(f"Error processing AI response: {str(e)}")
-                        return {}
-                        
-                except Exception as json_error:
-                    print(f"Error parsing OpenAI response JSON: {str(json_error)}")
-                    print(f"Raw response text: {response.text[:500]}...")
-                    return {}
-            else:
-                print(f"OpenAI API error: {response.status_code}")
-                print(f"Response text: {response.text[:500]}...")
-                return {}
-                
+                        if isinstance(ai_data[field], str):
+                            # 文字列から数値に変換
+                            ai_data[field] = int(ai_data[field])
+                    except (ValueError, TypeError):
+                        ai_data[field] = None
+            
+            return ai_data
+            
+        except json.JSONDecodeError as e:
+            print(f"Failed to parse AI response: {ai_response}")
+            print(f"JSON decode error: {str(e)}")
+            return {}
         except Exception as e:
-            print(f"Error in AI enhancement: {str(e)}")
+            print(f"Error processing AI response: {str(e)}")
             return {}
+
+    def _compact_basic_info(self, basic_info: Dict[str, Any]) -> Dict[str, Any]:
+        """プロンプト用に基本情報を圧縮（空の値を除き、長い文字列はトークン上限で切り詰め）"""
+        compact = {}
+        for key, value in basic_info.items():
+            if key == "website_content" or value is None or value == "":
+                continue
+            if isinstance(value, str):
+                value = truncate_to_tokens(value, self.field_token_limit)
+            compact[key] = value
+        return compact
+
+    def _chat_completion(self, system_prompt: str, user_prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        チャット補完を実行（レスポンスキャッシュ経由）
+        
+        Returns:
+            {"content": 応答本文, "usage": トークン使用量}。エラー時はNone
+        """
+        key = make_cache_key(self.openai_model, system_prompt, user_prompt)
+        return self.llm_cache.get_or_compute(
+            key, lambda: self._request_chat_completion(system_prompt, user_prompt)
+        )
+
+    def _build_chat_request(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        """チャット補完APIのリクエストボディを作成"""
+        data = {
+            "model": self.openai_model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": system_prompt
+                },
+                {
+                    "role": "user",
+                    "content": user_prompt
+                }
+            ]
+        }
+        
+        # モデルに応じてパラメータを調整
+        if "gpt-5-mini" in self.openai_model:
+            # GPT-5-mini用の設定（最小限のパラメータ）
+            data["max_completion_tokens"] = 2000
+        elif "gpt-5" in self.openai_model:
+            # その他のGPT-5モデル用
+            data["max_completion_tokens"] = 2000
+            data["temperature"] = 0.1
+        else:
+            # その他のモデル用（GPT-4、GPT-3.5など）
+            data["max_tokens"] = 2000
+            data["temperature"] = 0.1
+        
+        return data
+
+    @traced("openai", "chat_completion")
+    def _request_chat_completion(self, system_prompt: str, user_prompt: str) -> Optional[Dict[str, Any]]:
+        """OpenAI APIにチャット補完リクエストを送信"""
+        headers = {
+            "Authorization": f"Bearer {self.openai_api_key}",
+            "Content-Type": "application/json"
+        }
+        data = self._build_chat_request(system_prompt, user_prompt)
+        
+        print(f"Sending request to OpenAI API with model: {self.openai_model}")
+        response = requests.post(
+            f"{self.openai_base_url}/chat/completions",
+            headers=headers,
+            json=data,
+            timeout=120  # タイムアウトをさらに延長
+        )
+        
+        print(f"OpenAI API response status: {response.status_code}")
+        
+        if response.status_code != 200:
+            print(f"OpenAI API error: {response.status_code}")
+            print(f"Response text: {response.text[:500]}...")
+            return None
+        
+        try:
+            result = response.json()
+            return {
+                "content": result['choices'][0]['message']['content'],
+                "usage": result.get('usage') or {}
+            }
+        except Exception as json_error:
+            print(f"Error parsing OpenAI response JSON: {str(json_error)}")
+            print(f"Raw response text: {response.text[:500]}...")
+            return None
     
     def _get_financial_info(self, company_name: str, country: str) -> Dict[str, Any]:
         """財務情報を取得（外部APIを使用）"""
@@ -612,3 +844,61 @@ class AICompanyCollector:
                 "company_info": {},
                 "message": f"エラーが発生しました: {str(e)}"
             }
+
+    async def collect_and_save_with_ticker_async(self, company_name: str, website_url: str, ticker: str, country: str = "JP") -> Dict[str, Any]:
+        """collect_and_save_with_tickerの非同期版（Snowflakeへのアクセスはスレッドで実行）"""
+        try:
+            print(f"Starting collection for {company_name} with ticker {ticker}")
+            
+            company_info = await self.collect_company_info_async(company_name, website_url, country)
+            company_info['ticker'] = ticker
+            
+            success = await asyncio.to_thread(self.save_to_database, company_info)
+            print(f"Save result for {company_name}: {success}")
+            
+            return {
+                "success": success,
+                "company_info": company_info,
+                "message": "企業情報が正常に収集・保存されました" if success else "保存に失敗しました"
+            }
+            
+        except Exception as e:
+            import traceback
+            error_details = traceback.format_exc()
+            print(f"Error in collect_and_save_with_ticker_async: {str(e)}")
+            print(f"Traceback: {error_details}")
+            return {
+                "success": False,
+                "company_info": {},
+                "message": f"エラーが発生しました: {str(e)}"
+            }
+
+    async def collect_and_save_batch(self, companies: List[Dict[str, Any]], max_concurrency: int = 5) -> List[Dict[str, Any]]:
+        """
+        複数企業の情報を並行して収集・保存
+        
+        Args:
+            companies: company_name, website_url, ticker, countryを持つ辞書のリスト
+            max_concurrency: 同時に処理する企業数の上限
+            
+        Returns:
+            入力と同じ順序の処理結果リスト
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def _collect(company: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                result = await self.collect_and_save_with_ticker_async(
+                    company.get('company_name'),
+                    company.get('website_url'),
+                    company.get('ticker', ''),
+                    company.get('country', 'JP')
+                )
+            return {
+                "company_name": company.get('company_name'),
+                "ticker": company.get('ticker', ''),
+                **result
+            }
+        
+        await self.initialize()
+        return await asyncio.gather(*[_collect(company) for company in companies])
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Arrow形式のクエリ結果の操作とJSONへの変換
+
+SnowflakeService.query_arrowが返すpyarrow.Tableを、行ごとの辞書に変換せずに
+結合・並べ替え・切り出しし、列単位でJSONに書き出すための関数群。
+"""
+
+import json
+from typing import Any, List, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from fastapi import Response
+
+
+def lowercase_columns(table: pa.Table) -> pa.Table:
+    """カラム名を小文字に揃える（SnowflakeService.queryの辞書キーと同じ形）"""
+    return table.rename_columns([name.lower() for name in table.column_names])
+
+
+def decimals_to_float(table: pa.Table) -> pa.Table:
+    """NUMBER(p, s)由来のdecimal型のカラムをfloat64に変換"""
+    for index, field in enumerate(table.schema):
+        if pa.types.is_decimal(field.type):
+            table = table.set_column(index, field.name, table.column(index).cast(pa.float64()))
+    return table
+
+
+def _common_type(types: Sequence[pa.DataType]) -> pa.DataType:
+    if all(t == types[0] for t in types):
+        return types[0]
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) or pa.types.is_null(t) for t in types):
+        return pa.float64()
+    concrete = [t for t in types if not pa.types.is_null(t)]
+    if concrete and all(t == concrete[0] for t in concrete):
+        return concrete[0]
+    return pa.string()
+
+
+def concat_tables(tables: List[pa.Table]) -> pa.Table:
+    """
+    同じカラムを持つテーブルを縦に結合
+
+    テーブルごとに数値の型（NUMBERの精度など）が異なる場合はfloat64に、
+    それ以外の型が異なる場合は文字列に揃えてから結合する。
+    """
+    tables = [decimals_to_float(table) for table in tables]
+    if not tables:
+        return pa.table({})
+    names = tables[0].column_names
+    schema = pa.schema([
+        pa.field(name, _common_type([table.schema.field(name).type for table in tables]))
+        for name in names
+    ])
+    return pa.concat_tables([table.select(names).cast(schema) for table in tables])
+
+
+def sort_desc(table: pa.Table, column: str, null_as: Any = 0) -> pa.Table:
+    """カラムの降順に並べ替え（欠損値はnull_asとして扱う）"""
+    if table.num_rows == 0:
+        return table
+    keys = pc.fill_null(table.column(column), null_as) if null_as is not None else table.column(column)
+    indices = pc.sort_indices(pa.table({"key": keys}), sort_keys=[("key", "descending")])
+    return table.take(indices)
+
+
+def unique_values(table: pa.Table, column: str) -> List[Any]:
+    """カラムの重複を除いた値（欠損値と空文字を除く）を昇順で取得"""
+    values = pc.unique(table.column(column).drop_null()).to_pylist()
+    return sorted(value for value in values if value != '')
+
+
+def arrow_to_json(table: pa.Table) -> str:
+    """
+    テーブルを行の配列のJSON文字列に変換
+
+    pandasのto_jsonで列単位に書き出すため、行ごとの辞書を作らない。整数カラムは
+    欠損値があっても整数のまま、NaNと欠損値はnullとして出力する。
+    """
+    df = decimals_to_float(table).to_pandas(types_mapper={
+        pa.int8(): pd.Int64Dtype(),
+        pa.int16(): pd.Int64Dtype(),
+        pa.int32(): pd.Int64Dtype(),
+        pa.int64(): pd.Int64Dtype(),
+    }.get)
+    return df.to_json(orient="records", force_ascii=False, date_format="iso")
+
+
+def arrow_json_response(key: str, table: pa.Table, status_code: int = 200, **fields: Any) -> Response:
+    """
+    テーブルを key の配列として持つJSONレスポンスを作成
+
+    Args:
+        key: 行の配列を入れるキー
+        table: レスポンスに含める行
+        **fields: 配列と並べて返す値（total, page など）
+    """
+    parts = [f"{json.dumps(key)}:{arrow_to_json(table)}"]
+    parts.extend(
+        f"{json.dumps(name)}:{json.dumps(value, ensure_ascii=False, default=str)}"
+        for name, value in fields.items()
+    )
+    return Response(
+        content="{" + ",".join(parts) + "}",
+        status_code=status_code,
+        media_type="application/json",
+    )
+
+
+def to_records(table: Optional[pa.Table]) -> List[dict]:
+    """テーブルを辞書のリストに変換（辞書で扱う既存の処理に渡す場合）"""
+    return table.to_pylist() if table is not None else []
@@ -1,6 +1,7 @@
 from typing import List
 import openai
 from ..company_service import CompanyService
+from ..instrumentation import span
 
 class ChatService:
     def __init__(self):
@@ -14,12 +15,13 @@ class ChatService:
             # Get relevant company data that might be needed for context
             # This can be expanded based on the specific needs
             
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """You are a financial advisor assistant specialized in Japanese and US markets. 
+            with span("openai", "chat_completion"):
+                response = await openai.ChatCompletion.acreate(
+                    model="gpt-3.5-turbo",
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": """You are a financial advisor assistant specialized in Japanese and US markets. 
                         You help users understand company financials, stock indicators, and market analysis. 
                         Focus on providing accurate information about:
                         - Financial statements and metrics
@@ -28,12 +30,12 @@ class ChatService:
                         - Balance sheet analysis
                         - Industry comparisons
                         Always explain financial terms clearly and provide context for your answers."""
-                    },
-                    {"role": "user", "content": message}
-                ],
-                temperature=0.7,
-                max_tokens=500
-            )
+                        },
+                        {"role": "user", "content": message}
+                    ],
+                    temperature=0.7,
+                    max_tokens=500
+                )
             
             return response.choices[0].message.content
         except Exception as e:
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+全企業のデータ収集ジョブ
+
+ワーカーのプールで企業ごとの収集処理を並行に実行し、1社終わるごとに進捗イベントを
+返す。待ち行列の長さを制限して同時に抱える処理を一定数に抑え、収集したデータは
+一定件数ごとにまとめて書き込む。外部サービスへのリクエスト間隔は収集処理側の
+レート制限（HostRateLimiterなど）で制御するため、ここでは固定の待機を行わない。
+"""
+
+import time
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+DEFAULT_WORKERS = 8
+DEFAULT_FLUSH_SIZE = 100
+
+
+class CollectionJob:
+    def __init__(
+        self,
+        collect: Callable[[str], Awaitable[Dict[str, Any]]],
+        workers: int = DEFAULT_WORKERS,
+        max_in_flight: Optional[int] = None,
+        flush: Optional[Callable[[List[Dict[str, Any]]], Awaitable[Any]]] = None,
+        flush_size: int = DEFAULT_FLUSH_SIZE,
+    ):
+        """
+        初期化
+
+        Args:
+            collect: 1社分のデータを収集するコルーチン関数（ticker -> データ）
+            workers: 同時に収集する企業数
+            max_in_flight: 待ち行列と未送信の結果に保持する企業数の上限（デフォルトはworkersの2倍）
+            flush: 収集したデータをまとめて書き込むコルーチン関数
+            flush_size: まとめて書き込む件数
+        """
+        self.collect = collect
+        self.workers = max(1, workers)
+        self.max_in_flight = max_in_flight or self.workers * 2
+        self.flush = flush
+        self.flush_size = max(1, flush_size)
+
+    async def _write(self, buffer: List[Dict[str, Any]], failed: List[Dict[str, Any]]) -> int:
+        """バッファを書き込み、書き込めた件数を返す（失敗した企業はfailedに追加）"""
+        if not buffer or self.flush is None:
+            return len(buffer)
+        try:
+            await self.flush(buffer)
+            return len(buffer)
+        except Exception as e:
+            print(f"Error writing collected data: {str(e)}")
+            failed.extend({'ticker': data.get('ticker'), 'error': str(e)} for data in buffer)
+            return 0
+
+    async def run(self, tickers: List[str]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        収集を実行し、進捗イベントを順に返す
+
+        最初に開始イベント、1社終わるごとに進捗イベント、最後に完了イベントを返す。
+        呼び出し側が途中で読み出しをやめた場合は、実行中のワーカーを取り消す。
+        """
+        total = len(tickers)
+        start = time.perf_counter()
+        jobs: asyncio.Queue = asyncio.Queue(maxsize=self.max_in_flight)
+        results: asyncio.Queue = asyncio.Queue(maxsize=self.max_in_flight)
+
+        worker_count = min(self.workers, max(1, total))
+
+        async def produce():
+            for ticker in tickers:
+                await jobs.put(ticker)
+            for _ in range(worker_count):
+                await jobs.put(None)
+
+        async def work():
+            while True:
+                ticker = await jobs.get()
+                if ticker is None:
+                    return
+                try:
+                    data = await self.collect(ticker)
+                    await results.put((ticker, data, None))
+                except Exception as e:
+                    await results.put((ticker, None, str(e)))
+
+        tasks = [asyncio.create_task(produce())]
+        tasks.extend(asyncio.create_task(work()) for _ in range(worker_count))
+
+        collected = 0
+        updated = 0
+        failed: List[Dict[str, Any]] = []
+        buffer: List[Dict[str, Any]] = []
+        try:
+            yield {'progress': 0, 'current': 0, 'total': total}
+
+            for current in range(1, total + 1):
+                ticker, data, error = await results.get()
+                if error is None:
+                    collected += 1
+                    buffer.append(data)
+                    if len(buffer) >= self.flush_size:
+                        updated += await self._write(buffer, failed)
+                        buffer = []
+                else:
+                    print(f"Error collecting data for {ticker}: {error}")
+                    failed.append({'ticker': ticker, 'error': error})
+
+                event = {
+                    'progress': round(current / total * 100, 1),
+                    'current': current,
+                    'total': total,
+                    'ticker': ticker,
+                    'status': 'ok' if error is None else 'failed',
+                }
+                if error is not None:
+                    event['error'] = error
+                yield event
+
+            updated += await self._write(buffer, failed)
+            buffer = []
+
+            yield {
+                'progress': 100,
+                'total': collected,
+                'updated': updated,
+                'failed': failed,
+                'elapsed_seconds': round(time.perf_counter() - start, 2),
+            }
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -41,17 +41,10 @@ class CompanyDataCollector:
             ORDER BY ticker
             """
             
-            # SnowflakeServiceのqueryメソッドを使用
-            results = self.sf_client.query(query)
-            
-            companies = []
-            for row in results:
-                companies.append({
-                    "company_id": row["TICKER"],
-                    "company_name": row["COMPANY_NAME"]
-                })
-            
-            return companies
+            # 結果はArrowで受け取り、列単位でリネームしてから辞書に変換
+            results = self.sf_client.query_arrow(query)
+            results = results.select(["ticker", "company_name"]).rename_columns(["company_id", "company_name"])
+            return results.to_pylist()
             
         except Exception as e:
             logger.error(f"Error fetching companies from Snowflake: {str(e)}")
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+企業テーブルの業種・産業・国・市場の値と件数のカタログ
+
+JP/US/CNの企業テーブルから (テーブル, ticker) ごとの4項目を1回のクエリで読み込み、
+値ごとの件数をメモリ上に保持する。企業を書き込んだ際は SnowflakeService から
+apply / remove が呼ばれ、その企業の以前の値の件数を減らして新しい値の件数を
+増やすため、一覧の取得でテーブルを走査しない。
+
+Parquetの取り込みなど行単位で追えない書き込みの後と、一定時間（デフォルト6時間、
+他のプロセスからの書き込みを反映するため）が経過した後は、次に参照されたときに
+読み込み直す。
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CATALOGUE_FIELDS = ('sector', 'industry', 'country', 'market')
+DEFAULT_MAX_AGE_SECONDS = 6 * 60 * 60
+
+# (テーブル名, ticker, {項目: 値}) を返す読み込み関数
+CatalogueLoader = Callable[[], Iterable[Tuple[str, str, Dict[str, Optional[str]]]]]
+
+
+def _normalize(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+class CompanyCatalogue:
+    def __init__(self, loader: CatalogueLoader, max_age_seconds: int = DEFAULT_MAX_AGE_SECONDS):
+        """
+        初期化
+
+        Args:
+            loader: 全企業の (テーブル名, ticker, {項目: 値}) を返す関数
+            max_age_seconds: 読み込み直すまでの時間（秒）
+        """
+        self.loader = loader
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.RLock()
+        self._companies: Dict[Tuple[str, str], Dict[str, Optional[str]]] = {}
+        self._counts: Dict[str, Counter] = {field: Counter() for field in CATALOGUE_FIELDS}
+        self._loaded_at: Optional[float] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def _add(self, key: Tuple[str, str], values: Dict[str, Optional[str]]):
+        self._companies[key] = values
+        for field in CATALOGUE_FIELDS:
+            if values.get(field):
+                self._counts[field][values[field]] += 1
+
+    def _discard(self, key: Tuple[str, str]) -> Dict[str, Optional[str]]:
+        values = self._companies.pop(key, None) or {}
+        for field in CATALOGUE_FIELDS:
+            value = values.get(field)
+            if value:
+                self._counts[field][value] -= 1
+                if self._counts[field][value] <= 0:
+                    del self._counts[field][value]
+        return values
+
+    def load(self):
+        """企業テーブルから読み込み直す"""
+        rows = list(self.loader())
+        with self._lock:
+            self._companies = {}
+            self._counts = {field: Counter() for field in CATALOGUE_FIELDS}
+            for table_name, ticker, values in rows:
+                self._add((table_name, str(ticker)), {field: _normalize(values.get(field)) for field in CATALOGUE_FIELDS})
+            self._loaded_at = time.monotonic()
+        logger.info("Loaded company catalogue", extra={"companies": len(rows)})
+
+    def _ensure_loaded(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.max_age_seconds:
+            with self._lock:
+                if self._loaded_at == loaded_at:
+                    self.load()
+
+    def apply(self, table_name: str, ticker: str, values: Dict[str, Optional[str]], replace: bool = True):
+        """
+        企業の書き込みを反映（読み込み前は何もしない）
+
+        Args:
+            values: 書き込んだ値（キーは小文字・大文字どちらでもよい）
+            replace: Trueなら4項目すべてを書き込んだものとして扱い（MERGE）、Falseなら
+                valuesに含まれる項目だけを更新する（UPDATE）
+        """
+        if not ticker:
+            return
+        values = {str(key).lower(): value for key, value in values.items()}
+        with self._lock:
+            if not self.is_loaded:
+                return
+            key = (table_name, str(ticker))
+            previous = self._discard(key)
+            updated = {} if replace else dict(previous)
+            for field in CATALOGUE_FIELDS:
+                if field in values:
+                    updated[field] = _normalize(values[field])
+                elif replace:
+                    updated[field] = None
+            self._add(key, updated)
+
+    def remove(self, table_name: str, ticker: str):
+        """企業の削除を反映"""
+        with self._lock:
+            if self.is_loaded:
+                self._discard((table_name, str(ticker)))
+
+    def mark_stale(self):
+        """次に参照されたときに読み込み直す"""
+        with self._lock:
+            self._loaded_at = None
+
+    def values(self, field: str) -> List[str]:
+        """項目の値の一覧（値の昇順）"""
+        self._ensure_loaded()
+        with self._lock:
+            return sorted(self._counts[field])
+
+    def counts(self, field: str) -> List[Dict[str, object]]:
+        """項目の値と件数の一覧（件数の降順）"""
+        self._ensure_loaded()
+        with self._lock:
+            return [
+                {"value": value, "count": count}
+                for value, count in sorted(self._counts[field].items(), key=lambda item: (-item[1], item[0]))
+            ]
+
+    def snapshot(self) -> Dict[str, List[Dict[str, object]]]:
+        """全項目の値と件数"""
+        return {field: self.counts(field) for field in CATALOGUE_FIELDS}
+
+
+def _load_from_snowflake():
+    from app.services.registry import get_snowflake_service
+    return get_snowflake_service().get_company_catalogue_rows()
+
+
+_catalogue: Optional[CompanyCatalogue] = None
+_catalogue_lock = threading.Lock()
+
+
+def get_company_catalogue() -> CompanyCatalogue:
+    """アプリケーション全体で共有するカタログを取得（企業テーブルは最初に参照されたときに読み込む）"""
+    global _catalogue
+    if _catalogue is None:
+        with _catalogue_lock:
+            if _catalogue is None:
+                _catalogue = CompanyCatalogue(
+                    _load_from_snowflake,
+                    max_age_seconds=int(os.getenv("COMPANY_CATALOGUE_MAX_AGE_SECONDS", DEFAULT_MAX_AGE_SECONDS)),
+                )
+    return _catalogue
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+企業情報CSVのストリーミング取り込み
+
+アップロードされたCSVを一定行数ずつ読み込み、列単位の演算で型変換したうえで、
+バッチごとに一時テーブル経由の一括MERGEで企業テーブルへ反映する。ファイル全体を
+メモリに展開しないため、数百MBのCSVでもメモリ使用量はバッチサイズで決まる。
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from typing import TYPE_CHECKING, Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DEFAULT_BATCH_ROWS = 5000
+MAX_REPORTED_ERRORS = 1000
+
+# 数値として取り込むカラム
+NUMERIC_FIELDS = [
+    'market_cap', 'employees', 'current_price', 'shares_outstanding', 'volume',
+    'per', 'pbr', 'eps', 'bps', 'roe', 'roa', 'revenue',
+    'operating_profit', 'net_profit', 'total_assets', 'equity',
+    'operating_margin', 'net_margin', 'dividend_yield', 'founded_year'
+]
+
+# 数値から除去する記号
+NUMERIC_NOISE_PATTERN = r'[,¥$]'
+
+
+def _coerce_numeric(values: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    数値カラムを変換（小数点を含む値はfloat、それ以外はint）
+
+    Returns:
+        (変換後の値（object型、欠損はNone）, 値があるのに変換できなかった行のマスク)
+    """
+    import pandas as pd
+    cleaned = values.str.replace(NUMERIC_NOISE_PATTERN, '', regex=True).str.strip()
+    present = cleaned.notna() & (cleaned != '')
+    numbers = pd.to_numeric(cleaned.where(present), errors='coerce')
+    numbers = numbers.where(numbers.abs() != math.inf)
+    invalid = present & numbers.isna()
+
+    has_dot = cleaned.str.contains('.', regex=False, na=False)
+    integral = numbers.notna() & ~has_dot & (numbers == numbers.round())
+    result = pd.Series([None] * len(values), index=values.index, dtype=object)
+    result[numbers.notna()] = numbers[numbers.notna()].astype(object)
+    result[integral] = numbers[integral].astype('int64').astype(object)
+    return result, invalid
+
+
+def coerce_batch(df: pd.DataFrame, country: str, row_offset: int = 0) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    CSVの1バッチ分（全カラム文字列）を企業データに変換
+
+    Args:
+        df: 文字列として読み込んだバッチ
+        country: 企業の国コード
+        row_offset: バッチ先頭行のデータ行番号（0始まり）
+
+    Returns:
+        (企業データのリスト, 行ごとのエラーのリスト)
+    """
+    import pandas as pd
+    df = df.copy()
+    df.columns = [str(column).strip() for column in df.columns]
+    row_numbers = pd.Series(range(row_offset + 1, row_offset + len(df) + 1), index=df.index)
+    errors: List[Dict[str, Any]] = []
+
+    text_columns = [column for column in df.columns if column not in NUMERIC_FIELDS]
+    for column in text_columns:
+        stripped = df[column].str.strip()
+        df[column] = stripped.mask(stripped == '')
+
+    # 空の行をスキップ
+    non_empty = df[text_columns].notna().any(axis=1)
+    for column in [column for column in df.columns if column in NUMERIC_FIELDS]:
+        non_empty |= df[column].str.strip().fillna('') != ''
+    df, row_numbers = df[non_empty], row_numbers[non_empty]
+
+    for field in NUMERIC_FIELDS:
+        if field not in df.columns:
+            df[field] = None
+            continue
+        df[field], invalid = _coerce_numeric(df[field])
+        if invalid.any():
+            errors.extend(
+                {"row": int(row_number), "field": field, "message": "数値に変換できないため空欄として取り込みました"}
+                for row_number in row_numbers[invalid]
+            )
+
+    if 'ticker' not in df.columns:
+        df['ticker'] = None
+    missing_ticker = df['ticker'].isna()
+    errors.extend(
+        {"row": int(row_number), "field": "ticker", "message": "tickerが空のため取り込みませんでした"}
+        for row_number in row_numbers[missing_ticker]
+    )
+    df = df[~missing_ticker]
+
+    df['country'] = country
+    df = df.astype(object).where(df.notna(), None)
+
+    return df.to_dict('records'), errors
+
+
+def iter_csv_batches(source: BinaryIO, batch_rows: int = DEFAULT_BATCH_ROWS) -> Iterator[pd.DataFrame]:
+    """CSVをbatch_rows行ずつ文字列のDataFrameとして読み込む"""
+    import pandas as pd
+    reader = pd.read_csv(
+        source,
+        chunksize=batch_rows,
+        dtype=str,
+        keep_default_na=False,
+        na_values=[],
+        encoding='utf-8-sig',
+        skip_blank_lines=True,
+    )
+    with reader:
+        for chunk in reader:
+            yield chunk
+
+
+class CompanyCSVImporter:
+    def __init__(self, snowflake_service, batch_rows: int = DEFAULT_BATCH_ROWS):
+        """
+        初期化
+
+        Args:
+            snowflake_service: bulk_upsert_companiesを持つサービス
+            batch_rows: 1回に読み込み・反映する行数
+        """
+        self.snowflake_service = snowflake_service
+        self.batch_rows = batch_rows
+
+    def run(
+        self,
+        source: BinaryIO,
+        country: str = "JP",
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        CSVを取り込み、結果の集計を返す
+
+        Args:
+            source: CSVのバイナリストリーム
+            country: 企業の国コード
+            on_progress: バッチを反映するたびに進捗情報を受け取るコールバック
+        """
+        start = time.perf_counter()
+        rows_read = 0
+        uploaded = 0
+        error_count = 0
+        errors: List[Dict[str, Any]] = []
+
+        for batch_number, chunk in enumerate(iter_csv_batches(source, self.batch_rows), start=1):
+            companies, batch_errors = coerce_batch(chunk, country, row_offset=rows_read)
+            rows_read += len(chunk)
+
+            if companies:
+                merged = self.snowflake_service.bulk_upsert_companies(companies)
+                uploaded += sum(merged.values())
+
+            error_count += len(batch_errors)
+            errors.extend(batch_errors[:max(0, MAX_REPORTED_ERRORS - len(errors))])
+
+            progress = {
+                "batch": batch_number,
+                "rows_read": rows_read,
+                "uploaded_count": uploaded,
+                "error_count": error_count,
+                "elapsed_seconds": round(time.perf_counter() - start, 2),
+            }
+            print(f"CSV import progress: {progress}")
+            if on_progress:
+                on_progress(progress)
+
+        return {
+            "rows_read": rows_read,
+            "uploaded_count": uploaded,
+            "error_count": error_count,
+            "errors": errors,
+            "country": country,
+            "elapsed_seconds": round(time.perf_counter() - start, 2),
+        }
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+企業テーブルのParquetエクスポート・インポート
+
+エクスポートはSnowflakeから受け取ったArrowのバッチをそのままParquetに書き込み、
+書き込んだ分のバイト列を順に返す（全件をメモリに保持しない）。インポートは
+アップロードされたParquetファイルを検証したうえで一時ファイルに保存し、
+SnowflakeのステージへのPUTとCOPYで取り込む。
+"""
+
+import os
+import shutil
+import tempfile
+from typing import BinaryIO, Dict, Iterable, Iterator, List
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+COPY_BUFFER_SIZE = 8 * 1024 * 1024
+
+
+class _ChunkSink:
+    """ParquetWriterの出力を溜めておき、呼び出し側が少しずつ取り出せるようにする"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_parquet(batches: Iterable[pa.Table], compression: str = "zstd") -> Iterator[bytes]:
+    """
+    ArrowのバッチをParquetとして書き込み、書き込んだバイト列を順に返す
+
+    スキーマは最初のバッチに合わせ、以降のバッチは同じスキーマにキャストする。
+    バッチが1つもない場合も、行もカラムもない有効なParquetファイルを返す。
+    """
+    sink = _ChunkSink()
+    writer = None
+    schema = None
+    try:
+        for batch in batches:
+            table = batch if isinstance(batch, pa.Table) else pa.Table.from_batches([batch])
+            if writer is None:
+                schema = table.schema
+                writer = pq.ParquetWriter(sink, schema, compression=compression)
+            elif table.schema != schema:
+                table = table.cast(schema)
+            writer.write_table(table)
+            data = sink.drain()
+            if data:
+                yield data
+        if writer is None:
+            writer = pq.ParquetWriter(sink, pa.schema([]), compression=compression)
+    finally:
+        if writer is not None:
+            writer.close()
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def save_parquet_upload(source: BinaryIO) -> str:
+    """アップロードされたParquetを一時ファイルに保存し、パスを返す（呼び出し側で削除する）"""
+    fd, path = tempfile.mkstemp(suffix=".parquet")
+    with os.fdopen(fd, "wb") as f:
+        shutil.copyfileobj(source, f, COPY_BUFFER_SIZE)
+    return path
+
+
+def inspect_parquet(path: str) -> Dict:
+    """Parquetファイルのカラム名と行数を取得（不正なファイルの場合は例外）"""
+    metadata = pq.read_metadata(path)
+    return {
+        "columns": list(metadata.schema.to_arrow_schema().names),
+        "num_rows": metadata.num_rows,
+    }
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+企業名・tickerのプロセス内検索インデックス
+
+JP/US/CNの企業テーブルの ticker・企業名・別名（「株式会社」「Inc.」などを除いた名前）を
+正規化し、1文字・2文字のn-gramの転置リストを作る。検索語も同じように正規化して
+n-gramの転置リストの積を取り、候補に対して部分一致を確認するため、Snowflakeの
+LOWER(COMPANY_NAME) LIKE '%q%' のようなテーブル全体の走査を行わない。
+
+正規化:
+- NFKC（全角英数字・半角カナ・㈱などを統一）と小文字化
+- カタカナをひらがなに寄せる（「トヨタ」と「とよた」を同じに扱う）
+- 空白・記号（・ . , - & など）を除く
+
+並び順は 完全一致（ticker → 名前） → 前方一致（ticker → 名前） → 部分一致 → あいまい一致
+（検索語の2-gramの一定割合以上を含む企業）の順で、同じ順位の中は時価総額の降順。
+
+企業を書き込んだ際は SnowflakeService・管理APIから apply / remove が呼ばれる。
+行単位で追えない書き込みの後と、一定時間（デフォルト6時間）が経過した後は、次に
+検索されたときに読み込み直す。スケジューラからも定期的に build で作り直す。
+"""
+
+import os
+import re
+import time
+import heapq
+import logging
+import threading
+import unicodedata
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE_SECONDS = 6 * 60 * 60
+# あいまい一致とみなす、検索語の2-gramのうち含まれている割合の下限
+FUZZY_MIN_SIMILARITY = 0.6
+# tickers_by_table でSQLのIN句に渡すtickerの上限（超える場合はNoneを返し、呼び出し側はLIKEで検索する）
+MAX_TICKER_FILTER = 1000
+# 一致の種類（小さいほど上位）
+MATCH_EXACT_TICKER, MATCH_EXACT_NAME, MATCH_PREFIX_TICKER, MATCH_PREFIX_NAME, MATCH_SUBSTRING, MATCH_FUZZY = range(6)
+MATCH_LABELS = ('exact_ticker', 'exact_name', 'prefix_ticker', 'prefix_name', 'substring', 'fuzzy')
+
+# (テーブル名, ticker, {company_name, country, market, sector, market_cap, ...}) を返す読み込み関数
+SearchIndexLoader = Callable[[], Iterable[Tuple[str, str, Dict[str, object]]]]
+
+# 正規化したキーには含まれない区切り文字
+_KEY_SEPARATOR = '\x00'
+
+_LEGAL_FORMS_JA = re.compile(r'株式会社|有限会社|合同会社|\(株\)|\(有\)|ホールディングス|グループ')
+_LEGAL_FORMS_EN = re.compile(
+    r'\b(inc|incorporated|corp|corporation|co|company|ltd|limited|llc|plc|holdings?|group)\b\.?'
+)
+
+
+def normalize(text) -> str:
+    """検索用に正規化（NFKC・小文字化・カタカナをひらがなに・空白と記号を除く）"""
+    if text is None:
+        return ''
+    chars = []
+    for ch in unicodedata.normalize('NFKC', str(text)).lower():
+        code = ord(ch)
+        if 0x30A1 <= code <= 0x30F6:
+            ch = chr(code - 0x60)
+        category = unicodedata.category(ch)
+        if category[0] in ('L', 'N'):
+            chars.append(ch)
+    return ''.join(chars)
+
+
+def name_aliases(company_name) -> List[str]:
+    """企業名から「株式会社」「Inc.」などの法人格を除いた別名を作る"""
+    if not company_name:
+        return []
+    name = unicodedata.normalize('NFKC', str(company_name)).lower()
+    aliases = []
+    for pattern in (_LEGAL_FORMS_JA, _LEGAL_FORMS_EN):
+        stripped = pattern.sub(' ', name)
+        if stripped != name:
+            aliases.append(stripped)
+            name = stripped
+    return aliases
+
+
+def ticker_aliases(ticker) -> List[str]:
+    """取引所の接尾辞を除いたticker（0700.HK -> 0700）"""
+    ticker = str(ticker or '')
+    if '.' in ticker:
+        base = ticker.split('.', 1)[0]
+        if base:
+            return [base]
+    return []
+
+
+def _grams(key: str) -> Set[str]:
+    """1文字と2文字のn-gram"""
+    grams = set(key)
+    grams.update(key[i:i + 2] for i in range(len(key) - 1))
+    return grams
+
+
+def _query_grams(key: str) -> Set[str]:
+    # 2文字以上の検索語は2-gramだけで候補を絞る（1-gramの転置リストは長い）
+    if len(key) == 1:
+        return {key}
+    return {key[i:i + 2] for i in range(len(key) - 1)}
+
+
+class _Document:
+    __slots__ = ('table_name', 'ticker', 'values', 'country', 'ticker_keys', 'name_keys',
+                 'ticker_text', 'name_text', 'grams', 'market_cap')
+
+    def __init__(self, table_name: str, ticker: str, values: Dict[str, object]):
+        self.table_name = table_name
+        self.ticker = ticker
+        self.values = values
+        self.country = str(values.get('country') or '').upper()
+        self.ticker_keys = tuple(dict.fromkeys(
+            key for key in map(normalize, [ticker] + ticker_aliases(ticker)) if key
+        ))
+        company_name = values.get('company_name')
+        self.name_keys = tuple(dict.fromkeys(
+            key for key in map(normalize, [company_name] + name_aliases(company_name))
+            if key and key not in self.ticker_keys
+        ))
+        # キーを区切り文字でつないだ文字列（完全一致・前方一致・部分一致を文字列の in で判定する）
+        self.ticker_text = _KEY_SEPARATOR + _KEY_SEPARATOR.join(self.ticker_keys) + _KEY_SEPARATOR
+        self.name_text = _KEY_SEPARATOR + _KEY_SEPARATOR.join(self.name_keys) + _KEY_SEPARATOR
+        self.grams: Set[str] = set()
+        for key in self.ticker_keys + self.name_keys:
+            self.grams |= _grams(key)
+        try:
+            self.market_cap = float(values.get('market_cap') or 0)
+        except (TypeError, ValueError):
+            self.market_cap = 0.0
+
+    def match(self, query: str, prefix: str, exact: str) -> Optional[int]:
+        """
+        検索語との一致の種類（一致しなければNone）
+
+        Args:
+            query: 正規化した検索語
+            prefix: 区切り文字 + query
+            exact: 区切り文字 + query + 区切り文字
+        """
+        if query not in self.ticker_text and query not in self.name_text:
+            return None
+        if exact in self.ticker_text:
+            return MATCH_EXACT_TICKER
+        if exact in self.name_text:
+            return MATCH_EXACT_NAME
+        if prefix in self.ticker_text:
+            return MATCH_PREFIX_TICKER
+        if prefix in self.name_text:
+            return MATCH_PREFIX_NAME
+        return MATCH_SUBSTRING
+
+    def to_result(self, match: int) -> Dict[str, object]:
+        return {
+            "ticker": self.ticker,
+            "company_name": self.values.get('company_name'),
+            "country": self.values.get('country'),
+            "market": self.values.get('market'),
+            "sector": self.values.get('sector'),
+            "market_cap": self.market_cap,
+            "table_name": self.table_name,
+            "match": MATCH_LABELS[match],
+        }
+
+
+class CompanySearchIndex:
+    def __init__(self, loader: SearchIndexLoader, max_age_seconds: int = DEFAULT_MAX_AGE_SECONDS):
+        """
+        初期化
+
+        Args:
+            loader: 全企業の (テーブル名, ticker, {項目: 値}) を返す関数
+            max_age_seconds: 読み込み直すまでの時間（秒）
+        """
+        self.loader = loader
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.RLock()
+        self._documents: Dict[Tuple[str, str], _Document] = {}
+        self._postings: Dict[str, Set[Tuple[str, str]]] = {}
+        self._loaded_at: Optional[float] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def _add(self, document: _Document):
+        key = (document.table_name, document.ticker)
+        self._documents[key] = document
+        for gram in document.grams:
+            self._postings.setdefault(gram, set()).add(key)
+
+    def _discard(self, key: Tuple[str, str]) -> Optional[_Document]:
+        document = self._documents.pop(key, None)
+        if document is None:
+            return None
+        for gram in document.grams:
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+        return document
+
+    def build(self, rows: Iterable[Tuple[str, str, Dict[str, object]]]):
+        """行からインデックスを作り直す（作り終えてから差し替えるため、作成中も検索できる）"""
+        documents: Dict[Tuple[str, str], _Document] = {}
+        postings: Dict[str, Set[Tuple[str, str]]] = {}
+        for table_name, ticker, values in rows:
+            if not ticker:
+                continue
+            document = _Document(table_name, str(ticker), {str(k).lower(): v for k, v in values.items()})
+            key = (table_name, document.ticker)
+            documents[key] = document
+            for gram in document.grams:
+                postings.setdefault(gram, set()).add(key)
+        with self._lock:
+            self._documents = documents
+            self._postings = postings
+            self._loaded_at = time.monotonic()
+        logger.info("Built company search index", extra={"companies": len(documents), "ngrams": len(postings)})
+
+    def load(self):
+        """企業テーブルから読み込み直す"""
+        self.build(self.loader())
+
+    def _ensure_loaded(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.max_age_seconds:
+            with self._lock:
+                if self._loaded_at == loaded_at:
+                    self.load()
+
+    def apply(self, table_name: str, ticker: str, values: Dict[str, object], replace: bool = True):
+        """
+        企業の書き込みを反映（読み込み前は何もしない）
+
+        Args:
+            values: 書き込んだ値（キーは小文字・大文字どちらでもよい）
+            replace: Trueならvaluesで置き換え（MERGE）、Falseならvaluesに含まれる項目だけを更新する（UPDATE）
+        """
+        if not ticker:
+            return
+        values = {str(key).lower(): value for key, value in values.items()}
+        with self._lock:
+            if not self.is_loaded:
+                return
+            key = (table_name, str(ticker))
+            previous = self._discard(key)
+            if not replace and previous is not None:
+                values = {**previous.values, **values}
+            self._add(_Document(table_name, str(ticker), values))
+
+    def remove(self, table_name: str, ticker: str):
+        """企業の削除を反映"""
+        with self._lock:
+            if self.is_loaded:
+                self._discard((table_name, str(ticker)))
+
+    def get(self, ticker: str) -> Optional[Dict[str, object]]:
+        """
+        tickerの企業の保存済みの値（読み込み前や見つからない場合はNone。読み込みは行わない）
+
+        同じtickerが複数のテーブルにある場合はJP、US、CNの順で先のものを返す。
+        """
+        with self._lock:
+            if not self.is_loaded:
+                return None
+            for table_name in ('COMPANIES_JP', 'COMPANIES_US', 'COMPANIES_CN'):
+                document = self._documents.get((table_name, str(ticker)))
+                if document is not None:
+                    return {**document.values, "ticker": document.ticker}
+        return None
+
+    def mark_stale(self):
+        """次に検索されたときに読み込み直す"""
+        with self._lock:
+            self._loaded_at = None
+
+    def search(self, query: str, limit: int = 10, country: Optional[str] = None, fuzzy: bool = True) -> List[Dict[str, object]]:
+        """
+        検索語に一致する企業を順位の高い順に返す
+
+        Args:
+            query: 検索語（ticker・企業名の一部。全角・半角、カタカナ・ひらがなは区別しない）
+            limit: 最大件数
+            country: 指定した場合はその国の企業だけを返す
+            fuzzy: 部分一致で件数が足りない場合に、あいまい一致で補う
+        """
+        key = normalize(query)
+        if not key or limit <= 0:
+            return []
+        self._ensure_loaded()
+        country = country.upper() if country else None
+        query_grams = _query_grams(key)
+
+        prefix = _KEY_SEPARATOR + key
+        exact = prefix + _KEY_SEPARATOR
+
+        with self._lock:
+            posting_lists = sorted((self._postings.get(gram, set()) for gram in query_grams), key=len)
+            candidates = posting_lists[0].intersection(*posting_lists[1:]) if posting_lists[0] else set()
+
+            # 一致の種類ごとに分け、上位の種類から時価総額の大きい順に取る
+            # （1文字の検索語では候補が数千件になるため、全体は並べ替えない）
+            buckets: List[List[_Document]] = [[] for _ in MATCH_LABELS]
+            documents = self._documents
+            for doc_key in candidates:
+                document = documents[doc_key]
+                if country and document.country != country:
+                    continue
+                match = document.match(key, prefix, exact)
+                if match is not None:
+                    buckets[match].append(document)
+
+            ranked: List[Tuple[_Document, int]] = []
+            for match, bucket in enumerate(buckets):
+                remaining = limit - len(ranked)
+                if remaining <= 0:
+                    break
+                top = heapq.nsmallest(remaining, bucket, key=lambda document: (-document.market_cap, document.ticker))
+                ranked.extend((document, match) for document in top)
+
+            if fuzzy and len(ranked) < limit and len(query_grams) >= 2:
+                matched = {(document.table_name, document.ticker) for document, _ in ranked}
+                shared = Counter()
+                for keys in posting_lists:
+                    shared.update(keys)
+                min_count = FUZZY_MIN_SIMILARITY * len(query_grams)
+                similar = []
+                for doc_key, count in shared.items():
+                    if count < min_count or doc_key in matched:
+                        continue
+                    document = documents[doc_key]
+                    if country and document.country != country:
+                        continue
+                    similar.append((-count, -document.market_cap, document.ticker, document))
+                top = heapq.nsmallest(limit - len(ranked), similar, key=lambda item: item[:3])
+                ranked.extend((item[3], MATCH_FUZZY) for item in top)
+
+            return [document.to_result(match) for document, match in ranked]
+
+    def tickers_by_table(self, query: str, country: Optional[str] = None, max_tickers: int = MAX_TICKER_FILTER) -> Optional[Dict[str, List[str]]]:
+        """
+        検索語に一致する企業のtickerをテーブルごとに返す（SnowflakeのLIKEの代わりにTICKERで絞り込む）
+
+        部分一致がなければあいまい一致の企業を返す。一致する企業がmax_tickersを超える場合や、
+        検索語が記号だけで正規化すると空になる場合（"&" など）はNone（LIKEで検索する）。
+        """
+        if not normalize(query):
+            return None
+        hits = self.search(query, max_tickers + 1, country=country, fuzzy=False)
+        if not hits:
+            hits = self.search(query, max_tickers + 1, country=country)
+        if len(hits) > max_tickers:
+            return None
+        tickers: Dict[str, List[str]] = {}
+        for hit in hits:
+            tickers.setdefault(hit["table_name"], []).append(hit["ticker"])
+        return tickers
+
+
+def _load_from_snowflake():
+    from app.services.registry import get_snowflake_service
+    return get_snowflake_service().get_company_search_rows()
+
+
+_index: Optional[CompanySearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_company_search_index() -> CompanySearchIndex:
+    """アプリケーション全体で共有する検索インデックスを取得（企業テーブルは最初に検索されたときに読み込む）"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = CompanySearchIndex(
+                    _load_from_snowflake,
+                    max_age_seconds=int(os.getenv("COMPANY_SEARCH_INDEX_MAX_AGE_SECONDS", DEFAULT_MAX_AGE_SECONDS)),
+                )
+    return _index
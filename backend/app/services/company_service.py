@@ -1,49 +1,131 @@
 from typing import Optional, List, Dict
 # from .bigquery_service import BigQueryService
-from .snowflake_service import SnowflakeService
-import aiohttp
-from bs4 import BeautifulSoup
 import asyncio
-import yfinance as yf  # Yahoo Financeのデータ取得用
-from tradingview_ta import TA_Handler, Interval, Exchange # TradingViewのデータ取得用
+import logging
+import functools
+# yfinance・tradingview_taは読み込みに時間がかかるため、使うときにインポートする
+from .collection_jobs import CollectionJob, DEFAULT_WORKERS
+from .company_tables import COMPANY_TABLES, COLLECTED_TEXT_COLUMNS
+from .rate_limiter import HostRateLimiter
+from .tradingview_summaries import TradingViewSummaryCollector, update_tradingview_summaries
+from .registry import get_snowflake_service
+from .instrumentation import traced
+
+logger = logging.getLogger(__name__)
+
+# 提供元ごとの (1秒あたりのリクエスト数, 同時リクエスト数)
+PROVIDER_RATE_LIMITS = {
+    "yfinance": (2.0, 4),
+    "tradingview": (1.0, 2),
+}
+
+# _fetch_yfinance_dataのキー -> 企業テーブルのカラム（市場は固定値のため書き込まない）
+COLLECTED_FIELDS = {
+    "name": "COMPANY_NAME",
+    "sector": "SECTOR",
+    "industry": "INDUSTRY",
+    "market_price": "CURRENT_PRICE",
+    "market_cap": "MARKET_CAP",
+    "volume": "VOLUME",
+    "per": "PER",
+    "pbr": "PBR",
+    "roe": "ROE",
+    "revenue": "REVENUE",
+    "operating_profit": "OPERATING_PROFIT",
+    "net_profit": "NET_PROFIT",
+    "dividend_yield": "DIVIDEND_YIELD",
+}
+
+
+def collected_company_row(company_data: Dict) -> Dict:
+    """
+    _fetch_yfinance_dataの結果を企業テーブルのカラム名の辞書に変換
+
+    yfinanceで取得できなかった項目は空文字・0になっているため含めない（既存の値を残す）。
+    """
+    row = {"ticker": company_data["ticker"]}
+    for key, column in COLLECTED_FIELDS.items():
+        value = company_data.get(key)
+        if value in (None, "", 0):
+            continue
+        if column in COLLECTED_TEXT_COLUMNS:
+            row[column] = str(value)
+        elif isinstance(value, (int, float)):
+            row[column] = float(value)
+    return row
+
 
 class CompanyService:
     def __init__(self):
         # self.bigquery = BigQueryService()
-        self.snowflake = SnowflakeService()
+        self.provider_limiter = HostRateLimiter(overrides=PROVIDER_RATE_LIMITS)
 
-    async def collect_all_data(self, ticker: str) -> Dict:
-        """個別企業のデータを収集"""
+    @property
+    def snowflake(self):
+        # Snowflakeへの接続は最初に使うときに作成する（共有のSnowflakeServiceを使う）
+        return get_snowflake_service()
+
+    @traced("yfinance", "ticker_info")
+    def _fetch_yfinance_data(self, ticker: str) -> Dict:
+        """Yahoo Financeから企業データを取得（ブロッキング処理）"""
+        import yfinance as yf
+
+        stock = yf.Ticker(ticker)
+        info = stock.info
+        return {
+            "ticker": ticker,
+            "name": info.get("longName", ""),
+            "sector": info.get("sector", ""),
+            "industry": info.get("industry", ""),
+            "market": "TSE",  # 東証を想定
+            
+            # 株価データ
+            "market_price": info.get("currentPrice", 0),
+            "market_cap": info.get("marketCap", 0),
+            "volume": info.get("volume", 0),
+            
+            # 財務指標
+            "per": info.get("forwardPE", 0),
+            "pbr": info.get("priceToBook", 0),
+            "roe": info.get("returnOnEquity", 0),
+            "revenue": info.get("totalRevenue", 0),
+            "operating_profit": info.get("operatingMargins", 0) * info.get("totalRevenue", 0),
+            "net_profit": info.get("netIncomeToCommon", 0),
+            
+            # 配当データ
+            "dividend_yield": info.get("dividendYield", 0),
+            "dividend_per_share": info.get("dividendRate", 0),
+        }
+
+    def _fetch_tradingview_summary(self, ticker: str) -> Dict:
+        """TradingViewから分析サマリーを取得（ブロッキング処理）"""
+        from tradingview_ta import TA_Handler, Interval
+
+        tv_ticker = ticker.split('.')[0]
+        handler = TA_Handler(
+            symbol=tv_ticker,
+            screener="japan",
+            exchange="TSE",
+            interval=Interval.INTERVAL_1_DAY
+        )
+        return handler.get_analysis().summary
+
+    async def _fetch_yfinance_limited(self, ticker: str) -> Dict:
+        """yfinanceの企業データを提供元のレート制限の枠内で取得"""
+        async with self.provider_limiter.for_host("yfinance").limit():
+            return await asyncio.to_thread(self._fetch_yfinance_data, ticker)
+
+    async def _fetch_company_data(self, ticker: str) -> Dict:
+        """
+        個別企業のデータを取得（保存はしない）
+
+        yfinanceとTradingViewの呼び出しはブロッキングのためスレッドで実行し、
+        提供元ごとのレート制限の枠内で行う。
+        """
         company_data = {}
         # Yahoo Financeからデータを取得
         try:
-            print(f"Collecting data for {ticker} from yfinance...")
-            stock = yf.Ticker(ticker)
-            info = stock.info
-            company_data = {
-                "ticker": ticker,
-                "name": info.get("longName", ""),
-                "sector": info.get("sector", ""),
-                "industry": info.get("industry", ""),
-                "market": "TSE",  # 東証を想定
-                
-                # 株価データ
-                "market_price": info.get("currentPrice", 0),
-                "market_cap": info.get("marketCap", 0),
-                "volume": info.get("volume", 0),
-                
-                # 財務指標
-                "per": info.get("forwardPE", 0),
-                "pbr": info.get("priceToBook", 0),
-                "roe": info.get("returnOnEquity", 0),
-                "revenue": info.get("totalRevenue", 0),
-                "operating_profit": info.get("operatingMargins", 0) * info.get("totalRevenue", 0),
-                "net_profit": info.get("netIncomeToCommon", 0),
-                
-                # 配当データ
-                "dividend_yield": info.get("dividendYield", 0),
-                "dividend_per_share": info.get("dividendRate", 0),
-            }
+            company_data = await self._fetch_yfinance_limited(ticker)
         except Exception as e:
             print(f"Error collecting data from yfinance for {ticker}: {str(e)}")
             # yfinanceが失敗しても処理を続ける
@@ -51,69 +133,79 @@ class CompanyService:
 
         # TradingViewから分析サマリーを取得
         try:
-            print(f"Collecting summary for {ticker} from TradingView...")
-            tv_ticker = ticker.split('.')[0]
-            handler = TA_Handler(
-                symbol=tv_ticker,
-                screener="japan",
-                exchange="TSE",
-                interval=Interval.INTERVAL_1_DAY
-            )
-            summary = handler.get_analysis().summary
-            company_data['tradingview_summary'] = summary
+            async with self.provider_limiter.for_host("tradingview").limit():
+                company_data['tradingview_summary'] = await asyncio.to_thread(self._fetch_tradingview_summary, ticker)
         except Exception as e:
             print(f"Could not get TradingView summary for {ticker}: {e}")
             company_data['tradingview_summary'] = None
 
+        return company_data
+
+    async def _collect_company_data(self, ticker: str) -> Dict:
+        """
+        収集ジョブ用に企業データを取得し、企業テーブルのカラム名の辞書にする
+
+        yfinanceの取得に失敗した場合や値を1つも取得できなかった場合は例外にし、
+        ジョブの失敗として数える（空の値で既存の行を上書きしない）。
+        """
+        row = collected_company_row(await self._fetch_yfinance_limited(ticker))
+        if len(row) == 1:
+            raise ValueError(f"No data returned from yfinance for {ticker}")
+        return row
+
+    async def collect_all_data(self, ticker: str) -> Dict:
+        """個別企業のデータを収集"""
+        company_data = await self._fetch_company_data(ticker)
+
         # Save the collected data to Snowflake
         if self.snowflake.get_connection():
             print(f"Saving data for {ticker} to Snowflake...")
-            self.snowflake.upsert_companies([company_data])
+            await asyncio.to_thread(self.snowflake.upsert_companies, [company_data])
         
         return company_data
 
-    async def collect_company_data(self):
+    async def _save_collected_data(self, table_name: str, rows: List[Dict]):
+        """収集したデータをまとめてSnowflakeに保存（取得できたカラムだけを更新）"""
+        if self.snowflake.get_connection():
+            await asyncio.to_thread(self.snowflake.bulk_update_collected_companies, table_name, rows)
+
+    def create_collection_job(self, workers: int = DEFAULT_WORKERS, max_in_flight: Optional[int] = None,
+                              country: str = "JP") -> CollectionJob:
+        """
+        全企業のデータ収集ジョブを作成（収集したデータは一定件数ごとにまとめて保存）
+
+        TradingViewのサマリーは企業ごとには取得しないため、ジョブの完了後に
+        update_tradingview_summariesでまとめて取得する。
+        """
+        return CollectionJob(
+            self._collect_company_data,
+            workers=workers,
+            max_in_flight=max_in_flight,
+            flush=functools.partial(self._save_collected_data, COMPANY_TABLES[country]),
+        )
+
+    async def update_tradingview_summaries(self, tickers: List[str], country: str = "JP") -> Dict[str, int]:
+        """TradingViewのサマリーを複数銘柄ずつまとめて取得し、企業テーブルに一括で書き込む"""
+        collector = TradingViewSummaryCollector(limiter=self.provider_limiter.for_host("tradingview"))
+        stats = await update_tradingview_summaries(self.snowflake, {country: tickers}, collector)
+        return stats[country]
+
+    async def collect_company_data(self, workers: int = DEFAULT_WORKERS):
         try:
-            collected_data = []
-            failed_companies = []
-            
             companies = await self.get_company_list()
-            total_companies = len(companies)
-            
-            # バッチ処理（10社ごとに処理して、その後30秒待機）
-            batch_size = 10  # 必要に応じて変更可能
-            for i in range(0, len(companies), batch_size):
-                batch = companies[i:i + batch_size]
-                
-                for company in batch:
-                    try:
-                        data = await self.collect_all_data(company['ticker'])
-                        collected_data.append(data)
-                    except Exception as e:
-                        failed_companies.append({
-                            'ticker': company['ticker'],
-                            'error': str(e)
-                        })
-                
-                # 進捗状況を計算
-                progress = {
-                    "current": len(collected_data) + len(failed_companies),
-                    "total": total_companies,
-                    "percentage": round((len(collected_data) + len(failed_companies)) / total_companies * 100, 1)
-                }
-                print(f"Progress: {progress['percentage']}% ({progress['current']}/{progress['total']})")
-                
-                # バッチ処理後の待機
-                if i + batch_size < len(companies):
-                    print(f"Waiting 30 seconds before next batch...")
-                    await asyncio.sleep(30)
-        
-            return {
-                "total": len(collected_data),
-                "updated": len(collected_data),
-                "failed": failed_companies,
-                "progress": 100
-            }
+            tickers = [company['ticker'] for company in companies]
+
+            result = {}
+            async for event in self.create_collection_job(workers).run(tickers):
+                if 'ticker' in event:
+                    print(f"Progress: {event['progress']}% ({event['current']}/{event['total']})")
+                result = event
+
+            failed = {item['ticker'] for item in result.get('failed', [])}
+            result['tradingview'] = await self.update_tradingview_summaries(
+                [ticker for ticker in tickers if ticker not in failed]
+            )
+            return result
                     
         except Exception as e:
             print(f"Error in collect_company_data: {str(e)}")
@@ -127,11 +219,11 @@ class CompanyService:
         try:
             result = self.snowflake.query(query, (ticker,))
             if not result:
-                print(f"No company data found for ticker: {ticker} in Snowflake.") # 追加
+                logger.info("No company data found in Snowflake", extra={"ticker": ticker})
                 return None
             
             company_data = result[0]
-            print(f"Found company data for {ticker}: {company_data}") # 追加
+            logger.debug("Found company data", extra={"ticker": ticker, "company": company_data})
 
             # TODO: financial_reportsテーブルから時系列データを取得する
             # とりあえずダミーデータを返す
@@ -149,11 +241,10 @@ class CompanyService:
                 "company": company_data,
                 "financials": financials
             }
-            print(f"Returning data for {ticker}: {return_data}") # 追加
             return return_data
 
-        except Exception as e:
-            print(f"Error getting company details for {ticker}: {e}")
+        except Exception:
+            logger.exception("Error getting company details", extra={"ticker": ticker})
             return None
 
     async def search_companies(self, query: str, page: int = 1, page_size: int = 10) -> Dict:
@@ -203,8 +294,8 @@ class CompanyService:
                 "page_size": page_size,
                 "total_pages": (total + page_size - 1) // page_size
             }
-        except Exception as e:
-            print(f"Error searching companies in Snowflake: {e}")
+        except Exception:
+            logger.exception("Error searching companies in Snowflake", extra={"query": query})
             # エラーが発生した場合は空の結果を返すか、例外を再発生させる
             return {
                 "companies": [],
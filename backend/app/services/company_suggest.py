@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+入力途中の検索語に対する企業の候補（オートコンプリート）
+
+企業テーブルの ticker・企業名・別名と、Google Driveの企業フォルダ名を正規化したキー
+（company_search_index.normalize と同じ）を昇順に並べた配列を作り、bisectで前方一致の
+範囲を求めて時価総額の大きい順に返す。1〜2文字の前方一致は範囲が広いため、作成時に
+上位の候補を求めておく。
+
+Driveのフォルダ名が企業テーブルの企業名・別名と一致する場合は、その企業の候補に
+folder_id を付ける（一致しないフォルダは時価総額0の候補になる）。
+
+作成には企業テーブルとDriveの一覧の取得が必要なため、企業を書き込んだ後や一定時間
+（デフォルト1時間）が経過した後は、作り直す間も古い候補を返し、別スレッドで作り直す。
+"""
+
+import os
+import time
+import heapq
+import bisect
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .company_search_index import name_aliases, normalize, ticker_aliases
+from .company_tables import DRIVE_COMPANY_FOLDERS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE_SECONDS = 60 * 60
+MAX_LIMIT = 50
+# この文字数以下の前方一致は作成時に上位MAX_LIMIT件を求めておく
+PRECOMPUTED_PREFIX_LENGTH = 2
+# 作り直しに失敗した後、次に作り直すまでの時間（秒）
+REFRESH_RETRY_SECONDS = 60
+_MAX_CHAR = '\U0010ffff'
+
+CompanyRowsLoader = Callable[[], Iterable[Tuple[str, str, Dict[str, object]]]]
+DriveItemsLoader = Callable[[], Iterable[Dict[str, object]]]
+
+
+class _SuggestState:
+    """作成済みの候補（作成後は変更せず、作り直す際は丸ごと差し替える）"""
+
+    __slots__ = ('entries', 'keys', 'key_entries', 'top_by_prefix', 'built_at')
+
+    def __init__(self, entries: List[Dict[str, object]], keyed: List[Tuple[str, int]]):
+        self.entries = entries
+        keyed.sort()
+        self.keys = [key for key, _ in keyed]
+        self.key_entries = [entry_id for _, entry_id in keyed]
+
+        def rank(entry_id: int):
+            return -entries[entry_id]["market_cap"], entries[entry_id]["ticker"]
+
+        prefixed: Dict[str, set] = {}
+        for key, entry_id in keyed:
+            for length in range(1, min(len(key), PRECOMPUTED_PREFIX_LENGTH) + 1):
+                prefixed.setdefault(key[:length], set()).add(entry_id)
+        self.top_by_prefix = {
+            prefix: heapq.nsmallest(MAX_LIMIT, entry_ids, key=rank)
+            for prefix, entry_ids in prefixed.items()
+        }
+        self.built_at = time.monotonic()
+
+    def candidates(self, prefix: str, limit: int, country: Optional[str]) -> List[int]:
+        if len(prefix) <= PRECOMPUTED_PREFIX_LENGTH:
+            top = self.top_by_prefix.get(prefix, [])
+            selected = [entry_id for entry_id in top if not country or self.entries[entry_id]["country"] == country]
+            # 国で絞り込んで足りなくなった場合だけ範囲全体から求める
+            if len(selected) >= limit or len(top) < MAX_LIMIT:
+                return selected[:limit]
+
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + _MAX_CHAR, start)
+        entry_ids = {
+            entry_id for entry_id in self.key_entries[start:end]
+            if not country or self.entries[entry_id]["country"] == country
+        }
+        return heapq.nsmallest(
+            limit, entry_ids,
+            key=lambda entry_id: (-self.entries[entry_id]["market_cap"], self.entries[entry_id]["ticker"]),
+        )
+
+
+def _company_entry(table_name: str, ticker: str, values: Dict[str, object]) -> Dict[str, object]:
+    try:
+        market_cap = float(values.get('market_cap') or 0)
+    except (TypeError, ValueError):
+        market_cap = 0.0
+    return {
+        "ticker": ticker,
+        "company_name": values.get('company_name'),
+        "country": str(values.get('country') or '').upper(),
+        "market": values.get('market'),
+        "market_cap": market_cap,
+        "source": "companies",
+        "table_name": table_name,
+        "folder_id": None,
+    }
+
+
+def _drive_entry(item: Dict[str, object]) -> Dict[str, object]:
+    return {
+        "ticker": item['name'],
+        "company_name": item['name'],
+        "country": item['market'],
+        "market": item['market'],
+        "market_cap": 0.0,
+        "source": "drive",
+        "table_name": None,
+        "folder_id": item['id'],
+    }
+
+
+class CompanySuggester:
+    def __init__(self, company_loader: CompanyRowsLoader, drive_loader: Optional[DriveItemsLoader] = None,
+                 max_age_seconds: int = DEFAULT_MAX_AGE_SECONDS):
+        """
+        初期化
+
+        Args:
+            company_loader: 全企業の (テーブル名, ticker, {company_name, country, market, market_cap}) を返す関数
+            drive_loader: Driveの企業フォルダ（id, name, marketを持つ辞書）を返す関数
+            max_age_seconds: 作り直すまでの時間（秒）
+        """
+        self.company_loader = company_loader
+        self.drive_loader = drive_loader
+        self.max_age_seconds = max_age_seconds
+        self._state: Optional[_SuggestState] = None
+        self._stale = False
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._retry_after = 0.0
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._state is not None
+
+    def __len__(self) -> int:
+        return len(self._state.entries) if self._state is not None else 0
+
+    def build(self, company_rows: Iterable[Tuple[str, str, Dict[str, object]]], drive_items: Iterable[Dict[str, object]] = ()):
+        """企業テーブルの行とDriveのフォルダから候補を作り直す"""
+        entries: List[Dict[str, object]] = []
+        keyed: List[Tuple[str, int]] = []
+        entry_by_name: Dict[str, int] = {}
+
+        for table_name, ticker, values in company_rows:
+            if not ticker:
+                continue
+            values = {str(key).lower(): value for key, value in values.items()}
+            entry_id = len(entries)
+            entries.append(_company_entry(table_name, str(ticker), values))
+            company_name = values.get('company_name')
+            name_keys = {normalize(name) for name in [company_name] + name_aliases(company_name)}
+            ticker_keys = {normalize(key) for key in [ticker] + ticker_aliases(ticker)}
+            for key in (name_keys | ticker_keys) - {''}:
+                keyed.append((key, entry_id))
+            for key in name_keys - {''}:
+                entry_by_name.setdefault(key, entry_id)
+
+        drive_count = 0
+        for item in drive_items:
+            drive_count += 1
+            key = normalize(item['name'])
+            if not key:
+                continue
+            matched = entry_by_name.get(key)
+            if matched is not None:
+                entries[matched]["folder_id"] = entries[matched]["folder_id"] or item['id']
+                continue
+            entry_id = len(entries)
+            entries.append(_drive_entry(item))
+            keyed.append((key, entry_id))
+
+        self._state = _SuggestState(entries, keyed)
+        logger.info("Built company suggestions", extra={"entries": len(entries), "keys": len(keyed), "drive_items": drive_count})
+
+    def load(self):
+        """企業テーブルとDriveから作り直す"""
+        # 読み込み中に書き込まれた場合は次の参照で再び作り直す
+        self._stale = False
+        company_rows = self.company_loader()
+        drive_items = self.drive_loader() if self.drive_loader else []
+        self.build(company_rows, drive_items)
+
+    def mark_stale(self):
+        """次に参照されたときに別スレッドで作り直す"""
+        self._stale = True
+
+    def ensure_loaded(self):
+        """作成前なら作成し、古くなっていれば別スレッドで作り直す"""
+        state = self._state
+        if state is None:
+            with self._lock:
+                if self._state is None:
+                    self.load()
+        elif self._stale or time.monotonic() - state.built_at > self.max_age_seconds:
+            self._refresh_in_background()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing or time.monotonic() < self._retry_after:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.load()
+            except Exception:
+                self._stale = True
+                self._retry_after = time.monotonic() + REFRESH_RETRY_SECONDS
+                logger.exception("Failed to rebuild company suggestions")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="company-suggest-refresh", daemon=True).start()
+
+    def suggest(self, query: str, limit: int = 10, country: Optional[str] = None) -> List[Dict[str, object]]:
+        """
+        検索語で始まる ticker・企業名の候補を時価総額の大きい順に返す
+
+        Args:
+            query: 入力途中の検索語（全角・半角、カタカナ・ひらがなは区別しない）
+            limit: 最大件数（MAX_LIMITまで）
+            country: 指定した場合はその国（Driveのフォルダは市場）の候補だけを返す
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        self.ensure_loaded()
+        state = self._state
+        entry_ids = state.candidates(prefix, min(limit, MAX_LIMIT), country.upper() if country else None)
+        return [dict(state.entries[entry_id]) for entry_id in entry_ids]
+
+
+def _load_company_rows():
+    from app.services.registry import get_snowflake_service
+    return get_snowflake_service().get_company_search_rows()
+
+
+def load_drive_items() -> List[Dict[str, object]]:
+    """市場ごとのDriveの企業フォルダとスプレッドシート（Driveを使えない場合は空）"""
+    from app.services.google_drive_service import GoogleDriveService
+
+    drive_service = GoogleDriveService()
+    if not drive_service.service:
+        return []
+    items = []
+    for market, folder in DRIVE_COMPANY_FOLDERS.items():
+        items.extend({**item, 'market': market} for item in drive_service.list_company_folders(folder['folder_id']))
+    return items
+
+
+_suggester: Optional[CompanySuggester] = None
+_suggester_lock = threading.Lock()
+
+
+def get_company_suggester() -> CompanySuggester:
+    """アプリケーション全体で共有する候補を取得（最初に参照されたときに作成する）"""
+    global _suggester
+    if _suggester is None:
+        with _suggester_lock:
+            if _suggester is None:
+                _suggester = CompanySuggester(
+                    _load_company_rows,
+                    load_drive_items,
+                    max_age_seconds=int(os.getenv("COMPANY_SUGGEST_MAX_AGE_SECONDS", DEFAULT_MAX_AGE_SECONDS)),
+                )
+    return _suggester
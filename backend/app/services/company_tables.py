@@ -0,0 +1,47 @@
+"""
+企業テーブルの名前とカラムの定義
+
+SnowflakeServiceやAPIから参照する定数だけを置き、Snowflakeのコネクタなどを
+読み込まずにインポートできるようにしている。
+"""
+
+# 国コードと企業テーブルの対応
+COMPANY_TABLES = {'JP': 'COMPANIES_JP', 'US': 'COMPANIES_US', 'CN': 'COMPANIES_CN'}
+
+# 市場ごとの企業フォルダ（Google Drive）の親フォルダと表示用のラベル・通貨
+DRIVE_COMPANY_FOLDERS = {
+    'CN': {'folder_id': '1uragZmOuCVZYJ_9Wcyxe6R9-dnyI8-fi', 'label': '中国企業', 'currency': 'CNY'},
+    'US': {'folder_id': '1JDah1KWIgrGwktuxnF0yGz3WyBR6yDb2', 'label': '米国企業', 'currency': 'USD'},
+    'JP': {'folder_id': '1UCVDgNvrei0HPuWmM_BJaaHYAUNg3gO9', 'label': '日本企業', 'currency': 'JPY'},
+}
+
+# 企業データの辞書キー（upsert_companiesのカラム順）
+COMPANY_COLUMNS = [
+    'company_name', 'ticker', 'sector', 'industry', 'country', 'website',
+    'description', 'business_description', 'market_cap', 'employees', 'market', 'current_price',
+    'shares_outstanding', 'volume', 'per', 'pbr', 'eps', 'bps', 'roe',
+    'roa', 'revenue', 'operating_profit', 'net_profit', 'total_assets',
+    'equity', 'operating_margin', 'net_margin', 'dividend_yield', 'company_type', 'ceo'
+]
+
+# COMPANIES_CNテーブルのカラム（COMPANY_COLUMNSと同じ順序）
+CN_COMPANY_COLUMNS = [
+    'COMPANY_NAME', 'TICKER', 'SECTOR', 'INDUSTRY', 'COUNTRY', 'WEBSITE',
+    'DESCRIPTION', 'BUSINESS_DESCRIPTION', 'MARKET_CAP', 'EMPLOYEES', 'MARKET', 'CURRENT_PRICE',
+    'SHARES_OUTSTANDING', 'VOLUME', 'PER', 'PBR', 'EPS', 'BPS', 'ROE',
+    'ROA', 'REVENUE', 'OPERATING_INCOME', 'NET_INCOME', 'TOTAL_ASSETS',
+    'SHAREHOLDERS_EQUITY', 'OPERATING_MARGIN', 'NET_MARGIN', 'DIVIDEND_YIELD', 'COMPANY_TYPE', 'CEO'
+]
+
+# 定期更新で書き込む財務指標のカラム（COMPANIES_JP/COMPANIES_US）
+FINANCIAL_UPDATE_COLUMNS = [
+    'MARKET_CAP', 'SHARES_OUTSTANDING', 'EMPLOYEES', 'PER', 'PBR', 'EPS', 'BPS', 'ROE', 'ROA',
+    'REVENUE', 'OPERATING_PROFIT', 'NET_PROFIT', 'OPERATING_MARGIN', 'NET_MARGIN', 'DIVIDEND_YIELD'
+]
+
+# 企業データの収集（yfinanceのTicker.info）で書き込むカラム（COMPANIES_JP/COMPANIES_US）
+COLLECTED_TEXT_COLUMNS = ['COMPANY_NAME', 'SECTOR', 'INDUSTRY']
+COLLECTED_NUMERIC_COLUMNS = [
+    'CURRENT_PRICE', 'MARKET_CAP', 'VOLUME', 'PER', 'PBR', 'ROE',
+    'REVENUE', 'OPERATING_PROFIT', 'NET_PROFIT', 'DIVIDEND_YIELD'
+]
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+企業テーブルの株価・財務指標の一括更新
+
+株価はyfinanceのdownloadで数百銘柄ずつ直近の日足をまとめて取得し、最新の終値と
+出来高を書き込む。企業ごとにTicker.infoを取得するより大幅に少ないリクエスト数で
+全銘柄を更新できる。財務指標は企業ごとにTicker.infoを取得する必要があるため、
+CollectionJobのワーカーで並行に取得し、一定件数ごとにまとめて書き込む。
+どちらも取得できた値だけを更新し、企業名などのほかのカラムは変更しない。
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from .collection_jobs import CollectionJob
+from .instrumentation import traced
+from .rate_limiter import AsyncRateLimiter
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DEFAULT_CHUNK_SIZE = 200
+DEFAULT_FINANCIAL_WORKERS = 4
+
+# Ticker.infoのキー -> 企業テーブルのカラム（OPERATING_PROFITは売上高と営業利益率から計算）
+FINANCIAL_INFO_FIELDS = [
+    ('marketCap', 'MARKET_CAP'),
+    ('sharesOutstanding', 'SHARES_OUTSTANDING'),
+    ('fullTimeEmployees', 'EMPLOYEES'),
+    ('trailingPE', 'PER'),
+    ('priceToBook', 'PBR'),
+    ('trailingEps', 'EPS'),
+    ('bookValue', 'BPS'),
+    ('returnOnEquity', 'ROE'),
+    ('returnOnAssets', 'ROA'),
+    ('totalRevenue', 'REVENUE'),
+    ('netIncomeToCommon', 'NET_PROFIT'),
+    ('operatingMargins', 'OPERATING_MARGIN'),
+    ('profitMargins', 'NET_MARGIN'),
+    ('dividendYield', 'DIVIDEND_YIELD'),
+]
+
+
+def yfinance_symbol(ticker: str, country: str) -> str:
+    """企業テーブルのtickerをyfinanceの銘柄コードに変換（7203 -> 7203.T, BRK.B -> BRK-B）"""
+    if country == 'JP':
+        return ticker if '.' in ticker else f"{ticker}.T"
+    return ticker.replace('.', '-')
+
+
+def latest_prices(df: Optional[pd.DataFrame], symbols: List[str]) -> Dict[str, Dict]:
+    """
+    yfinance.downloadの結果から銘柄ごとの最新の終値と出来高を取り出す
+
+    Returns:
+        銘柄コード -> {"current_price": 終値, "volume": 出来高}（終値がない銘柄は含まない）
+    """
+    import pandas as pd
+
+    prices: Dict[str, Dict] = {}
+    if df is None or df.empty:
+        return prices
+
+    for symbol in symbols:
+        if isinstance(df.columns, pd.MultiIndex):
+            if symbol not in df.columns.get_level_values(0):
+                continue
+            frame = df[symbol]
+        elif len(symbols) == 1:
+            frame = df
+        else:
+            continue
+
+        if 'Close' not in frame.columns:
+            continue
+        frame = frame.dropna(subset=['Close'])
+        if frame.empty:
+            continue
+        last = frame.iloc[-1]
+        volume = last.get('Volume')
+        prices[symbol] = {
+            "current_price": float(last['Close']),
+            "volume": float(volume) if pd.notna(volume) else None,
+        }
+    return prices
+
+
+@traced("yfinance", "download")
+def fetch_latest_prices(symbols: List[str]) -> Dict[str, Dict]:
+    """yfinanceで直近5日分の日足を取得し、最新の終値と出来高を返す（ブロッキング処理）"""
+    import yfinance as yf
+
+    df = yf.download(
+        tickers=symbols,
+        period="5d",
+        interval="1d",
+        group_by="ticker",
+        auto_adjust=False,
+        threads=True,
+        progress=False,
+    )
+    return latest_prices(df, symbols)
+
+
+async def update_prices(
+    snowflake_service,
+    table_name: str,
+    country: str,
+    tickers: List[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    limiter: Optional[AsyncRateLimiter] = None,
+    fetch=fetch_latest_prices,
+) -> Dict[str, int]:
+    """
+    企業テーブルの株価と出来高をまとめて更新
+
+    Returns:
+        {"requested": 対象の企業数, "found": 株価を取得できた企業数, "updated": 更新した行数}
+    """
+    limiter = limiter or AsyncRateLimiter(rate_per_second=0.5, max_concurrency=2)
+    tickers_by_symbol = {yfinance_symbol(ticker, country): ticker for ticker in tickers}
+    symbols = list(tickers_by_symbol)
+
+    async def fetch_chunk(chunk: List[str]) -> Dict[str, Dict]:
+        try:
+            async with limiter.limit():
+                return await asyncio.to_thread(fetch, chunk)
+        except Exception as e:
+            print(f"Error downloading prices for {len(chunk)} symbols: {str(e)}")
+            return {}
+
+    results = await asyncio.gather(*[
+        fetch_chunk(symbols[start:start + chunk_size]) for start in range(0, len(symbols), chunk_size)
+    ])
+
+    rows = []
+    for result in results:
+        for symbol, price in result.items():
+            rows.append((tickers_by_symbol[symbol], price["current_price"], price["volume"]))
+
+    updated = 0
+    if rows:
+        updated = await asyncio.to_thread(snowflake_service.bulk_update_prices, table_name, rows)
+    print(f"Price update for {table_name}: {len(rows)}/{len(tickers)} found, {updated} rows updated")
+    return {"requested": len(tickers), "found": len(rows), "updated": updated}
+
+
+def financial_metrics(info: Dict) -> Dict[str, Optional[float]]:
+    """Ticker.infoから企業テーブルの財務指標を取り出す（取得できない値はNone）"""
+    import pandas as pd
+
+    metrics = {}
+    for key, column in FINANCIAL_INFO_FIELDS:
+        value = info.get(key)
+        metrics[column] = float(value) if isinstance(value, (int, float)) and not pd.isna(value) else None
+    revenue, margin = metrics['REVENUE'], metrics['OPERATING_MARGIN']
+    metrics['OPERATING_PROFIT'] = revenue * margin if revenue is not None and margin is not None else None
+    return metrics
+
+
+@traced("yfinance", "ticker_info")
+def fetch_financial_metrics(symbol: str) -> Dict[str, Optional[float]]:
+    """yfinanceのTicker.infoから財務指標を取得（ブロッキング処理）"""
+    import yfinance as yf
+
+    return financial_metrics(yf.Ticker(symbol).info or {})
+
+
+def create_financial_update_job(
+    snowflake_service,
+    table_name: str,
+    country: str,
+    workers: int = DEFAULT_FINANCIAL_WORKERS,
+    limiter: Optional[AsyncRateLimiter] = None,
+    fetch=fetch_financial_metrics,
+) -> CollectionJob:
+    """企業テーブルの財務指標を企業ごとに取得してまとめて書き込むジョブを作成"""
+    limiter = limiter or AsyncRateLimiter(rate_per_second=2.0, max_concurrency=workers)
+
+    async def collect(ticker: str) -> Dict:
+        async with limiter.limit():
+            metrics = await asyncio.to_thread(fetch, yfinance_symbol(ticker, country))
+        return {"ticker": ticker, **metrics}
+
+    async def flush(rows: List[Dict]):
+        await asyncio.to_thread(snowflake_service.bulk_update_financials, table_name, rows)
+
+    return CollectionJob(collect, workers=workers, flush=flush)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+決算カレンダーAPIのプロセス内レスポンスキャッシュ
+
+月単位の集計結果を(年, 月)ごとに、日別の企業一覧を日付ごとに保持する。
+過去の期間は決算発表がほぼ確定しているため長い期間（デフォルト1時間）保持し、
+当日・当月以降は短い期間で失効させる。このプロセスで決算予定を書き込んだ際は
+upsert_earnings_calendar から invalidate_dates が呼ばれ、書き込まれた日付を含む
+エントリがすぐに破棄される。別のプロセス（CLIのバックフィルや auto_fetch_earnings）
+による書き込みは、過去の期間でも長い方の有効期間が過ぎると反映される。
+"""
+
+import os
+import time
+import threading
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_CLOSED_TTL_SECONDS = 60 * 60
+
+MonthKey = Tuple[int, int]
+
+
+def month_of(value) -> Optional[MonthKey]:
+    """date/datetime/'YYYY-MM-DD'文字列から(年, 月)を取得"""
+    if isinstance(value, (date, datetime)):
+        return value.year, value.month
+    if isinstance(value, str) and len(value) >= 7:
+        try:
+            return int(value[:4]), int(value[5:7])
+        except ValueError:
+            return None
+    return None
+
+
+def day_of(value) -> Optional[str]:
+    """date/datetime/'YYYY-MM-DD'文字列から'YYYY-MM-DD'を取得"""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, str) and len(value) >= 10:
+        return value[:10]
+    return None
+
+
+class _EarningsCache(ABC):
+    """期間キーごとのキャッシュ（過去の期間と当日・当月以降で有効期間が異なる）"""
+
+    def __init__(self, ttl_seconds: int = DEFAULT_TTL_SECONDS, closed_ttl_seconds: Optional[int] = None):
+        """
+        初期化
+
+        Args:
+            ttl_seconds: 当日・当月以降のエントリの有効期間（秒）
+            closed_ttl_seconds: 過去の期間のエントリの有効期間（秒）。Noneの場合は失効しない
+        """
+        self.ttl_seconds = ttl_seconds
+        self.closed_ttl_seconds = closed_ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+
+    @abstractmethod
+    def _key_of(self, value) -> Optional[Hashable]:
+        """書き込まれた日付からエントリのキーを求める"""
+
+    @abstractmethod
+    def _is_closed(self, key: Hashable) -> bool:
+        """キーの期間が過去の期間かを判定"""
+
+    def _ttl_of(self, key: Hashable) -> Optional[int]:
+        return self.closed_ttl_seconds if self._is_closed(key) else self.ttl_seconds
+
+    def _get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            ttl = self._ttl_of(key)
+            if ttl is not None and time.time() - stored_at > ttl:
+                del self._entries[key]
+                return None
+            return value
+
+    def _set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+
+    def invalidate_dates(self, dates: Iterable) -> int:
+        """書き込まれた日付を含むエントリを破棄し、破棄した件数を返す"""
+        keys = {self._key_of(value) for value in dates}
+        with self._lock:
+            removed = [key for key in keys if key and self._entries.pop(key, None) is not None]
+        return len(removed)
+
+    def clear(self):
+        """全エントリを削除"""
+        with self._lock:
+            self._entries.clear()
+
+
+class MonthlyEarningsCache(_EarningsCache):
+    """(年, 月)ごとの日別企業数"""
+
+    @staticmethod
+    def is_closed_month(year: int, month: int, today: Optional[date] = None) -> bool:
+        """当月より前の月（以後変更されない月）かを判定"""
+        today = today or date.today()
+        return (year, month) < (today.year, today.month)
+
+    def _key_of(self, value) -> Optional[MonthKey]:
+        return month_of(value)
+
+    def _is_closed(self, key: MonthKey) -> bool:
+        return self.is_closed_month(*key)
+
+    def get(self, year: int, month: int) -> Optional[Any]:
+        """キャッシュされた集計結果を取得（期限切れの場合はNone）"""
+        return self._get((year, month))
+
+    def set(self, year: int, month: int, value: Any):
+        """集計結果を保存"""
+        self._set((year, month), value)
+
+
+class DailyEarningsCache(_EarningsCache):
+    """日付ごとの決算発表企業一覧"""
+
+    def _key_of(self, value) -> Optional[str]:
+        return day_of(value)
+
+    def _is_closed(self, key: str) -> bool:
+        return key < date.today().isoformat()
+
+    def get(self, day: date) -> Optional[Any]:
+        """キャッシュされた企業一覧を取得（期限切れの場合はNone）"""
+        return self._get(day.isoformat())
+
+    def set(self, day: date, value: Any):
+        """企業一覧を保存"""
+        self._set(day.isoformat(), value)
+
+
+_ttl_seconds = int(os.getenv("EARNINGS_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+_closed_ttl_seconds = int(os.getenv("EARNINGS_CACHE_CLOSED_TTL_SECONDS", DEFAULT_CLOSED_TTL_SECONDS))
+monthly_earnings_cache = MonthlyEarningsCache(ttl_seconds=_ttl_seconds, closed_ttl_seconds=_closed_ttl_seconds)
+daily_earnings_cache = DailyEarningsCache(ttl_seconds=_ttl_seconds, closed_ttl_seconds=_closed_ttl_seconds)
+
+
+def invalidate_earnings_caches(dates: Iterable) -> None:
+    """決算予定の書き込み後に、該当する日付・月のキャッシュを破棄"""
+    dates = list(dates)
+    monthly_earnings_cache.invalidate_dates(dates)
+    daily_earnings_cache.invalidate_dates(dates)
@@ -1,31 +1,12 @@
-import os
 import asyncio
 from datetime import datetime, timezone
 import logging
 # from ..bigquery_service import BigQueryService  # BigQueryServiceを削除
 # from .financial_report_service_selenium import TDNetScraper  # 一時的にコメントアウト
 
-# ロガーの設定
+# ロガーの設定（出力先はルートロガーのキュー経由のハンドラー。モジュールで
+# ハンドラーを追加すると同じログが重複して出力されるため追加しない）
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-
-# ログファイルのパスを設定
-log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'logs')
-os.makedirs(log_dir, exist_ok=True)
-log_file = os.path.join(log_dir, 'tdnet_scraping.log')
-
-# ファイルハンドラーの追加
-fh = logging.FileHandler(log_file)
-fh.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-fh.setFormatter(formatter)
-logger.addHandler(fh)
-
-# コンソールハンドラーの追加
-ch = logging.StreamHandler()
-ch.setLevel(logging.INFO)
-ch.setFormatter(formatter)
-logger.addHandler(ch)
 
 class FinancialReportService:
     def __init__(self):
@@ -8,12 +8,23 @@ import json
 from typing import Dict, Any, Optional
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
+from googleapiclient.http import HttpRequest, MediaIoBaseUpload
 import io
 import logging
 
+from app.services.instrumentation import span
+
 logger = logging.getLogger(__name__)
 
+
+class TracedHttpRequest(HttpRequest):
+    """Drive・Sheets APIの呼び出しごとに所要時間を記録するHttpRequest"""
+
+    def execute(self, *args, **kwargs):
+        with span("google_drive", self.methodId or "request"):
+            return super().execute(*args, **kwargs)
+
+
 class GoogleDriveService:
     def __init__(self):
         self.service = None
@@ -44,11 +55,11 @@ class GoogleDriveService:
             
             # Google Drive APIサービスを構築
             print("Building Google Drive API service...")
-            self.service = build('drive', 'v3', credentials=credentials)
+            self.service = build('drive', 'v3', credentials=credentials, requestBuilder=TracedHttpRequest)
             
             # Google Sheets APIサービスも構築
             print("Building Google Sheets API service...")
-            self.sheets_service = build('sheets', 'v4', credentials=credentials)
+            self.sheets_service = build('sheets', 'v4', credentials=credentials, requestBuilder=TracedHttpRequest)
             
             print("Google Drive and Sheets API services initialized successfully")
             logger.info("Google Drive and Sheets API services initialized successfully")
@@ -381,44 +392,28 @@ class GoogleDriveService:
             return []
         
         try:
-            print(f"Starting Google Drive search for query: '{query}' in folder: {parent_folder_id}")
-            logger.info(f"Starting Google Drive search for query: '{query}' in folder: {parent_folder_id}")
-            
-            # まず、指定されたフォルダ内のすべてのアイテムを取得してテスト
-            print("Testing folder access...")
-            test_query = f"parents in '{parent_folder_id}' and trashed=false"
-            test_results = self.service.files().list(
-                q=test_query,
-                fields="files(id, name, mimeType)",
-                pageSize=10
-            ).execute()
-            
-            test_items = test_results.get('files', [])
-            print(f"Found {len(test_items)} items in folder {parent_folder_id}")
-            for item in test_items:
-                print(f"  - {item.get('name', 'Unknown')} ({item.get('mimeType', 'Unknown')})")
-            
             # 企業名でフォルダとスプレッドシートファイルを検索
             search_query = f"name contains '{query}' and parents in '{parent_folder_id}' and (mimeType='application/vnd.google-apps.folder' or mimeType='application/vnd.google-apps.spreadsheet') and trashed=false"
             
-            print(f"Executing search query: {search_query}")
-            logger.info(f"Executing search query: {search_query}")
-            
-            results = self.service.files().list(
-                q=search_query,
-                fields="files(id, name, mimeType, createdTime, modifiedTime, webViewLink)",
-                pageSize=50
-            ).execute()
-            
-            items = results.get('files', [])
-            logger.info(f"Raw API response: {results}")
-            logger.info(f"Found {len(items)} company items (folders/files) matching '{query}'")
-            logger.info(f"Search query used: {search_query}")
-            logger.info(f"Items found: {[item.get('name', 'Unknown') for item in items]}")
-            
-            # 各アイテムの詳細をログ出力
-            for i, item in enumerate(items):
-                logger.info(f"Item {i+1}: {item}")
+            # 一致するものをすべて取得（呼び出し側で並べ替えてページに分ける）
+            items = []
+            page_token = None
+            while True:
+                results = self.service.files().list(
+                    q=search_query,
+                    fields="nextPageToken, files(id, name, mimeType, createdTime, modifiedTime, webViewLink)",
+                    pageSize=1000,
+                    pageToken=page_token
+                ).execute()
+                items.extend(results.get('files', []))
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
+            logger.debug(
+                "Google Drive company search",
+                extra={"query": query, "folder_id": parent_folder_id, "count": len(items),
+                       "items": [item.get('name', 'Unknown') for item in items]},
+            )
             
             # フォルダとファイルを区別して処理
             processed_items = []
@@ -448,10 +443,43 @@ class GoogleDriveService:
             
             return processed_items
             
-        except Exception as e:
-            logger.error(f"Error searching company folders: {str(e)}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
+        except Exception:
+            logger.exception("Error searching company folders")
+            return []
+
+    def list_company_folders(self, parent_folder_id: str) -> list:
+        """親フォルダ直下の企業フォルダとスプレッドシートをすべて取得（検索候補の作成用）"""
+        if not self.service:
+            logger.error("Google Drive service not initialized")
+            return []
+        
+        try:
+            items = []
+            page_token = None
+            while True:
+                results = self.service.files().list(
+                    q=f"parents in '{parent_folder_id}' and (mimeType='application/vnd.google-apps.folder' or mimeType='application/vnd.google-apps.spreadsheet') and trashed=false",
+                    fields="nextPageToken, files(id, name, mimeType, webViewLink)",
+                    pageSize=1000,
+                    pageToken=page_token
+                ).execute()
+                items.extend(results.get('files', []))
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
+            
+            return [
+                {
+                    'id': item['id'],
+                    'name': item['name'],
+                    'webViewLink': item.get('webViewLink', ''),
+                    'type': 'folder' if item['mimeType'] == 'application/vnd.google-apps.folder' else 'spreadsheet'
+                }
+                for item in items
+            ]
+            
+        except Exception:
+            logger.exception("Error listing company folders")
             return []
 
     def get_company_folder_files(self, folder_id: str) -> list:
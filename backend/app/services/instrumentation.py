@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+リクエストと外部サービス呼び出しの計測
+
+- TimingMiddleware: リクエストごとの処理時間・ステータスを記録し、レスポンスに
+  Server-Timingヘッダー（外部サービスごとの合計時間）を付ける
+- span / traced: Snowflake・Google Drive・yfinance・SEC・OpenAIなどの呼び出しを囲む
+  コンテキストマネージャーとデコレーター。実行時間を依存先・操作ごとのヒストグラムに
+  記録し、リクエスト中であればそのリクエストのServer-Timingにも加える。同じ依存先の
+  spanの中で呼ばれたspan（queryの中のquery_arrowなど）は二重に数えない
+- render_metrics: 記録した値をPrometheusのテキスト形式で出力（/api/metrics）
+
+リクエスト中の記録はcontextvarsで受け渡すため、asyncio.to_threadで実行した処理の
+中で記録した時間も呼び出し元のリクエストに集計される。
+
+PROFILING_ENABLED=true の場合、?profile=1 またはヘッダー X-Profile: 1 を付けた
+リクエスト（PROFILE_SAMPLE_RATE を指定した場合はその割合のリクエストも）を
+プロファイルし、結果をapp/logs/profilesに保存する。pyinstrumentがインストール
+されていればHTML、なければcProfileの.profファイルを出力する。
+"""
+
+import os
+import re
+import time
+import random
+import asyncio
+import functools
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PROFILE_DIR = Path(__file__).resolve().parents[1] / 'logs' / 'profiles'
+
+# 現在のリクエストで記録した (依存先, 秒) のリスト（リクエスト外ではNone）
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('request_spans', default=None)
+# 実行中のspanの依存先
+_active_dependencies: ContextVar[FrozenSet[str]] = ContextVar('active_dependencies', default=frozenset())
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+class Counter:
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # ラベルの値 -> [バケットごとの件数, 合計, 件数]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (bucket_counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.label_names + ('le',), key + (f"{bound:g}",))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_names + ('le',), key + ('+Inf',))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {total:.6f}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+HTTP_REQUESTS = Counter(
+    "bizlens_http_requests_total", "処理したHTTPリクエスト数", ("method", "route", "status"))
+HTTP_REQUEST_DURATION = Histogram(
+    "bizlens_http_request_duration_seconds", "HTTPリクエストの処理時間（秒）", ("method", "route"))
+DEPENDENCY_DURATION = Histogram(
+    "bizlens_dependency_duration_seconds", "外部サービス呼び出しの所要時間（秒）", ("dependency", "operation"))
+DEPENDENCY_ERRORS = Counter(
+    "bizlens_dependency_errors_total", "例外で終了した外部サービス呼び出しの数", ("dependency", "operation"))
+
+METRICS = [HTTP_REQUESTS, HTTP_REQUEST_DURATION, DEPENDENCY_DURATION, DEPENDENCY_ERRORS]
+
+
+def render_metrics() -> str:
+    """記録したメトリクスをPrometheusのテキスト形式で出力"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def span(dependency: str, operation: str) -> Iterator[None]:
+    """
+    外部サービスの呼び出しを計測
+
+        with span("snowflake", "query"):
+            cursor.execute(...)
+    """
+    active = _active_dependencies.get()
+    if dependency in active:
+        yield
+        return
+
+    token = _active_dependencies.set(active | {dependency})
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        _active_dependencies.reset(token)
+        DEPENDENCY_DURATION.observe(elapsed, dependency=dependency, operation=operation)
+        if failed:
+            DEPENDENCY_ERRORS.inc(dependency=dependency, operation=operation)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((dependency, elapsed))
+
+
+def traced(dependency: str, operation: Optional[str] = None) -> Callable:
+    """
+    関数の呼び出しをspanで計測するデコレーター（operationのデフォルトは関数名）
+
+    ジェネレーター関数に付けると作成までしか計測されないため、その場合は中で
+    spanを使う。
+    """
+    def decorator(func):
+        name = operation or func.__name__.lstrip('_')
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(dependency, name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(dependency, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def server_timing_header(spans: List[Tuple[str, float]], total_seconds: float) -> str:
+    """依存先ごとの合計時間と呼び出し回数をServer-Timingヘッダーの値にする"""
+    totals: Dict[str, List[float]] = {}
+    for dependency, elapsed in spans:
+        entry = totals.setdefault(dependency, [0.0, 0])
+        entry[0] += elapsed
+        entry[1] += 1
+    metrics = [
+        f'{re.sub(r"[^A-Za-z0-9_-]", "_", dependency)};desc="{count} calls";dur={seconds * 1000:.1f}'
+        for dependency, (seconds, count) in totals.items()
+    ]
+    metrics.append(f"app;dur={total_seconds * 1000:.1f}")
+    return ", ".join(metrics)
+
+
+def _route_template(scope) -> str:
+    """メトリクスのラベルに使うルートのパス（/api/companies/{ticker} など）"""
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    # scope["route"]を設定しないバージョンのStarlette向けに、エンドポイントから探す
+    endpoint = scope.get("endpoint")
+    app = scope.get("app")
+    if endpoint is not None and app is not None:
+        for candidate in getattr(app, "routes", []):
+            if getattr(candidate, "endpoint", None) is endpoint:
+                return candidate.path
+    return "unmatched"
+
+
+class RequestProfiler:
+    """1リクエスト分のプロファイル（同時に1リクエストだけ）"""
+
+    _lock = threading.Lock()
+
+    def __init__(self, name: str):
+        self.name = name
+        self.path: Optional[Path] = None
+        self._profiler = None
+
+    def start(self) -> bool:
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            from pyinstrument import Profiler
+            self._profiler = Profiler(async_mode="enabled")
+        except ImportError:
+            import cProfile
+            self._profiler = cProfile.Profile()
+        try:
+            if hasattr(self._profiler, "output_html"):
+                self._profiler.start()
+            else:
+                self._profiler.enable()
+        except Exception as e:
+            print(f"Could not start profiler: {str(e)}")
+            self._profiler = None
+            self._lock.release()
+            return False
+        return True
+
+    def stop(self) -> Optional[Path]:
+        if self._profiler is None:
+            return None
+        try:
+            PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            stem = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{re.sub(r'[^A-Za-z0-9_-]+', '_', self.name).strip('_')}"
+            if hasattr(self._profiler, "output_html"):
+                self._profiler.stop()
+                self.path = PROFILE_DIR / f"{stem}.html"
+                self.path.write_text(self._profiler.output_html(), encoding="utf-8")
+            else:
+                self._profiler.disable()
+                self.path = PROFILE_DIR / f"{stem}.prof"
+                self._profiler.dump_stats(str(self.path))
+            print(f"Saved request profile to {self.path}")
+            return self.path
+        except Exception as e:
+            print(f"Could not save profile: {str(e)}")
+            return None
+        finally:
+            self._profiler = None
+            self._lock.release()
+
+
+def _should_profile(scope) -> bool:
+    if os.getenv("PROFILING_ENABLED", "false").lower() != "true":
+        return False
+    query = scope.get("query_string", b"").decode("latin-1")
+    if re.search(r'(^|&)profile=(1|true)(&|$)', query):
+        return True
+    for name, value in scope.get("headers", []):
+        if name == b"x-profile" and value in (b"1", b"true"):
+            return True
+    sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0") or 0)
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+class TimingMiddleware:
+    """
+    リクエストの処理時間を記録し、Server-Timingヘッダーを付けるASGIミドルウェア
+
+    ストリーミングレスポンスではヘッダー送信時点までに記録した時間がServer-Timingに
+    入り、メトリクスにはレスポンスの送信完了までの時間を記録する。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        spans: List[Tuple[str, float]] = []
+        token = _request_spans.set(spans)
+        started = time.perf_counter()
+        status = 500
+        profiler = RequestProfiler(f"{scope['method']} {scope['path']}") if _should_profile(scope) else None
+        if profiler is not None and not profiler.start():
+            profiler = None
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                value = server_timing_header(spans, time.perf_counter() - started)
+                headers.append((b"server-timing", value.encode("latin-1")))
+                if profiler is not None:
+                    headers.append((b"x-profile", b"enabled"))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = _route_template(scope)
+            HTTP_REQUEST_DURATION.observe(elapsed, method=scope["method"], route=route)
+            HTTP_REQUESTS.inc(method=scope["method"], route=route, status=status)
+            if profiler is not None:
+                profiler.stop()
+            _request_spans.reset(token)
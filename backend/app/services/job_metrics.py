@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+定期実行ジョブの実行状況の記録
+
+ジョブごとに実行回数、成功・失敗・スキップの回数、直近の実行時間と結果を保持する。
+スケジューラの管理画面やメトリクスの出力で参照する。
+"""
+
+import time
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+
+class JobMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    def _entry(self, job_id: str) -> Dict[str, Any]:
+        if job_id not in self._jobs:
+            self._jobs[job_id] = {
+                "runs": 0,
+                "successes": 0,
+                "failures": 0,
+                "skipped": 0,
+                "misfires": 0,
+                "running": False,
+                "total_seconds": 0.0,
+                "max_seconds": 0.0,
+                "last_started_at": None,
+                "last_finished_at": None,
+                "last_duration_seconds": None,
+                "last_status": None,
+                "last_error": None,
+                "last_result": None,
+                "last_skipped_reason": None,
+            }
+        return self._jobs[job_id]
+
+    def is_running(self, job_id: str) -> bool:
+        with self._lock:
+            return self._jobs.get(job_id, {}).get("running", False)
+
+    def start(self, job_id: str) -> float:
+        """実行開始を記録し、開始時刻（perf_counter）を返す"""
+        with self._lock:
+            entry = self._entry(job_id)
+            entry["running"] = True
+            entry["last_started_at"] = datetime.now(timezone.utc).isoformat()
+        return time.perf_counter()
+
+    def finish(self, job_id: str, started: float, result: Any = None, error: Optional[BaseException] = None):
+        """実行終了を記録"""
+        duration = time.perf_counter() - started
+        with self._lock:
+            entry = self._entry(job_id)
+            entry["running"] = False
+            entry["runs"] += 1
+            entry["total_seconds"] += duration
+            entry["max_seconds"] = max(entry["max_seconds"], duration)
+            entry["last_finished_at"] = datetime.now(timezone.utc).isoformat()
+            entry["last_duration_seconds"] = round(duration, 3)
+            if error is None:
+                entry["successes"] += 1
+                entry["last_status"] = "success"
+                entry["last_error"] = None
+                entry["last_result"] = result
+            else:
+                entry["failures"] += 1
+                entry["last_status"] = "failed"
+                entry["last_error"] = str(error)
+
+    def record_skipped(self, job_id: str, reason: str):
+        """前回の実行が終わっていないなどの理由で実行しなかったことを記録"""
+        with self._lock:
+            entry = self._entry(job_id)
+            entry["skipped"] += 1
+            entry["last_skipped_reason"] = reason
+
+    def record_misfire(self, job_id: str):
+        """予定時刻から猶予時間を過ぎて実行されなかったことを記録"""
+        with self._lock:
+            self._entry(job_id)["misfires"] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """ジョブごとの実行状況（平均実行時間を含む）のコピー"""
+        with self._lock:
+            result = {}
+            for job_id, entry in self._jobs.items():
+                item = dict(entry)
+                item["average_seconds"] = round(entry["total_seconds"] / entry["runs"], 3) if entry["runs"] else None
+                item["total_seconds"] = round(entry["total_seconds"], 3)
+                item["max_seconds"] = round(entry["max_seconds"], 3)
+                result[job_id] = item
+            return result
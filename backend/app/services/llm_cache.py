@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+OpenAI APIレスポンスの永続キャッシュ
+
+(モデル, システムプロンプト, ユーザープロンプト) のハッシュをキーとして
+チャット補完の結果をSQLiteに保存する。TTLと最大件数で古いエントリを削除し、
+同じキーのリクエストが同時に発生した場合は最初の1件だけをAPIに送信して
+結果を共有する。
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable
+
+DEFAULT_CACHE_PATH = Path(__file__).parent.parent / 'cache' / 'llm_cache.sqlite3'
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 1000
+
+
+def make_cache_key(model: str, system_prompt: str, user_prompt: str) -> str:
+    """キャッシュキーを生成"""
+    payload = json.dumps([model, system_prompt, user_prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        """
+        初期化
+
+        Args:
+            path: SQLiteファイルのパス（":memory:"でメモリ上に作成）
+            ttl_seconds: エントリの有効期間（秒）
+            max_entries: 保持する最大エントリ数（超えた分は最終アクセスが古い順に削除）
+        """
+        self.path = str(path or DEFAULT_CACHE_PATH)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "upstream_calls": 0,
+            "upstream_errors": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "saved_prompt_tokens": 0,
+            "saved_completion_tokens": 0,
+            "upstream_latency_ms": 0.0,
+            "cached_latency_ms": 0.0,
+        }
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """有効なキャッシュエントリを取得（期限切れの場合は削除してNone）"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET last_accessed = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        return json.loads(response)
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """エントリを保存し、最大件数を超えた分を削除"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, created_at, last_accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            self._conn.execute("""
+                DELETE FROM llm_cache WHERE key NOT IN (
+                    SELECT key FROM llm_cache ORDER BY last_accessed DESC LIMIT ?
+                )
+            """, (self.max_entries,))
+            self._conn.commit()
+
+    def clear(self):
+        """全エントリを削除"""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """
+        キャッシュから取得し、なければcomputeを実行して保存
+
+        computeは {"content": str, "usage": {...}} を返す。Noneを返した場合
+        （APIエラーなど）はキャッシュしない。同じキーで実行中のリクエストが
+        あればその結果を待って共有する。
+        """
+        start = time.perf_counter()
+        cached = self.get(key)
+        if cached is not None:
+            usage = cached.get("usage") or {}
+            with self._lock:
+                self._stats["hits"] += 1
+                self._stats["saved_prompt_tokens"] += usage.get("prompt_tokens", 0)
+                self._stats["saved_completion_tokens"] += usage.get("completion_tokens", 0)
+                self._stats["cached_latency_ms"] += (time.perf_counter() - start) * 1000
+            return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            # 直前に別スレッドが保存した可能性があるため再確認
+            cached = self.get(key)
+            if cached is not None:
+                future.set_result(cached)
+                return cached
+
+            upstream_start = time.perf_counter()
+            value = compute()
+            elapsed_ms = (time.perf_counter() - upstream_start) * 1000
+            with self._lock:
+                self._stats["upstream_calls"] += 1
+                self._stats["upstream_latency_ms"] += elapsed_ms
+                if value is None:
+                    self._stats["upstream_errors"] += 1
+                else:
+                    usage = value.get("usage") or {}
+                    self._stats["prompt_tokens"] += usage.get("prompt_tokens", 0)
+                    self._stats["completion_tokens"] += usage.get("completion_tokens", 0)
+            if value is not None:
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            with self._lock:
+                self._stats["upstream_errors"] += 1
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """キャッシュの統計情報（ヒット数、トークン数、レイテンシ）"""
+        with self._lock:
+            stats = dict(self._stats)
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["entries"] = entries
+        stats["hit_rate"] = (stats["hits"] + stats["coalesced"]) / lookups if lookups else 0.0
+        stats["avg_upstream_latency_ms"] = (
+            stats["upstream_latency_ms"] / stats["upstream_calls"] if stats["upstream_calls"] else 0.0
+        )
+        stats["avg_cached_latency_ms"] = (
+            stats["cached_latency_ms"] / stats["hits"] if stats["hits"] else 0.0
+        )
+        return stats
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """プロセス内で共有するキャッシュを取得（環境変数で設定可能）"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache(
+                path=os.getenv("LLM_CACHE_PATH") or None,
+                ttl_seconds=int(os.getenv("LLM_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+                max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            )
+        return _cache
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+キーセット（カーソル）ページネーション
+
+一覧は (時価総額の降順, tickerの昇順) のように行が一意に決まる順で返し、ページの最後の
+行の並び替えキーを不透明なカーソル（base64urlの文字列）として返す。次のページは
+カーソルの位置より後ろの行を、SQLではシーク条件（WHERE (キー) < (カーソルの値)）、
+並べ替え済みの配列では二分探索で求めるため、OFFSETのように前のページの行を読み飛ばす
+必要がなく、深いページでも1ページ目と同じコストで取得できる。
+
+カーソルには検索条件のハッシュを含め、別の条件の検索に渡された場合は InvalidCursor にする。
+
+使い方:
+    filters = filters_fingerprint(query=query, country=country)
+    position = decode_cursor(cursor, filters) if cursor else None
+    seek_sql, seek_params = market_cap_seek(position)
+    ...
+    next_cursor = encode_cursor((row["sort_market_cap"], row["ticker"]), filters) if has_more else None
+"""
+
+import json
+import base64
+import bisect
+import hashlib
+from typing import Any, List, Optional, Sequence, Tuple
+
+CURSOR_VERSION = 1
+
+# 企業の一覧の並び順（SORT_MARKET_CAP は COALESCE(MARKET_CAP, 0)::FLOAT の別名）
+MARKET_CAP_SORT_COLUMN = "COALESCE(MARKET_CAP, 0)::FLOAT AS SORT_MARKET_CAP"
+MARKET_CAP_ORDER = "SORT_MARKET_CAP DESC, TICKER ASC"
+
+
+class InvalidCursor(ValueError):
+    """形式が不正なカーソル、または別の検索条件のカーソル"""
+
+
+def filters_fingerprint(**filters: Any) -> str:
+    """検索条件のハッシュ（カーソルが同じ条件の検索に使われていることの確認用）"""
+    payload = json.dumps(filters, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+
+def encode_cursor(position: Sequence[Any], filters: str = "") -> str:
+    """並び替えキーの値をカーソルの文字列にする"""
+    payload = json.dumps({"v": CURSOR_VERSION, "k": list(position), "f": filters}, separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, filters: str = "") -> Tuple[Any, ...]:
+    """カーソルの文字列を並び替えキーの値に戻す"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        position = tuple(payload["k"])
+        version, cursor_filters = payload["v"], payload["f"]
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor(f"invalid cursor: {str(e)}") from e
+    if version != CURSOR_VERSION:
+        raise InvalidCursor(f"unsupported cursor version: {version}")
+    if cursor_filters != filters:
+        raise InvalidCursor("cursor was issued for different search conditions")
+    return position
+
+
+def market_cap_seek(position: Optional[Sequence[Any]]) -> Tuple[str, List[Any]]:
+    """
+    (SORT_MARKET_CAP DESC, TICKER ASC) でpositionより後ろの行を選ぶ条件
+
+    Args:
+        position: (時価総額, ticker)。Noneの場合は全行（"1=1"）
+    """
+    if position is None:
+        return "1=1", []
+    if len(position) != 2:
+        raise InvalidCursor("cursor does not point to a (market_cap, ticker) position")
+    market_cap, ticker = position
+    try:
+        market_cap = float(market_cap)
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor(f"invalid market_cap in cursor: {str(e)}") from e
+    return "(SORT_MARKET_CAP < %s OR (SORT_MARKET_CAP = %s AND TICKER > %s))", [market_cap, market_cap, str(ticker)]
+
+
+def seek_sorted(keys: Sequence[Tuple[Any, ...]], position: Optional[Sequence[Any]]) -> int:
+    """昇順に並んだキーの配列で、positionより後ろの最初の位置（Noneなら0）"""
+    if position is None:
+        return 0
+    try:
+        return bisect.bisect_right(keys, tuple(position))
+    except TypeError as e:
+        raise InvalidCursor(f"cursor does not match the sort keys: {str(e)}") from e
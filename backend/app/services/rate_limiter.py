@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+外部サイトへのリクエスト間隔・同時実行数の制御
+
+スクレイピング先ごとに、リクエストの開始間隔（1秒あたりのリクエスト数）と
+同時に実行するリクエスト数の上限を設ける。並行処理に切り替えた取得処理が
+同じサイトへ一度にリクエストを送らないようにするために使う。
+"""
+
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+
+class AsyncRateLimiter:
+    def __init__(self, rate_per_second: float = 1.0, max_concurrency: int = 1):
+        """
+        初期化
+
+        Args:
+            rate_per_second: 1秒あたりに開始できるリクエスト数
+            max_concurrency: 同時に実行できるリクエスト数
+        """
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self.max_concurrency = max(1, max_concurrency)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._next_start = 0.0
+
+    def _ensure_primitives(self):
+        # イベントループの外で生成されても使えるよう、初回利用時に作成する
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._lock = asyncio.Lock()
+
+    async def _wait_for_slot(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    @asynccontextmanager
+    async def limit(self):
+        """リクエスト1件分の実行枠を確保する"""
+        self._ensure_primitives()
+        async with self._semaphore:
+            await self._wait_for_slot()
+            yield
+
+
+class HostRateLimiter:
+    def __init__(
+        self,
+        rate_per_second: float = 1.0,
+        max_concurrency: int = 1,
+        overrides: Optional[Dict[str, Tuple[float, int]]] = None,
+    ):
+        """
+        初期化
+
+        Args:
+            rate_per_second: ホストごとの1秒あたりのリクエスト数（デフォルト）
+            max_concurrency: ホストごとの同時リクエスト数（デフォルト）
+            overrides: ホスト名 -> (rate_per_second, max_concurrency) の個別設定
+        """
+        self.rate_per_second = rate_per_second
+        self.max_concurrency = max_concurrency
+        self.overrides = overrides or {}
+        self._limiters: Dict[str, AsyncRateLimiter] = {}
+
+    def for_host(self, host: str) -> AsyncRateLimiter:
+        """ホストの制限を取得（未作成なら作成）"""
+        if host not in self._limiters:
+            rate, concurrency = self.overrides.get(host, (self.rate_per_second, self.max_concurrency))
+            self._limiters[host] = AsyncRateLimiter(rate, concurrency)
+        return self._limiters[host]
+
+    def limit(self, url: str):
+        """URLのホストに対するリクエスト1件分の実行枠を確保する"""
+        return self.for_host(urlparse(url).netloc).limit()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+サービスの遅延初期化
+
+SnowflakeServiceなどの接続を伴うサービスをモジュールのインポート時ではなく最初に
+使われたときに作成し、以降は同じインスタンスを共有する。FastAPIのDependsに
+そのまま渡せるため、エンドポイントは引数で受け取る。
+
+    @router.get("/...")
+    async def endpoint(snowflake_service=Depends(get_snowflake_service)):
+        ...
+
+サービスのモジュールも作成時にインポートするため、アプリケーションの起動時に
+Snowflakeのコネクタやyfinanceなどを読み込まない。同じ理由で、サービスの中の
+pandasも使う関数の中でインポートする（型注釈にはTYPE_CHECKINGの中でインポートする）。
+"""
+
+import threading
+from typing import Any, Callable, Dict, Optional
+
+_lock = threading.Lock()
+_instances: Dict[str, Any] = {}
+
+
+def _get_or_create(name: str, factory: Callable[[], Any], is_usable: Optional[Callable[[Any], bool]] = None) -> Any:
+    """nameのインスタンスを取得（未作成、または使えない状態なら作成）"""
+    instance = _instances.get(name)
+    if instance is not None and (is_usable is None or is_usable(instance)):
+        return instance
+    with _lock:
+        instance = _instances.get(name)
+        if instance is None or (is_usable is not None and not is_usable(instance)):
+            instance = factory()
+            _instances[name] = instance
+        return instance
+
+
+def _create_snowflake_service():
+    from app.services.snowflake_service import SnowflakeService
+    return SnowflakeService()
+
+
+def _create_company_service():
+    from app.services.company_service import CompanyService
+    return CompanyService()
+
+
+def get_snowflake_service():
+    """共有のSnowflakeServiceを取得（接続に失敗していた場合は次の呼び出しで接続し直す）"""
+    return _get_or_create("snowflake", _create_snowflake_service, lambda service: service.conn is not None)
+
+
+def get_company_service():
+    """共有のCompanyServiceを取得"""
+    return _get_or_create("company", _create_company_service)
+
+
+def create_snowflake_service():
+    """
+    共有しない新しいSnowflakeServiceを作成
+
+    CSVやParquetの取り込みなど、実行に時間がかかり最後に接続を閉じる処理で使う。
+    """
+    return _create_snowflake_service()
+
+
+def reset_services():
+    """作成済みのサービスを破棄（Snowflakeの接続は閉じる）"""
+    with _lock:
+        instances = list(_instances.values())
+        _instances.clear()
+    for instance in instances:
+        close = getattr(instance, "close_connection", None)
+        if close is not None:
+            try:
+                close()
+            except Exception as e:
+                print(f"Error closing service: {str(e)}")
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+読み取り専用APIのレスポンスキャッシュ
+
+業種・国の一覧や企業詳細など、データの更新が1日に数回程度のエンドポイントの
+レスポンス本文を「パス + 並べ替えたクエリ文字列」をキーに保存する。
+
+- 保存先はプロセス内のLRU（デフォルト）か、RESPONSE_CACHE_REDIS_URL を指定した
+  場合はRedis互換のサーバー（複数プロセスで共有）。テストではInMemoryRedisを使う
+- 本文のハッシュからETagを作り、If-None-Matchが一致すれば本文なしの304を返す
+- エントリには企業ごと（company:{TICKER}）・一覧全体（companies）のタグを付け、
+  企業情報を書き込んだ際に invalidate_company_responses で該当するエントリを破棄する
+
+使い方:
+    @router.get("/{ticker}")
+    @cached_response(lambda ticker, **_: [company_tag(ticker)], ttl_seconds=60)
+    async def get_company_detail(request: Request, ticker: str, ...):
+        ...
+
+デコレーターを付けるエンドポイントは request: Request を引数に持つ必要がある。
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import functools
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_MAX_ENTRIES = 1024
+COMPANIES_TAG = "companies"
+# これより多くの企業を書き込んだ場合は企業ごとではなく全体を破棄する
+MAX_TAGS_PER_INVALIDATION = 200
+
+
+def company_tag(ticker: str) -> str:
+    return f"company:{str(ticker).strip().upper()}"
+
+
+class LocalBackend:
+    """プロセス内のLRU（期限付き）"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # キー -> (期限, 値, タグ)
+        self._entries: "OrderedDict[str, Tuple[float, bytes, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ttl_seconds: int, tags: Iterable[str] = ()):
+        tags = tuple(tags)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl_seconds, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tags.get(tag, set())
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Redis互換サーバーに保存するバックエンド
+
+    エントリはSET（EX付き）で保存し、タグごとのキーの集合をSADDで保持する。
+    clientはredis.Redisと同じget/set/delete/sadd/smembers/expire/scan_iterを持つもの。
+    """
+
+    def __init__(self, client, prefix: str = "bizlens:response:"):
+        self.client = client
+        self.prefix = prefix
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl_seconds: int, tags: Iterable[str] = ()):
+        self.client.set(self.prefix + key, value, ex=ttl_seconds)
+        for tag in tags:
+            tag_key = self._tag_key(tag)
+            self.client.sadd(tag_key, key)
+            # タグの集合はエントリより先に消えないようにする
+            self.client.expire(tag_key, ttl_seconds * 2)
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        removed = 0
+        for tag in tags:
+            tag_key = self._tag_key(tag)
+            keys = [key.decode() if isinstance(key, bytes) else key for key in self.client.smembers(tag_key)]
+            if keys:
+                removed += self.client.delete(*[self.prefix + key for key in keys])
+            self.client.delete(tag_key)
+        return removed
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=f"{self.prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class InMemoryRedis:
+    """RedisBackendが使うコマンドだけを実装したプロセス内のRedis（テスト用）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+
+    def _alive(self, key: str) -> bool:
+        expires = self._expires.get(key)
+        if expires is not None and expires < time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._data.get(key) if self._alive(key) else None
+
+    def set(self, key: str, value: bytes, ex: Optional[int] = None):
+        with self._lock:
+            self._data[key] = value
+            if ex is not None:
+                self._expires[key] = time.monotonic() + ex
+            else:
+                self._expires.pop(key, None)
+        return True
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._alive(key):
+                    removed += 1
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            return removed
+
+    def sadd(self, key: str, *members: str) -> int:
+        with self._lock:
+            if not self._alive(key):
+                self._data[key] = set()
+            current = self._data[key]
+            before = len(current)
+            current.update(members)
+            return len(current) - before
+
+    def smembers(self, key: str) -> Set[str]:
+        with self._lock:
+            return set(self._data.get(key, set())) if self._alive(key) else set()
+
+    def expire(self, key: str, seconds: int) -> bool:
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self._expires[key] = time.monotonic() + seconds
+            return True
+
+    def scan_iter(self, match: str = "*"):
+        prefix = match.rstrip("*")
+        with self._lock:
+            keys = [key for key in list(self._data) if key.startswith(prefix) and self._alive(key)]
+        return iter(keys)
+
+
+class ResponseCache:
+    def __init__(self, backend=None, ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        self.backend = backend if backend is not None else LocalBackend()
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def key_for(request: Request) -> str:
+        """パスと（並べ替えた）クエリ文字列からキーを作成"""
+        query = urlencode(sorted(request.query_params.multi_items()))
+        return f"{request.url.path}?{query}" if query else request.url.path
+
+    @staticmethod
+    def etag_for(body: bytes) -> str:
+        return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            stored = self.backend.get(key)
+        except Exception:
+            logger.warning("Response cache read failed", exc_info=True)
+            return None
+        if stored is None:
+            return None
+        header, _, body = stored.partition(b"\n")
+        entry = json.loads(header)
+        entry["body"] = body
+        return entry
+
+    def set(self, key: str, body: bytes, media_type: Optional[str], tags: Iterable[str] = (), ttl_seconds: Optional[int] = None) -> Dict[str, Any]:
+        """本文を保存し、ETagを含むエントリを返す（保存に失敗してもエントリは返す）"""
+        entry = {"etag": self.etag_for(body), "media_type": media_type}
+        try:
+            stored = json.dumps(entry).encode() + b"\n" + body
+            self.backend.set(key, stored, ttl_seconds or self.ttl_seconds, tags)
+        except Exception:
+            logger.warning("Response cache write failed", exc_info=True)
+        entry["body"] = body
+        return entry
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        try:
+            return self.backend.invalidate(list(tags))
+        except Exception:
+            logger.warning("Response cache invalidation failed", exc_info=True)
+            return 0
+
+    def clear(self):
+        self.backend.clear()
+
+    @staticmethod
+    def respond(entry: Dict[str, Any], request: Request, cache_status: str) -> Response:
+        """エントリからレスポンスを作成（If-None-Matchが一致すれば304）"""
+        headers = {"ETag": entry["etag"], "Cache-Control": "no-cache", "X-Cache": cache_status}
+        if_none_match = request.headers.get("if-none-match", "")
+        if entry["etag"] in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry["body"], media_type=entry["media_type"], headers=headers)
+
+
+def _create_backend():
+    redis_url = os.getenv("RESPONSE_CACHE_REDIS_URL")
+    if redis_url:
+        try:
+            import redis
+            return RedisBackend(redis.Redis.from_url(redis_url))
+        except Exception:
+            logger.warning("Could not use Redis for response cache, falling back to in-process cache", exc_info=True)
+    return LocalBackend(max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)))
+
+
+_response_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """アプリケーション全体で共有するレスポンスキャッシュを取得"""
+    global _response_cache
+    if _response_cache is None:
+        with _cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache(
+                    _create_backend(),
+                    ttl_seconds=int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+                )
+    return _response_cache
+
+
+def set_response_cache(cache: Optional[ResponseCache]):
+    """共有のレスポンスキャッシュを差し替える（テスト用。Noneで次回作成し直す）"""
+    global _response_cache
+    _response_cache = cache
+
+
+def invalidate_company_responses(tickers: Optional[Iterable[str]] = None) -> None:
+    """
+    企業情報の書き込み後に、該当する企業と一覧のキャッシュを破棄
+
+    tickersを省略した場合や件数が多い場合はキャッシュ全体を破棄する。
+    """
+    cache = get_response_cache()
+    tickers = [ticker for ticker in (tickers or []) if ticker]
+    if not tickers or len(tickers) > MAX_TAGS_PER_INVALIDATION:
+        try:
+            cache.clear()
+        except Exception:
+            logger.warning("Response cache clear failed", exc_info=True)
+        return
+    cache.invalidate([COMPANIES_TAG] + [company_tag(ticker) for ticker in tickers])
+
+
+def cached_response(tags: Callable[..., List[str]], ttl_seconds: Optional[int] = None):
+    """
+    エンドポイントのレスポンスをキャッシュするデコレーター
+
+    Args:
+        tags: エンドポイントの引数（キーワード引数）を受け取り、エントリのタグを返す関数
+        ttl_seconds: 有効期間（省略時はキャッシュのデフォルト）
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs["request"]
+            cache = get_response_cache()
+            key = cache.key_for(request)
+            entry = cache.get(key)
+            if entry is not None:
+                return cache.respond(entry, request, "HIT")
+
+            result = await func(*args, **kwargs)
+            response = result if isinstance(result, Response) else JSONResponse(jsonable_encoder(result))
+            if response.status_code != 200 or not hasattr(response, "body"):
+                return response
+            entry = cache.set(key, response.body, response.media_type, tags(**kwargs), ttl_seconds)
+            return cache.respond(entry, request, "MISS")
+        return wrapper
+    return decorator
@@ -1,43 +1,257 @@
+"""
+データの定期更新スケジューラ
+
+APSchedulerで次のジョブを実行する。ジョブの定義と次回実行時刻はSQLAlchemyの
+ジョブストア（デフォルトはapp/cache/scheduler/jobs.sqlite）に保存するため、
+サーバーを再起動しても予定が引き継がれ、停止中に実行されなかったジョブは
+猶予時間内であれば起動後に1回だけ実行される。
+
+- daily_prices: 平日16:00 株価・出来高（yfinanceのdownloadで数百銘柄ずつ一括取得）
+- weekly_financials: 土曜3:00 財務指標（企業ごとにTicker.infoを取得）
+- monthly_earnings: 毎月1日4:00 決算予定（今月から3か月分を差分同期）
+- search_index: 毎日5:30・17:30 企業検索インデックスと検索候補の作り直し（株価更新後の時価総額を順位に反映）
+
+同じジョブは同時に1つしか実行しない。ジョブごとの実行回数・実行時間・結果は
+JobMetricsに記録する。
+
+重複実行を防ぐのはプロセス内だけなので、スケジューラは SCHEDULER_ENABLED=true を
+指定した1つのプロセス（複数のワーカー・マシンで動かす場合はそのうちの1つ）でだけ開始する。
+"""
+
+from __future__ import annotations
+
+import os
+import asyncio
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from datetime import datetime
-from .companies.data_collector import DataCollector
-from .bigquery_service import BigQueryService
+from apscheduler.triggers.cron import CronTrigger
+
+from .company_updates import create_financial_update_job, update_prices
+from .company_search_index import get_company_search_index
+from .company_suggest import get_company_suggester
+from .job_metrics import JobMetrics
+from .company_tables import COMPANY_TABLES
+
+# Snowflakeのコネクタ（pandas・pyarrowを含む）はジョブの初回実行時に読み込む
+if TYPE_CHECKING:
+    from .snowflake_service import SnowflakeService
+
+TIMEZONE = 'Asia/Tokyo'
+DEFAULT_JOBSTORE_PATH = Path(__file__).resolve().parents[1] / 'cache' / 'scheduler' / 'jobs.sqlite'
+
+# 株価・財務指標を更新する国（COMPANIES_CNは財務指標のカラム名が異なるため対象外）
+UPDATE_COUNTRIES = ['JP', 'US']
+EARNINGS_MONTHS_AHEAD = 3
+
+
+async def update_daily_prices(snowflake_service: SnowflakeService) -> Dict[str, Any]:
+    """全企業の株価・出来高を更新"""
+    results = {}
+    for country in UPDATE_COUNTRIES:
+        tickers = await asyncio.to_thread(snowflake_service.get_company_tickers, country)
+        results[country] = await update_prices(snowflake_service, COMPANY_TABLES[country], country, tickers)
+    return results
+
+
+async def update_weekly_financials(snowflake_service: SnowflakeService) -> Dict[str, Any]:
+    """全企業の財務指標を更新"""
+    results = {}
+    for country in UPDATE_COUNTRIES:
+        tickers = await asyncio.to_thread(snowflake_service.get_company_tickers, country)
+        job = create_financial_update_job(snowflake_service, COMPANY_TABLES[country], country)
+        final = {}
+        async for event in job.run(tickers):
+            final = event
+        results[country] = {
+            "requested": len(tickers),
+            "updated": final.get('updated', 0),
+            "failed": len(final.get('failed', [])),
+        }
+    return results
+
+
+async def update_monthly_earnings(snowflake_service: SnowflakeService) -> Dict[str, Any]:
+    """今月から数か月分の決算予定を差分同期"""
+    from app.scripts.earnings_calendar.auto_fetch_earnings import incremental_sync
+
+    today = date.today()
+    results = {}
+    for offset in range(EARNINGS_MONTHS_AHEAD):
+        year_offset, month_index = divmod(today.month - 1 + offset, 12)
+        year, month = today.year + year_offset, month_index + 1
+        results[f"{year}-{month:02d}"] = await incremental_sync(year, month, snowflake_service=snowflake_service)
+    return results
+
+
+async def rebuild_search_index(snowflake_service: SnowflakeService) -> Dict[str, Any]:
+    """企業検索インデックスと検索候補を企業テーブル（候補はGoogle Driveのフォルダも）から作り直す"""
+    rows = await asyncio.to_thread(snowflake_service.get_company_search_rows)
+    index = get_company_search_index()
+    await asyncio.to_thread(index.build, rows)
+    suggester = get_company_suggester()
+    drive_items = await asyncio.to_thread(suggester.drive_loader) if suggester.drive_loader else []
+    await asyncio.to_thread(suggester.build, rows, drive_items)
+    return {"companies": len(index), "suggestions": len(suggester)}
+
+
+# ジョブID -> 名前、実行する関数、cronの設定、予定時刻を過ぎても実行する猶予時間（秒）
+JOB_DEFINITIONS: Dict[str, Dict[str, Any]] = {
+    'daily_prices': {
+        'name': '株価・出来高の日次更新',
+        'func': update_daily_prices,
+        'trigger': {'day_of_week': 'mon-fri', 'hour': 16, 'minute': 0},
+        'misfire_grace_time': 3 * 60 * 60,
+    },
+    'weekly_financials': {
+        'name': '財務指標の週次更新',
+        'func': update_weekly_financials,
+        'trigger': {'day_of_week': 'sat', 'hour': 3, 'minute': 0},
+        'misfire_grace_time': 24 * 60 * 60,
+    },
+    'monthly_earnings': {
+        'name': '決算予定の月次同期',
+        'func': update_monthly_earnings,
+        'trigger': {'day': 1, 'hour': 4, 'minute': 0},
+        'misfire_grace_time': 3 * 24 * 60 * 60,
+    },
+    'search_index': {
+        'name': '企業検索インデックス・検索候補の作り直し',
+        'func': rebuild_search_index,
+        'trigger': {'hour': '5,17', 'minute': 30},
+        'misfire_grace_time': 6 * 60 * 60,
+    },
+}
+
 
 class DataUpdateScheduler:
-    def __init__(self):
-        self.scheduler = AsyncIOScheduler()
-        self.collector = DataCollector()
-        self.bigquery = BigQueryService()
-
-    async def update_daily_data(self):
-        # 毎日の株価データ更新
-        companies = await self.bigquery.get_all_companies()
-        for company in companies:
-            data = await self.collector.collect_stock_data(company['ticker'])
-            await self.bigquery.update_stock_data(company['ticker'], data)
-
-    async def update_quarterly_data(self):
-        # 四半期財務データ更新
-        companies = await self.bigquery.get_all_companies()
-        for company in companies:
-            data = await self.collector.collect_financial_data(company['ticker'])
-            await self.bigquery.update_financial_data(company['ticker'], data)
+    def __init__(self, jobstore_url: Optional[str] = None):
+        """
+        初期化
 
-    def start(self):
-        # 毎日の株価データ更新（日本時間15:30）
-        self.scheduler.add_job(
-            self.update_daily_data,
-            'cron',
-            hour=15,
-            minute=30,
-            timezone='Asia/Tokyo'
+        Args:
+            jobstore_url: ジョブストアのSQLAlchemyのURL（デフォルトは環境変数SCHEDULER_JOBSTORE_URL、
+                なければapp/cache/scheduler/jobs.sqlite）
+        """
+        self.jobstore_url = jobstore_url or os.getenv("SCHEDULER_JOBSTORE_URL") or f"sqlite:///{DEFAULT_JOBSTORE_PATH}"
+        self.metrics = JobMetrics()
+        self.scheduler = AsyncIOScheduler(
+            jobstores={'default': SQLAlchemyJobStore(url=self.jobstore_url)},
+            job_defaults={'coalesce': True, 'max_instances': 1},
+            timezone=TIMEZONE,
         )
-        
-        # 四半期財務データ更新（毎週月曜日）
-        self.scheduler.add_job(
-            self.update_quarterly_data,
-            'cron',
-            day_of_week='mon'
-        )
-        
-        self.scheduler.start() 
\ No newline at end of file
+        self.scheduler.add_listener(self._on_event, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+        self._snowflake: Optional[SnowflakeService] = None
+
+    @property
+    def snowflake(self) -> SnowflakeService:
+        # 接続はジョブの初回実行時に作成する
+        if self._snowflake is None:
+            from .snowflake_service import SnowflakeService
+            self._snowflake = SnowflakeService()
+        return self._snowflake
+
+    def _on_event(self, event):
+        if event.code == EVENT_JOB_MISSED:
+            print(f"Scheduled job {event.job_id} missed its run time ({event.scheduled_run_time})")
+            self.metrics.record_misfire(event.job_id)
+        elif event.code == EVENT_JOB_MAX_INSTANCES:
+            print(f"Scheduled job {event.job_id} skipped: previous run is still in progress")
+            self.metrics.record_skipped(event.job_id, "前回の実行が終了していません")
+
+    async def run_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        ジョブを実行し、実行状況を記録
+
+        同じジョブが実行中の場合（手動実行と定期実行が重なった場合など）は実行せずにNoneを返す。
+        """
+        if job_id not in JOB_DEFINITIONS:
+            raise KeyError(job_id)
+        if self.metrics.is_running(job_id):
+            print(f"Job {job_id} is already running, skipping")
+            self.metrics.record_skipped(job_id, "前回の実行が終了していません")
+            return None
+
+        print(f"Starting scheduled job {job_id}")
+        started = self.metrics.start(job_id)
+        try:
+            result = await JOB_DEFINITIONS[job_id]['func'](self.snowflake)
+        except Exception as e:
+            print(f"Scheduled job {job_id} failed: {str(e)}")
+            self.metrics.finish(job_id, started, error=e)
+            raise
+        self.metrics.finish(job_id, started, result=result)
+        print(f"Scheduled job {job_id} finished: {result}")
+        return result
+
+    def start(self):
+        """
+        スケジューラを開始（イベントループ内で呼び出す）
+
+        ジョブストアに保存済みのジョブは次回実行時刻を保ったまま設定だけを更新し、
+        実行時刻の設定が変わった場合だけ予定を作り直す。
+        """
+        if self.jobstore_url.startswith("sqlite:///"):
+            Path(self.jobstore_url[len("sqlite:///"):]).parent.mkdir(parents=True, exist_ok=True)
+
+        self.scheduler.start(paused=True)
+        for job_id, definition in JOB_DEFINITIONS.items():
+            trigger = CronTrigger(timezone=TIMEZONE, **definition['trigger'])
+            options = {
+                'name': definition['name'],
+                'max_instances': 1,
+                'coalesce': True,
+                'misfire_grace_time': definition['misfire_grace_time'],
+            }
+            existing = self.scheduler.get_job(job_id)
+            if existing is None:
+                self.scheduler.add_job(run_scheduled_job, trigger, args=[job_id], id=job_id, **options)
+            else:
+                existing.modify(**options)
+                if str(existing.trigger) != str(trigger):
+                    self.scheduler.reschedule_job(job_id, trigger=trigger)
+        self.scheduler.resume()
+        print(f"Data update scheduler started with jobs: {', '.join(JOB_DEFINITIONS)}")
+
+    def shutdown(self):
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+        if self._snowflake is not None:
+            self._snowflake.close_connection()
+            self._snowflake = None
+
+    def get_status(self) -> Dict[str, Any]:
+        """ジョブごとの予定と実行状況"""
+        metrics = self.metrics.snapshot()
+        jobs = []
+        for job_id, definition in JOB_DEFINITIONS.items():
+            job = self.scheduler.get_job(job_id) if self.scheduler.running else None
+            next_run_time = getattr(job, 'next_run_time', None)
+            jobs.append({
+                "id": job_id,
+                "name": definition['name'],
+                "trigger": str(job.trigger) if job else None,
+                "next_run_time": next_run_time.isoformat() if next_run_time else None,
+                "metrics": metrics.get(job_id),
+            })
+        return {"running": self.scheduler.running, "jobs": jobs}
+
+
+_scheduler: Optional[DataUpdateScheduler] = None
+
+
+def get_scheduler() -> DataUpdateScheduler:
+    """アプリケーション全体で共有するスケジューラを取得"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = DataUpdateScheduler()
+    return _scheduler
+
+
+async def run_scheduled_job(job_id: str):
+    """ジョブストアから参照される実行関数（ジョブストアにはこの関数の参照とジョブIDだけを保存する）"""
+    return await get_scheduler().run_job(job_id)
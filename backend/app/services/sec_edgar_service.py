@@ -10,6 +10,8 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import logging
 
+from app.services.instrumentation import span
+
 logger = logging.getLogger(__name__)
 
 class SECEdgarService:
@@ -27,7 +29,8 @@ class SECEdgarService:
             # SEC EDGAR APIのレート制限に従う（10リクエスト/秒）
             time.sleep(0.1)
             
-            response = requests.get(url, headers=self.headers, params=params)
+            with span("sec_edgar", "api"):
+                response = requests.get(url, headers=self.headers, params=params)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -83,17 +86,8 @@ class SECEdgarService:
             cik_padded = cik.zfill(10)
             url = f"{self.base_url}/api/xbrl/companyfacts/CIK{cik_padded}.json"
             
-            print(f"Requesting company facts from: {url}")
             result = self._make_request(url)
-            print(f"Company facts response keys: {list(result.keys()) if result else 'None'}")
-            
-            if "filings" in result:
-                print(f"Filings structure: {list(result['filings'].keys()) if result['filings'] else 'None'}")
-                if "recent" in result["filings"]:
-                    recent = result["filings"]["recent"]
-                    print(f"Recent filings keys: {list(recent.keys()) if recent else 'None'}")
-                    if "form" in recent:
-                        print(f"Available forms: {recent['form'][:10]}")  # 最初の10個のフォーム
+            logger.debug("SEC company facts", extra={"url": url, "keys": list(result.keys()) if result else None})
             
             return result
             
@@ -110,9 +104,8 @@ class SECEdgarService:
             # submissions エンドポイントを使用して提出書類を取得
             url = f"{self.base_url}/submissions/CIK{cik_padded}.json"
             
-            print(f"Requesting filings from: {url}")
             submissions = self._make_request(url)
-            print(f"Submissions response keys: {list(submissions.keys()) if submissions else 'None'}")
+            logger.debug("SEC submissions", extra={"url": url, "keys": list(submissions.keys()) if submissions else None})
             
             # 提出書類の情報を抽出
             filings = []
@@ -126,8 +119,6 @@ class SECEdgarService:
                 accession_numbers = recent_filings.get("accessionNumber", [])
                 primary_documents = recent_filings.get("primaryDocument", [])
                 
-                print(f"Available forms: {forms[:10]}")  # 最初の10個のフォーム
-                
                 # 指定されたフォームタイプの提出書類を検索
                 for i, form in enumerate(forms):
                     if form == form_type and len(filings) < limit:
@@ -139,8 +130,8 @@ class SECEdgarService:
                             "primaryDocument": primary_documents[i] if i < len(primary_documents) else None
                         }
                         filings.append(filing)
-                        print(f"Found {form_type} filing: {filing}")
             
+            logger.debug("SEC filings", extra={"cik": cik, "form_type": form_type, "count": len(filings)})
             return filings
             
         except Exception as e:
@@ -161,13 +152,12 @@ class SECEdgarService:
             # ドキュメントURLを構築（正しい形式）
             document_url = f"https://www.sec.gov/Archives/edgar/data/{cik_clean}/{accession_clean}/{primary_document}"
             
-            print(f"Downloading document from: {document_url}")
-            
             # ドキュメントをダウンロード
-            response = requests.get(document_url, headers=self.headers)
+            with span("sec_edgar", "document"):
+                response = requests.get(document_url, headers=self.headers)
             response.raise_for_status()
             
-            print(f"Document downloaded successfully, size: {len(response.content)} bytes")
+            logger.debug("SEC document downloaded", extra={"url": document_url, "bytes": len(response.content)})
             return response.content
             
         except Exception as e:
@@ -3,7 +3,24 @@ import os
 import json
 import snowflake.connector
 from dotenv import load_dotenv
-from typing import List, Dict, Optional
+import uuid
+from datetime import date
+from pathlib import Path
+from typing import List, Dict, Iterator, Optional
+import pandas as pd
+import pyarrow as pa
+from app.services.arrow_results import lowercase_columns
+from app.services.earnings_cache import monthly_earnings_cache, daily_earnings_cache, invalidate_earnings_caches
+from app.services.company_tables import (
+    COMPANY_TABLES, COMPANY_COLUMNS, CN_COMPANY_COLUMNS, FINANCIAL_UPDATE_COLUMNS,
+    COLLECTED_TEXT_COLUMNS, COLLECTED_NUMERIC_COLUMNS,
+)
+from app.services.instrumentation import traced
+from app.services.response_cache import invalidate_company_responses
+from app.services.company_catalogue import get_company_catalogue
+from app.services.company_search_index import get_company_search_index
+from app.services.company_suggest import get_company_suggester
+
 
 class SnowflakeService:
     def __init__(self):
@@ -25,6 +42,7 @@ class SnowflakeService:
     def get_connection(self):
         return self.conn
 
+    @traced("snowflake")
     def upsert_companies(self, companies_data: List[Dict]):
         if not self.conn:
             print("No connection to Snowflake. Aborting upsert.")
@@ -128,6 +146,7 @@ class SnowflakeService:
             
             self.conn.commit()
             print("Upsert operation committed.")
+            self._on_companies_written([company.get('ticker') for company in companies_data], companies_data)
 
         except Exception as e:
             print(f"An error occurred during upsert: {e}")
@@ -135,11 +154,372 @@ class SnowflakeService:
         finally:
             cursor.close()
 
+    @traced("snowflake")
+    def bulk_merge(self, table_name: str, columns: List[str], key_columns: List[str], rows: List[tuple]) -> int:
+        """
+        複数行を一時テーブルにまとめて投入し、1回のMERGEで反映する
+
+        Args:
+            table_name: スキーマ修飾なしのテーブル名
+            columns: rowsの各要素に対応するカラム名
+            key_columns: 一致判定に使うカラム名
+            rows: カラム順に並んだ値のタプルのリスト
+
+        Returns:
+            投入した行数
+        """
+        if not self.conn:
+            print("No connection to Snowflake. Aborting bulk merge.")
+            return 0
+        if not rows:
+            return 0
+
+        db_name = os.getenv("SNOWFLAKE_DATABASE")
+        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+        full_table_name = f"{db_name}.{schema_name}.{table_name}"
+        stage_table_name = f"{db_name}.{schema_name}.{table_name}_STAGE_{uuid.uuid4().hex[:8].upper()}"
+
+        # 同じキーが複数回現れた場合は後の行を優先（MERGEは重複キーを許さないため）
+        key_indexes = [columns.index(col) for col in key_columns]
+        unique_rows = {}
+        for row in rows:
+            unique_rows[tuple(row[i] for i in key_indexes)] = row
+        rows = list(unique_rows.values())
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"CREATE TEMPORARY TABLE {stage_table_name} LIKE {full_table_name}")
+            # executemanyは複数行のINSERT文にまとめて送信される
+            cursor.executemany(
+                f"INSERT INTO {stage_table_name} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+                rows
+            )
+            self._merge_from_stage(
+                cursor, full_table_name, f"SELECT {', '.join(columns)} FROM {stage_table_name}", columns, key_columns
+            )
+            self.conn.commit()
+            print(f"Bulk merged {len(rows)} rows into {table_name}")
+            return len(rows)
+        except Exception as e:
+            print(f"An error occurred during bulk merge into {table_name}: {e}")
+            self.conn.rollback()
+            raise
+        finally:
+            try:
+                cursor.execute(f"DROP TABLE IF EXISTS {stage_table_name}")
+            finally:
+                cursor.close()
+
+    def _merge_from_stage(self, cursor, full_table_name: str, source_sql: str, columns: List[str], key_columns: List[str]):
+        """一時テーブルなどから選択した行(source_sql)をキーで対象テーブルにMERGE"""
+        on_clause = ' AND '.join([f"target.{col} = source.{col}" for col in key_columns])
+        update_columns = [col for col in columns if col not in key_columns]
+        cursor.execute(f"""
+        MERGE INTO {full_table_name} AS target
+        USING ({source_sql}) AS source
+        ON {on_clause}
+        WHEN MATCHED THEN
+            UPDATE SET {', '.join([f"{col} = source.{col}" for col in update_columns])}
+        WHEN NOT MATCHED THEN
+            INSERT ({', '.join(columns)})
+            VALUES ({', '.join([f"source.{col}" for col in columns])});
+        """)
+
+    def get_company_tickers(self, country: str) -> List[str]:
+        """国の企業テーブルのtickerをすべて取得"""
+        db_name = os.getenv("SNOWFLAKE_DATABASE")
+        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+        table = self.query_arrow(
+            f"SELECT TICKER FROM {db_name}.{schema_name}.{COMPANY_TABLES[country]} WHERE TICKER IS NOT NULL ORDER BY TICKER"
+        )
+        return table.column("ticker").to_pylist()
+
+    def get_table_columns(self, table_name: str) -> List[str]:
+        """テーブルのカラム名（大文字）を取得"""
+        db_name = os.getenv("SNOWFLAKE_DATABASE")
+        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"SELECT * FROM {db_name}.{schema_name}.{table_name} LIMIT 0")
+            return [col[0].upper() for col in cursor.description]
+        finally:
+            cursor.close()
+
+    def iter_table_arrow_batches(self, table_name: str):
+        """
+        テーブル全体をArrowのバッチ（pyarrow.Table）として順に取得
+
+        コネクタのfetch_arrow_batchesを使うため、行ごとのPython変換を行わない。
+        テーブルが空の場合は、カラムだけを持つ空のバッチを1つ返す。
+        """
+        if not self.conn:
+            raise Exception("No connection to Snowflake.")
+
+        db_name = os.getenv("SNOWFLAKE_DATABASE")
+        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"SELECT * FROM {db_name}.{schema_name}.{table_name} ORDER BY TICKER")
+            empty = True
+            for batch in cursor.fetch_arrow_batches():
+                empty = False
+                yield batch
+            if empty:
+                yield cursor.fetch_arrow_all(force_return_table=True)
+        finally:
+            cursor.close()
+
+    @traced("snowflake")
+    def copy_parquet_into(self, table_name: str, parquet_path: str, key_columns: List[str], columns: Optional[List[str]] = None) -> int:
+        """
+        Parquetファイルを一時ステージ経由でCOPYし、キーでテーブルにMERGE
+
+        Parquetのカラムは名前（大文字小文字を区別しない）で対象テーブルのカラムに対応付け、
+        対象テーブルにないカラムは無視する。columnsを指定した場合はそのカラムだけを更新し、
+        ファイルに含まれないカラムの既存の値は変更しない。
+
+        Returns:
+            MERGEした行数
+        """
+        if not self.conn:
+            raise Exception("No connection to Snowflake.")
+
+        db_name = os.getenv("SNOWFLAKE_DATABASE")
+        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+        suffix = uuid.uuid4().hex[:8].upper()
+        full_table_name = f"{db_name}.{schema_name}.{table_name}"
+        stage_name = f"{db_name}.{schema_name}.{table_name}_PARQUET_{suffix}"
+        stage_table_name = f"{db_name}.{schema_name}.{table_name}_STAGE_{suffix}"
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"CREATE TEMPORARY STAGE {stage_name} FILE_FORMAT = (TYPE = PARQUET)")
+            cursor.execute(f"PUT 'file://{Path(parquet_path).resolve().as_posix()}' @{stage_name} AUTO_COMPRESS = FALSE")
+            cursor.execute(f"CREATE TEMPORARY TABLE {stage_table_name} LIKE {full_table_name}")
+            cursor.execute(f"""
+            COPY INTO {stage_table_name}
+            FROM @{stage_name}
+            FILE_FORMAT = (TYPE = PARQUET)
+            MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+            """)
+
+            # キーが空の行は除き、同じキーが複数回現れる場合は1行に絞る（MERGEは重複キーを許さないため）
+            table_columns = self.get_table_columns(table_name)
+            if columns:
+                requested = {col.upper() for col in columns} | {col.upper() for col in key_columns}
+                table_columns = [col for col in table_columns if col in requested]
+            columns = table_columns
+            source_sql = f"""
+            SELECT {', '.join(columns)} FROM {stage_table_name}
+            WHERE {' AND '.join([f"{col} IS NOT NULL" for col in key_columns])}
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY {', '.join(key_columns)} ORDER BY {', '.join(key_columns)}) = 1
+            """
+            cursor.execute(f"SELECT COUNT(*) FROM ({source_sql})")
+            row_count = cursor.fetchone()[0]
+            self._merge_from_stage(cursor, full_table_name, source_sql, columns, key_columns)
+            self.conn.commit()
+            print(f"Copied {row_count} rows from Parquet into {table_name}")
+            if table_name in COMPANY_TABLES.values():
+                self._on_companies_written()
+            return row_count
+        except Exception as e:
+            print(f"An error occurred during Parquet import into {table_name}: {e}")
+            self.conn.rollback()
+            raise
+        finally:
+            try:
+                cursor.execute(f"DROP TABLE IF EXISTS {stage_table_name}")
+                cursor.execute(f"DROP STAGE IF EXISTS {stage_name}")
+            finally:
+                cursor.close()
+
+    def bulk_upsert_companies(self, companies_data: List[Dict]) -> Dict[str, int]:
+        """upsert_companiesの一括版（国ごとのテーブルに1回のMERGEで反映）"""
+        rows_by_table: Dict[str, List[tuple]] = {}
+        for company in companies_data:
+            if not company.get('ticker'):
+                continue
+            table_name = COMPANY_TABLES.get(company.get('country', 'JP'), 'COMPANIES_US')
+            rows_by_table.setdefault(table_name, []).append(
+                tuple(company.get(col) for col in COMPANY_COLUMNS)
+            )
+
+        merged = {}
+        for table_name, rows in rows_by_table.items():
+            columns = CN_COMPANY_COLUMNS if table_name == 'COMPANIES_CN' else [col.upper() for col in COMPANY_COLUMNS]
+            merged[table_name] = self.bulk_merge(table_name, columns, ['TICKER'], rows)
+        if merged:
+            self._on_companies_written([company.get('ticker') for company in companies_data], companies_data)
+        return merged
+
+    def _on_companies_written(self, tickers: Optional[List[str]] = None, companies: Optional[List[Dict]] = None,
+                              table_name: Optional[str] = None, replace: bool = True):
+        """
+        企業テーブルへの書き込み後の処理（レスポンスキャッシュの破棄とカタログ・検索インデックス・候補の更新）
+
+        Args:
+            tickers: 書き込んだ企業のticker（省略した場合はテーブル全体が変わったものとして扱う）
+            companies: 書き込んだ企業データ（業種・国・企業名などをカタログと検索インデックスに反映する）
+            table_name: 書き込んだテーブル（省略した場合は企業データのcountryから決める）
+            replace: Trueなら企業データで置き換え（MERGE）、Falseなら含まれる項目だけを更新する（UPDATE）
+        """
+        catalogue = get_company_catalogue()
+        search_index = get_company_search_index()
+        if tickers is None:
+            catalogue.mark_stale()
+            search_index.mark_stale()
+        for company in companies or []:
+            company_table = table_name or COMPANY_TABLES.get(company.get('country', 'JP'), 'COMPANIES_US')
+            catalogue.apply(company_table, company.get('ticker'), company, replace=replace)
+            search_index.apply(company_table, company.get('ticker'), company, replace=replace)
+        get_company_suggester().mark_stale()
+        invalidate_company_responses(tickers)
+
+    def get_company_rows(self, columns: List[str]) -> List[tuple]:
+        """全企業テーブルの (テーブル名, ticker, {小文字のカラム名: 値}) を1回のクエリで取得"""
+        db_name = os.getenv("SNOWFLAKE_DATABASE")
+        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+        rows_query = " UNION ALL ".join(
+            f"SELECT '{table_name}' AS TABLE_NAME, TICKER, {', '.join(columns)} "
+            f"FROM {db_name}.{schema_name}.{table_name}"
+            for table_name in COMPANY_TABLES.values()
+        )
+        return [(row['table_name'], row['ticker'], row) for row in self.query_arrow(rows_query).to_pylist()]
+
+    def get_company_catalogue_rows(self) -> List[tuple]:
+        """カタログ用に全企業の業種・産業・国・市場を取得"""
+        return self.get_company_rows(['SECTOR', 'INDUSTRY', 'COUNTRY', 'MARKET'])
+
+    def get_company_search_rows(self) -> List[tuple]:
+        """検索インデックス用に全企業の企業名・国・市場・業種・時価総額を取得"""
+        return self.get_company_rows(['COMPANY_NAME', 'COUNTRY', 'MARKET', 'SECTOR', 'MARKET_CAP'])
+
+    @traced("snowflake")
+    def _bulk_update(self, table_name: str, stage_columns: List[str], rows: List[tuple], set_clause: str,
+                     companies: Optional[List[Dict]] = None) -> int:
+        """
+        一時テーブルに投入した行でTICKERが一致する行を1回のUPDATEで更新（一致しない行は追加しない）
+
+        Args:
+            table_name: スキーマ修飾なしのテーブル名
+            stage_columns: 一時テーブルのカラム定義（先頭はTICKER）。例: ["TICKER VARCHAR", "SUMMARY VARCHAR"]
+            rows: stage_columnsの順に並んだ値のタプルのリスト
+            set_clause: 更新内容（一時テーブルはsource、対象テーブルはtargetで参照）
+            companies: カタログと検索インデックスに反映する更新後の値（tickerと更新したカラムだけを含む辞書）
+
+        Returns:
+            更新した行数
+        """
+        if not self.conn:
+            print("No connection to Snowflake. Aborting bulk update.")
+            return 0
+        if not rows:
+            return 0
+
+        db_name = os.getenv("SNOWFLAKE_DATABASE")
+        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+        full_table_name = f"{db_name}.{schema_name}.{table_name}"
+        stage_table_name = f"{db_name}.{schema_name}.{table_name}_UPDATE_STAGE_{uuid.uuid4().hex[:8].upper()}"
+        column_names = [column.split()[0] for column in stage_columns]
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"CREATE TEMPORARY TABLE {stage_table_name} ({', '.join(stage_columns)})")
+            cursor.executemany(
+                f"INSERT INTO {stage_table_name} ({', '.join(column_names)}) VALUES ({', '.join(['%s'] * len(column_names))})",
+                rows
+            )
+            cursor.execute(f"""
+            UPDATE {full_table_name} AS target
+            SET {set_clause}
+            FROM {stage_table_name} AS source
+            WHERE target.TICKER = source.TICKER
+            """)
+            updated = cursor.rowcount or 0
+            self.conn.commit()
+            print(f"Bulk updated {updated} rows in {table_name}")
+            self._on_companies_written([row[0] for row in rows], companies, table_name=table_name, replace=False)
+            return updated
+        except Exception as e:
+            print(f"An error occurred during bulk update of {table_name}: {e}")
+            self.conn.rollback()
+            raise
+        finally:
+            try:
+                cursor.execute(f"DROP TABLE IF EXISTS {stage_table_name}")
+            finally:
+                cursor.close()
+
+    def bulk_update_tradingview_summaries(self, table_name: str, summaries: Dict[str, Dict]) -> int:
+        """TRADINGVIEW_SUMMARYをtickerごとにまとめて更新（summaries: ticker -> サマリー）"""
+        return self._bulk_update(
+            table_name,
+            ["TICKER VARCHAR", "SUMMARY VARCHAR"],
+            [(ticker, json.dumps(summary, ensure_ascii=False)) for ticker, summary in summaries.items()],
+            "TRADINGVIEW_SUMMARY = PARSE_JSON(source.SUMMARY)",
+        )
+
+    def bulk_update_prices(self, table_name: str, prices: List[tuple]) -> int:
+        """
+        株価と出来高をtickerごとにまとめて更新
+
+        時価総額は発行済株式数がある企業だけ新しい株価から計算し直す。
+
+        Args:
+            prices: (ticker, 株価, 出来高) のリスト
+        """
+        return self._bulk_update(
+            table_name,
+            ["TICKER VARCHAR", "CURRENT_PRICE FLOAT", "VOLUME FLOAT"],
+            prices,
+            """CURRENT_PRICE = source.CURRENT_PRICE,
+                VOLUME = COALESCE(source.VOLUME, target.VOLUME),
+                MARKET_CAP = COALESCE(target.SHARES_OUTSTANDING * source.CURRENT_PRICE, target.MARKET_CAP)""",
+        )
+
+    def bulk_update_financials(self, table_name: str, rows: List[Dict]) -> int:
+        """
+        財務指標をtickerごとにまとめて更新（値がNoneのカラムは既存の値を残す）
+
+        Args:
+            rows: "ticker" とFINANCIAL_UPDATE_COLUMNSのカラム名をキーに持つ辞書のリスト
+        """
+        return self._bulk_update(
+            table_name,
+            ["TICKER VARCHAR"] + [f"{column} FLOAT" for column in FINANCIAL_UPDATE_COLUMNS],
+            [tuple([row['ticker']] + [row.get(column) for column in FINANCIAL_UPDATE_COLUMNS]) for row in rows],
+            ",\n                ".join(
+                f"{column} = COALESCE(source.{column}, target.{column})" for column in FINANCIAL_UPDATE_COLUMNS
+            ),
+        )
+
+    def bulk_update_collected_companies(self, table_name: str, rows: List[Dict]) -> int:
+        """
+        企業データの収集結果をtickerごとにまとめて更新（取得できなかったカラムは既存の値を残す）
+
+        Args:
+            rows: "ticker" とCOLLECTED_TEXT_COLUMNS・COLLECTED_NUMERIC_COLUMNSのカラム名をキーに持つ辞書のリスト
+        """
+        columns = COLLECTED_TEXT_COLUMNS + COLLECTED_NUMERIC_COLUMNS
+        return self._bulk_update(
+            table_name,
+            ["TICKER VARCHAR"]
+            + [f"{column} VARCHAR" for column in COLLECTED_TEXT_COLUMNS]
+            + [f"{column} FLOAT" for column in COLLECTED_NUMERIC_COLUMNS],
+            [tuple([row['ticker']] + [row.get(column) for column in columns]) for row in rows],
+            ",\n                ".join(f"{column} = COALESCE(source.{column}, target.{column})" for column in columns),
+            companies=[
+                {'ticker': row['ticker'], **{column: row[column] for column in columns if row.get(column) is not None}}
+                for row in rows
+            ],
+        )
+
     def close_connection(self):
         if self.conn and not self.conn.is_closed():
             self.conn.close()
             print("Snowflake connection closed.")
 
+    @traced("snowflake")
     def query(self, query_string: str, params: Optional[Dict] = None) -> List[Dict]:
         """汎用クエリ実行メソッド"""
         if not self.conn:
@@ -169,6 +549,67 @@ class SnowflakeService:
         finally:
             cursor.close()
 
+    @traced("snowflake", "execute")
+    def _execute_for_fetch(self, query_string: str, params=None):
+        if not self.conn:
+            raise Exception("No connection to Snowflake.")
+        cursor = self.conn.cursor()
+        try:
+            if params:
+                cursor.execute(query_string, params)
+            else:
+                cursor.execute(query_string)
+        except Exception as e:
+            cursor.close()
+            print(f"Error executing query: {str(e)}")
+            raise
+        return cursor
+
+    @traced("snowflake")
+    def query_arrow(self, query_string: str, params=None) -> pa.Table:
+        """
+        クエリ結果をpyarrow.Tableとして取得（カラム名は小文字）
+
+        コネクタのfetch_arrow_allで列単位のまま受け取るため、queryのような行ごとの
+        辞書変換を行わない。結果が0件の場合もカラムを持つ空のテーブルを返す。
+        """
+        cursor = self._execute_for_fetch(query_string, params)
+        try:
+            table = cursor.fetch_arrow_all(force_return_table=True)
+            return lowercase_columns(table)
+        finally:
+            cursor.close()
+
+    def query_arrow_batches(self, query_string: str, params=None) -> Iterator[pa.Table]:
+        """クエリ結果をpyarrow.Tableのバッチとして順に取得（カラム名は小文字）"""
+        cursor = self._execute_for_fetch(query_string, params)
+        try:
+            for batch in cursor.fetch_arrow_batches():
+                yield lowercase_columns(batch)
+        finally:
+            cursor.close()
+
+    @traced("snowflake")
+    def query_df(self, query_string: str, params=None) -> pd.DataFrame:
+        """クエリ結果をDataFrameとして取得（カラム名は小文字）"""
+        cursor = self._execute_for_fetch(query_string, params)
+        try:
+            df = cursor.fetch_pandas_all()
+            df.columns = [str(column).lower() for column in df.columns]
+            return df
+        finally:
+            cursor.close()
+
+    def query_df_batches(self, query_string: str, params=None) -> Iterator[pd.DataFrame]:
+        """クエリ結果をDataFrameのバッチとして順に取得（カラム名は小文字）"""
+        cursor = self._execute_for_fetch(query_string, params)
+        try:
+            for df in cursor.fetch_pandas_batches():
+                df.columns = [str(column).lower() for column in df.columns]
+                yield df
+        finally:
+            cursor.close()
+
     async def get_earnings_calendar(self, start_date: str, end_date: str) -> List[Dict]:
         """指定期間の決算予定を取得"""
         print(f"Querying earnings calendar from {start_date} to {end_date}")
@@ -276,6 +717,235 @@ class SnowflakeService:
         finally:
             cursor.close()
 
+    def create_earnings_daily_counts_table(self):
+        """決算発表日ごとの企業数の集計テーブルを作成（月間カレンダー用）"""
+        if not self.conn:
+            print("No connection to Snowflake. Aborting table creation.")
+            return
+
+        cursor = self.conn.cursor()
+        try:
+            create_table_sql = f"""
+            CREATE TABLE IF NOT EXISTS {os.getenv("SNOWFLAKE_DATABASE")}.{os.getenv("SNOWFLAKE_SCHEMA")}.earnings_calendar_daily_counts (
+                date DATE,
+                company_count NUMBER,
+                updated_at TIMESTAMP_NTZ
+            )
+            CLUSTER BY (date);
+            """
+            cursor.execute(create_table_sql)
+            print("earnings_calendar_daily_counts table created or already exists.")
+        except Exception as e:
+            print(f"Error creating earnings_calendar_daily_counts table: {str(e)}")
+            raise
+        finally:
+            cursor.close()
+
+    def _refresh_earnings_daily_counts(self, cursor, dates: List) -> None:
+        """
+        指定した発表日の企業数を earnings_calendar から再集計して集計テーブルに反映
+
+        0件になった日付は集計テーブルから削除する。
+        """
+        dates = sorted({str(d)[:10] for d in dates})
+        if not dates:
+            return
+
+        db_name = os.getenv("SNOWFLAKE_DATABASE")
+        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+        values = ", ".join(["(%s)"] * len(dates))
+        refresh_sql = f"""
+        MERGE INTO {db_name}.{schema_name}.earnings_calendar_daily_counts AS target
+        USING (
+            SELECT d.date AS date, COUNT(e.ticker) AS company_count
+            FROM (SELECT TO_DATE(column1) AS date FROM VALUES {values}) d
+            LEFT JOIN {db_name}.{schema_name}.earnings_calendar e
+            ON e.announcement_date = d.date
+            GROUP BY d.date
+        ) AS source
+        ON target.date = source.date
+        WHEN MATCHED AND source.company_count = 0 THEN DELETE
+        WHEN MATCHED THEN
+            UPDATE SET company_count = source.company_count, updated_at = CURRENT_TIMESTAMP()
+        WHEN NOT MATCHED AND source.company_count > 0 THEN
+            INSERT (date, company_count, updated_at)
+            VALUES (source.date, source.company_count, CURRENT_TIMESTAMP());
+        """
+        cursor.execute(refresh_sql, tuple(dates))
+
+    def rebuild_earnings_daily_counts(self):
+        """集計テーブルを earnings_calendar 全体から作り直す（初回作成・不整合時用）"""
+        if not self.conn:
+            print("No connection to Snowflake. Aborting rebuild.")
+            return
+
+        db_name = os.getenv("SNOWFLAKE_DATABASE")
+        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"""
+            INSERT OVERWRITE INTO {db_name}.{schema_name}.earnings_calendar_daily_counts (date, company_count, updated_at)
+            SELECT announcement_date, COUNT(*), CURRENT_TIMESTAMP()
+            FROM {db_name}.{schema_name}.earnings_calendar
+            WHERE announcement_date IS NOT NULL
+            GROUP BY announcement_date
+            """)
+            self.conn.commit()
+            monthly_earnings_cache.clear()
+            print("earnings_calendar_daily_counts rebuilt.")
+        except Exception as e:
+            print(f"Error rebuilding earnings_calendar_daily_counts: {str(e)}")
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def get_earnings_daily_counts(self, start_date: date, end_date: date) -> List[Dict]:
+        """集計テーブルから [start_date, end_date) の日別企業数を取得"""
+        db_name = os.getenv("SNOWFLAKE_DATABASE")
+        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+        query = f"""
+        SELECT date, company_count
+        FROM {db_name}.{schema_name}.earnings_calendar_daily_counts
+        WHERE date >= %s AND date < %s
+        ORDER BY date
+        """
+        return self.query(query, (start_date.isoformat(), end_date.isoformat()))
+
+    def create_earnings_day_view_table(self):
+        """発表日ごとの決算企業一覧（最新の決算予定と企業情報を結合済み）のテーブルを作成"""
+        if not self.conn:
+            print("No connection to Snowflake. Aborting table creation.")
+            return
+
+        cursor = self.conn.cursor()
+        try:
+            create_table_sql = f"""
+            CREATE TABLE IF NOT EXISTS {os.getenv("SNOWFLAKE_DATABASE")}.{os.getenv("SNOWFLAKE_SCHEMA")}.earnings_day_view (
+                date DATE,
+                company_code VARCHAR,
+                company_name VARCHAR,
+                market VARCHAR,
+                fiscal_year NUMBER,
+                quarter NUMBER,
+                description VARCHAR,
+                sector VARCHAR,
+                industry VARCHAR,
+                market_cap NUMBER,
+                per FLOAT,
+                pbr FLOAT,
+                dividend_yield FLOAT,
+                updated_at TIMESTAMP_NTZ
+            )
+            CLUSTER BY (date);
+            """
+            cursor.execute(create_table_sql)
+            print("earnings_day_view table created or already exists.")
+        except Exception as e:
+            print(f"Error creating earnings_day_view table: {str(e)}")
+            raise
+        finally:
+            cursor.close()
+
+    def _earnings_day_view_select(self, date_filter: str) -> str:
+        """earnings_day_viewに格納する行を作るSELECT文（ティッカーごとに最新の決算予定を企業情報と結合）"""
+        db_name = os.getenv("SNOWFLAKE_DATABASE")
+        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+        return f"""
+        WITH latest_earnings AS (
+            SELECT
+                ticker,
+                company_name,
+                announcement_date,
+                fiscal_year,
+                fiscal_quarter,
+                ROW_NUMBER() OVER (PARTITION BY ticker, announcement_date ORDER BY created_at DESC) as rn
+            FROM {db_name}.{schema_name}.earnings_calendar
+            WHERE {date_filter}
+        )
+        SELECT
+            e.announcement_date,
+            e.ticker,
+            COALESCE(c.company_name, e.company_name),
+            c.market,
+            e.fiscal_year,
+            e.fiscal_quarter,
+            c.description,
+            c.sector,
+            c.industry,
+            c.market_cap,
+            c.per,
+            c.pbr,
+            c.dividend_yield,
+            CURRENT_TIMESTAMP()
+        FROM latest_earnings e
+        LEFT JOIN {db_name}.{schema_name}.companies c
+        ON e.ticker = c.ticker
+        WHERE e.rn = 1
+        """
+
+    def _refresh_earnings_day_view(self, cursor, dates: List) -> None:
+        """指定した発表日の行をearnings_day_viewで作り直す"""
+        dates = sorted({str(d)[:10] for d in dates})
+        if not dates:
+            return
+
+        db_name = os.getenv("SNOWFLAKE_DATABASE")
+        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+        placeholders = ", ".join(["TO_DATE(%s)"] * len(dates))
+        cursor.execute(
+            f"DELETE FROM {db_name}.{schema_name}.earnings_day_view WHERE date IN ({placeholders})",
+            tuple(dates)
+        )
+        cursor.execute(
+            f"INSERT INTO {db_name}.{schema_name}.earnings_day_view "
+            + self._earnings_day_view_select(f"announcement_date IN ({placeholders})"),
+            tuple(dates)
+        )
+
+    def rebuild_earnings_day_view(self):
+        """
+        earnings_day_viewを全期間作り直す
+
+        企業情報（companiesテーブル）の更新は決算予定の書き込み時にしか反映されないため、
+        企業情報を一括更新した後などに実行する。
+        """
+        if not self.conn:
+            print("No connection to Snowflake. Aborting rebuild.")
+            return
+
+        db_name = os.getenv("SNOWFLAKE_DATABASE")
+        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                f"INSERT OVERWRITE INTO {db_name}.{schema_name}.earnings_day_view "
+                + self._earnings_day_view_select("announcement_date IS NOT NULL")
+            )
+            self.conn.commit()
+            daily_earnings_cache.clear()
+            print("earnings_day_view rebuilt.")
+        except Exception as e:
+            print(f"Error rebuilding earnings_day_view: {str(e)}")
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def get_earnings_day_view(self, start_date: date, end_date: date) -> List[Dict]:
+        """earnings_day_viewから [start_date, end_date) の決算発表企業を取得"""
+        db_name = os.getenv("SNOWFLAKE_DATABASE")
+        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+        query = f"""
+        SELECT
+            date, company_code, company_name, market, fiscal_year, quarter,
+            description, sector, industry, market_cap, per, pbr, dividend_yield
+        FROM {db_name}.{schema_name}.earnings_day_view
+        WHERE date >= %s AND date < %s
+        ORDER BY date, company_code
+        """
+        return self.query(query, (start_date.isoformat(), end_date.isoformat()))
+
     def initialize_database(self):
         """データベースの初期化とテーブル存在確認"""
         if not self.conn:
@@ -286,66 +956,175 @@ class SnowflakeService:
             # データベースとスキーマの存在確認は接続時に行われるため、ここではテーブルの存在確認と作成のみ
             self.create_companies_table()
             self.create_earnings_calendar_table()
+            self.create_earnings_daily_counts_table()
+            self.create_earnings_day_view_table()
             print("Snowflake database initialized successfully.")
             return True
         except Exception as e:
             print(f"Failed to initialize Snowflake database: {str(e)}")
             raise
 
+    @traced("snowflake")
     def upsert_earnings_calendar(self, earnings_data: List[Dict]):
-        """決算予定の更新または挿入"""
+        """
+        決算予定の更新または挿入
+
+        全行を一時テーブルに投入し、(ticker, fiscal_year, fiscal_quarter) をキーに
+        1回のMERGEで反映する。反映後、発表日ごとの集計テーブルと企業一覧テーブルを
+        変更のあった日付について更新する。
+        """
         if not self.conn:
             print("No connection to Snowflake. Aborting upsert.")
             return
+        if not earnings_data:
+            return
 
-        cursor = self.conn.cursor()
         db_name = os.getenv("SNOWFLAKE_DATABASE")
         schema_name = os.getenv("SNOWFLAKE_SCHEMA")
         table_id = f"{db_name}.{schema_name}.earnings_calendar"
+        stage_table_id = f"{db_name}.{schema_name}.EARNINGS_CALENDAR_STAGE_{uuid.uuid4().hex[:8].upper()}"
 
+        # 同じキーが複数回現れた場合は後の行を優先（MERGEは重複キーを許さないため）
+        unique_rows = {}
+        for data in earnings_data:
+            ticker_value = data["ticker"].replace(".T", "")
+            key = (ticker_value, int(data["fiscal_year"]), int(data["fiscal_quarter"]))
+            unique_rows[key] = (
+                ticker_value,
+                data["company_name"],
+                str(data["announcement_date"])[:10] if data.get("announcement_date") else None,
+                key[1],
+                key[2],
+            )
+        rows = list(unique_rows.values())
+
+        cursor = self.conn.cursor()
         try:
-            for data in earnings_data:
-                merge_sql = f"""
-                MERGE INTO {table_id} AS target
-                USING (SELECT
-                        %s AS ticker,
-                        %s AS company_name,
-                        %s AS announcement_date,
-                        %s AS fiscal_year,
-                        %s AS fiscal_quarter
-                       ) AS source
-                ON target.ticker = source.TICKER
-                   AND target.fiscal_year = source.FISCAL_YEAR
-                   AND target.fiscal_quarter = source.FISCAL_QUARTER
-                WHEN MATCHED THEN
-                    UPDATE SET
-                        announcement_date = source.ANNOUNCEMENT_DATE,
-                        updated_at = CURRENT_TIMESTAMP()
-                WHEN NOT MATCHED THEN
-                    INSERT (ticker, company_name, announcement_date, fiscal_year, fiscal_quarter, created_at, updated_at)
-                    VALUES (source.TICKER, source.COMPANY_NAME, source.ANNOUNCEMENT_DATE, source.FISCAL_YEAR, source.FISCAL_QUARTER, CURRENT_TIMESTAMP(), CURRENT_TIMESTAMP());
-                """
-                
-                ticker_value = data["ticker"].replace(".T", "")
-
-                params = (
-                    ticker_value,
-                    data["company_name"],
-                    data["announcement_date"],
-                    data["fiscal_year"],
-                    data["fiscal_quarter"]
-                )
-                
-                cursor.execute(merge_sql, params)
-                print(f"Successfully merged data for earnings: {ticker_value} - {data['fiscal_year']}Q{data['fiscal_quarter']}")
-            
+            cursor.execute(f"""
+            CREATE TEMPORARY TABLE {stage_table_id} (
+                ticker VARCHAR,
+                company_name VARCHAR,
+                announcement_date DATE,
+                fiscal_year NUMBER,
+                fiscal_quarter NUMBER
+            )
+            """)
+            cursor.executemany(
+                f"INSERT INTO {stage_table_id} (ticker, company_name, announcement_date, fiscal_year, fiscal_quarter) VALUES (%s, %s, %s, %s, %s)",
+                rows
+            )
+
+            # 発表日が変わる行は変更前の日付の件数も減るため、MERGE前に既存の発表日を取得しておく
+            cursor.execute(f"""
+            SELECT DISTINCT target.announcement_date
+            FROM {table_id} target
+            JOIN {stage_table_id} source
+            ON target.ticker = source.ticker
+               AND target.fiscal_year = source.fiscal_year
+               AND target.fiscal_quarter = source.fiscal_quarter
+            WHERE target.announcement_date IS NOT NULL
+            """)
+            affected_dates = {str(row[0]) for row in cursor.fetchall()}
+            affected_dates.update(row[2] for row in rows if row[2])
+
+            cursor.execute(f"""
+            MERGE INTO {table_id} AS target
+            USING {stage_table_id} AS source
+            ON target.ticker = source.ticker
+               AND target.fiscal_year = source.fiscal_year
+               AND target.fiscal_quarter = source.fiscal_quarter
+            WHEN MATCHED THEN
+                UPDATE SET
+                    announcement_date = source.announcement_date,
+                    updated_at = CURRENT_TIMESTAMP()
+            WHEN NOT MATCHED THEN
+                INSERT (ticker, company_name, announcement_date, fiscal_year, fiscal_quarter, created_at, updated_at)
+                VALUES (source.ticker, source.company_name, source.announcement_date, source.fiscal_year, source.fiscal_quarter, CURRENT_TIMESTAMP(), CURRENT_TIMESTAMP());
+            """)
+            print(f"Merged {len(rows)} earnings calendar rows")
+
+            self._refresh_earnings_daily_counts(cursor, list(affected_dates))
+            self._refresh_earnings_day_view(cursor, list(affected_dates))
             self.conn.commit()
+            invalidate_earnings_caches(affected_dates)
             print("Upsert operation committed.")
 
         except Exception as e:
             print(f"An error occurred during upsert_earnings_calendar: {e}")
             self.conn.rollback()
             raise
+        finally:
+            try:
+                cursor.execute(f"DROP TABLE IF EXISTS {stage_table_id}")
+            finally:
+                cursor.close()
+
+    def get_earnings_calendar_rows(self, start_date: str, end_date: str) -> List[Dict]:
+        """発表日が [start_date, end_date) の決算予定を取得（差分同期用）"""
+        db_name = os.getenv("SNOWFLAKE_DATABASE")
+        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+        query = f"""
+        SELECT ticker, company_name, announcement_date, fiscal_year, fiscal_quarter
+        FROM {db_name}.{schema_name}.earnings_calendar
+        WHERE announcement_date >= %s AND announcement_date < %s
+        """
+        return self.query(query, (start_date, end_date))
+
+    @traced("snowflake")
+    def delete_earnings_calendar(self, keys: List[tuple]) -> int:
+        """
+        取り消された決算予定を削除
+
+        Args:
+            keys: (ticker, fiscal_year, fiscal_quarter) のリスト
+
+        Returns:
+            削除した行数
+        """
+        if not self.conn:
+            print("No connection to Snowflake. Aborting delete.")
+            return 0
+        if not keys:
+            return 0
+
+        db_name = os.getenv("SNOWFLAKE_DATABASE")
+        schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+        table_id = f"{db_name}.{schema_name}.earnings_calendar"
+        values = ", ".join(["(%s, %s, %s)"] * len(keys))
+        params = tuple(value for key in keys for value in key)
+        key_source = f"SELECT column1 AS ticker, column2 AS fiscal_year, column3 AS fiscal_quarter FROM VALUES {values}"
+        on_clause = """target.ticker = source.ticker
+               AND target.fiscal_year = source.fiscal_year
+               AND target.fiscal_quarter = source.fiscal_quarter"""
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"""
+            SELECT DISTINCT target.announcement_date
+            FROM {table_id} target
+            JOIN ({key_source}) source
+            ON {on_clause}
+            WHERE target.announcement_date IS NOT NULL
+            """, params)
+            affected_dates = {str(row[0]) for row in cursor.fetchall()}
+
+            cursor.execute(f"""
+            DELETE FROM {table_id} AS target
+            USING ({key_source}) AS source
+            WHERE {on_clause}
+            """, params)
+            deleted = cursor.rowcount or 0
+
+            self._refresh_earnings_daily_counts(cursor, list(affected_dates))
+            self._refresh_earnings_day_view(cursor, list(affected_dates))
+            self.conn.commit()
+            invalidate_earnings_caches(affected_dates)
+            print(f"Deleted {deleted} cancelled earnings calendar rows")
+            return deleted
+        except Exception as e:
+            print(f"An error occurred during delete_earnings_calendar: {e}")
+            self.conn.rollback()
+            raise
         finally:
             cursor.close()
 
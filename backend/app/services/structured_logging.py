@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+キュー経由の構造化ログ
+
+ルートロガーにはキューへ積むだけのハンドラーを付け、JSONへの変換と標準出力・
+ファイルへの書き込みはQueueListenerの別スレッドで行う。リクエストを処理する
+スレッドやイベントループはログの書き込みを待たない。
+
+- 1行1件のJSON（時刻、レベル、ロガー名、メッセージ、extraで渡した項目、例外）
+- 長い文字列・大きなリストや辞書は切り詰めてから積む
+- DEBUG/INFOは LOG_SAMPLE_RATE（またはextraのsample_rate）の割合だけ残す。
+  WARNING以上は常に残す
+- キューがいっぱいのときは待たずに捨て、捨てた件数を数える
+
+環境変数:
+    LOG_LEVEL: ルートのレベル（デフォルトINFO）
+    LOG_LEVELS: ロガーごとのレベル（例: "app.services.google_drive_service=WARNING,snowflake=WARNING"）
+    LOG_SAMPLE_RATE: DEBUG/INFOを残す割合（0〜1、デフォルト1）
+    LOG_FILE: 指定した場合はファイルにも出力（10MBごとにローテーション）
+    LOG_QUEUE_SIZE: キューの最大件数（デフォルト10000）
+
+使い方:
+    logger = logging.getLogger(__name__)
+    logger.info("Google Drive search finished", extra={"count": len(items), "items": items})
+"""
+
+import os
+import sys
+import json
+import queue
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional
+
+MAX_STRING_LENGTH = 1000
+MAX_ITEMS = 20
+MAX_DEPTH = 4
+DEFAULT_QUEUE_SIZE = 10000
+
+# LogRecordの標準の属性（これ以外はextraで渡された項目として出力する）
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
+_setup_lock = threading.Lock()
+
+
+def truncate(value: Any, max_length: int = MAX_STRING_LENGTH, max_items: int = MAX_ITEMS, depth: int = 0) -> Any:
+    """ログに出す値を切り詰める（大きな値でも先頭のmax_items件だけを見る）"""
+    if isinstance(value, str):
+        if len(value) > max_length:
+            return f"{value[:max_length]}...(+{len(value) - max_length} chars)"
+        return value
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if depth >= MAX_DEPTH:
+        return truncate(repr(value), max_length)
+    if isinstance(value, dict):
+        result = {}
+        for index, (key, item) in enumerate(value.items()):
+            if index >= max_items:
+                result["..."] = f"+{len(value) - max_items} keys"
+                break
+            result[str(key)] = truncate(item, max_length, max_items, depth + 1)
+        return result
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = []
+        for index, item in enumerate(value):
+            if index >= max_items:
+                items.append(f"...(+{len(value) - max_items} items)")
+                break
+            items.append(truncate(item, max_length, max_items, depth + 1))
+        return items
+    return truncate(str(value), max_length)
+
+
+class JsonFormatter(logging.Formatter):
+    """LogRecordを1行のJSONにする"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key != "sample_rate":
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = truncate(self.formatException(record.exc_info), max_length=10000)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """WARNING未満のログをsample_rateの割合だけ通す"""
+
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = getattr(record, "sample_rate", self.sample_rate)
+        return rate >= 1 or random.random() < rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    """キューに積むだけのハンドラー（キューがいっぱいなら待たずに捨てる）"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 引数を埋め込んだメッセージとextraの値を切り詰めたコピーを積む
+        # （書き込みスレッドで変換する時点で元のオブジェクトが変わっていても影響しない）
+        record = logging.makeLogRecord(vars(record))
+        record.msg = truncate(record.getMessage())
+        record.args = None
+        for key, value in list(vars(record).items()):
+            if key not in _RECORD_ATTRIBUTES:
+                setattr(record, key, truncate(value))
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _parse_levels(value: str) -> Dict[str, str]:
+    levels = {}
+    for item in value.split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(level: Optional[str] = None, log_file: Optional[str] = None) -> QueueListener:
+    """
+    ルートロガーをキュー経由のJSON出力に切り替える（何度呼んでも1回だけ設定する）
+
+    Args:
+        level: ルートのレベル（デフォルトは環境変数LOG_LEVEL、なければINFO）
+        log_file: 出力するファイル（デフォルトは環境変数LOG_FILE、なければ標準出力のみ）
+    """
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+
+        formatter = JsonFormatter()
+        handlers = [logging.StreamHandler(sys.stdout)]
+        log_file = log_file or os.getenv("LOG_FILE")
+        if log_file:
+            os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+            handlers.append(RotatingFileHandler(log_file, maxBytes=10 * 1024 * 1024, backupCount=5, encoding='utf-8'))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)))
+        _queue_handler = DroppingQueueHandler(log_queue)
+        _queue_handler.addFilter(SamplingFilter(float(os.getenv("LOG_SAMPLE_RATE", "1"))))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_queue_handler)
+        root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+        for name, logger_level in _parse_levels(os.getenv("LOG_LEVELS", "")).items():
+            logging.getLogger(name).setLevel(logger_level)
+
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        return _listener
+
+
+def dropped_count() -> int:
+    """キューがいっぱいで捨てたログの件数"""
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+def shutdown_logging():
+    """キューに残っているログを書き出して書き込みスレッドを止める"""
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        root = logging.getLogger()
+        if _queue_handler is not None:
+            root.removeHandler(_queue_handler)
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _queue_handler = None
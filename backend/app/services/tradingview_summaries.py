@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+TradingViewの分析サマリーの一括取得
+
+企業ごとにTA_Handlerでリクエストする代わりに、tradingview_taのget_multiple_analysisで
+スクリーナー（japan、americaなど）ごとに数百銘柄をまとめて取得する。米国株は上場先の
+取引所がテーブルに保存されていないため、NASDAQ、NYSE、AMEXの順に問い合わせ、
+見つからなかった銘柄だけを次の取引所で問い合わせる。
+"""
+
+import asyncio
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .rate_limiter import AsyncRateLimiter
+
+DEFAULT_BATCH_SIZE = 500
+
+# 国コード -> (スクリーナー, 問い合わせる取引所の順序)
+SCREENER_EXCHANGES: Dict[str, Tuple[str, List[str]]] = {
+    'JP': ('japan', ['TSE']),
+    'US': ('america', ['NASDAQ', 'NYSE', 'AMEX']),
+}
+
+
+def tradingview_symbol(ticker: str, country: str) -> str:
+    """企業テーブルのtickerをTradingViewの銘柄コードに変換（7203.T -> 7203, BRK-B -> BRK.B）"""
+    if country == 'JP':
+        return ticker.split('.')[0].upper()
+    return ticker.replace('-', '.').upper()
+
+
+def chunked(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _fetch_multiple_analysis(screener: str, symbols: List[str]) -> Dict:
+    """get_multiple_analysisで日足の分析を取得（ブロッキング処理）"""
+    from tradingview_ta import Interval, get_multiple_analysis
+
+    return get_multiple_analysis(screener=screener, interval=Interval.INTERVAL_1_DAY, symbols=symbols)
+
+
+class TradingViewSummaryCollector:
+    def __init__(
+        self,
+        fetch_multiple: Optional[Callable[[str, List[str]], Dict]] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        limiter: Optional[AsyncRateLimiter] = None,
+    ):
+        """
+        初期化
+
+        Args:
+            fetch_multiple: (スクリーナー, ["取引所:銘柄", ...]) -> {"取引所:銘柄": 分析結果またはNone}
+            batch_size: 1回のリクエストで問い合わせる銘柄数
+            limiter: TradingViewへのリクエストのレート制限
+        """
+        self.fetch_multiple = fetch_multiple or _fetch_multiple_analysis
+        self.batch_size = max(1, batch_size)
+        self.limiter = limiter or AsyncRateLimiter(rate_per_second=1.0, max_concurrency=2)
+
+    async def _fetch_chunk(self, screener: str, exchange: str, symbols: Sequence[str]) -> Dict[str, Dict]:
+        """1回分の銘柄を問い合わせ、銘柄コード -> サマリーを返す（失敗した場合は空）"""
+        try:
+            async with self.limiter.limit():
+                result = await asyncio.to_thread(
+                    self.fetch_multiple, screener, [f"{exchange}:{symbol}" for symbol in symbols]
+                )
+        except Exception as e:
+            print(f"Error fetching TradingView analysis ({screener}/{exchange}, {len(symbols)} symbols): {str(e)}")
+            return {}
+
+        summaries = {}
+        for key, analysis in (result or {}).items():
+            if analysis is None:
+                continue
+            summary = getattr(analysis, 'summary', None)
+            if summary:
+                summaries[key.split(':', 1)[-1].upper()] = summary
+        return summaries
+
+    async def collect(self, tickers: List[str], country: str) -> Dict[str, Dict]:
+        """
+        1つの国の企業のサマリーを取得
+
+        Returns:
+            ticker -> サマリー（取得できなかった企業は含まない）
+        """
+        if country not in SCREENER_EXCHANGES:
+            return {}
+        screener, exchanges = SCREENER_EXCHANGES[country]
+
+        tickers_by_symbol: Dict[str, List[str]] = {}
+        for ticker in tickers:
+            tickers_by_symbol.setdefault(tradingview_symbol(ticker, country), []).append(ticker)
+
+        summaries: Dict[str, Dict] = {}
+        remaining = list(tickers_by_symbol)
+        for exchange in exchanges:
+            if not remaining:
+                break
+            results = await asyncio.gather(*[
+                self._fetch_chunk(screener, exchange, chunk)
+                for chunk in chunked(remaining, self.batch_size)
+            ])
+            found = {}
+            for result in results:
+                found.update(result)
+            for symbol, summary in found.items():
+                for ticker in tickers_by_symbol.get(symbol, []):
+                    summaries[ticker] = summary
+            remaining = [symbol for symbol in remaining if symbol not in found]
+
+        print(f"TradingView summaries for {country}: {len(summaries)}/{len(tickers)} found")
+        return summaries
+
+
+async def update_tradingview_summaries(
+    snowflake_service,
+    tickers_by_country: Dict[str, List[str]],
+    collector: Optional[TradingViewSummaryCollector] = None,
+) -> Dict[str, Dict[str, int]]:
+    """
+    国ごとにサマリーを一括取得し、企業テーブルのTRADINGVIEW_SUMMARYにまとめて書き込む
+
+    Returns:
+        国コード -> {"requested": 問い合わせた企業数, "found": 取得できた企業数, "updated": 更新した行数}
+    """
+    from .snowflake_service import COMPANY_TABLES
+
+    collector = collector or TradingViewSummaryCollector()
+    stats = {}
+    for country, tickers in tickers_by_country.items():
+        summaries = await collector.collect(tickers, country)
+        updated = 0
+        if summaries:
+            updated = await asyncio.to_thread(
+                snowflake_service.bulk_update_tradingview_summaries, COMPANY_TABLES[country], summaries
+            )
+        stats[country] = {"requested": len(tickers), "found": len(summaries), "updated": updated}
+    return stats
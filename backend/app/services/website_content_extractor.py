@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+AI分析用のウェブサイト本文抽出
+
+企業サイトのトップページと会社概要・IRなどの関連ページから本文ブロックを抽出し、
+ナビゲーションなどの定型部分を除去・重複排除したうえで、情報量の多い順に
+トークン予算の範囲内へ詰め込む。
+"""
+
+import re
+import hashlib
+from typing import List, Tuple, Optional
+from urllib.parse import urljoin, urlparse
+from bs4 import BeautifulSoup
+
+# 関連ページとみなすリンクのキーワード（URLまたはリンクテキストに含まれるもの）
+RELEVANT_LINK_KEYWORDS = [
+    'about', 'company', 'corporate', 'profile', 'overview', 'outline', 'ir', 'investor',
+    '会社概要', '会社情報', '企業情報', '企業概要', '事業内容', '私たちについて', 'IR情報', '投資家',
+]
+
+# 定型部分として除去するタグ
+BOILERPLATE_TAGS = ['script', 'style', 'noscript', 'nav', 'header', 'footer', 'aside', 'form', 'iframe', 'svg']
+
+# class/idの単語（-・_・camelCaseで区切った単位）に含まれる場合に定型部分として除去するキーワード
+BOILERPLATE_ATTR_WORDS = {
+    'nav', 'gnav', 'navi', 'navbar', 'navigation', 'menu', 'footer', 'header', 'breadcrumb', 'breadcrumbs',
+    'cookie', 'sidebar', 'sns', 'share', 'banner', 'pagetop', 'modal',
+}
+# 状態を表すclass（has-sidebar, is-menu-openなど）の先頭の単語。要素自体は定型部分ではない
+STATE_PREFIX_WORDS = {'has', 'is', 'no', 'with', 'without'}
+ATTR_WORD_SEPARATOR = re.compile(r'[-_]+|(?<=[a-z0-9])(?=[A-Z])')
+
+# class/idが一致しても除去しないタグ（ページ全体・本文のコンテナ）
+PROTECTED_TAGS = {'html', 'body', 'main', 'article'}
+# ページの本文のうちこの割合を超えるテキストを含む要素は、class/idが一致してもラッパーとみなして残す
+MAX_BOILERPLATE_TEXT_RATIO = 0.5
+
+# 本文ブロックとして扱うタグ
+BLOCK_TAGS = ['h1', 'h2', 'h3', 'h4', 'p', 'li', 'dt', 'dd', 'th', 'td']
+
+# 企業情報として価値の高いキーワード（スコアリング用）
+INFORMATIVE_KEYWORDS = [
+    '設立', '創業', '従業員', '社員数', '代表', '社長', 'CEO', '資本金', '売上', '事業', 'サービス',
+    '製品', '本社', '所在地', '上場', '資金調達', '株主', '投資家',
+    'founded', 'employees', 'headquarters', 'revenue', 'capital', 'product', 'service', 'customers',
+]
+
+MIN_BLOCK_CHARS = 20
+CJK_PATTERN = re.compile(r'[぀-ヿ㐀-鿿＀-￯]')
+
+
+def estimate_tokens(text: str) -> int:
+    """トークン数の概算（日本語は1文字≒1トークン、英数字は4文字≒1トークン）"""
+    cjk_chars = len(CJK_PATTERN.findall(text))
+    return cjk_chars + (len(text) - cjk_chars + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """トークン予算に収まるように文字列を切り詰める（末尾に付ける「…」も予算に含める）"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if estimate_tokens("…") > max_tokens:
+        return ""
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid] + "…") <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low] + "…"
+
+
+def _is_relevant_link(path: str, text: str) -> bool:
+    """URLのパスまたはリンクテキストが関連ページを示すかを判定"""
+    path = path.lower()
+    text = text.lower()
+    # 'ir'のような短いキーワードは部分一致で誤検出しやすいため、パスの区切り単位で判定
+    path_parts = set(re.split(r'[/_\-.]', path))
+    for keyword in RELEVANT_LINK_KEYWORDS:
+        keyword = keyword.lower()
+        if keyword in path_parts or text == keyword:
+            return True
+        if len(keyword) > 2 and (keyword in path or keyword in text):
+            return True
+    return False
+
+
+def find_relevant_links(soup: BeautifulSoup, base_url: str, max_links: int = 3) -> List[str]:
+    """同一ドメイン内の会社概要・IRなどの関連ページのURLを取得"""
+    base_host = urlparse(base_url).netloc
+    links = []
+
+    for anchor in soup.find_all('a', href=True):
+        href = anchor['href'].strip()
+        if href.startswith(('#', 'mailto:', 'tel:', 'javascript:')):
+            continue
+
+        url = urljoin(base_url, href).split('#')[0]
+        parsed = urlparse(url)
+        if parsed.netloc != base_host or parsed.scheme not in ('http', 'https'):
+            continue
+        if url.rstrip('/') == base_url.rstrip('/') or url in links:
+            continue
+        if parsed.path.lower().endswith(('.pdf', '.jpg', '.png', '.zip')):
+            continue
+
+        if _is_relevant_link(parsed.path, anchor.get_text(" ", strip=True)):
+            links.append(url)
+            if len(links) >= max_links:
+                break
+
+    return links
+
+
+def is_boilerplate_token(token: str) -> bool:
+    """class/idの1つの値が定型部分（ナビゲーション・フッターなど）を示すかを判定"""
+    words = [word.lower() for word in ATTR_WORD_SEPARATOR.split(token) if word]
+    if not words or words[0] in STATE_PREFIX_WORDS:
+        return False
+    return any(word in BOILERPLATE_ATTR_WORDS for word in words)
+
+
+def remove_boilerplate_elements(soup: BeautifulSoup):
+    """class/idが定型部分を示す要素を除去（ページ全体や本文の大部分を含むラッパーは残す）"""
+    page_chars = len(soup.get_text(strip=True))
+    for tag in soup.find_all(True):
+        if tag.decomposed or tag.name in PROTECTED_TAGS:
+            continue
+        tokens = list(tag.get('class') or []) + ([tag['id']] if tag.get('id') else [])
+        if not any(is_boilerplate_token(token) for token in tokens):
+            continue
+        if len(tag.get_text(strip=True)) > page_chars * MAX_BOILERPLATE_TEXT_RATIO:
+            continue
+        tag.decompose()
+
+
+def extract_text_blocks(content, page_weight: float = 1.0) -> List[Tuple[float, str]]:
+    """HTMLから定型部分を除いた本文ブロックを(スコア, テキスト)のリストで取得"""
+    soup = content if isinstance(content, BeautifulSoup) else BeautifulSoup(content, 'html.parser')
+
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+    remove_boilerplate_elements(soup)
+
+    blocks = []
+    for element in soup.find_all(BLOCK_TAGS):
+        # 入れ子のブロック（li内のpなど）は内側だけを使う
+        if element.find(BLOCK_TAGS):
+            continue
+        text = " ".join(element.get_text(" ").split())
+        if len(text) < MIN_BLOCK_CHARS:
+            continue
+        blocks.append((score_block(text) * page_weight, text))
+
+    return blocks
+
+
+def score_block(text: str) -> float:
+    """ブロックの情報量スコア（キーワード・数値を含むほど高い、長すぎる文は減点）"""
+    score = 1.0
+    score += sum(1.5 for keyword in INFORMATIVE_KEYWORDS if keyword.lower() in text.lower())
+    score += min(len(re.findall(r'\d', text)), 10) * 0.2
+    if len(text) > 400:
+        score *= 0.7
+    return score
+
+
+def deduplicate_blocks(blocks: List[Tuple[float, str]]) -> List[Tuple[float, str]]:
+    """同一テキストのブロックを除去（スコアの高い方を残す）"""
+    seen = {}
+    for index, (score, text) in enumerate(blocks):
+        digest = hashlib.md5(re.sub(r'\s+', '', text).lower().encode('utf-8')).hexdigest()
+        if digest not in seen or seen[digest][1] < score:
+            seen[digest] = (index, score, text)
+    return [(score, text) for _, score, text in sorted(seen.values())]
+
+
+def pack_blocks(blocks: List[Tuple[float, str]], token_budget: int) -> str:
+    """スコアの高い順にトークン予算内に詰め込み、元の出現順で連結"""
+    ranked = sorted(enumerate(blocks), key=lambda item: item[1][0], reverse=True)
+    selected = []
+    used = 0
+
+    for index, (_, text) in ranked:
+        tokens = estimate_tokens(text) + 1
+        if used + tokens > token_budget:
+            continue
+        selected.append((index, text))
+        used += tokens
+
+    return "\n".join(text for _, text in sorted(selected))
+
+
+def build_website_content(
+    pages: List[Tuple[str, Optional[bytes]]],
+    token_budget: int,
+) -> str:
+    """
+    取得したページ群からAI分析用の本文を作成
+
+    Args:
+        pages: (URL, HTML)のリスト。先頭がトップページ、以降が関連ページ
+        token_budget: 本文に割り当てるトークン数の上限
+    """
+    blocks = []
+    for index, (url, content) in enumerate(pages):
+        if not content:
+            continue
+        # 会社概要などの関連ページはトップページより情報量が多いため重み付け
+        weight = 1.0 if index == 0 else 1.5
+        blocks.extend(extract_text_blocks(content, page_weight=weight))
+
+    return pack_blocks(deduplicate_blocks(blocks), token_budget)
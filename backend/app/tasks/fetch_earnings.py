@@ -1,9 +1,14 @@
 from datetime import datetime, date, timedelta
+import re
+import asyncio
 import calendar
+import unicodedata
+from typing import Optional
+import aiohttp
 import requests
 from bs4 import BeautifulSoup
-from ..db.earnings import insert_earnings_data
-import time
+from ..services.rate_limiter import HostRateLimiter
+from ..services.snowflake_service import SnowflakeService
 
 def should_fetch_next_month_data() -> bool:
     """今日が月末かどうかをチェック"""
@@ -26,57 +31,125 @@ def get_target_month() -> date:
     
     return date(new_year, new_month, 1)
 
+def parse_earnings_page(html: str) -> list:
+    """決算カレンダーページのHTMLから企業情報を抽出"""
+    soup = BeautifulSoup(html, 'html.parser')
+    companies = []
+
+    # Yahoo!ファイナンスの決算カレンダーのテーブルから情報を取得
+    table = soup.find('table', {'class': '_13C_m5Hx'})  # クラス名は実際のものに変更が必要
+    if table:
+        rows = table.find_all('tr')[1:]  # ヘッダー行をスキップ
+        for row in rows:
+            cols = row.find_all('td')
+            if len(cols) >= 4:
+                company = {
+                    "code": cols[0].text.strip(),
+                    "name": cols[1].text.strip(),
+                    "market": cols[2].text.strip(),
+                    "fiscal_year": cols[3].text.strip() if len(cols) > 3 else None,
+                    "quarter": cols[4].text.strip() if len(cols) > 4 else None
+                }
+                companies.append(company)
+
+    return companies
+
 def scrape_earnings_page(url: str) -> list:
     """決算カレンダーページから企業情報をスクレイピング"""
     response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    companies = []
-
     try:
-        # Yahoo!ファイナンスの決算カレンダーのテーブルから情報を取得
-        table = soup.find('table', {'class': '_13C_m5Hx'})  # クラス名は実際のものに変更が必要
-        if table:
-            rows = table.find_all('tr')[1:]  # ヘッダー行をスキップ
-            for row in rows:
-                cols = row.find_all('td')
-                if len(cols) >= 4:
-                    company = {
-                        "code": cols[0].text.strip(),
-                        "name": cols[1].text.strip(),
-                        "market": cols[2].text.strip(),
-                        "fiscal_year": cols[3].text.strip() if len(cols) > 3 else None,
-                        "quarter": cols[4].text.strip() if len(cols) > 4 else None
-                    }
-                    companies.append(company)
+        return parse_earnings_page(response.text)
     except Exception as e:
         print(f"Error scraping page {url}: {e}")
+        return []
 
-    return companies
+async def _fetch_day(session: aiohttp.ClientSession, limiter: HostRateLimiter, target_date: date) -> tuple:
+    """1日分の決算カレンダーページを取得して解析"""
+    date_str = target_date.strftime('%Y-%m-%d')
+    url = f"https://finance.yahoo.co.jp/calendar/{target_date.year}/{target_date.month}/{target_date.day}"
+    try:
+        async with limiter.limit(url):
+            async with session.get(url) as response:
+                html = await response.text()
+        return date_str, parse_earnings_page(html)
+    except Exception as e:
+        print(f"Error processing date {date_str}: {e}")
+        return date_str, []
+
+def _parse_number(text) -> Optional[int]:
+    """'2025年3月期' や '第３四半期' から最初の数値を取り出す"""
+    match = re.search(r'\d+', unicodedata.normalize('NFKC', str(text or '')))
+    return int(match.group()) if match else None
 
-def fetch_earnings_for_specific_month(year: int, month: int):
+def to_calendar_rows(companies_by_date: dict) -> tuple:
+    """
+    日付 -> 企業リストを earnings_calendar の行に変換
+
+    Returns:
+        (行のリスト, 年度または四半期を解析できずに除いた件数)
+    """
+    rows = []
+    skipped = 0
+    for date_str, companies in companies_by_date.items():
+        for company in companies:
+            fiscal_year = _parse_number(company.get("fiscal_year"))
+            quarter = _parse_number(company.get("quarter"))
+            if not company.get("code") or fiscal_year is None or quarter is None:
+                skipped += 1
+                continue
+            rows.append({
+                "ticker": company["code"],
+                "company_name": company["name"],
+                "announcement_date": date_str,
+                "fiscal_year": fiscal_year,
+                "fiscal_quarter": quarter,
+            })
+    return rows, skipped
+
+def save_earnings_data(companies_by_date: dict) -> bool:
+    """複数日分の決算データをSnowflakeの earnings_calendar にまとめて反映"""
+    rows, skipped = to_calendar_rows(companies_by_date)
+    if skipped:
+        print(f"Skipped {skipped} companies without fiscal year or quarter")
+    if not rows:
+        return False
+    snowflake_service = SnowflakeService()
+    try:
+        snowflake_service.upsert_earnings_calendar(rows)
+        return True
+    except Exception as e:
+        print(f"Error inserting data: {e}")
+        return False
+    finally:
+        snowflake_service.close_connection()
+
+async def fetch_earnings_range(start_date: date, end_date: date, limiter: Optional[HostRateLimiter] = None) -> dict:
+    """
+    期間内の各日の決算データを並行して取得し、まとめて保存
+
+    同じホストへのリクエストはレート制限の範囲で実行し、保存は全日分を1回で行う。
+
+    Returns:
+        日付 -> 企業リスト（企業がいない日は含まない）
+    """
+    limiter = limiter or HostRateLimiter(rate_per_second=0.5, max_concurrency=2)
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+    async with aiohttp.ClientSession() as session:
+        results = await asyncio.gather(*[_fetch_day(session, limiter, day) for day in days])
+
+    companies_by_date = {date_str: companies for date_str, companies in results if companies}
+    if companies_by_date:
+        if save_earnings_data(companies_by_date):
+            print(f"Successfully saved data for {len(companies_by_date)} days")
+    return companies_by_date
+
+async def fetch_earnings_for_specific_month(year: int, month: int):
     """指定された年月の決算データを取得"""
     _, last_day = calendar.monthrange(year, month)
-    
-    for day in range(1, last_day + 1):
-        target_date = date(year, month, day)
-        date_str = target_date.strftime('%Y-%m-%d')
-        
-        try:
-            url = f"https://finance.yahoo.co.jp/calendar/{year}/{month}/{day}"
-            companies = scrape_earnings_page(url)
-            
-            if companies:
-                insert_earnings_data(date_str, companies)
-                print(f"Successfully saved data for {date_str}")
-            
-            time.sleep(2)  # サーバー負荷対策
-            
-        except Exception as e:
-            print(f"Error processing date {date_str}: {e}")
+    return await fetch_earnings_range(date(year, month, 1), date(year, month, last_day))
 
 # データを即時取得するためのスクリプト
 if __name__ == "__main__":
-    # 2024年11月のデータを取得
-    fetch_earnings_for_specific_month(2024, 11)
-    # 2024年12月のデータを取得
-    fetch_earnings_for_specific_month(2024, 12) 
\ No newline at end of file
+    # 2024年11月〜12月のデータを取得
+    asyncio.run(fetch_earnings_range(date(2024, 11, 1), date(2024, 12, 31)))
@@ -0,0 +1,106 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import admin
+
+COMPANY = {"company_name": "Example", "website_url": "https://example.com"}
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/admin")
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("payload", [
+    {"companies": [COMPANY], "max_concurrency": "many"},
+    {"companies": [COMPANY], "max_concurrency": 0},
+    {"companies": [COMPANY], "max_concurrency": admin.MAX_BATCH_CONCURRENCY + 1},
+    {"companies": [COMPANY], "max_concurrency": None},
+    {"companies": ["Example"]},
+    {"companies": [COMPANY, None]},
+])
+def test_batch_collect_rejects_invalid_requests(client, payload):
+    response = client.post("/api/admin/ai/batch-collect", json=payload)
+    assert response.status_code == 400
+
+
+def test_batch_collect_accepts_bounded_concurrency(client, monkeypatch):
+    from app.services import ai_company_collector
+
+    received = {}
+
+    class _Collector:
+        async def collect_and_save_batch(self, companies, max_concurrency):
+            received["max_concurrency"] = max_concurrency
+            return [{"company_name": c["company_name"], "ticker": "", "success": True, "message": ""} for c in companies]
+
+        async def close(self):
+            pass
+
+    monkeypatch.setattr(ai_company_collector, "AICompanyCollector", _Collector)
+    response = client.post("/api/admin/ai/batch-collect", json={"companies": [COMPANY], "max_concurrency": "3"})
+    assert response.status_code == 200
+    assert received["max_concurrency"] == 3
+
+
+@pytest.mark.parametrize("payload", [
+    {"companies": [dict(COMPANY, ticker="1001")], "max_concurrency": "many"},
+    {"companies": [dict(COMPANY, ticker="1001")], "max_concurrency": 100},
+    {"companies": [dict(COMPANY, ticker="1001"), "1002"]},
+])
+def test_batch_enrich_rejects_invalid_requests(client, payload):
+    response = client.post("/api/admin/ai/batch-enrich", json=payload)
+    assert response.status_code == 400
+
+
+def test_merging_an_unfinished_batch_returns_409(client, monkeypatch):
+    from app.services import ai_batch_enrichment
+
+    class _Enricher:
+        def merge(self, job_id):
+            raise ai_batch_enrichment.BatchNotReady(job_id, "in_progress")
+
+    monkeypatch.setattr(ai_batch_enrichment, "AIBatchEnricher", _Enricher)
+    response = client.post("/api/admin/ai/batch-enrich/batch_1/merge")
+    assert response.status_code == 409
+    assert response.json()["detail"]["status"] == "in_progress"
+
+
+def test_manual_scheduler_run_keeps_a_reference_until_done(monkeypatch):
+    pytest.importorskip("apscheduler")
+    import threading
+    from app.services import scheduler as scheduler_module
+
+    release = threading.Event()
+    finished = threading.Event()
+
+    class _Scheduler:
+        class metrics:
+            @staticmethod
+            def is_running(job_id):
+                return False
+
+        async def run_job(self, job_id):
+            import asyncio
+            await asyncio.to_thread(release.wait, 5)
+            finished.set()
+
+    monkeypatch.setattr(scheduler_module, "get_scheduler", lambda: _Scheduler())
+    job_id = next(iter(scheduler_module.JOB_DEFINITIONS))
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/admin")
+    # 応答後もタスクが動き続けるよう、同じイベントループでリクエストを処理する
+    with TestClient(app) as client:
+        assert client.post(f"/api/admin/scheduler/jobs/{job_id}/run").status_code == 200
+        assert len(admin._background_tasks) == 1
+
+        release.set()
+        assert finished.wait(5)
+        for _ in range(100):
+            if not admin._background_tasks:
+                break
+            threading.Event().wait(0.01)
+        assert not admin._background_tasks
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.llm_cache import LLMResponseCache
+
+
+class StubBatchAPIHandler(BaseHTTPRequestHandler):
+    """OpenAIのFiles/Batches APIとテスト用の企業サイトを模したスタブサーバー"""
+    files = {}
+    batches = {}
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, text, content_type='text/html', status=200):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith('/site/'):
+            name = self.path.split('/')[2]
+            self._send_text(f"<title>{name}</title><body><p>{name}は業務用ソフトウェアを提供する企業です。</p></body>")
+        elif self.path.startswith('/search'):
+            self._send_text("", status=404)
+        elif self.path.startswith('/batches/'):
+            self._send_json(self.batches[self.path.split('/')[2]])
+        elif self.path.startswith('/files/') and self.path.endswith('/content'):
+            self._send_text(self.files[self.path.split('/')[2]], content_type='application/jsonl')
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.path == '/files':
+            # multipartの本文からJSONLの行だけを取り出す
+            lines = [line for line in body.decode('utf-8').splitlines() if line.startswith('{"custom_id"')]
+            file_id = f"file-{len(self.files) + 1}"
+            self.files[file_id] = "\n".join(lines)
+            self._send_json({"id": file_id, "purpose": "batch"})
+        elif self.path == '/batches':
+            request = json.loads(body)
+            output_lines = []
+            for line in self.files[request["input_file_id"]].splitlines():
+                item = json.loads(line)
+                ticker = item["custom_id"].split(':')[1]
+                content = json.dumps({"company_name": f"{ticker}株式会社", "sector": "テクノロジー"}, ensure_ascii=False)
+                # TICKER 9999 には選択肢のない壊れた応答を返す
+                choices = [] if ticker == "9999" else [{"message": {"role": "assistant", "content": content}}]
+                output_lines.append(json.dumps({
+                    "custom_id": item["custom_id"],
+                    "response": {"status_code": 200, "body": {
+                        "choices": choices,
+                        "usage": {"prompt_tokens": 100, "completion_tokens": 20},
+                    }},
+                    "error": None,
+                }, ensure_ascii=False))
+            output_lines.append("not json")
+            output_id = f"file-{len(self.files) + 1}"
+            self.files[output_id] = "\n".join(output_lines)
+            batch_id = f"batch-{len(self.batches) + 1}"
+            self.batches[batch_id] = {"id": batch_id, "status": "completed", "output_file_id": output_id}
+            self._send_json({"id": batch_id, "status": "validating"})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeSnowflakeService:
+    conn = None
+
+    def __init__(self):
+        self.upserted = []
+
+    def bulk_upsert_companies(self, companies):
+        self.upserted.extend(companies)
+        return {"COMPANIES_JP": len(companies)}
+
+
+@pytest.fixture
+def stub_server():
+    StubBatchAPIHandler.files = {}
+    StubBatchAPIHandler.batches = {}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubBatchAPIHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_batch_enrichment_round_trip(stub_server, tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_BASE_URL", stub_server)
+    from app.services import ai_company_collector
+    from app.services.ai_batch_enrichment import AIBatchEnricher
+    monkeypatch.setattr(ai_company_collector, "STARTUP_DB_BASE_URL", stub_server)
+
+    collector = ai_company_collector.AICompanyCollector()
+    collector.snowflake_service = FakeSnowflakeService()
+    collector.llm_cache = LLMResponseCache(path=str(tmp_path / "llm_cache.sqlite3"))
+    enricher = AIBatchEnricher(collector=collector, job_dir=str(tmp_path / "jobs"))
+
+    companies = [
+        {"company_name": "アルファ", "website_url": f"{stub_server}/site/alpha", "ticker": "1001", "country": "JP"},
+        {"company_name": "ベータ", "website_url": f"{stub_server}/site/beta", "ticker": "1002", "country": "JP"},
+    ]
+    job = asyncio.run(enricher.prepare(companies))
+    assert job["request_count"] == 2
+
+    job = enricher.submit(job["job_id"])
+    assert job["batch_id"] == "batch-1"
+
+    job = enricher.wait(job["job_id"], poll_interval=0.01, timeout=5)
+    assert job["status"] == "completed"
+
+    job = enricher.merge(job["job_id"])
+    assert job["status"] == "merged"
+
+    upserted = {c["ticker"]: c for c in collector.snowflake_service.upserted}
+    assert upserted["1001"]["company_name"] == "1001株式会社"
+    assert upserted["1002"]["sector"] == "テクノロジー"
+    assert upserted["1001"]["description"] == "alphaは業務用ソフトウェアを提供する企業です。"
+    assert "website_content" not in upserted["1001"]
+    # 結果はレスポンスキャッシュにも保存される
+    assert collector.llm_cache.stats()["entries"] == 2
+
+
+def test_merge_reports_malformed_results_and_missing_tickers(stub_server, tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_BASE_URL", stub_server)
+    from app.services import ai_company_collector
+    from app.services.ai_batch_enrichment import AIBatchEnricher
+    monkeypatch.setattr(ai_company_collector, "STARTUP_DB_BASE_URL", stub_server)
+
+    collector = ai_company_collector.AICompanyCollector()
+    collector.snowflake_service = FakeSnowflakeService()
+    collector.llm_cache = LLMResponseCache(path=str(tmp_path / "llm_cache.sqlite3"))
+    enricher = AIBatchEnricher(collector=collector, job_dir=str(tmp_path / "jobs"))
+
+    companies = [
+        {"company_name": "アルファ", "website_url": f"{stub_server}/site/alpha", "ticker": "1001", "country": "JP"},
+        {"company_name": "ガンマ", "website_url": f"{stub_server}/site/gamma", "ticker": "9999", "country": "JP"},
+        {"company_name": "デルタ", "website_url": f"{stub_server}/site/delta", "ticker": "", "country": "JP"},
+    ]
+    job = asyncio.run(enricher.prepare(companies))
+    enricher.submit(job["job_id"])
+    job = enricher.merge(job["job_id"])
+
+    assert job["status"] == "merged"
+    assert [c["ticker"] for c in collector.snowflake_service.upserted] == ["1001"]
+    assert sorted(f["company_name"] for f in job["failed"]) == ["ガンマ", "デルタ"]
@@ -0,0 +1,55 @@
+import json
+from decimal import Decimal
+
+import pyarrow as pa
+
+from app.services.arrow_results import (
+    arrow_json_response,
+    arrow_to_json,
+    concat_tables,
+    lowercase_columns,
+    sort_desc,
+    unique_values,
+)
+
+
+def test_concat_and_sort_across_company_tables():
+    jp = lowercase_columns(pa.table({
+        "TICKER": ["7203", "6758"],
+        "MARKET_CAP": pa.array([Decimal("300"), None], pa.decimal128(38, 0)),
+    }))
+    us = lowercase_columns(pa.table({
+        "TICKER": ["AAPL"],
+        "MARKET_CAP": pa.array([500], pa.int64()),
+    }))
+
+    # 精度の異なる数値カラムも結合でき、欠損値は0として最後に並ぶ
+    table = sort_desc(concat_tables([jp, us]), "market_cap")
+    assert table.column("ticker").to_pylist() == ["AAPL", "7203", "6758"]
+    assert table.column("market_cap").to_pylist() == [500.0, 300.0, None]
+
+
+def test_arrow_to_json_keeps_integers_and_nulls():
+    table = pa.table({
+        "ticker": ["7203", None],
+        "employees": pa.array([370000, None], pa.int64()),
+        "per": [10.5, float("nan")],
+        "company_name": ["トヨタ自動車", "ソニー"],
+    })
+    assert json.loads(arrow_to_json(table)) == [
+        {"ticker": "7203", "employees": 370000, "per": 10.5, "company_name": "トヨタ自動車"},
+        {"ticker": None, "employees": None, "per": None, "company_name": "ソニー"},
+    ]
+
+
+def test_arrow_json_response_and_unique_values():
+    table = pa.table({"country": ["JP", "US", None, "JP", ""]})
+    assert unique_values(table, "country") == ["JP", "US"]
+
+    response = arrow_json_response("companies", table.slice(0, 2), total=5, page=1)
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == {
+        "companies": [{"country": "JP"}, {"country": "US"}],
+        "total": 5,
+        "page": 1,
+    }
@@ -0,0 +1,135 @@
+import pytest
+
+pytest.importorskip("selenium")
+pytest.importorskip("webdriver_manager")
+
+from bs4 import BeautifulSoup
+
+from app.services.companies.china_stock_scraper import ChinaStockScraper
+
+URL = "https://www.nikihou.jp/company/company.html?code=02312&market=HKM"
+
+# Selenium版が読んでいた表（contentPart内のcompanyContent・smallWordを含むクラスの表）と、読まない表
+FINANCE_HTML = """
+<html><body>
+<div class="contentPart main"><div>
+<table class="companyContent smallWord">
+  <tr><th>決算期</th><th>売上高</th><th>純利益</th></tr>
+  <tr><td>2023/12</td><td>1,234百万</td><td>56百万</td></tr>
+</table>
+<table class="companyContent1 smallWord">
+  <tr><th>決算期</th><th>総資産</th></tr>
+  <tr><td>2023/12</td><td>9,999百万</td></tr>
+</table>
+<table class="companyContent smallWord">
+  <tr><td>PER</td><td>12.5倍</td></tr>
+  <tr><td>配当利回り</td><td>3.2%</td></tr>
+  <tr><td>EPS</td><td>1,050円</td></tr>
+</table>
+</div></div>
+<table class="companyContent smallWord">
+  <tr><th>決算期</th><th>営業活動によるキャッシュフロー</th></tr>
+  <tr><td>2023/12</td><td>1百万</td></tr>
+</table>
+</body></html>
+"""
+
+OUTLINE_HTML = """
+<html><body>
+<table class="middleWord"><tr><td>メインボード 02312</td><td>業種</td><td>金融・証券・保険</td></tr></table>
+<table class="companyContent1">
+  <tr><td>会社名</td><td>中国金融</td></tr>
+  <tr><td>URL</td><td><a href="/company/site">サイト</a></td></tr>
+  <tr><td>設 立</td><td>1990年</td></tr>
+</table>
+<div class="summaryContent">香港の金融会社です。 ＜続きを読むにはログインが必要です＞ 続き</div>
+</body></html>
+"""
+
+PRICE_HTML = """
+<html><body>
+<table>
+  <tr><td>取引値</td><td>HK$1,234.5</td></tr>
+  <tr><td>前日比</td><td>1.5%</td></tr>
+</table>
+<table>
+  <tr><td>売気配1</td><td>HK$10.5</td><td>買気配1</td><td>HK$10.4</td><td>出来高</td><td>1,000株</td></tr>
+</table>
+<table>
+  <tr><th>項目</th><th>値</th></tr>
+  <tr><td>出来高(千株)</td><td>120</td><td>週間騰落(%)</td><td>2.5%</td></tr>
+  <tr><td>売買代金(百万)</td><td>3.5</td><td>PER(倍)</td><td>8倍</td></tr>
+</table>
+</body></html>
+"""
+
+EMPTY_HTML = "<html><body><div id='app'></div></body></html>"
+
+
+def _parse(parser, html):
+    return parser("02312", BeautifulSoup(html, "html.parser"), URL)["data"]
+
+
+def test_parse_financial_info_reads_the_content_tables():
+    scraper = ChinaStockScraper()
+    data = _parse(scraper._parse_financial_info, FINANCE_HTML)
+
+    assert data["income_statement"] == [{"決算期": "2023/12", "売上高": 1_234_000_000.0, "純利益": 56_000_000.0}]
+    assert data["balance_sheet"] == [{"決算期": "2023/12", "総資産": 9_999_000_000.0}]
+    # contentPartの外の表は読まない
+    assert "cash_flow" not in data
+    indicators = data["indicators"]
+    assert indicators["PER"] == 12.5
+    assert indicators["配当利回り"] == pytest.approx(0.032)
+    assert indicators["EPS"] == 1050.0
+
+
+def test_parse_company_info_reads_market_basic_info_and_summary():
+    scraper = ChinaStockScraper()
+    data = _parse(scraper._parse_company_info, OUTLINE_HTML)
+
+    assert data["market_info"] == {"market": "メインボード", "ticker": "02312", "industry": "金融・証券・保険"}
+    assert data["basic_info"] == {
+        "会社名": "中国金融",
+        "URL": "https://www.nikihou.jp/company/site",
+        "設立": "1990年",
+    }
+    assert data["business_description"] == "香港の金融会社です。"
+
+
+def test_parse_stock_price_reads_price_trading_and_history_tables():
+    scraper = ChinaStockScraper()
+    data = _parse(scraper._parse_stock_price, PRICE_HTML)
+
+    assert data["current_price"] == {"取引値": 1234.5, "前日比": pytest.approx(0.015)}
+    assert data["trading_info"] == {
+        "出来高": 1000,
+        "level_1": {"sell": {"price": 10.5, "volume": None}, "buy": {"price": 10.4, "volume": None}},
+    }
+    assert data["price_history"] == [
+        {"basic_info": {"出来高": 120}, "market_info": {"週間騰落": pytest.approx(0.025)}},
+        {"basic_info": {"売買代金": 3.5}, "market_info": {"per": 8.0}},
+    ]
+
+
+@pytest.mark.parametrize("static_html, rendered", [
+    (OUTLINE_HTML, False),
+    # 企業概要の文章だけでもあればSeleniumを使わない
+    ('<div class="summaryContent">香港の金融会社です。</div>', False),
+    (EMPTY_HTML, True),
+    (None, True),
+])
+def test_selenium_fallback_runs_only_when_static_html_has_no_data(monkeypatch, static_html, rendered):
+    scraper = ChinaStockScraper()
+    calls = []
+
+    def render_html(url):
+        calls.append(url)
+        return OUTLINE_HTML
+
+    monkeypatch.setattr(scraper, "_fetch_html", lambda url: static_html.encode("utf-8") if static_html else None)
+    monkeypatch.setattr(scraper, "_render_html", render_html)
+
+    info = scraper.get_company_info("02312")
+    assert bool(calls) is rendered
+    assert info["data"]["business_description"] == "香港の金融会社です。"
@@ -0,0 +1,100 @@
+import asyncio
+
+from app.services.collection_jobs import CollectionJob
+
+
+def _run(job, tickers):
+    async def collect_events():
+        return [event async for event in job.run(tickers)]
+
+    return asyncio.run(collect_events())
+
+
+def test_collection_job_runs_workers_concurrently_and_reports_each_ticker():
+    active = 0
+    peak = 0
+    written = []
+
+    async def collect(ticker):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        if ticker == "FAIL":
+            raise ValueError("not found")
+        return {"ticker": ticker}
+
+    async def flush(companies):
+        written.append([company["ticker"] for company in companies])
+
+    tickers = [f"{1000 + i}" for i in range(9)] + ["FAIL"]
+    events = _run(CollectionJob(collect, workers=3, flush=flush, flush_size=4), tickers)
+
+    assert peak == 3
+    assert events[0] == {"progress": 0, "current": 0, "total": 10}
+    progress = events[1:-1]
+    assert [event["current"] for event in progress] == list(range(1, 11))
+    assert sorted(event["ticker"] for event in progress) == sorted(tickers)
+    assert [event["status"] for event in progress if event["ticker"] == "FAIL"] == ["failed"]
+
+    final = events[-1]
+    assert final["progress"] == 100
+    assert final["updated"] == 9
+    assert final["failed"] == [{"ticker": "FAIL", "error": "not found"}]
+    # 4件ごとにまとめて書き込み、残りは最後に書き込む
+    assert [len(batch) for batch in written] == [4, 4, 1]
+
+
+def test_collection_job_reports_failed_writes():
+    async def collect(ticker):
+        return {"ticker": ticker}
+
+    async def flush(companies):
+        raise RuntimeError("write failed")
+
+    final = _run(CollectionJob(collect, workers=2, flush=flush), ["7203", "6758"])[-1]
+    assert final["total"] == 2
+    assert final["updated"] == 0
+    assert sorted(item["ticker"] for item in final["failed"]) == ["6758", "7203"]
+
+
+def test_collection_job_with_no_tickers():
+    events = _run(CollectionJob(lambda ticker: None), [])
+    assert events[0] == {"progress": 0, "current": 0, "total": 0}
+    assert events[-1]["updated"] == 0
+
+
+def test_company_collection_writes_only_fetched_columns_and_fails_empty_results(monkeypatch):
+    from app.services import company_service as company_service_module
+
+    class _Snowflake:
+        def __init__(self):
+            self.updates = []
+
+        def get_connection(self):
+            return True
+
+        def bulk_update_collected_companies(self, table_name, rows):
+            self.updates.append((table_name, rows))
+            return len(rows)
+
+    snowflake = _Snowflake()
+    monkeypatch.setattr(company_service_module, "get_snowflake_service", lambda: snowflake)
+    service = company_service_module.CompanyService()
+
+    def fetch_yfinance(ticker):
+        if ticker == "ERR":
+            raise ConnectionError("yfinance unavailable")
+        if ticker == "EMPTY":
+            return {"ticker": ticker, "name": "", "market_price": 0, "market_cap": 0, "market": "TSE"}
+        return {"ticker": ticker, "name": "トヨタ自動車", "sector": "", "market_price": 2500, "per": 0, "market": "TSE"}
+
+    monkeypatch.setattr(service, "_fetch_yfinance_data", fetch_yfinance)
+    final = _run(service.create_collection_job(workers=2), ["7203", "ERR", "EMPTY"])[-1]
+
+    assert final["total"] == 1
+    assert sorted(item["ticker"] for item in final["failed"]) == ["EMPTY", "ERR"]
+    assert snowflake.updates == [
+        ("COMPANIES_JP", [{"ticker": "7203", "COMPANY_NAME": "トヨタ自動車", "CURRENT_PRICE": 2500.0}]),
+    ]
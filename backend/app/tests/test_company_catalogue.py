@@ -0,0 +1,59 @@
+from app.services.company_catalogue import CompanyCatalogue
+
+
+def _catalogue(rows):
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return rows
+
+    return CompanyCatalogue(loader), loads
+
+
+def test_catalogue_counts_loaded_rows():
+    catalogue, loads = _catalogue([
+        ("COMPANIES_JP", "7203", {"sector": "輸送用機器", "country": "JP", "market": "プライム"}),
+        ("COMPANIES_JP", "7267", {"sector": "輸送用機器", "country": "JP", "market": "プライム"}),
+        ("COMPANIES_US", "AAPL", {"sector": "Technology", "industry": "Consumer Electronics", "country": "US", "market": " "}),
+    ])
+
+    assert catalogue.values("sector") == ["Technology", "輸送用機器"]
+    assert catalogue.counts("country") == [{"value": "JP", "count": 2}, {"value": "US", "count": 1}]
+    assert catalogue.snapshot()["market"] == [{"value": "プライム", "count": 2}]
+    assert len(loads) == 1
+
+
+def test_apply_and_remove_update_counts_incrementally():
+    catalogue, loads = _catalogue([
+        ("COMPANIES_JP", "7203", {"sector": "輸送用機器", "industry": "自動車", "country": "JP"}),
+    ])
+    catalogue.values("sector")
+
+    # MERGE: 4項目すべてを置き換える
+    catalogue.apply("COMPANIES_JP", "7203", {"SECTOR": "電気機器", "COUNTRY": "JP"})
+    assert catalogue.values("sector") == ["電気機器"]
+    assert catalogue.values("industry") == []
+
+    # UPDATE: 渡した項目だけを変える
+    catalogue.apply("COMPANIES_JP", "7203", {"industry": "電子部品"}, replace=False)
+    assert catalogue.values("sector") == ["電気機器"]
+    assert catalogue.values("industry") == ["電子部品"]
+
+    catalogue.apply("COMPANIES_US", "MSFT", {"sector": "Technology", "country": "US"})
+    catalogue.remove("COMPANIES_JP", "7203")
+    assert catalogue.counts("country") == [{"value": "US", "count": 1}]
+    assert len(loads) == 1
+
+
+def test_writes_before_load_are_ignored_and_mark_stale_reloads():
+    rows = [("COMPANIES_JP", "7203", {"sector": "輸送用機器"})]
+    catalogue, loads = _catalogue(rows)
+
+    catalogue.apply("COMPANIES_JP", "9999", {"sector": "その他"})
+    assert catalogue.values("sector") == ["輸送用機器"]
+
+    rows.append(("COMPANIES_JP", "6758", {"sector": "電気機器"}))
+    catalogue.mark_stale()
+    assert catalogue.values("sector") == ["輸送用機器", "電気機器"]
+    assert len(loads) == 2
@@ -0,0 +1,89 @@
+import io
+
+import pytest
+
+from app.services.company_csv_import import CompanyCSVImporter, coerce_batch, iter_csv_batches
+
+CSV = """﻿ticker,company_name,sector,market_cap,employees,per,current_price
+7203, トヨタ自動車 ,自動車,"30,000,000,000,000","370,000",10.5,¥2500.50
+6758,ソニーグループ,電機,abc,,15,
+,,,,,,
+,名無し,不明,100,1,1,1
+"""
+
+
+class FakeSnowflakeService:
+    def __init__(self):
+        self.batches = []
+        self.closed = False
+
+    def close_connection(self):
+        self.closed = True
+
+    def bulk_upsert_companies(self, companies):
+        self.batches.append(companies)
+        return {"COMPANIES_JP": len(companies)}
+
+
+def test_coerce_batch_converts_numbers_and_reports_row_errors():
+    chunk = next(iter_csv_batches(io.BytesIO(CSV.encode('utf-8'))))
+    companies, errors = coerce_batch(chunk, "JP")
+
+    assert [c["ticker"] for c in companies] == ["7203", "6758"]
+    toyota, sony = companies
+    assert toyota["company_name"] == "トヨタ自動車"
+    assert toyota["market_cap"] == 30_000_000_000_000 and isinstance(toyota["market_cap"], int)
+    assert toyota["employees"] == 370_000
+    assert toyota["per"] == 10.5
+    assert toyota["current_price"] == 2500.5
+    assert toyota["country"] == "JP"
+    assert sony["market_cap"] is None
+    assert sony["employees"] is None
+    assert sony["per"] == 15 and isinstance(sony["per"], int)
+
+    assert {(e["row"], e["field"]) for e in errors} == {(2, "market_cap"), (4, "ticker")}
+
+
+def test_importer_loads_in_batches():
+    rows = "\n".join(f"{1000 + i},会社{i},{i * 10}" for i in range(250))
+    source = io.BytesIO(f"ticker,company_name,market_cap\n{rows}\n".encode('utf-8'))
+    service = FakeSnowflakeService()
+    progress = []
+
+    result = CompanyCSVImporter(service, batch_rows=100).run(source, "US", on_progress=progress.append)
+
+    assert [len(batch) for batch in service.batches] == [100, 100, 50]
+    assert result["uploaded_count"] == 250
+    assert result["rows_read"] == 250
+    assert result["error_count"] == 0
+    assert [p["rows_read"] for p in progress] == [100, 200, 250]
+    last = service.batches[2][-1]
+    assert (last["ticker"], last["company_name"], last["market_cap"], last["country"]) == ("1249", "会社249", 2490, "US")
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_upload_endpoint_closes_its_dedicated_connection(monkeypatch, stream):
+    pytest.importorskip("multipart")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.endpoints import admin
+
+    services = []
+
+    def create_service():
+        services.append(FakeSnowflakeService())
+        return services[-1]
+
+    monkeypatch.setattr(admin, "create_snowflake_service", create_service)
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/admin")
+
+    response = TestClient(app).post(
+        "/api/admin/companies/upload-csv",
+        params={"stream": stream},
+        files={"file": ("companies.csv", CSV.encode("utf-8"), "text/csv")},
+        data={"country": "JP"},
+    )
+    assert response.status_code == 200
+    assert len(services) == 1 and services[0].batches
+    assert services[0].closed
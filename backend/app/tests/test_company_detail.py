@@ -0,0 +1,86 @@
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import companies
+from app.services.company_search_index import CompanySearchIndex
+from app.services.registry import get_snowflake_service
+from app.services.response_cache import LocalBackend, ResponseCache, set_response_cache
+
+STORED_ROW = {column: None for column in companies.COMPANY_DETAIL_COLUMNS}
+STORED_ROW.update(ticker="AAPL", company_name="Apple Inc.", country="US", market="NASDAQ", current_price=180.0, per=28.0)
+
+
+class _Snowflake:
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.queries = []
+
+    def query(self, query, params=None):
+        self.queries.append(query)
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return [dict(STORED_ROW)] if params[0] == "AAPL" else []
+
+
+def _client(monkeypatch, snowflake, quote_delay=0.0):
+    set_response_cache(ResponseCache(LocalBackend()))
+
+    def quote_info(ticker):
+        time.sleep(quote_delay)
+        return {"trailingPE": 30.5, "marketCap": 3_000_000_000_000}
+
+    def latest_price(ticker):
+        time.sleep(quote_delay)
+        return 190.0
+
+    monkeypatch.setattr(companies, "_fetch_quote_info", quote_info)
+    monkeypatch.setattr(companies, "_fetch_latest_price", latest_price)
+    app = FastAPI()
+    app.include_router(companies.router, prefix="/api/companies")
+    app.dependency_overrides[get_snowflake_service] = lambda: snowflake
+    return TestClient(app)
+
+
+def test_detail_fetches_dependencies_concurrently(monkeypatch):
+    snowflake = _Snowflake(delay=0.3)
+    client = _client(monkeypatch, snowflake, quote_delay=0.3)
+
+    started = time.perf_counter()
+    response = client.get("/api/companies/AAPL")
+    elapsed = time.perf_counter() - started
+
+    assert response.status_code == 200
+    assert response.json()["current_price"] == 190.0
+    assert response.json()["per"] == 30.5
+    assert len(snowflake.queries) == 1 and snowflake.queries[0].count("UNION ALL") == 2
+    assert elapsed < 0.75
+    assert client.get("/api/companies/MSFT").status_code == 404
+
+
+def test_quote_timeout_falls_back_to_stored_values(monkeypatch):
+    monkeypatch.setattr(companies, "COMPANY_DETAIL_QUOTE_TIMEOUT_SECONDS", 0.05)
+    client = _client(monkeypatch, _Snowflake(), quote_delay=0.5)
+
+    body = client.get("/api/companies/AAPL").json()
+    assert body["current_price"] == 180.0
+    assert body["per"] == 28.0
+
+
+def test_warehouse_failure_falls_back_to_search_index(monkeypatch):
+    index = CompanySearchIndex(lambda: [
+        ("COMPANIES_US", "AAPL", {"company_name": "Apple Inc.", "country": "US", "market_cap": 2_900_000_000_000}),
+    ])
+    index.load()
+    monkeypatch.setattr(companies, "get_company_search_index", lambda: index)
+    client = _client(monkeypatch, _Snowflake(error=RuntimeError("warehouse suspended")))
+
+    response = client.get("/api/companies/AAPL")
+    assert response.status_code == 203
+    assert response.json()["company_name"] == "Apple Inc."
+    assert response.json()["current_price"] == 190.0
+    assert "x-cache" not in response.headers
+    assert client.get("/api/companies/MSFT").status_code == 503
@@ -0,0 +1,77 @@
+import io
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.services.company_parquet import inspect_parquet, save_parquet_upload, stream_parquet
+
+
+def test_stream_parquet_writes_batches_incrementally():
+    batches = [
+        pa.table({"TICKER": ["7203", "6758"], "MARKET_CAP": pa.array([100, 200], pa.int64())}),
+        pa.table({"TICKER": ["9984"], "MARKET_CAP": pa.array([None], pa.int64())}),
+    ]
+    chunks = list(stream_parquet(iter(batches)))
+
+    # バッチごとに書き込んだ分が送られる
+    assert len(chunks) > 1
+    table = pq.read_table(io.BytesIO(b"".join(chunks)))
+    assert table.to_pydict() == {"TICKER": ["7203", "6758", "9984"], "MARKET_CAP": [100, 200, None]}
+
+
+def test_stream_parquet_casts_later_batches_to_first_schema():
+    batches = [
+        pa.table({"TICKER": ["7203"], "PER": pa.array([10.5], pa.float64())}),
+        pa.table({"TICKER": ["6758"], "PER": pa.array([None], pa.null())}),
+    ]
+    table = pq.read_table(io.BytesIO(b"".join(stream_parquet(batches))))
+    assert table.schema.field("PER").type == pa.float64()
+    assert table.column("PER").to_pylist() == [10.5, None]
+
+
+def test_save_and_inspect_upload(tmp_path):
+    buffer = io.BytesIO()
+    pq.write_table(pa.table({"ticker": ["7203"], "company_name": ["トヨタ自動車"]}), buffer)
+    buffer.seek(0)
+
+    path = save_parquet_upload(buffer)
+    try:
+        assert inspect_parquet(path) == {"columns": ["ticker", "company_name"], "num_rows": 1}
+    finally:
+        os.remove(path)
+
+
+def test_stream_parquet_writes_a_valid_file_without_batches():
+    assert pq.read_table(io.BytesIO(b"".join(stream_parquet(iter([]))))).num_rows == 0
+
+    empty = pa.table({"TICKER": pa.array([], pa.string())})
+    table = pq.read_table(io.BytesIO(b"".join(stream_parquet([empty]))))
+    assert table.num_rows == 0 and table.column_names == ["TICKER"]
+
+
+def test_export_endpoint_streams_the_table(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.endpoints import admin
+
+    class _Snowflake:
+        conn = object()
+        closed = False
+
+        def iter_table_arrow_batches(self, table_name):
+            yield pa.table({"TICKER": ["7203"], "TABLE": [table_name]})
+
+        def close_connection(self):
+            self.closed = True
+
+    service = _Snowflake()
+    monkeypatch.setattr(admin, "create_snowflake_service", lambda: service)
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/admin")
+
+    response = TestClient(app).get("/api/admin/companies/export.parquet", params={"country": "JP"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    assert pq.read_table(io.BytesIO(response.content)).to_pydict() == {"TICKER": ["7203"], "TABLE": ["COMPANIES_JP"]}
+    assert service.closed
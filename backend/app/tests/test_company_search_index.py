@@ -0,0 +1,58 @@
+from app.services.company_search_index import CompanySearchIndex, name_aliases, normalize
+
+ROWS = [
+    ("COMPANIES_JP", "7203", {"COMPANY_NAME": "トヨタ自動車株式会社", "COUNTRY": "JP", "MARKET_CAP": 40_000_000_000_000}),
+    ("COMPANIES_JP", "7267", {"COMPANY_NAME": "本田技研工業株式会社", "COUNTRY": "JP", "MARKET_CAP": 8_000_000_000_000}),
+    ("COMPANIES_JP", "6201", {"COMPANY_NAME": "株式会社豊田自動織機", "COUNTRY": "JP", "MARKET_CAP": 4_000_000_000_000}),
+    ("COMPANIES_US", "TM", {"COMPANY_NAME": "Toyota Motor Corp.", "COUNTRY": "US", "MARKET_CAP": 250_000_000_000}),
+    ("COMPANIES_US", "AAPL", {"COMPANY_NAME": "Apple Inc.", "COUNTRY": "US", "MARKET_CAP": 3_000_000_000_000}),
+    ("COMPANIES_CN", "0700.HK", {"COMPANY_NAME": "Tencent Holdings Ltd", "COUNTRY": "CN", "MARKET_CAP": 500_000_000_000}),
+]
+
+
+def _index(rows=ROWS):
+    return CompanySearchIndex(lambda: list(rows))
+
+
+def test_normalize_folds_width_case_and_kana():
+    assert normalize("ＴＯＹＯＴＡ　ﾄﾖﾀ・トヨタ") == "toyotaとよたとよた"
+    assert name_aliases("Apple Inc.") == ["apple  "]
+    assert normalize(name_aliases("トヨタ自動車株式会社")[0]) == "とよた自動車"
+
+
+def test_search_ranks_by_match_type_then_market_cap():
+    index = _index()
+
+    assert [hit["ticker"] for hit in index.search("toyota")] == ["TM"]
+    assert [hit["ticker"] for hit in index.search("ﾄﾖﾀ")] == ["7203"]
+    assert [hit["ticker"] for hit in index.search("自動")] == ["7203", "6201"]
+    # 取引所の接尾辞なしのtickerと、法人格を除いた名前の完全一致
+    assert index.search("0700")[0]["match"] == "exact_ticker"
+    assert index.search("tencent")[0]["match"] == "exact_name"
+    assert [hit["ticker"] for hit in index.search("t")] == ["TM", "0700.HK"]
+    assert [hit["ticker"] for hit in index.search("a", country="us")] == ["AAPL", "TM"]
+
+
+def test_fuzzy_match_fills_remaining_results():
+    index = _index()
+
+    hits = index.search("本田技研工場")
+    assert [(hit["ticker"], hit["match"]) for hit in hits] == [("7267", "fuzzy")]
+    assert index.search("本田技研工場", fuzzy=False) == []
+
+
+def test_apply_remove_and_tickers_by_table():
+    index = _index()
+    index.search("apple")
+
+    index.apply("COMPANIES_US", "MSFT", {"company_name": "Microsoft Corporation", "market_cap": 3_100_000_000_000})
+    index.apply("COMPANIES_US", "AAPL", {"market_cap": 1}, replace=False)
+    assert [hit["ticker"] for hit in index.search("micro")] == ["MSFT"]
+    assert index.search("apple")[0]["market_cap"] == 1
+
+    index.remove("COMPANIES_JP", "6201")
+    assert index.tickers_by_table("自動") == {"COMPANIES_JP": ["7203"]}
+    assert index.tickers_by_table("t", max_tickers=1) is None
+    # 記号だけの検索語（"AT&T" の "&" など）はLIKEでの検索に任せる
+    for query in ("&", "-", "・"):
+        assert index.tickers_by_table(query) is None
@@ -0,0 +1,61 @@
+import time
+
+from app.services.company_suggest import CompanySuggester
+
+ROWS = [
+    ("COMPANIES_JP", "7203", {"COMPANY_NAME": "トヨタ自動車株式会社", "COUNTRY": "JP", "MARKET_CAP": 40_000_000_000_000}),
+    ("COMPANIES_JP", "6201", {"COMPANY_NAME": "株式会社豊田自動織機", "COUNTRY": "JP", "MARKET_CAP": 4_000_000_000_000}),
+    ("COMPANIES_JP", "7270", {"COMPANY_NAME": "ＳＵＢＡＲＵ", "COUNTRY": "JP", "MARKET_CAP": 2_000_000_000_000}),
+    ("COMPANIES_US", "TM", {"COMPANY_NAME": "Toyota Motor Corp.", "COUNTRY": "US", "MARKET_CAP": 250_000_000_000}),
+    ("COMPANIES_US", "TSLA", {"COMPANY_NAME": "Tesla, Inc.", "COUNTRY": "US", "MARKET_CAP": 800_000_000_000}),
+]
+DRIVE_ITEMS = [
+    {"id": "folder-tm", "name": "Toyota Motor", "market": "US"},
+    {"id": "folder-tcehy", "name": "Tencent", "market": "CN"},
+]
+
+
+def _suggester(rows=ROWS, drive_items=DRIVE_ITEMS):
+    loads = []
+
+    def company_loader():
+        loads.append(1)
+        return list(rows)
+
+    return CompanySuggester(company_loader, lambda: list(drive_items)), loads
+
+
+def test_suggest_completes_tickers_and_names_by_market_cap():
+    suggester, loads = _suggester()
+
+    assert [s["ticker"] for s in suggester.suggest("t")] == ["TSLA", "TM", "Tencent"]
+    assert [s["ticker"] for s in suggester.suggest("ﾄﾖ")] == ["7203"]
+    assert [s["ticker"] for s in suggester.suggest("72")] == ["7203", "7270"]
+    assert [s["ticker"] for s in suggester.suggest("subaru")] == ["7270"]
+    assert [s["ticker"] for s in suggester.suggest("t", limit=1)] == ["TSLA"]
+    assert [s["ticker"] for s in suggester.suggest("t", country="cn")] == ["Tencent"]
+    assert suggester.suggest("") == []
+    assert len(loads) == 1
+
+
+def test_drive_folders_attach_to_matching_companies():
+    suggester, _ = _suggester()
+
+    toyota_motor = suggester.suggest("toyota mo")
+    assert [(s["ticker"], s["folder_id"], s["source"]) for s in toyota_motor] == [("TM", "folder-tm", "companies")]
+    assert suggester.suggest("tencent")[0]["source"] == "drive"
+
+
+def test_mark_stale_rebuilds_in_background_and_keeps_serving():
+    rows = list(ROWS)
+    suggester, loads = _suggester(rows)
+    assert [s["ticker"] for s in suggester.suggest("sony")] == []
+
+    rows.append(("COMPANIES_JP", "6758", {"COMPANY_NAME": "ソニーグループ株式会社", "COUNTRY": "JP", "MARKET_CAP": 1}))
+    suggester.mark_stale()
+    suggester.suggest("ソニ")
+    for _ in range(100):
+        if len(loads) == 2 and not suggester._refreshing:
+            break
+        time.sleep(0.01)
+    assert [s["ticker"] for s in suggester.suggest("ソニ")] == ["6758"]
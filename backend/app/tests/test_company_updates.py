@@ -0,0 +1,60 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from app.services.company_updates import financial_metrics, latest_prices, update_prices, yfinance_symbol
+from app.services.rate_limiter import AsyncRateLimiter
+
+
+def test_yfinance_symbol():
+    assert yfinance_symbol("7203", "JP") == "7203.T"
+    assert yfinance_symbol("7203.T", "JP") == "7203.T"
+    assert yfinance_symbol("BRK.B", "US") == "BRK-B"
+
+
+def test_latest_prices_uses_last_close_per_symbol():
+    index = pd.to_datetime(["2025-01-06", "2025-01-07"])
+    columns = pd.MultiIndex.from_product([["7203.T", "6758.T"], ["Close", "Volume"]])
+    df = pd.DataFrame([[2500.0, 100, 3000.0, 50], [2550.0, 120, np.nan, np.nan]], index=index, columns=columns)
+
+    assert latest_prices(df, ["7203.T", "6758.T", "9999.T"]) == {
+        "7203.T": {"current_price": 2550.0, "volume": 120.0},
+        # 最終日が欠損している銘柄は前日の値を使う
+        "6758.T": {"current_price": 3000.0, "volume": 50.0},
+    }
+    assert latest_prices(pd.DataFrame(), ["7203.T"]) == {}
+
+
+def test_financial_metrics_skips_missing_values():
+    metrics = financial_metrics({"trailingPE": 12.5, "totalRevenue": 1000, "operatingMargins": 0.1, "priceToBook": None})
+    assert metrics["PER"] == 12.5
+    assert metrics["OPERATING_PROFIT"] == 100.0
+    assert metrics["PBR"] is None
+    assert metrics["DIVIDEND_YIELD"] is None
+
+
+def test_update_prices_writes_found_prices_in_one_update():
+    class FakeService:
+        def __init__(self):
+            self.calls = []
+
+        def bulk_update_prices(self, table_name, rows):
+            self.calls.append((table_name, sorted(rows)))
+            return len(rows)
+
+    fetched = []
+
+    def fetch(symbols):
+        fetched.append(list(symbols))
+        return {symbol: {"current_price": 100.0, "volume": 10.0} for symbol in symbols if symbol != "9999.T"}
+
+    service = FakeService()
+    stats = asyncio.run(update_prices(
+        service, "COMPANIES_JP", "JP", ["7203", "6758", "9999"],
+        chunk_size=2, limiter=AsyncRateLimiter(rate_per_second=0, max_concurrency=2), fetch=fetch,
+    ))
+
+    assert fetched == [["7203.T", "6758.T"], ["9999.T"]]
+    assert stats == {"requested": 3, "found": 2, "updated": 2}
+    assert service.calls == [("COMPANIES_JP", [("6758", 100.0, 10.0), ("7203", 100.0, 10.0)])]
@@ -0,0 +1,88 @@
+from datetime import date
+
+from app.services.earnings_cache import DailyEarningsCache, MonthlyEarningsCache, month_of
+
+
+def test_closed_months_use_the_longer_ttl():
+    cache = MonthlyEarningsCache(ttl_seconds=-1, closed_ttl_seconds=3600)
+    cache.set(2000, 1, {"2000-01-05": {"date": "2000-01-05", "count": 3}})
+    assert cache.get(2000, 1)["2000-01-05"]["count"] == 3
+
+    # 別のプロセスによる書き込みは、過去の月でも長い方の有効期間が過ぎると反映される
+    cache = MonthlyEarningsCache(ttl_seconds=3600, closed_ttl_seconds=-1)
+    cache.set(2000, 1, {})
+    assert cache.get(2000, 1) is None
+
+
+def test_module_caches_expire_closed_months():
+    from app.services.earnings_cache import daily_earnings_cache, monthly_earnings_cache
+
+    assert monthly_earnings_cache.closed_ttl_seconds is not None
+    assert daily_earnings_cache.closed_ttl_seconds is not None
+
+
+def test_current_month_expires_after_ttl():
+    today = date.today()
+    cache = MonthlyEarningsCache(ttl_seconds=-1)
+    cache.set(today.year, today.month, {})
+    assert cache.get(today.year, today.month) is None
+
+
+def test_invalidate_dates_drops_only_written_months():
+    cache = MonthlyEarningsCache()
+    cache.set(2030, 4, {"a": 1})
+    cache.set(2030, 5, {"b": 2})
+    removed = cache.invalidate_dates([date(2030, 4, 28), "2030-04-30"])
+    assert removed == 1
+    assert cache.get(2030, 4) is None
+    assert cache.get(2030, 5) == {"b": 2}
+
+
+def test_month_of():
+    assert month_of("2024-11-05") == (2024, 11)
+    assert month_of(date(2024, 2, 1)) == (2024, 2)
+    assert month_of(None) is None
+
+
+def test_daily_cache_keeps_past_days_and_invalidates_written_days():
+    cache = DailyEarningsCache(ttl_seconds=-1)
+    cache.set(date(2000, 1, 5), [{"code": "7203"}])
+    cache.set(date(2999, 1, 5), [])
+    assert cache.get(date(2000, 1, 5)) == [{"code": "7203"}]
+    # 未来の日付はTTLで失効する
+    assert cache.get(date(2999, 1, 5)) is None
+
+    cache.invalidate_dates(["2000-01-05"])
+    assert cache.get(date(2000, 1, 5)) is None
+
+
+def test_weekly_endpoint_refetches_past_days_after_closed_ttl(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.endpoints import earnings_calendar
+    from app.services.registry import get_snowflake_service
+
+    class _Snowflake:
+        def __init__(self):
+            self.calls = []
+
+        def get_earnings_day_view(self, start, end):
+            self.calls.append((start, end))
+            return []
+
+    snowflake = _Snowflake()
+    app = FastAPI()
+    app.include_router(earnings_calendar.router, prefix="/api/earnings")
+    app.dependency_overrides[get_snowflake_service] = lambda: snowflake
+    client = TestClient(app)
+
+    monkeypatch.setattr(earnings_calendar, "daily_earnings_cache", DailyEarningsCache(ttl_seconds=3600, closed_ttl_seconds=3600))
+    client.get("/api/earnings/weekly/2000-01-03")
+    client.get("/api/earnings/weekly/2000-01-03")
+    assert len(snowflake.calls) == 1
+
+    # 別のプロセスがバックフィルした過去の日付も、有効期間が過ぎると取得し直す
+    monkeypatch.setattr(earnings_calendar, "daily_earnings_cache", DailyEarningsCache(ttl_seconds=3600, closed_ttl_seconds=-1))
+    client.get("/api/earnings/weekly/2000-01-03")
+    client.get("/api/earnings/weekly/2000-01-03")
+    assert len(snowflake.calls) == 3
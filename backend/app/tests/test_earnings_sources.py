@@ -0,0 +1,39 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+pytest.importorskip("snowflake.connector")
+
+from app.scripts.earnings_calendar.earnings_sources import fetch_earnings_range, iter_months, parse_fiscal_period
+from app.tasks.fetch_earnings import to_calendar_rows
+
+
+def test_fiscal_year_follows_announcement_date():
+    # 3月期: 第3四半期（12月末）は2月、通期（3月末）は5月、第1四半期（6月末）は8月に発表
+    assert parse_fiscal_period("3月期", "第３", "2024-02-07") == (2024, 3)
+    assert parse_fiscal_period("3月期", "第４", "2024-05-10") == (2024, 4)
+    assert parse_fiscal_period("3月期", "第１", "2023-08-04") == (2024, 1)
+    # 12月期の通期は翌年2月に発表
+    assert parse_fiscal_period("12月期", "第４", "2025-02-13") == (2024, 4)
+    assert parse_fiscal_period("12月期", "第2", "2025-08-06") == (2025, 2)
+
+
+def test_range_repeating_a_month_is_rejected():
+    months = list(iter_months(date(2023, 1, 1), date(2024, 3, 1)))
+    with pytest.raises(ValueError):
+        asyncio.run(fetch_earnings_range(None, months))
+
+
+def test_yahoo_rows_are_converted_for_earnings_calendar():
+    rows, skipped = to_calendar_rows({
+        "2025-05-08": [
+            {"code": "7203", "name": "トヨタ自動車", "fiscal_year": "2025年3月期", "quarter": "第４四半期"},
+            {"code": "6758", "name": "ソニーグループ", "fiscal_year": "", "quarter": None},
+        ],
+    })
+    assert rows == [{
+        "ticker": "7203", "company_name": "トヨタ自動車", "announcement_date": "2025-05-08",
+        "fiscal_year": 2025, "fiscal_quarter": 4,
+    }]
+    assert skipped == 1
@@ -0,0 +1,60 @@
+import sys
+import importlib
+from datetime import date
+
+import pytest
+
+from app.scripts.earnings_calendar.earnings_sync import SyncState, diff_earnings, fingerprint, to_calendar_rows
+
+
+def test_diff_classifies_inserted_changed_and_cancelled():
+    new_rows = to_calendar_rows([
+        {"code": "7203", "company_name": "トヨタ自動車", "date": "2025-05-08", "fiscal_year": 2025, "quarter": 4},
+        {"code": "6758", "company_name": "ソニーグループ", "date": "2025-05-14", "fiscal_year": 2025, "quarter": 4},
+        {"code": "9984", "company_name": "ソフトバンクグループ", "date": "2025-05-13", "fiscal_year": 2025, "quarter": 4},
+    ])
+    stored_rows = [
+        {"ticker": "7203", "announcement_date": date(2025, 5, 8), "fiscal_year": 2025, "fiscal_quarter": 4},
+        {"ticker": "6758", "announcement_date": date(2025, 5, 13), "fiscal_year": 2025, "fiscal_quarter": 4},
+        {"ticker": "8306", "announcement_date": date(2025, 5, 15), "fiscal_year": 2025, "fiscal_quarter": 4},
+        # 対象月の外の発表は取得結果になくても取消にしない
+        {"ticker": "4063", "announcement_date": date(2025, 6, 2), "fiscal_year": 2025, "fiscal_quarter": 4},
+    ]
+
+    diff = diff_earnings(new_rows, stored_rows, cancel_window=("2025-05-01", "2025-06-01"))
+
+    assert [row["ticker"] for row in diff["inserted"]] == ["9984"]
+    assert [(row["ticker"], row["announcement_date"]) for row in diff["changed"]] == [("6758", "2025-05-14")]
+    assert diff["cancelled"] == [("8306", 2025, 4)]
+    assert diff["unchanged"] == 1
+
+
+def test_sync_state_round_trip(tmp_path):
+    path = tmp_path / "state.json"
+    state = SyncState(path)
+    source_fingerprint = fingerprint("<table>...</table>")
+    assert not state.is_unchanged("nikkei:2025-05", source_fingerprint)
+
+    state.update("nikkei:2025-05", source_fingerprint, [{"code": "7203"}])
+    state.save()
+
+    reloaded = SyncState(path)
+    assert reloaded.is_unchanged("nikkei:2025-05", source_fingerprint)
+    assert reloaded.get("nikkei:2025-05")["rows"] == [{"code": "7203"}]
+    assert not reloaded.is_unchanged("nikkei:2025-05", fingerprint(b"other"))
+
+
+def test_sync_scripts_import_without_google_packages(monkeypatch, tmp_path):
+    pytest.importorskip("snowflake.connector")
+    # google-cloud-bigquery はrequirementsにないため、インストールされていない状態にする
+    monkeypatch.setitem(sys.modules, "google", None)
+    for name in list(sys.modules):
+        if name.startswith("app.scripts.earnings_calendar"):
+            monkeypatch.delitem(sys.modules, name)
+    monkeypatch.chdir(tmp_path)
+
+    auto_fetch_earnings = importlib.import_module("app.scripts.earnings_calendar.auto_fetch_earnings")
+    importlib.import_module("app.scripts.earnings_calendar.fetch_earnings_data")
+
+    assert callable(auto_fetch_earnings.incremental_sync)
+    assert not (tmp_path / "earnings_fetch.log").exists()
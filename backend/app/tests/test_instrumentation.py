@@ -0,0 +1,52 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.services import instrumentation
+from app.services.instrumentation import Histogram, TimingMiddleware, render_metrics, span, traced
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_seconds", "test", ("operation",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, operation="query")
+    histogram.observe(0.5, operation="query")
+    histogram.observe(5.0, operation="query")
+
+    lines = histogram.render()
+    assert 'test_seconds_bucket{operation="query",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{operation="query",le="1"} 2' in lines
+    assert 'test_seconds_bucket{operation="query",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{operation="query"} 3' in lines
+
+
+def test_middleware_adds_server_timing_and_records_metrics():
+    app = FastAPI()
+    app.add_middleware(TimingMiddleware)
+
+    @traced("snowflake", "query")
+    def query():
+        # 同じ依存先の中の呼び出しは数えない
+        with span("snowflake", "execute"):
+            return 1
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: str):
+        await asyncio.to_thread(query)
+        with span("yfinance", "ticker_info"):
+            pass
+        return {"id": item_id}
+
+    response = TestClient(app).get("/items/7203")
+
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert 'snowflake;desc="1 calls"' in timing
+    assert 'yfinance;desc="1 calls"' in timing
+    assert "app;dur=" in timing
+
+    metrics = render_metrics()
+    assert 'bizlens_http_requests_total{method="GET",route="/items/{item_id}",status="200"} 1' in metrics
+    assert 'bizlens_dependency_duration_seconds_count{dependency="snowflake",operation="query"}' in metrics
+    assert 'operation="execute"' not in metrics
+    assert instrumentation._request_spans.get() is None
@@ -0,0 +1,23 @@
+from app.services.job_metrics import JobMetrics
+
+
+def test_job_metrics_records_runs_and_failures():
+    metrics = JobMetrics()
+
+    started = metrics.start("daily_prices")
+    assert metrics.is_running("daily_prices")
+    metrics.finish("daily_prices", started, result={"updated": 10})
+
+    started = metrics.start("daily_prices")
+    metrics.finish("daily_prices", started, error=RuntimeError("connection lost"))
+    metrics.record_skipped("daily_prices", "前回の実行が終了していません")
+    metrics.record_misfire("daily_prices")
+
+    snapshot = metrics.snapshot()["daily_prices"]
+    assert not snapshot["running"]
+    assert (snapshot["runs"], snapshot["successes"], snapshot["failures"]) == (2, 1, 1)
+    assert (snapshot["skipped"], snapshot["misfires"]) == (1, 1)
+    assert snapshot["last_status"] == "failed"
+    assert snapshot["last_error"] == "connection lost"
+    assert snapshot["last_result"] == {"updated": 10}
+    assert snapshot["average_seconds"] is not None
@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.llm_cache import LLMResponseCache, make_cache_key
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """/chat/completions だけを実装したローカルのOpenAI互換サーバー"""
+    calls = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        type(self).calls += 1
+        time.sleep(0.2)  # 同時リクエストが重なるように待機
+        content = json.dumps({"company_name": "テスト株式会社", "founded_year": "2015"}, ensure_ascii=False)
+        payload = json.dumps({
+            "model": body["model"],
+            "choices": [{"message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 120, "completion_tokens": 30, "total_tokens": 150},
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_openai():
+    FakeOpenAIHandler.calls = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeOpenAIHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def collector(fake_openai, tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_BASE_URL", fake_openai)
+    from app.services.ai_company_collector import AICompanyCollector
+    collector = AICompanyCollector()
+    collector.llm_cache = LLMResponseCache(path=str(tmp_path / "llm_cache.sqlite3"))
+    return collector
+
+
+def test_cache_key_depends_on_model_and_prompts():
+    key = make_cache_key("gpt-4", "system", "user")
+    assert key == make_cache_key("gpt-4", "system", "user")
+    assert key != make_cache_key("gpt-4o", "system", "user")
+    assert key != make_cache_key("gpt-4", "system", "user2")
+
+
+def test_ttl_and_size_eviction(tmp_path):
+    cache = LLMResponseCache(path=str(tmp_path / "c.sqlite3"), ttl_seconds=60, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, {"content": key, "usage": {}})
+    assert cache.get("a") is None
+    assert cache.get("c") == {"content": "c", "usage": {}}
+
+    cache.ttl_seconds = 0
+    time.sleep(0.01)
+    assert cache.get("c") is None
+
+
+def test_repeated_enhancement_is_served_from_cache(collector):
+    first = collector._enhance_with_ai("テスト", "https://example.com", {"employees": 10})
+    second = collector._enhance_with_ai("テスト", "https://example.com", {"employees": 10})
+
+    assert first == second
+    assert first["founded_year"] == 2015
+    assert FakeOpenAIHandler.calls == 1
+
+    stats = collector.llm_cache.stats()
+    assert stats["hits"] == 1
+    assert stats["prompt_tokens"] == 120
+    assert stats["saved_prompt_tokens"] == 120
+
+
+def test_concurrent_identical_requests_are_coalesced(collector):
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(
+            collector._enhance_with_ai("テスト", "https://example.com", {})
+        ))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 5
+    assert all(result == results[0] for result in results)
+    assert FakeOpenAIHandler.calls == 1
+    assert collector.llm_cache.stats()["upstream_calls"] == 1
@@ -0,0 +1,108 @@
+import pyarrow as pa
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import companies
+from app.services.pagination import (
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    filters_fingerprint,
+    market_cap_seek,
+    seek_sorted,
+)
+from app.services.registry import get_snowflake_service
+
+
+def test_cursor_round_trip_and_rejects_other_filters():
+    filters = filters_fingerprint(query="トヨタ", country="JP")
+    cursor = encode_cursor((4.0e13, "7203"), filters)
+
+    assert decode_cursor(cursor, filters) == (4.0e13, "7203")
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, filters_fingerprint(query="ホンダ", country="JP"))
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor", filters)
+
+
+def test_seek_helpers():
+    assert market_cap_seek(None) == ("1=1", [])
+    sql, params = market_cap_seek((100, "AAPL"))
+    assert sql == "(SORT_MARKET_CAP < %s OR (SORT_MARKET_CAP = %s AND TICKER > %s))"
+    assert params == [100.0, 100.0, "AAPL"]
+
+    keys = [("Alibaba", "a"), ("Baidu", "b"), ("Baidu", "c"), ("NIO", "d")]
+    assert seek_sorted(keys, None) == 0
+    assert seek_sorted(keys, ("Baidu", "b")) == 2
+    with pytest.raises(InvalidCursor):
+        seek_sorted(keys, (1, 2))
+
+
+class _Snowflake:
+    """LIMIT件の行を返し、受け取ったクエリを記録する"""
+
+    def __init__(self):
+        self.queries = []
+
+    def query_arrow(self, query, params=None):
+        self.queries.append((query, params))
+        if "COUNT(*)" in query:
+            return pa.table({"total": [25]})
+        limit = int(query.split("LIMIT")[1].split()[0])
+        return pa.table({
+            "ticker": [f"T{i:02d}" for i in range(limit)],
+            "market_cap": [float(1000 - i) for i in range(limit)],
+            "sort_market_cap": [float(1000 - i) for i in range(limit)],
+        })
+
+
+def test_search_companies_pages_with_seek_predicate():
+    snowflake = _Snowflake()
+    app = FastAPI()
+    app.include_router(companies.router, prefix="/api/companies")
+    app.dependency_overrides[get_snowflake_service] = lambda: snowflake
+    client = TestClient(app)
+
+    first = client.get("/api/companies/search", params={"page_size": 10, "sector": "Technology"}).json()
+    assert [company["ticker"] for company in first["companies"]][-1] == "T09"
+    assert "sort_market_cap" not in first["companies"][0]
+    assert first["total"] == 25 and first["total_pages"] == 3
+    assert "OFFSET 0" in snowflake.queries[0][0]
+
+    snowflake.queries.clear()
+    second = client.get("/api/companies/search", params={"page_size": 10, "sector": "Technology", "cursor": first["next_cursor"]}).json()
+    page_query, params = snowflake.queries[0]
+    assert "OFFSET" not in page_query and "SORT_MARKET_CAP < %s" in page_query
+    assert params[-3:] == (991.0, 991.0, "T09")
+    assert second["total"] is None and second["next_cursor"]
+    assert len(snowflake.queries) == 1
+
+    mismatched = client.get("/api/companies/search", params={"page_size": 10, "cursor": first["next_cursor"]})
+    assert mismatched.status_code == 400
+
+
+def test_drive_search_listing_is_reused_across_pages(monkeypatch):
+    monkeypatch.setattr(companies, "_drive_search_cache", type(companies._drive_search_cache)())
+
+    class _Drive:
+        def __init__(self):
+            self.searches = 0
+
+        def search_company_folders(self, query, folder_id):
+            self.searches += 1
+            return [{"id": f"id{i}", "name": name} for i, name in enumerate(["Tencent", "Alibaba", "Baidu"])]
+
+    drive = _Drive()
+    folders, keys = companies._search_drive_sorted(drive, "a", "folder")
+    assert keys == [("Alibaba", "id1"), ("Baidu", "id2"), ("Tencent", "id0")]
+    assert companies._search_drive_sorted(drive, "a", "folder")[0] is folders
+    assert drive.searches == 1
+
+    # 検索語・フォルダが違う場合や期限が過ぎた場合は取り直す
+    companies._search_drive_sorted(drive, "b", "folder")
+    assert drive.searches == 2
+    monkeypatch.setattr(companies, "DRIVE_SEARCH_CACHE_SECONDS", -1)
+    companies._search_drive_sorted(drive, "c", "folder")
+    companies._search_drive_sorted(drive, "c", "folder")
+    assert drive.searches == 4
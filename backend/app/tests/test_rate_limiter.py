@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+from app.services.rate_limiter import AsyncRateLimiter, HostRateLimiter
+
+
+def test_rate_limiter_spaces_request_starts():
+    limiter = AsyncRateLimiter(rate_per_second=20, max_concurrency=5)
+    starts = []
+
+    async def request():
+        async with limiter.limit():
+            starts.append(time.monotonic())
+
+    async def run():
+        await asyncio.gather(*[request() for _ in range(5)])
+
+    asyncio.run(run())
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert all(gap >= 0.04 for gap in gaps)
+
+
+def test_rate_limiter_bounds_concurrency():
+    limiter = AsyncRateLimiter(rate_per_second=0, max_concurrency=2)
+    active = 0
+    peak = 0
+
+    async def request():
+        nonlocal active, peak
+        async with limiter.limit():
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    async def run():
+        await asyncio.gather(*[request() for _ in range(6)])
+
+    asyncio.run(run())
+    assert peak == 2
+
+
+def test_hosts_are_limited_independently():
+    limiter = HostRateLimiter(rate_per_second=1, overrides={"fast.example.com": (100, 4)})
+    assert limiter.for_host("www.nikkei.com") is limiter.for_host("www.nikkei.com")
+    assert limiter.for_host("www.nikkei.com") is not limiter.for_host("www.jpx.co.jp")
+    assert limiter.for_host("fast.example.com").max_concurrency == 4
+
+    async def run():
+        start = time.monotonic()
+        # 別ホストへのリクエストは互いに待たない
+        async with limiter.limit("https://www.nikkei.com/a"):
+            pass
+        async with limiter.limit("https://www.jpx.co.jp/b"):
+            pass
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) < 0.5
@@ -0,0 +1,107 @@
+import os
+import sys
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from app.services import registry
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+
+
+class _Service:
+    def __init__(self, conn=object()):
+        self.conn = conn
+        self.closed = False
+
+    def close_connection(self):
+        self.closed = True
+
+
+def test_get_or_create_caches_and_recreates_unusable_instances():
+    registry.reset_services()
+    created = []
+
+    def factory():
+        created.append(_Service())
+        return created[-1]
+
+    def is_usable(service):
+        return service.conn is not None
+
+    first = registry._get_or_create("test", factory, is_usable)
+    assert registry._get_or_create("test", factory, is_usable) is first
+    assert len(created) == 1
+
+    first.conn = None
+    second = registry._get_or_create("test", factory, is_usable)
+    assert second is not first
+    assert len(created) == 2
+
+    registry.reset_services()
+    assert second.closed
+    assert registry._instances == {}
+
+
+def _run(code, tmp_path, **extra_env):
+    env = {**os.environ, 'SCHEDULER_JOBSTORE_URL': f"sqlite:///{tmp_path / 'jobs.sqlite'}"}
+    env.pop('SCHEDULER_ENABLED', None)
+    env.update(extra_env)
+    result = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip().splitlines()[-1]
+
+
+def test_scheduler_import_defers_snowflake_and_pandas(tmp_path):
+    pytest.importorskip("apscheduler")
+    loaded = _run(
+        "import sys, app.services.scheduler; "
+        "print([name for name in ('pandas', 'pyarrow', 'snowflake.connector') if name in sys.modules])",
+        tmp_path,
+    )
+    assert loaded == "[]"
+
+
+def test_app_startup_starts_scheduler_after_startup_completes(tmp_path):
+    for module in ("apscheduler", "multipart", "snowflake.connector"):
+        pytest.importorskip(module)
+    # 起動処理の完了時点ではスケジューラのモジュールを読み込まず、その後バックグラウンドで開始する
+    result = _run(
+        "import sys, asyncio\n"
+        "from app.main import app\n"
+        "async def main():\n"
+        "    await app.router.startup()\n"
+        "    loaded_at_startup = 'apscheduler' in sys.modules\n"
+        "    for _ in range(200):\n"
+        "        await asyncio.sleep(0.05)\n"
+        "        scheduler = getattr(sys.modules.get('app.services.scheduler'), '_scheduler', None)\n"
+        "        if scheduler and scheduler.scheduler.running:\n"
+        "            break\n"
+        "    running = bool(scheduler and scheduler.scheduler.running)\n"
+        "    await app.router.shutdown()\n"
+        "    print(loaded_at_startup, running)\n"
+        "asyncio.run(main())\n",
+        tmp_path,
+        SCHEDULER_ENABLED="true",
+    )
+    assert result == "False True"
+
+
+def test_app_startup_leaves_scheduler_off_by_default(tmp_path):
+    for module in ("apscheduler", "multipart", "snowflake.connector"):
+        pytest.importorskip(module)
+    # スケジュールを受け持つプロセスだけがSCHEDULER_ENABLED=trueで開始する
+    result = _run(
+        "import sys, asyncio\n"
+        "from app.main import app\n"
+        "async def main():\n"
+        "    await app.router.startup()\n"
+        "    await asyncio.sleep(0.5)\n"
+        "    started = 'app.services.scheduler' in sys.modules\n"
+        "    await app.router.shutdown()\n"
+        "    print(started)\n"
+        "asyncio.run(main())\n",
+        tmp_path,
+    )
+    assert result == "False"
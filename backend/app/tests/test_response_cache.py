@@ -0,0 +1,94 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.services.response_cache import (
+    InMemoryRedis,
+    LocalBackend,
+    RedisBackend,
+    ResponseCache,
+    cached_response,
+    company_tag,
+    invalidate_company_responses,
+    set_response_cache,
+)
+
+
+def _client(backend):
+    set_response_cache(ResponseCache(backend))
+    calls = []
+    app = FastAPI()
+
+    @app.get("/companies/{ticker}")
+    @cached_response(lambda ticker, **_: [company_tag(ticker)])
+    async def get_company(request: Request, ticker: str, detail: bool = False):
+        calls.append(ticker)
+        return {"ticker": ticker, "detail": detail}
+
+    return TestClient(app), calls
+
+
+def test_cached_response_serves_hits_and_not_modified():
+    client, calls = _client(LocalBackend())
+    try:
+        first = client.get("/companies/7203?detail=true")
+        second = client.get("/companies/7203?detail=true")
+        not_modified = client.get("/companies/7203?detail=true", headers={"If-None-Match": first.headers["etag"]})
+
+        assert first.headers["x-cache"] == "MISS"
+        assert second.headers["x-cache"] == "HIT"
+        assert second.json() == {"ticker": "7203", "detail": True}
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert calls == ["7203"]
+
+        client.get("/companies/7203")
+        assert calls == ["7203", "7203"]
+    finally:
+        set_response_cache(None)
+
+
+def test_invalidation_with_redis_backend():
+    client, calls = _client(RedisBackend(InMemoryRedis()))
+    try:
+        client.get("/companies/7203")
+        client.get("/companies/AAPL")
+        invalidate_company_responses(["7203"])
+        client.get("/companies/7203")
+        client.get("/companies/AAPL")
+        assert calls == ["7203", "AAPL", "7203"]
+
+        invalidate_company_responses()
+        client.get("/companies/AAPL")
+        assert calls == ["7203", "AAPL", "7203", "AAPL"]
+    finally:
+        set_response_cache(None)
+
+
+def test_local_backend_evicts_least_recently_used():
+    backend = LocalBackend(max_entries=2)
+    backend.set("a", b"1", 60, ["t"])
+    backend.set("b", b"2", 60)
+    backend.get("a")
+    backend.set("c", b"3", 60)
+
+    assert backend.get("b") is None
+    assert backend.get("a") == b"1"
+    assert backend.invalidate(["t"]) == 1
+    assert len(backend) == 1
+
+
+def test_backend_failures_are_logged_and_served_uncached(caplog):
+    class _BrokenBackend(LocalBackend):
+        def get(self, key):
+            raise ConnectionError("redis down")
+
+        def set(self, key, value, ttl_seconds, tags):
+            raise ConnectionError("redis down")
+
+    client, calls = _client(_BrokenBackend())
+    with caplog.at_level("WARNING", logger="app.services.response_cache"):
+        assert client.get("/companies/AAPL").status_code == 200
+        assert client.get("/companies/AAPL").status_code == 200
+    assert calls == ["AAPL", "AAPL"]
+    assert "Response cache read failed" in caplog.messages
+    assert "Response cache write failed" in caplog.messages
@@ -0,0 +1,42 @@
+import json
+import queue
+import logging
+
+from app.services.structured_logging import DroppingQueueHandler, JsonFormatter, SamplingFilter, truncate
+
+
+def _record(level=logging.INFO, msg="search %s", args=("toyota",), **extra):
+    record = logging.LogRecord("app.test", level, __file__, 1, msg, args, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+def test_truncate_limits_strings_and_collections():
+    assert truncate("a" * 15, max_length=10) == "aaaaaaaaaa...(+5 chars)"
+    assert truncate(list(range(30)), max_items=3) == [0, 1, 2, "...(+27 items)"]
+    assert truncate({"a": 1, "b": 2, "c": 3}, max_items=2) == {"a": 1, "b": 2, "...": "+1 keys"}
+
+
+def test_queue_handler_formats_json_and_drops_when_full():
+    log_queue = queue.Queue(maxsize=1)
+    handler = DroppingQueueHandler(log_queue)
+    items = [{"id": i, "name": "x" * 5000} for i in range(100)]
+
+    handler.handle(_record(items=items, count=100))
+    handler.handle(_record())
+
+    assert handler.dropped == 1
+    entry = json.loads(JsonFormatter().format(log_queue.get_nowait()))
+    assert entry["message"] == "search toyota"
+    assert entry["level"] == "INFO"
+    assert entry["count"] == 100
+    assert len(entry["items"]) == 21
+    assert entry["items"][0]["name"].endswith("(+4000 chars)")
+
+
+def test_sampling_filter_keeps_warnings():
+    sampling = SamplingFilter(sample_rate=0)
+    assert not sampling.filter(_record())
+    assert sampling.filter(_record(level=logging.WARNING))
+    assert sampling.filter(_record(sample_rate=1.0))
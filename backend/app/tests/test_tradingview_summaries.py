@@ -0,0 +1,47 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.services.rate_limiter import AsyncRateLimiter
+from app.services.tradingview_summaries import TradingViewSummaryCollector, tradingview_symbol
+
+
+def test_tradingview_symbol():
+    assert tradingview_symbol("7203.T", "JP") == "7203"
+    assert tradingview_symbol("brk-b", "US") == "BRK.B"
+
+
+def test_collector_batches_symbols_and_falls_back_to_next_exchange():
+    listed = {"NASDAQ": {"AAPL", "MSFT"}, "NYSE": {"KO"}, "AMEX": set()}
+    calls = []
+
+    def fetch_multiple(screener, symbols):
+        calls.append((screener, list(symbols)))
+        result = {}
+        for key in symbols:
+            exchange, symbol = key.split(":")
+            result[key] = SimpleNamespace(summary={"RECOMMENDATION": f"BUY {symbol}"}) if symbol in listed[exchange] else None
+        return result
+
+    collector = TradingViewSummaryCollector(
+        fetch_multiple, batch_size=2, limiter=AsyncRateLimiter(rate_per_second=0, max_concurrency=4)
+    )
+    summaries = asyncio.run(collector.collect(["AAPL", "MSFT", "KO", "ZZZZ"], "US"))
+
+    assert summaries == {
+        "AAPL": {"RECOMMENDATION": "BUY AAPL"},
+        "MSFT": {"RECOMMENDATION": "BUY MSFT"},
+        "KO": {"RECOMMENDATION": "BUY KO"},
+    }
+    # NASDAQに2回（2銘柄ずつ）、NYSE・AMEXには見つからなかった銘柄だけを問い合わせる
+    assert sorted(symbol for screener, symbols in calls[:2] for symbol in symbols) == [
+        "NASDAQ:AAPL", "NASDAQ:KO", "NASDAQ:MSFT", "NASDAQ:ZZZZ"
+    ]
+    assert calls[2:] == [("america", ["NYSE:KO", "NYSE:ZZZZ"]), ("america", ["AMEX:ZZZZ"])]
+
+
+def test_collector_skips_failed_requests():
+    def fetch_multiple(screener, symbols):
+        raise ConnectionError("scanner unavailable")
+
+    collector = TradingViewSummaryCollector(fetch_multiple, limiter=AsyncRateLimiter(rate_per_second=0))
+    assert asyncio.run(collector.collect(["7203.T"], "JP")) == {}
@@ -0,0 +1,86 @@
+from bs4 import BeautifulSoup
+
+from app.services.website_content_extractor import (
+    build_website_content,
+    estimate_tokens,
+    extract_text_blocks,
+    find_relevant_links,
+    is_boilerplate_token,
+    truncate_to_tokens,
+)
+
+HOME = """
+<html><body>
+<header><p>ヘッダーのキャッチコピーはプロンプトに含めない文章です</p></header>
+<nav><a href="/about/">会社概要</a><a href="/ir/">IR情報</a><a href="/recruit/">採用</a>
+<a href="https://other.example.com/about">外部サイト</a></nav>
+<main>
+<p>私たちはクラウド会計サービスを中小企業向けに提供しています。</p>
+<p>私たちはクラウド会計サービスを中小企業向けに提供しています。</p>
+</main>
+<div class="footer"><p>Copyright 2024 Example Inc. All rights reserved.</p></div>
+</body></html>
+"""
+
+ABOUT = """
+<html><body><dl>
+<dt>設立</dt><dd>2015年4月1日に東京都渋谷区で設立されました</dd>
+<dt>従業員数</dt><dd>従業員数は120名（2024年3月時点）です</dd>
+</dl></body></html>
+"""
+
+
+def test_find_relevant_links_keeps_same_site_about_and_ir_pages():
+    soup = BeautifulSoup(HOME, 'html.parser')
+    links = find_relevant_links(soup, "https://example.com/")
+    assert links == ["https://example.com/about/", "https://example.com/ir/"]
+
+
+def test_build_website_content_strips_boilerplate_and_duplicates():
+    content = build_website_content(
+        [("https://example.com/", HOME.encode()), ("https://example.com/about/", ABOUT.encode())],
+        token_budget=1000,
+    )
+    assert content.count("クラウド会計サービス") == 1
+    assert "Copyright" not in content
+    assert "ヘッダー" not in content
+    assert "2015年4月1日" in content
+
+
+def test_build_website_content_respects_token_budget():
+    pages = [("https://example.com/", HOME.encode()), ("https://example.com/about/", ABOUT.encode())]
+    content = build_website_content(pages, token_budget=30)
+    assert estimate_tokens(content) <= 30
+    # 予算が少ない場合は情報量の多い会社概要のブロックが優先される
+    assert "従業員数" in content
+    assert "クラウド会計" not in content
+
+
+def test_truncate_to_tokens():
+    text = "あ" * 100
+    assert truncate_to_tokens(text, 10) == "あ" * 9 + "…"
+    assert truncate_to_tokens("short", 10) == "short"
+    assert truncate_to_tokens(text, 0) == ""
+    # 「…」を付けても予算を超えない
+    for max_tokens in range(1, 40):
+        for sample in (text, "a" * 100, "あa" * 50):
+            assert estimate_tokens(truncate_to_tokens(sample, max_tokens)) <= max_tokens
+
+
+def test_boilerplate_classes_match_whole_words_and_keep_page_wrappers():
+    assert is_boilerplate_token("global-nav") and is_boilerplate_token("gNav") and is_boilerplate_token("l_footer")
+    assert not is_boilerplate_token("has-sidebar") and not is_boilerplate_token("canvas") and not is_boilerplate_token("shareholders")
+
+    html = """
+    <html><body class="has-sidebar">
+    <div id="main-header-wrapper"><div class="menu-page">
+    <p>当社は1998年に創業し、産業用ロボットの製造と販売を行っています。</p>
+    <p>本社は大阪府大阪市にあり、従業員数は約850名です。</p>
+    </div></div>
+    <div class="sidebar"><p>おすすめ記事の一覧はこちらからご覧いただけます。</p></div>
+    </body></html>
+    """
+    texts = [text for _, text in extract_text_blocks(html)]
+    assert any("産業用ロボット" in text for text in texts)
+    assert any("従業員数" in text for text in texts)
+    assert not any("おすすめ記事" in text for text in texts)
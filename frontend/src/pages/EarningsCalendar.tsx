@@ -25,6 +25,14 @@ interface CompanyEarnings {
   dividend_yield?: number;
 }
 
+interface DailyListing {
+  companies: CompanyEarnings[];
+  fetchedAt: number;
+}
+
+// バックエンドの決算キャッシュの有効期間（EARNINGS_CACHE_TTL_SECONDS、デフォルト300秒）に合わせる
+const DAILY_LISTINGS_TTL_MS = 5 * 60 * 1000;
+
 function EarningsCalendar() {
   const navigate = useNavigate();
   const [currentYear, setCurrentYear] = useState(new Date().getFullYear());
@@ -32,6 +40,7 @@ function EarningsCalendar() {
   const [monthlyData, setMonthlyData] = useState<{ [key: string]: EarningsData }>({});
   const [selectedDate, setSelectedDate] = useState<string | null>(null);
   const [companies, setCompanies] = useState<CompanyEarnings[]>([]);
+  const [dailyListings, setDailyListings] = useState<{ [key: string]: DailyListing }>({});
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
@@ -57,18 +66,39 @@ function EarningsCalendar() {
   };
 
   const fetchDailyData = async (date: string) => {
+    // 同じ週の日付は取得済みの一覧を使う（有効期間を過ぎたものは取得し直す）
+    const cached = dailyListings[date];
+    if (cached && Date.now() - cached.fetchedAt < DAILY_LISTINGS_TTL_MS) {
+      setCompanies(cached.companies);
+      return;
+    }
+
     try {
       setLoading(true);
       setError(null);
 
+      // クリックした日を含む週（日曜始まり）をまとめて取得
+      const [year, month, day] = date.split('-').map(Number);
+      const weekStart = new Date(year, month - 1, day);
+      weekStart.setDate(weekStart.getDate() - weekStart.getDay());
+      const weekStartStr = `${weekStart.getFullYear()}-${String(weekStart.getMonth() + 1).padStart(2, '0')}-${String(
+        weekStart.getDate()
+      ).padStart(2, '0')}`;
+
       const API_BASE_URL = import.meta.env.VITE_API_URL || '/api';
-      const response = await fetch(`${API_BASE_URL}/earnings/daily/${date}`);
+      const response = await fetch(`${API_BASE_URL}/earnings/weekly/${weekStartStr}`);
       if (!response.ok) {
         throw new Error('企業データの取得に失敗しました');
       }
 
-      const data = await response.json();
-      setCompanies(data);
+      const data: { [key: string]: CompanyEarnings[] } = await response.json();
+      const fetchedAt = Date.now();
+      const listings: { [key: string]: DailyListing } = {};
+      Object.entries(data).forEach(([day, dayCompanies]) => {
+        listings[day] = { companies: dayCompanies, fetchedAt };
+      });
+      setDailyListings((prev) => ({ ...prev, ...listings }));
+      setCompanies(data[date] || []);
     } catch (error) {
       setError(error instanceof Error ? error.message : '予期せぬエラーが発生しました');
       setCompanies([]);
@@ -78,6 +108,8 @@ function EarningsCalendar() {
   };
 
   useEffect(() => {
+    // 月を切り替えたら取得済みの日ごとの一覧を破棄する
+    setDailyListings({});
     fetchMonthlyData(currentYear, currentMonth);
   }, [currentYear, currentMonth]);
 